@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Measures how long linking up async and flow events takes.
+
+Builds a trace made only of async (S/T/F) and flow (s/t/f) events spread over
+several threads, and times the importer's FinalizeImport, which is where they
+are turned into AsyncSlices and flow event pairs.
+
+Usage: benchmark_async_import.py [--events N] [--shuffle]
+"""
+
+import optparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir))
+
+from telemetry.timeline import model
+from telemetry.timeline import trace_event_importer
+from telemetry.timeline import tracing_timeline_data
+
+
+def CreateLinkedEvents(num_events, num_threads=8, seed=0, shuffle=False):
+  """Returns interleaved async slices with steps and flows of three events.
+
+  If shuffle is True the events are in random order, as in traces that were
+  merged from several sources without sorting them.
+  """
+  rng = random.Random(seed)
+  events = []
+  ts = 0
+  slice_id = 0
+  while len(events) < num_events:
+    ts += rng.randint(1, 20)
+    slice_id += 1
+    tids = [rng.randint(1, num_threads) for _ in xrange(3)]
+    name = rng.choice(['InputLatency', 'ResourceLoad', 'FrameSwap'])
+    events.extend([
+        {'name': name, 'cat': 'benchmark', 'ph': 'S', 'pid': 1,
+         'tid': tids[0], 'ts': ts, 'id': slice_id, 'args': {}},
+        {'name': name, 'cat': 'benchmark', 'ph': 'T', 'pid': 1,
+         'tid': tids[1], 'ts': ts + rng.randint(0, 500), 'id': slice_id,
+         'args': {'step': 'Step'}},
+        {'name': name, 'cat': 'benchmark', 'ph': 'F', 'pid': 1,
+         'tid': tids[2], 'ts': ts + rng.randint(500, 1000), 'id': slice_id,
+         'args': {}},
+        {'name': 'Flow', 'cat': 'benchmark', 'ph': 's', 'pid': 1,
+         'tid': tids[0], 'ts': ts, 'id': slice_id, 'args': {}},
+        {'name': 'Flow', 'cat': 'benchmark', 'ph': 't', 'pid': 1,
+         'tid': tids[1], 'ts': ts + rng.randint(0, 500), 'id': slice_id,
+         'args': {}},
+        {'name': 'Flow', 'cat': 'benchmark', 'ph': 'f', 'pid': 1,
+         'tid': tids[2], 'ts': ts + rng.randint(500, 1000), 'id': slice_id,
+         'args': {}},
+    ])
+  # Like Chrome's trace buffer, write the events out in chunks that each hold
+  # a few milliseconds of events of a single thread.
+  events.sort(key=lambda event: (event['ts'] // 10000, event['tid']))
+  if shuffle:
+    rng.shuffle(events)
+  return events
+
+
+def Main(args):
+  parser = optparse.OptionParser(usage=__doc__)
+  parser.add_option('--events', type='int', default=300000,
+                    help='Number of async and flow events.')
+  parser.add_option('--repeat', type='int', default=3,
+                    help='Number of imports to take the best time of.')
+  parser.add_option('--shuffle', action='store_true',
+                    help='Put the events in random order.')
+  options, _ = parser.parse_args(args)
+
+  events = CreateLinkedEvents(options.events, shuffle=options.shuffle)
+  best_import = best_finalize = None
+  for _ in xrange(options.repeat):
+    timeline_model = model.TimelineModel()
+    importer = trace_event_importer.TraceEventTimelineImporter(
+        timeline_model, tracing_timeline_data.TracingTimelineData(events))
+    start = time.time()
+    importer.ImportEvents()
+    imported = time.time()
+    importer.FinalizeImport()
+    finalized = time.time()
+    best_import = min(best_import or imported - start, imported - start)
+    best_finalize = min(best_finalize or finalized - imported,
+                        finalized - imported)
+
+  num_async_slices = sum(len(t.async_slices)
+                         for t in timeline_model.GetAllThreads())
+  print '%d events: ImportEvents %.2fs, FinalizeImport %.2fs' % (
+      len(events), best_import, best_finalize)
+  print '%d async slices, %d flows, %d import errors' % (
+      num_async_slices, len(timeline_model.flow_events),
+      len(timeline_model.import_errors))
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(Main(sys.argv[1:]))
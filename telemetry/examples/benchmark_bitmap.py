@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Times the pixel operations of telemetry.core.bitmap on video frames.
+
+Compares the NumPy and pure Python implementations of bitmap.py with running
+the bitmaptools binary once per command, which is what bitmap.py used to do,
+if a bitmaptools binary is given.
+
+Usage: benchmark_bitmap.py [--size 1920x1080] [--bitmaptools path]
+"""
+
+import optparse
+import os
+import random
+import struct
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir))
+
+from telemetry.core import bitmap
+
+_CROP_PIXELS = 0
+_HISTOGRAM = 1
+_BOUNDING_BOX = 2
+
+
+def CreateFrame(width, height, seed=0):
+  """Returns the RGB pixels of a frame showing a white page with some text
+  and images in an orange content box, like the first frames of a video."""
+  rng = random.Random(seed)
+  row = bytearray(bitmap.WHITE[:3]) * width
+  pixels = row * height
+  margin = min(width, height) / 10
+  orange = bytearray(bitmap.WEB_PAGE_TEST_ORANGE[:3]) * (width - 2 * margin)
+  for y in xrange(margin, height - margin):
+    start = 3 * (y * width + margin)
+    pixels[start:start + len(orange)] = orange
+  for _ in xrange(200):
+    x = rng.randint(0, width - 20)
+    y = rng.randint(0, height - 20)
+    color = bytearray(rng.randint(0, 255) for _ in xrange(3))
+    for dy in xrange(20):
+      start = 3 * ((y + dy) * width + x)
+      pixels[start:start + 60] = color * 20
+  return pixels
+
+
+def RunBitmapTools(binary, bmp, *command):
+  """Runs one command of bitmaptools on the uncropped bmp."""
+  process = subprocess.Popen([binary], stdin=subprocess.PIPE,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+  process.stdin.write(struct.pack('iiiiiii', bmp.bpp, bmp.width, bmp.height,
+                                  0, 0, bmp.width, bmp.height))
+  process.stdin.write(bmp.pixels)
+  process.stdin.write(struct.pack('i' * len(command), *command))
+  process.stdin.close()
+  length = struct.unpack('i', process.stdout.read(struct.calcsize('i')))[0]
+  response = process.stdout.read(length)
+  process.wait()
+  return response
+
+
+def Time(function, max_seconds):
+  """Returns the average seconds that function takes."""
+  start = time.time()
+  runs = 0
+  while True:
+    function()
+    runs += 1
+    elapsed = time.time() - start
+    if elapsed > max_seconds:
+      return elapsed / runs
+
+
+def Main(args):
+  parser = optparse.OptionParser(usage=__doc__)
+  parser.add_option('--size', default='1920x1080',
+                    help='Width x height of the frames.')
+  parser.add_option('--bitmaptools',
+                    help='Path to a bitmaptools binary to compare with.')
+  parser.add_option('--max-seconds', type='float', default=1,
+                    help='Time to spend on one operation.')
+  options, _ = parser.parse_args(args)
+
+  width, height = [int(s) for s in options.size.split('x')]
+  pixels = CreateFrame(width, height)
+  other_pixels = CreateFrame(width, height, seed=1)
+  orange = bitmap.WEB_PAGE_TEST_ORANGE
+
+  def Frame():
+    return bitmap.Bitmap(3, width, height, pixels)
+
+  content_box, _ = Frame().GetBoundingBox(orange, tolerance=8)
+  operations = [
+      ('GetBoundingBox', lambda: Frame().GetBoundingBox(orange, tolerance=8)),
+      ('ColorHistogram', lambda: Frame().ColorHistogram()),
+      ('Crop+ColorHistogram ignoring white',
+       lambda: Frame().Crop(*content_box).ColorHistogram(
+           ignore_color=bitmap.WHITE, tolerance=8)),
+      ('Crop+pixels', lambda: Frame().Crop(*content_box).pixels),
+      ('IsEqual with tolerance',
+       lambda: Frame().IsEqual(bitmap.Bitmap(3, width, height, other_pixels),
+                               tolerance=2)),
+      ('Diff',
+       lambda: Frame().Diff(bitmap.Bitmap(3, width, height, other_pixels))),
+  ]
+  bitmaptools_operations = {
+      'GetBoundingBox': (_BOUNDING_BOX, int(orange), 8),
+      'ColorHistogram': (_HISTOGRAM, -1, 0),
+      'Crop+pixels': (_CROP_PIXELS,),
+  }
+
+  bitmap_numpy = bitmap.bitmap_numpy
+  if not bitmap_numpy:
+    print 'NumPy is not installed, only timing the pure Python versions.'
+  print '%dx%d frames:' % (width, height)
+  for name, function in operations:
+    print '  %-36s' % name,
+    if bitmap_numpy:
+      print 'numpy %9.3fms' % (Time(function, options.max_seconds) * 1000),
+    bitmap.bitmap_numpy = None
+    try:
+      print 'python %9.3fms' % (Time(function, options.max_seconds) * 1000),
+    finally:
+      bitmap.bitmap_numpy = bitmap_numpy
+    if options.bitmaptools and name in bitmaptools_operations:
+      command = bitmaptools_operations[name]
+      print 'bitmaptools %9.3fms' % (Time(
+          lambda: RunBitmapTools(options.bitmaptools, Frame(), *command),
+          options.max_seconds) * 1000),
+    print
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(Main(sys.argv[1:]))
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Measures the cost of looking up timeline events by name.
+
+Compares the indexed TimelineEventContainer helpers against a full predicate
+scan of the model, which is what every lookup used to cost.
+
+Usage: benchmark_event_lookup.py [--events N] [--trace <trace file>]
+"""
+
+import optparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir))
+
+from telemetry.timeline import model
+from telemetry.timeline import slice as slice_module
+from telemetry.timeline import tracing_timeline_data
+
+import benchmark_trace_import
+
+
+def _ScanSlicesOfName(timeline_model, name):
+  return timeline_model.IterAllEvents(
+      event_type_predicate=lambda t: t == slice_module.Slice,
+      event_predicate=lambda e: e.name == name)
+
+
+def _TimeLookups(lookup, timeline_model, names, repeat):
+  found = 0
+  start = time.time()
+  for _ in xrange(repeat):
+    for name in names:
+      found += sum(1 for _ in lookup(timeline_model, name))
+  return (time.time() - start) / (repeat * len(names)), found
+
+
+def Main(args):
+  parser = optparse.OptionParser(usage=__doc__)
+  parser.add_option('--events', type='int', default=200000,
+                    help='Number of events in the synthetic trace.')
+  parser.add_option('--trace', help='Use this trace file instead.')
+  parser.add_option('--repeat', type='int', default=5,
+                    help='Number of times every lookup is repeated.')
+  parser.add_option('--columnar', action='store_true',
+                    help='Use columnar slice storage.')
+  options, _ = parser.parse_args(args)
+
+  trace_path = options.trace
+  if not trace_path:
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+      benchmark_trace_import.WriteSyntheticTrace(f, options.events)
+      trace_path = f.name
+  try:
+    timeline_model = model.TimelineModel(
+        tracing_timeline_data.TracingTimelineData(open(trace_path)),
+        columnar_slices=options.columnar)
+  finally:
+    if not options.trace:
+      os.remove(trace_path)
+
+  names = sorted(set(e.name for e in timeline_model.IterAllSlices()))[:10]
+  names.append('NoSuchEvent')
+
+  start = time.time()
+  list(timeline_model.IterAllSlicesOfName(names[0]))
+  print 'Index build + first lookup: %.3fs' % (time.time() - start)
+
+  scan_time, scan_found = _TimeLookups(
+      _ScanSlicesOfName, timeline_model, names, options.repeat)
+  index_time, index_found = _TimeLookups(
+      lambda m, name: m.IterAllSlicesOfName(name), timeline_model, names,
+      options.repeat)
+  assert scan_found == index_found
+  print 'Per lookup: scan %.2fms, indexed %.2fms (%.0fx), %d slices found' % (
+      scan_time * 1000, index_time * 1000, scan_time / index_time,
+      index_found / options.repeat)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(Main(sys.argv[1:]))
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Loads the threaded and the event loop memory cache HTTP servers.
+
+Serves a generated page set of small html, css and JavaScript files and
+larger images from each server in a child process, and requests random files
+from client processes for a while. Prints the requests per second and the
+latency percentiles of each server.
+
+Usage: benchmark_http_server.py [--clients 16] [--seconds 5] [--no-keep-alive]
+"""
+
+import httplib
+import multiprocessing
+import optparse
+import os
+import random
+import shutil
+import socket
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir))
+
+from telemetry.core import memory_cache_http_server
+
+# pylint: disable=W0212
+_SERVER_CLASSES = [
+    ('threaded', memory_cache_http_server._MemoryCacheHTTPServerImpl),
+    ('event loop',
+     memory_cache_http_server._MemoryCacheEventLoopHTTPServerImpl),
+]
+# Extensions and sizes of the generated files.
+_FILE_TYPES = [('html', 20 * 1024), ('css', 10 * 1024), ('js', 50 * 1024),
+               ('png', 100 * 1024), ('jpg', 300 * 1024)]
+
+
+def CreatePageSet(serving_dir, num_files):
+  """Writes num_files files to serving_dir and returns their URL paths."""
+  rng = random.Random(0)
+  words = ['<div>', 'function', 'var', 'color:', 'telemetry', '</div>']
+  paths = []
+  for i in xrange(num_files):
+    extension, size = _FILE_TYPES[i % len(_FILE_TYPES)]
+    name = 'file%d.%s' % (i, extension)
+    with open(os.path.join(serving_dir, name), 'wb') as f:
+      if extension in ('png', 'jpg'):
+        f.write(os.urandom(size))
+      else:
+        text = ' '.join(rng.choice(words) for _ in xrange(size / 6))
+        f.write(text[:size])
+    paths.append('/' + name)
+  return paths
+
+
+def _Serve(server_class, serving_dir, cache_dir, port_queue):
+  os.chdir(serving_dir)
+  server = server_class(
+      ('127.0.0.1', 0), memory_cache_http_server.MemoryCacheHTTPRequestHandler,
+      [serving_dir], compressed_cache_dir=cache_dir)
+  port_queue.put(server.server_address[1])
+  server.serve_forever()
+
+
+def _Load(args):
+  """Requests random paths for a number of seconds and returns the latency
+  of each request."""
+  port, paths, seconds, keep_alive, seed = args
+  rng = random.Random(seed)
+  latencies = []
+  connection = None
+  end_time = time.time() + seconds
+  while time.time() < end_time:
+    start_time = time.time()
+    if not connection:
+      connection = httplib.HTTPConnection('127.0.0.1', port, timeout=30)
+    connection.request('GET', rng.choice(paths))
+    response = connection.getresponse()
+    response.read()
+    assert response.status == 200, response.status
+    latencies.append(time.time() - start_time)
+    if not keep_alive:
+      connection.close()
+      connection = None
+  return latencies
+
+
+def Percentile(sorted_values, percent):
+  return sorted_values[min(len(sorted_values) - 1,
+                           int(len(sorted_values) * percent / 100.0))]
+
+
+def RunBenchmark(server_class, serving_dir, cache_dir, paths, options):
+  port_queue = multiprocessing.Queue()
+  server = multiprocessing.Process(
+      target=_Serve, args=(server_class, serving_dir, cache_dir, port_queue))
+  server.daemon = True
+  server.start()
+  idle_connections = []
+  try:
+    port = port_queue.get(timeout=30)
+    # Loads and gzips every file before timing.
+    for path in paths:
+      connection = httplib.HTTPConnection('127.0.0.1', port)
+      connection.request('GET', path)
+      connection.getresponse().read()
+      connection.close()
+    for _ in xrange(options.idle_connections):
+      idle_connections.append(
+          socket.create_connection(('127.0.0.1', port)))
+
+    pool = multiprocessing.Pool(options.clients)
+    start_time = time.time()
+    results = pool.map(_Load, [
+        (port, paths, options.seconds, options.keep_alive, seed)
+        for seed in xrange(options.clients)])
+    elapsed = time.time() - start_time
+    pool.close()
+    pool.join()
+  finally:
+    for sock in idle_connections:
+      sock.close()
+    server.terminate()
+    server.join()
+  latencies = sorted(latency for result in results for latency in result)
+  return len(latencies) / elapsed, latencies
+
+
+def Main(args):
+  parser = optparse.OptionParser(usage=__doc__)
+  parser.add_option('--clients', type='int', default=16,
+                    help='Number of client processes.')
+  parser.add_option('--seconds', type='float', default=5,
+                    help='Time to load each server for.')
+  parser.add_option('--files', type='int', default=100,
+                    help='Number of files to serve.')
+  parser.add_option('--idle-connections', type='int', default=0,
+                    help='Number of connections that are opened and never '
+                    'used, like those of a browser.')
+  parser.add_option('--no-keep-alive', dest='keep_alive', default=True,
+                    action='store_false',
+                    help='Open a connection for every request.')
+  options, _ = parser.parse_args(args)
+
+  temp_dir = tempfile.mkdtemp()
+  try:
+    serving_dir = os.path.join(temp_dir, 'serving')
+    os.mkdir(serving_dir)
+    paths = CreatePageSet(serving_dir, options.files)
+    print '%d clients, %d idle connections, %s:' % (
+        options.clients, options.idle_connections,
+        'keep-alive' if options.keep_alive else 'a connection per request')
+    for name, server_class in _SERVER_CLASSES:
+      requests_per_second, latencies = RunBenchmark(
+          server_class, serving_dir, os.path.join(temp_dir, 'cache'), paths,
+          options)
+      print '  %-10s %8.0f requests/s  latency ms p50 %7.2f  p90 %7.2f  ' \
+          'p99 %7.2f  max %7.2f' % (
+              name, requests_per_second,
+              Percentile(latencies, 50) * 1000,
+              Percentile(latencies, 90) * 1000,
+              Percentile(latencies, 99) * 1000, latencies[-1] * 1000)
+  finally:
+    shutil.rmtree(temp_dir)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(Main(sys.argv[1:]))
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Measures how long the jank and GC stats take with many interaction records.
+
+Builds a long renderer main thread of top level tasks, some of which run
+garbage collections, covers it with interaction records, and times
+MainthreadJankStats and V8Stats against computing the same stats record by
+record.
+
+Usage: benchmark_interaction_records.py [--slices N] [--records N]
+"""
+
+import optparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir))
+
+from telemetry.timeline import async_slice
+from telemetry.timeline import model
+from telemetry.web_perf import timeline_interaction_record as tir_module
+from telemetry.web_perf.metrics import mainthread_jank_stats
+from telemetry.web_perf.metrics import v8_stats
+
+
+_GC_EVENT_NAMES = ['V8.GCScavenger', 'V8.GCIncrementalMarking',
+                   'V8.GCCompactor']
+
+
+def CreateRendererThread(num_slices, seed=0):
+  """Returns a renderer main thread of num_slices top level tasks."""
+  rng = random.Random(seed)
+  timeline_model = model.TimelineModel()
+  thread = timeline_model.GetOrCreateProcess(1).GetOrCreateThread(2)
+  thread.name = 'CrRendererMain'
+  ts = 0
+  for _ in xrange(num_slices):
+    ts += rng.uniform(0.1, 5)
+    duration = rng.uniform(0.1, 80)
+    thread.BeginSlice('toplevel', 'MessageLoop::RunTask', ts, ts)
+    if rng.random() < 0.2:
+      gc_start = ts + duration * 0.25
+      if rng.random() < 0.5:
+        thread.BeginSlice('v8', 'V8.GCIdleNotification', gc_start, gc_start)
+      thread.PushCompleteSlice('v8', rng.choice(_GC_EVENT_NAMES), gc_start,
+                               duration / 4, gc_start, duration / 4)
+      if thread.open_slice_count > 1:
+        thread.EndSlice(gc_start + duration / 2, gc_start + duration / 2)
+    thread.EndSlice(ts + duration, ts + duration)
+    ts += duration
+  timeline_model.FinalizeImport(shift_world_to_zero=False)
+  return thread
+
+
+def CreateRecords(thread, num_records):
+  """Returns num_records back to back interaction records over thread."""
+  start = thread.bounds.min
+  length = thread.bounds.bounds / num_records
+  records = []
+  for i in xrange(num_records):
+    event = async_slice.AsyncSlice(
+        'blink.console', 'Interaction.Record%d/is_fast,is_responsive' % i,
+        timestamp=start + i * length, duration=length, start_thread=thread,
+        end_thread=thread, thread_start=start + i * length,
+        thread_duration=length)
+    records.append(tir_module.TimelineInteractionRecord.FromAsyncEvent(event))
+  return records
+
+
+def ComputeJankStatsPerRecord(thread, records):
+  total_big_jank_thread_time = 0
+  biggest_jank_thread_time = 0
+  for record in records:
+    # pylint: disable=W0212
+    stat = mainthread_jank_stats._ComputeMainthreadJankStatsForRecord(
+        thread, record)
+    total_big_jank_thread_time += stat.sum_big_top_slices_thread_time
+    biggest_jank_thread_time = max(biggest_jank_thread_time,
+                                   stat.biggest_top_slice_thread_time)
+  return total_big_jank_thread_time, biggest_jank_thread_time
+
+
+def ComputeGcStatsPerRecord(thread, records):
+  total_gc_thread_duration = 0
+  for record in records:
+    for event in thread.IterAllSlicesInRange(record.start, record.end):
+      if event.name in _GC_EVENT_NAMES:
+        total_gc_thread_duration += event.thread_duration
+  return total_gc_thread_duration
+
+
+def ResultsMatch(a, b):
+  """Returns whether stats match up to the rounding of summing them in a
+  different order."""
+  if not isinstance(a, tuple):
+    a, b = (a,), (b,)
+  return all(abs(x - y) <= 1e-9 * max(abs(x), abs(y), 1)
+             for x, y in zip(a, b))
+
+
+def Time(function, repeat):
+  best = None
+  for _ in xrange(repeat):
+    start = time.time()
+    result = function()
+    elapsed = time.time() - start
+    best = min(best or elapsed, elapsed)
+  return best, result
+
+
+def Main(args):
+  parser = optparse.OptionParser(usage=__doc__)
+  parser.add_option('--slices', type='int', default=20000,
+                    help='Number of top level slices.')
+  parser.add_option('--records', type='int', default=2000,
+                    help='Number of interaction records.')
+  parser.add_option('--repeat', type='int', default=3,
+                    help='Number of runs to take the best time of.')
+  options, _ = parser.parse_args(args)
+
+  thread = CreateRendererThread(options.slices)
+  records = CreateRecords(thread, options.records)
+
+  def ComputeJankStats():
+    stats = mainthread_jank_stats.MainthreadJankStats(thread, records)
+    return stats.total_big_jank_thread_time, stats.biggest_jank_thread_time
+  def ComputeGcStats():
+    return v8_stats.V8Stats(thread, records).total_gc_thread_duration
+
+  print '%d slices, %d records' % (options.slices, options.records)
+  for name, sweep, per_record in [
+      ('MainthreadJankStats', ComputeJankStats,
+       lambda: ComputeJankStatsPerRecord(thread, records)),
+      ('V8Stats', ComputeGcStats,
+       lambda: ComputeGcStatsPerRecord(thread, records))]:
+    sweep_time, sweep_result = Time(sweep, options.repeat)
+    per_record_time, per_record_result = Time(per_record, 1)
+    print '%s: sweep %.3fs, per record %.3fs, results %s' % (
+        name, sweep_time, per_record_time,
+        'match' if ResultsMatch(sweep_result, per_record_result)
+        else 'differ (%r != %r)' % (sweep_result, per_record_result))
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(Main(sys.argv[1:]))
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Compares the pure Python and NumPy versions of telemetry.util.statistics.
+
+Times the statistics that smoothness metrics compute on frame timestamps for
+lists of increasing length, with and without NumPy.
+
+Usage: benchmark_statistics.py [--sizes 100,1000,5000]
+"""
+
+import optparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir))
+
+from telemetry.util import statistics
+
+
+def CreateFrameTimestamps(count, seed=0):
+  """Returns count frame timestamps 16.7ms apart, with occasional janks."""
+  rng = random.Random(seed)
+  timestamps = [0.0]
+  for _ in xrange(count - 1):
+    interval = 16.7 if rng.random() > 0.05 else rng.uniform(30, 200)
+    timestamps.append(timestamps[-1] + interval)
+  return timestamps
+
+
+def TimeStatistics(timestamps, max_seconds):
+  """Returns the seconds each statistic takes on timestamps, or None for those
+  that would take more than about max_seconds."""
+  durations = [b - a for a, b in zip(timestamps, timestamps[1:])]
+  results = []
+  for function, args in [
+      (statistics.TimestampsDiscrepancy, (timestamps,)),
+      (statistics.DurationsDiscrepancy, (durations,)),
+      (statistics.Percentile, (durations, 95)),
+      (statistics.GeometricMean, (durations,)),
+      (statistics.StandardDeviation, (durations,))]:
+    start = time.time()
+    runs = 0
+    while True:
+      function(*args)
+      runs += 1
+      elapsed = time.time() - start
+      if elapsed > 0.2 or elapsed * (runs + 1) / runs > max_seconds:
+        break
+    results.append((function.__name__, elapsed / runs))
+  return results
+
+
+def Main(args):
+  parser = optparse.OptionParser(usage=__doc__)
+  parser.add_option('--sizes', default='100,1000,5000',
+                    help='Comma separated numbers of timestamps.')
+  parser.add_option('--max-seconds', type='float', default=30,
+                    help='Longest time to spend on one statistic.')
+  options, _ = parser.parse_args(args)
+
+  statistics_numpy = statistics.statistics_numpy
+  if not statistics_numpy:
+    print 'NumPy is not installed, only timing the pure Python versions.'
+  for size in [int(s) for s in options.sizes.split(',')]:
+    timestamps = CreateFrameTimestamps(size)
+    statistics.statistics_numpy = None
+    python_times = TimeStatistics(timestamps, options.max_seconds)
+    statistics.statistics_numpy = statistics_numpy
+    numpy_times = (TimeStatistics(timestamps, options.max_seconds)
+                   if statistics_numpy else [(None, None)] * len(python_times))
+    print '%d timestamps:' % size
+    for (name, python_time), (_, numpy_time) in zip(python_times,
+                                                   numpy_times):
+      print '  %-22s python %9.3fms' % (name, python_time * 1000),
+      if numpy_time is not None:
+        print '  numpy %7.3fms  (%.1fx)' % (numpy_time * 1000,
+                                           python_time / numpy_time),
+      print
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(Main(sys.argv[1:]))
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Measures TimelineModel import throughput and peak memory.
+
+Each import mode runs in a fresh child process so that its peak RSS is not
+polluted by the other modes. Without --trace a synthetic trace is generated.
+The cached modes run twice, first importing the trace into an empty model
+cache and then loading the model back from it.
+
+Usage: benchmark_trace_import.py [--events N] [--trace <trace file>]
+"""
+
+import json
+import optparse
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir))
+
+from telemetry.timeline import model
+from telemetry.timeline import tracing_timeline_data
+
+
+def _LoadEager(trace_path):
+  with open(trace_path) as f:
+    return tracing_timeline_data.TracingTimelineData(f.read())
+
+
+def _LoadStreaming(trace_path):
+  return tracing_timeline_data.TracingTimelineData(open(trace_path))
+
+
+_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'benchmark_trace_import_cache')
+
+
+def _LoadCached(trace_path):
+  return tracing_timeline_data.TracingTimelineData(open(trace_path),
+                                                   cache_dir=_CACHE_DIR)
+
+
+# Maps each mode to the way the trace is loaded and the TimelineModel options.
+_MODES = {
+    'eager': (_LoadEager, {}),
+    'streaming': (_LoadStreaming, {}),
+    'columnar': (_LoadStreaming, {'columnar_slices': True}),
+    'parallel': (_LoadStreaming, {'import_jobs': 4}),
+    'parallel-columnar': (_LoadStreaming, {'columnar_slices': True,
+                                           'import_jobs': 4}),
+    'cached': (_LoadCached, {}),
+    'cached-columnar': (_LoadCached, {'columnar_slices': True}),
+    'cached-lazy': (_LoadCached, {'columnar_slices': True, 'lazy_args': True}),
+}
+
+
+# Names used for the nested B/E slices of the synthetic trace.
+_NESTED_SLICE_NAMES = [
+    'Layout', 'Paint', 'RecalculateStyles', 'ParseHTML', 'FunctionCall',
+    'EvaluateScript', 'UpdateLayerTree', 'CompositeLayers', 'DecodeImage',
+    'V8.GCScavenger', 'V8.GCIncrementalMarking', 'V8.GCCompactor',
+    'ThreadProxy::BeginMainFrame', 'InputRouterImpl::SendEvent',
+    'ResourceDispatcher::OnRequestComplete', 'HTMLDocumentParser::didReceive',
+]
+
+
+def WriteSyntheticTrace(f, num_events, num_threads=8, seed=0):
+  """Writes a trace of nested complete events, B/E pairs and async slices."""
+  rng = random.Random(seed)
+  f.write('{"traceEvents": [\n')
+  written = 0
+  ts = 0
+  first = True
+  while written < num_events:
+    ts += rng.randint(1, 50)
+    tid = rng.randint(1, num_threads)
+    pid = 1 + tid % 3
+    nested_name = rng.choice(_NESTED_SLICE_NAMES)
+    events = [
+        {'name': 'MessageLoop::RunTask', 'cat': 'toplevel', 'ph': 'X',
+         'pid': pid, 'tid': tid, 'ts': ts, 'dur': 40, 'tts': ts / 2,
+         'tdur': 30, 'args': {'src_file': 'foo.cc', 'src_func': 'Run'}},
+        {'name': nested_name, 'cat': 'blink', 'ph': 'B', 'pid': pid,
+         'tid': tid, 'ts': ts + 5, 'tts': ts / 2 + 2,
+         'args': {'frame': '0x%x' % ts}},
+        {'name': nested_name, 'cat': 'blink', 'ph': 'E', 'pid': pid,
+         'tid': tid, 'ts': ts + 20, 'tts': ts / 2 + 12, 'args': {}},
+        {'name': 'InputLatency', 'cat': 'benchmark', 'ph': 'S', 'pid': pid,
+         'tid': tid, 'ts': ts + 1, 'id': written, 'args': {}},
+        {'name': 'InputLatency', 'cat': 'benchmark', 'ph': 'F', 'pid': pid,
+         'tid': tid, 'ts': ts + 30, 'id': written, 'args': {'data': {}}},
+    ]
+    for event in events:
+      if not first:
+        f.write(',\n')
+      first = False
+      json.dump(event, f)
+    written += len(events)
+  f.write('\n], "metadata": {"benchmark": true}}\n')
+  return written
+
+
+def _RunChild(mode, trace_path):
+  start = time.time()
+  load, model_options = _MODES[mode]
+  m = model.TimelineModel(load(trace_path), **model_options)
+  elapsed = time.time() - start
+  num_events = sum(1 for _ in m.IterAllEvents())
+  print json.dumps({
+      'mode': mode,
+      'seconds': elapsed,
+      'events': num_events,
+      # ru_maxrss is in kilobytes on Linux and bytes on Mac.
+      'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+  })
+  return 0
+
+
+def Main(args):
+  parser = optparse.OptionParser(usage=__doc__)
+  parser.add_option('--events', type='int', default=500000,
+                    help='Number of events in the synthetic trace.')
+  parser.add_option('--trace', help='Import this trace file instead.')
+  parser.add_option('--modes', default=','.join(sorted(_MODES)),
+                    help='Comma separated list of import modes to run.')
+  parser.add_option('--child-mode', help=optparse.SUPPRESS_HELP)
+  options, _ = parser.parse_args(args)
+
+  if options.child_mode:
+    return _RunChild(options.child_mode, options.trace)
+
+  trace_path = options.trace
+  if not trace_path:
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+      WriteSyntheticTrace(f, options.events)
+      trace_path = f.name
+  try:
+    print 'Trace: %s (%.1f MB)' % (
+        trace_path, os.path.getsize(trace_path) / 1024.0 / 1024.0)
+    for mode in options.modes.split(','):
+      runs = [mode]
+      if _MODES[mode][0] == _LoadCached:
+        shutil.rmtree(_CACHE_DIR, ignore_errors=True)
+        runs = [mode + ' (cold)', mode + ' (warm)']
+      for run in runs:
+        output = subprocess.check_output(
+            [sys.executable, __file__, '--child-mode', mode,
+             '--trace', trace_path])
+        result = json.loads(output.splitlines()[-1])
+        print '%-24s %8.2fs %10.0f events/s  peak RSS %8d' % (
+            run, result['seconds'], result['events'] / result['seconds'],
+            result['peak_rss'])
+  finally:
+    shutil.rmtree(_CACHE_DIR, ignore_errors=True)
+    if not options.trace:
+      os.remove(trace_path)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(Main(sys.argv[1:]))
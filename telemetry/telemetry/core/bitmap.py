@@ -5,18 +5,22 @@
 """
 Bitmap is a basic wrapper for image pixels. It includes some basic processing
 tools: crop, find bounding box of a color and compute histogram of color values.
+
+The processing is done in process, with bitmap_numpy.py when NumPy is
+available and with the slower pure Python functions below otherwise.
 """
 
-import array
 import base64
-import cStringIO
 import collections
-import struct
-import subprocess
+import itertools
+import sys
 
 from telemetry.core import util
-from telemetry.core import platform
-from telemetry.util import support_binaries
+
+try:
+  from telemetry.core import bitmap_numpy
+except ImportError:
+  bitmap_numpy = None  # NumPy is not installed
 
 util.AddDirToPythonPath(util.GetTelemetryDir(), 'third_party', 'png')
 import png  # pylint: disable=F0401
@@ -115,65 +119,122 @@ WEB_PAGE_TEST_ORANGE = RgbaColor(222, 100, 13)
 WHITE = RgbaColor(255, 255, 255)
 
 
-class _BitmapTools(object):
-  """Wraps a child process of bitmaptools and allows for one command."""
-  CROP_PIXELS = 0
-  HISTOGRAM = 1
-  BOUNDING_BOX = 2
-
-  def __init__(self, dimensions, pixels):
-    binary = support_binaries.FindPath(
-        'bitmaptools',
-        platform.GetHostPlatform().GetArchName(),
-        platform.GetHostPlatform().GetOSName())
-    assert binary, 'You must build bitmaptools first!'
-
-    self._popen = subprocess.Popen([binary],
-                                   stdin=subprocess.PIPE,
-                                   stdout=subprocess.PIPE,
-                                   stderr=subprocess.PIPE)
-
-    # dimensions are: bpp, width, height, boxleft, boxtop, boxwidth, boxheight
-    packed_dims = struct.pack('iiiiiii', *dimensions)
-    self._popen.stdin.write(packed_dims)
-    # If we got a list of ints, we need to convert it into a byte buffer.
-    if type(pixels) is not bytearray:
-      pixels = bytearray(pixels)
-    self._popen.stdin.write(pixels)
-
-  def _RunCommand(self, *command):
-    assert not self._popen.stdin.closed, (
-      'Exactly one command allowed per instance of tools.')
-    packed_command = struct.pack('i' * len(command), *command)
-    self._popen.stdin.write(packed_command)
-    self._popen.stdin.close()
-    length_packed = self._popen.stdout.read(struct.calcsize('i'))
-    if not length_packed:
-      raise Exception(self._popen.stderr.read())
-    length = struct.unpack('i', length_packed)[0]
-    return self._popen.stdout.read(length)
-
-  def CropPixels(self):
-    return self._RunCommand(_BitmapTools.CROP_PIXELS)
-
-  def Histogram(self, ignore_color, tolerance):
-    ignore_color_int = -1 if ignore_color is None else int(ignore_color)
-    response = self._RunCommand(_BitmapTools.HISTOGRAM,
-                                ignore_color_int, tolerance)
-    out = array.array('i')
-    out.fromstring(response)
-    assert len(out) == 768, (
-        'The ColorHistogram has the wrong number of buckets: %s' % len(out))
-    return ColorHistogram(out[:256], out[256:512], out[512:], ignore_color)
-
-  def BoundingBox(self, color, tolerance):
-    response = self._RunCommand(_BitmapTools.BOUNDING_BOX, int(color),
-                                tolerance)
-    unpacked = struct.unpack('iiiii', response)
-    box, count = unpacked[:4], unpacked[-1]
-    if box[2] < 0 or box[3] < 0:
-      box = None
-    return box, count
+def _GetSize(image):
+  _, width, height, _, crop_box = image
+  return (crop_box[2], crop_box[3]) if crop_box else (width, height)
+
+
+def _IterRows(image):
+  """Yields the pixels of each row of image inside its crop box."""
+  bpp, width, height, pixels, crop_box = image
+  left, top, crop_width, crop_height = crop_box or (0, 0, width, height)
+  row_stride = width * bpp
+  row_size = crop_width * bpp
+  start = top * row_stride + left * bpp
+  for row_start in xrange(start, start + crop_height * row_stride, row_stride):
+    yield pixels[row_start:row_start + row_size]
+
+
+def _CropPixels(image):
+  return bytearray().join(_IterRows(image))
+
+
+def _ToRgb(row, bpp):
+  if bpp == 3:
+    return row
+  rgb = bytearray(len(row) / 4 * 3)
+  for i in xrange(3):
+    rgb[i::3] = row[i::4]
+  return rgb
+
+
+def _ToRgba(row, bpp):
+  if bpp == 4:
+    return row
+  rgba = bytearray('\xff') * (len(row) / 3 * 4)
+  for i in xrange(3):
+    rgba[i::4] = row[i::3]
+  return rgba
+
+
+def _Histogram(image, ignore_color, tolerance):
+  bpp = image[0]
+  if ignore_color is None:
+    # Counting each byte value in the channels is much faster than looking at
+    # each pixel in Python.
+    counts = []
+    for i in xrange(3):
+      channel = bytearray().join(row[i::bpp] for row in _IterRows(image))
+      counts.append([channel.count(chr(v)) for v in xrange(256)])
+    return counts
+
+  r_counts, g_counts, b_counts = counts = [[0] * 256 for _ in xrange(3)]
+  ignore_r, ignore_g, ignore_b = ignore_color[:3]
+  for row in _IterRows(image):
+    for i in xrange(0, len(row), bpp):
+      r, g, b = row[i], row[i + 1], row[i + 2]
+      if (abs(r - ignore_r) <= tolerance and abs(g - ignore_g) <= tolerance and
+          abs(b - ignore_b) <= tolerance):
+        continue
+      r_counts[r] += 1
+      g_counts[g] += 1
+      b_counts[b] += 1
+  return counts
+
+
+def _BoundingBox(image, color, tolerance):
+  bpp = image[0]
+  color_r, color_g, color_b = color[:3]
+  left, top, right, bottom = sys.maxint, sys.maxint, -1, -1
+  count = 0
+  for y, row in enumerate(_IterRows(image)):
+    for i in xrange(0, len(row), bpp):
+      if (abs(row[i] - color_r) <= tolerance and
+          abs(row[i + 1] - color_g) <= tolerance and
+          abs(row[i + 2] - color_b) <= tolerance):
+        x = i / bpp
+        left = min(left, x)
+        right = max(right, x)
+        top = min(top, y)
+        bottom = y
+        count += 1
+  if not count:
+    return None, 0
+  return (left, top, right - left + 1, bottom - top + 1), count
+
+
+def _IsEqual(image1, image2, tolerance):
+  if image1[0] == image2[0]:
+    pixels1 = _CropPixels(image1)
+    pixels2 = _CropPixels(image2)
+  else:
+    pixels1 = _ToRgba(_CropPixels(image1), image1[0])
+    pixels2 = _ToRgba(_CropPixels(image2), image2[0])
+  if not tolerance:
+    return pixels1 == pixels2
+  return all(abs(a - b) <= tolerance
+             for a, b in itertools.izip(pixels1, pixels2))
+
+
+def _Diff(image1, image2):
+  width1, height1 = _GetSize(image1)
+  width2, height2 = _GetSize(image2)
+  width = max(width1, width2)
+  height = max(height1, height2)
+
+  def IterPaddedRgbRows(image, image_width):
+    """Yields the RGB rows of image, padded to width x height with black."""
+    padding = bytearray(3 * (width - image_width))
+    for row in _IterRows(image):
+      yield _ToRgb(row, image[0]) + padding
+    for _ in xrange(height - _GetSize(image)[1]):
+      yield bytearray(3 * width)
+
+  diff = bytearray()
+  for row1, row2 in itertools.izip(IterPaddedRgbRows(image1, width1),
+                                   IterPaddedRgbRows(image2, width2)):
+    diff.extend(abs(a - b) for a, b in itertools.izip(row1, row2))
+  return width, height, diff
 
 
 class Bitmap(object):
@@ -208,18 +269,21 @@ class Bitmap(object):
     """Height of the bitmap."""
     return self._crop_box[3] if self._crop_box else self._height
 
-  def _PrepareTools(self):
-    """Prepares an instance of _BitmapTools which allows exactly one command.
-    """
-    crop_box = self._crop_box or (0, 0, self._width, self._height)
-    return _BitmapTools((self._bpp, self._width, self._height) + crop_box,
-                        self._pixels)
+  def _GetImage(self):
+    """Returns the (bpp, width, height, pixels, crop_box) that the pixel
+    functions take, without copying the pixels."""
+    if type(self._pixels) is not bytearray:
+      self._pixels = bytearray(self._pixels)
+    return self._bpp, self._width, self._height, self._pixels, self._crop_box
 
   @property
   def pixels(self):
     """Flat pixel array of the bitmap."""
     if self._crop_box:
-      self._pixels = self._PrepareTools().CropPixels()
+      if bitmap_numpy:
+        self._pixels = bitmap_numpy.CropPixels(self._GetImage())
+      else:
+        self._pixels = _CropPixels(self._GetImage())
       # pylint: disable=unpacking-non-sequence
       _, _, self._width, self._height = self._crop_box
       self._crop_box = None
@@ -269,67 +333,36 @@ class Bitmap(object):
     if self.width != other.width or self.height != other.height:
       return False
 
-    # Loop over each pixel and test for equality
-    if tolerance or self.bpp != other.bpp:
-      for y in range(self.height):
-        for x in range(self.width):
-          c0 = self.GetPixelColor(x, y)
-          c1 = other.GetPixelColor(x, y)
-          if not c0.IsEqual(c1, tolerance):
-            return False
-    else:
-      return self.pixels == other.pixels
-
-    return True
+    if bitmap_numpy:
+      return bitmap_numpy.IsEqual(self._GetImage(), other._GetImage(),
+                                  tolerance)
+    return _IsEqual(self._GetImage(), other._GetImage(), tolerance)
 
   def Diff(self, other):
     """Returns a new Bitmap that represents the difference between this image
     and another Bitmap."""
 
-    # Output dimensions will be the maximum of the two input dimensions
-    out_width = max(self.width, other.width)
-    out_height = max(self.height, other.height)
-
-    diff = [[0 for x in xrange(out_width * 3)] for x in xrange(out_height)]
-
-    # Loop over each pixel and write out the difference
-    for y in range(out_height):
-      for x in range(out_width):
-        if x < self.width and y < self.height:
-          c0 = self.GetPixelColor(x, y)
-        else:
-          c0 = RgbaColor(0, 0, 0, 0)
-
-        if x < other.width and y < other.height:
-          c1 = other.GetPixelColor(x, y)
-        else:
-          c1 = RgbaColor(0, 0, 0, 0)
-
-        offset = x * 3
-        diff[y][offset] = abs(c0.r - c1.r)
-        diff[y][offset+1] = abs(c0.g - c1.g)
-        diff[y][offset+2] = abs(c0.b - c1.b)
-
-    # This particular method can only save to a file, so the result will be
-    # written into an in-memory buffer and read back into a Bitmap
-    diff_img = png.from_array(diff, mode='RGB')
-    output = cStringIO.StringIO()
-    try:
-      diff_img.save(output)
-      diff = Bitmap.FromPng(output.getvalue())
-    finally:
-      output.close()
-
-    return diff
+    # Pixels outside of the smaller bitmap count as black.
+    if bitmap_numpy:
+      width, height, pixels = bitmap_numpy.Diff(self._GetImage(),
+                                                other._GetImage())
+    else:
+      width, height, pixels = _Diff(self._GetImage(), other._GetImage())
+    return Bitmap(3, width, height, pixels)
 
   def GetBoundingBox(self, color, tolerance=0):
     """Finds the minimum box surrounding all occurences of |color|.
     Returns: (top, left, width, height), match_count
     Ignores the alpha channel."""
-    return self._PrepareTools().BoundingBox(color, tolerance)
+    if bitmap_numpy:
+      return bitmap_numpy.BoundingBox(self._GetImage(), color, tolerance)
+    return _BoundingBox(self._GetImage(), color, tolerance)
 
   def Crop(self, left, top, width, height):
-    """Crops the current bitmap down to the specified box."""
+    """Crops the current bitmap down to the specified box.
+
+    The pixels are only copied when they are asked for.
+    """
     cur_box = self._crop_box or (0, 0, self._width, self._height)
     cur_left, cur_top, cur_width, cur_height = cur_box
 
@@ -350,4 +383,9 @@ class Bitmap(object):
     Returns:
       A ColorHistogram namedtuple with 256 integers in each field: r, g, and b.
     """
-    return self._PrepareTools().Histogram(ignore_color, tolerance)
+    if bitmap_numpy:
+      r, g, b = bitmap_numpy.Histogram(self._GetImage(), ignore_color,
+                                       tolerance)
+    else:
+      r, g, b = _Histogram(self._GetImage(), ignore_color, tolerance)
+    return ColorHistogram(r, g, b, ignore_color)
@@ -0,0 +1,141 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""NumPy implementations of the pixel operations of bitmap.py.
+
+bitmap.py uses these when NumPy can be imported. Each function takes the
+images it works on as (bpp, width, height, pixels, crop_box) tuples and looks
+at the pixels through a NumPy view of the buffer inside crop_box, so cropping
+a bitmap never copies its pixels until they are asked for.
+"""
+
+import numpy  # pylint: disable=F0401
+
+_ROWS_PER_BAND = 64
+
+
+def _Rows(image):
+  """Returns a (height, width * bpp) uint8 view of the rows of pixels of image
+  inside its crop box.
+
+  Keeping the channels of a row next to each other in the last dimension
+  lets NumPy copy and compare whole rows at a time.
+  """
+  bpp, width, height, pixels, crop_box = image
+  rows = numpy.frombuffer(pixels, dtype=numpy.uint8).reshape(height,
+                                                              width * bpp)
+  if crop_box:
+    left, top, crop_width, crop_height = crop_box
+    rows = rows[top:top + crop_height, left * bpp:(left + crop_width) * bpp]
+  return rows
+
+
+def _MatchesColor(rows, bpp, color, tolerance):
+  """Returns a (height, width) bool array of whether the RGB of each pixel is
+  within tolerance of color. The alpha channel is ignored."""
+  matches = numpy.ones((rows.shape[0], rows.shape[1] / bpp), dtype=bool)
+  for i, value in enumerate(color[:3]):
+    channel = rows[:, i::bpp]
+    if value - tolerance > 0:
+      matches &= channel >= value - tolerance
+    if value + tolerance < 255:
+      matches &= channel <= value + tolerance
+  return matches
+
+
+def _RgbaRows(image):
+  rows = _Rows(image)
+  if image[0] == 4:
+    return rows
+  rgba = numpy.empty((rows.shape[0], rows.shape[1] / 3 * 4),
+                     dtype=numpy.uint8)
+  rgba[:, 3::4] = 255
+  for i in xrange(3):
+    rgba[:, i::4] = rows[:, i::3]
+  return rgba
+
+
+def _AbsoluteDifference(a, b, out=None):
+  # Avoids converting the pixels to a signed type.
+  out = numpy.maximum(a, b, out=out)
+  out -= numpy.minimum(a, b)
+  return out
+
+
+def _NewPixels(shape):
+  """Returns a bytearray of pixels and a writable NumPy view of it."""
+  pixels = bytearray(shape[0] * shape[1])
+  return pixels, numpy.frombuffer(pixels, dtype=numpy.uint8).reshape(shape)
+
+
+def CropPixels(image):
+  rows = _Rows(image)
+  # Copying through a view is much faster than tostring() on a cropped array.
+  pixels, view = _NewPixels(rows.shape)
+  view[...] = rows
+  return pixels
+
+
+def Histogram(image, ignore_color, tolerance):
+  bpp = image[0]
+  rows = _Rows(image)
+  keep = None
+  if ignore_color is not None:
+    keep = ~_MatchesColor(rows, bpp, ignore_color, tolerance).ravel()
+  histogram = []
+  for i in xrange(3):
+    channel = rows[:, i::bpp].ravel()
+    if keep is not None:
+      channel = numpy.compress(keep, channel)
+    histogram.append(numpy.bincount(channel, minlength=256).tolist())
+  return histogram
+
+
+def BoundingBox(image, color, tolerance):
+  matches = _MatchesColor(_Rows(image), image[0], color, tolerance)
+  rows = numpy.flatnonzero(matches.any(axis=1))
+  if not len(rows):
+    return None, 0
+  columns = numpy.flatnonzero(matches.any(axis=0))
+  box = (int(columns[0]), int(rows[0]), int(columns[-1] - columns[0] + 1),
+         int(rows[-1] - rows[0] + 1))
+  return box, int(numpy.count_nonzero(matches))
+
+
+def IsEqual(image1, image2, tolerance):
+  """Returns whether the two images, which have the same size, are equal
+  within tolerance. The alpha channel of RGB images is 255."""
+  if image1[0] == image2[0]:
+    rows1 = _Rows(image1)
+    rows2 = _Rows(image2)
+  else:
+    rows1 = _RgbaRows(image1)
+    rows2 = _RgbaRows(image2)
+  if not tolerance:
+    return numpy.array_equal(rows1, rows2)
+  # Compares a band of rows at a time to stop at the first difference, like
+  # the pure Python version does.
+  for top in xrange(0, rows1.shape[0], _ROWS_PER_BAND):
+    band = slice(top, top + _ROWS_PER_BAND)
+    if _AbsoluteDifference(rows1[band], rows2[band]).max() > tolerance:
+      return False
+  return True
+
+
+def Diff(image1, image2):
+  """Returns the width, height and RGB pixels of the absolute difference of
+  the two images, where pixels outside of an image are black."""
+  rows1 = _Rows(image1)
+  rows2 = _Rows(image2)
+  height = max(rows1.shape[0], rows2.shape[0])
+  width = max(rows1.shape[1] / image1[0], rows2.shape[1] / image2[0])
+  padded = []
+  for bpp, rows in ((image1[0], rows1), (image2[0], rows2)):
+    rgb = numpy.zeros((height, width * 3), dtype=numpy.uint8)
+    for i in xrange(3):
+      rgb[:rows.shape[0], i:rows.shape[1] / bpp * 3:3] = rows[:, i::bpp]
+    padded.append(rgb)
+  pixels, view = _NewPixels((height, width * 3))
+  _AbsoluteDifference(padded[0], padded[1], out=view)
+  return width, height, pixels
@@ -0,0 +1,80 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import random
+import unittest
+
+from telemetry.core import bitmap
+
+
+def _CreateRandomBitmap(rng, bpp, width, height):
+  """Returns a bitmap with a few colors, so that colors repeat, that is
+  randomly cropped half of the time. Also returns the colors and a function
+  creating new copies of the bitmap."""
+  colors = [[rng.randint(0, 255) for _ in xrange(bpp)] for _ in xrange(4)]
+  pixels = []
+  for _ in xrange(width * height):
+    pixels.extend(rng.choice(colors))
+  crop_box = None
+  if rng.random() < 0.5:
+    left = rng.randint(0, width - 1)
+    top = rng.randint(0, height - 1)
+    crop_box = (left, top, rng.randint(1, width - left),
+                rng.randint(1, height - top))
+  def CreateBitmap():
+    bmp = bitmap.Bitmap(bpp, width, height, list(pixels))
+    if crop_box:
+      bmp.Crop(*crop_box)
+    return bmp
+  return CreateBitmap(), colors, CreateBitmap
+
+
+@unittest.skipUnless(bitmap.bitmap_numpy, 'NumPy is not installed.')
+class BitmapNumpyUnitTest(unittest.TestCase):
+  """Checks that the NumPy functions match the pure Python ones on random
+  bitmaps."""
+
+  def setUp(self):
+    self._rng = random.Random(0)
+
+  def _AssertMatches(self, function):
+    numpy_result = function()
+    bitmap_numpy = bitmap.bitmap_numpy
+    bitmap.bitmap_numpy = None
+    try:
+      python_result = function()
+    finally:
+      bitmap.bitmap_numpy = bitmap_numpy
+    self.assertEqual(python_result, numpy_result)
+
+  def _CreateRandomBitmaps(self):
+    for _ in xrange(50):
+      bpp = self._rng.choice([3, 4])
+      yield _CreateRandomBitmap(self._rng, bpp, self._rng.randint(1, 12),
+                                self._rng.randint(1, 12))
+
+  def testCropPixels(self):
+    for _, _, create_bitmap in self._CreateRandomBitmaps():
+      # Getting the pixels of a cropped bitmap crops its pixels, so each run
+      # needs a new bitmap.
+      self._AssertMatches(lambda: create_bitmap().pixels)
+
+  def testHistogramAndBoundingBox(self):
+    for bmp, colors, _ in self._CreateRandomBitmaps():
+      color = bitmap.RgbaColor(*colors[0][:3])
+      tolerance = self._rng.choice([0, 0, 10, 100])
+      self._AssertMatches(lambda: bmp.ColorHistogram())
+      self._AssertMatches(lambda: bmp.ColorHistogram(color, tolerance))
+      self._AssertMatches(lambda: bmp.GetBoundingBox(color, tolerance))
+
+  def testIsEqualAndDiff(self):
+    for bmp1, _, _ in self._CreateRandomBitmaps():
+      bmp2, _, _ = _CreateRandomBitmap(
+          self._rng, self._rng.choice([3, 4]), bmp1.width, bmp1.height)
+      tolerance = self._rng.choice([0, 100, 255])
+      self._AssertMatches(lambda: bmp1.IsEqual(bmp2, tolerance))
+      self._AssertMatches(lambda: bmp1.IsEqual(bmp1, tolerance))
+      self._AssertMatches(lambda: bmp1.Diff(bmp2).pixels)
+      bmp3, _, _ = _CreateRandomBitmap(self._rng, bmp1.bpp, 5, 7)
+      self._AssertMatches(lambda: bmp1.Diff(bmp3).pixels)
@@ -0,0 +1,370 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""An HTTP server that serves all its connections from a single thread.
+
+SocketServer.ThreadingMixIn starts a thread per connection, and every
+thread competes for the GIL while it waits on its socket. EventLoopHTTPServer
+instead keeps all sockets non-blocking and waits for them together, with
+epoll where the platform has it and select elsewhere. Requests are read
+until they are complete and handed one at a time to an ordinary
+BaseHTTPServer.BaseHTTPRequestHandler subclass, whose response is collected in
+memory and sent whenever the socket can take more bytes. Connections are
+kept alive as the handler decides, and pipelined requests are answered in
+order.
+
+Request bodies must come with a Content-Length. Requests with a chunked
+Transfer-Encoding are answered with 501 Not Implemented, and their
+connection is closed.
+
+Since one thread serves every connection, request handlers must never
+block, which holds for handlers that serve from memory. Anything slow, like
+reading or compressing files, has to be done before serving starts.
+"""
+
+import collections
+import cStringIO
+import errno
+import logging
+import re
+import select
+import socket
+import threading
+
+
+_RECV_SIZE = 64 * 1024
+# Connections that send more header bytes than this are closed.
+_MAX_HEADER_SIZE = 64 * 1024
+_CONTENT_LENGTH_RE = re.compile(r'^content-length:\s*(\d+)\s*$',
+                                re.IGNORECASE | re.MULTILINE)
+_TRANSFER_ENCODING_RE = re.compile(r'^transfer-encoding:\s*(.*?)\s*$',
+                                   re.IGNORECASE | re.MULTILINE)
+_NOT_IMPLEMENTED_RESPONSE = ('HTTP/1.1 501 Not Implemented\r\n'
+                             'Content-Length: 0\r\n'
+                             'Connection: close\r\n\r\n')
+_WOULD_BLOCK_ERRORS = (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR)
+
+
+class _ResponseWriter(object):
+  """Collects the response of a request handler.
+
+  It replaces both the wfile and the connection of the handler, so that
+  handlers can send large bodies with connection.sendall(buffer(...)) without
+  them being copied.
+  """
+
+  def __init__(self):
+    self.chunks = []
+
+  def write(self, data):
+    if len(data):
+      self.chunks.append(data)
+
+  def sendall(self, data):
+    self.write(data)
+
+  def flush(self):
+    pass
+
+  def close(self):
+    pass
+
+
+class _Connection(object):
+  def __init__(self, sock, address):
+    self.socket = sock
+    self.address = address
+    self.input = ''
+    self.output = collections.deque()
+    self.output_offset = 0
+    self.close_when_sent = False
+    self.wants_write = False
+
+
+class _SelectPoller(object):
+  """Waits for sockets with select.select, which works everywhere but scans
+  every socket on each call."""
+
+  def __init__(self):
+    self._readers = set()
+    self._writers = set()
+
+  def Register(self, fd, write=False):
+    self._readers.add(fd)
+    self.Modify(fd, write)
+
+  def Modify(self, fd, write):
+    if write:
+      self._writers.add(fd)
+    else:
+      self._writers.discard(fd)
+
+  def Unregister(self, fd):
+    self._readers.discard(fd)
+    self._writers.discard(fd)
+
+  def Poll(self, timeout):
+    """Returns a list of (fd, readable, writable) tuples."""
+    try:
+      readable, writable, _ = select.select(
+          list(self._readers), list(self._writers), [], timeout)
+    except select.error, e:
+      if e[0] == errno.EINTR:
+        return []
+      raise
+    writable = set(writable)
+    events = [(fd, True, fd in writable) for fd in readable]
+    events.extend((fd, False, True) for fd in writable.difference(readable))
+    return events
+
+  def Close(self):
+    pass
+
+
+class _EpollPoller(object):
+  """Waits for sockets with select.epoll, whose cost does not grow with the
+  number of idle sockets."""
+
+  def __init__(self):
+    self._epoll = select.epoll()
+
+  @staticmethod
+  def _GetEventMask(write):
+    if write:
+      return select.EPOLLIN | select.EPOLLOUT
+    return select.EPOLLIN
+
+  def Register(self, fd, write=False):
+    self._epoll.register(fd, self._GetEventMask(write))
+
+  def Modify(self, fd, write):
+    self._epoll.modify(fd, self._GetEventMask(write))
+
+  def Unregister(self, fd):
+    self._epoll.unregister(fd)
+
+  def Poll(self, timeout):
+    """Returns a list of (fd, readable, writable) tuples."""
+    try:
+      events = self._epoll.poll(timeout)
+    except IOError, e:
+      if e.errno == errno.EINTR:
+        return []
+      raise
+    # Errors and hang ups are reported as readable, so that the next recv
+    # finds them.
+    readable_mask = select.EPOLLIN | select.EPOLLERR | select.EPOLLHUP
+    return [(fd, bool(mask & readable_mask), bool(mask & select.EPOLLOUT))
+            for fd, mask in events]
+
+  def Close(self):
+    self._epoll.close()
+
+
+def _CreatePoller():
+  if hasattr(select, 'epoll'):
+    return _EpollPoller()
+  return _SelectPoller()
+
+
+def _CreateBufferedHandlerClass(handler_class):
+  """Returns a subclass of handler_class that serves one buffered request.
+
+  handler_class is not constructed as usual, because its constructor would
+  serve the whole connection. Instead the handler is given the request and a
+  _ResponseWriter in place of the socket, and serves only that request.
+  """
+  class BufferedRequestHandler(handler_class):
+    def __init__(self, request, writer, client_address, server):
+      # pylint: disable=W0231
+      self.server = server
+      self.client_address = client_address
+      self.request = writer
+      self.connection = writer
+      self.rfile = cStringIO.StringIO(request)
+      self.wfile = writer
+      self.close_connection = 1
+      self.handle_one_request()
+
+  return BufferedRequestHandler
+
+
+class _UnsupportedRequestError(Exception):
+  pass
+
+
+def _GetRequestLength(data):
+  """Returns the length of the first complete request in data, or None if
+  more bytes are needed.
+
+  Raises _UnsupportedRequestError if the request has a body whose length is
+  not given by a Content-Length header.
+  """
+  header_end = data.find('\r\n\r\n')
+  if header_end < 0:
+    return None
+  match = _TRANSFER_ENCODING_RE.search(data, 0, header_end)
+  if match and match.group(1).lower() != 'identity':
+    raise _UnsupportedRequestError(match.group(1))
+  length = header_end + 4
+  match = _CONTENT_LENGTH_RE.search(data, 0, header_end)
+  if match:
+    length += int(match.group(1))
+  if len(data) < length:
+    return None
+  return length
+
+
+class EventLoopHTTPServer(object):
+  """Serves HTTP requests with RequestHandlerClass from a single thread.
+
+  It has the serve_forever, shutdown and server_close methods of
+  SocketServer.TCPServer, so it can be used in its place.
+  """
+
+  request_queue_size = 128
+
+  def __init__(self, server_address, RequestHandlerClass):
+    self.RequestHandlerClass = RequestHandlerClass
+    self._buffered_handler_class = _CreateBufferedHandlerClass(
+        RequestHandlerClass)
+    self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    self.socket.bind(server_address)
+    self.socket.listen(self.request_queue_size)
+    self.socket.setblocking(0)
+    self.server_address = self.socket.getsockname()
+    self._connections = {}
+    self._poller = _CreatePoller()
+    self._poller.Register(self.socket.fileno())
+    self._shutdown_request = False
+    self._is_shut_down = threading.Event()
+    self._is_shut_down.set()
+
+  def fileno(self):
+    return self.socket.fileno()
+
+  def serve_forever(self, poll_interval=0.5):
+    """Serves until shutdown is called from another thread."""
+    self._is_shut_down.clear()
+    try:
+      listening_fd = self.socket.fileno()
+      while not self._shutdown_request:
+        for fd, readable, writable in self._poller.Poll(poll_interval):
+          if fd == listening_fd:
+            self._Accept()
+            continue
+          connection = self._connections.get(fd)
+          if connection and readable:
+            self._Read(connection)
+          if connection and writable and fd in self._connections:
+            self._Write(connection)
+    finally:
+      self._shutdown_request = False
+      self._is_shut_down.set()
+
+  def shutdown(self):
+    """Stops serve_forever and waits until it returns."""
+    self._shutdown_request = True
+    self._is_shut_down.wait()
+
+  def server_close(self):
+    for connection in self._connections.values():
+      self._Close(connection)
+    self._poller.Close()
+    self.socket.close()
+
+  def _Accept(self):
+    while True:
+      try:
+        sock, address = self.socket.accept()
+      except socket.error, e:
+        if e[0] in _WOULD_BLOCK_ERRORS or e[0] == errno.ECONNABORTED:
+          return
+        raise
+      sock.setblocking(0)
+      sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+      self._connections[sock.fileno()] = _Connection(sock, address)
+      self._poller.Register(sock.fileno())
+
+  def _Close(self, connection):
+    fd = connection.socket.fileno()
+    self._poller.Unregister(fd)
+    del self._connections[fd]
+    connection.socket.close()
+
+  def _Read(self, connection):
+    try:
+      data = connection.socket.recv(_RECV_SIZE)
+    except socket.error, e:
+      if e[0] in _WOULD_BLOCK_ERRORS:
+        return
+      # Connection reset errors happen all the time due to the browser
+      # closing without terminating the connection properly.
+      self._Close(connection)
+      return
+    if not data:
+      self._Close(connection)
+      return
+    connection.input += data
+    self._HandleRequests(connection)
+    # Most responses fit in the socket buffer, so they are sent right away
+    # rather than after another poll.
+    self._Write(connection)
+
+  def _HandleRequests(self, connection):
+    while not connection.close_when_sent:
+      try:
+        length = _GetRequestLength(connection.input)
+      except _UnsupportedRequestError:
+        connection.output.append(_NOT_IMPLEMENTED_RESPONSE)
+        connection.close_when_sent = True
+        return
+      if length is None:
+        if len(connection.input) > _MAX_HEADER_SIZE:
+          connection.output.clear()
+          connection.close_when_sent = True
+        return
+      request = connection.input[:length]
+      connection.input = connection.input[length:]
+      self._HandleRequest(connection, request)
+
+  def _HandleRequest(self, connection, request):
+    writer = _ResponseWriter()
+    try:
+      handler = self._buffered_handler_class(
+          request, writer, connection.address, self)
+    except Exception:  # pylint: disable=W0703
+      logging.warning('Failed to handle request from %s:%d.',
+                      *connection.address[:2], exc_info=True)
+      connection.close_when_sent = True
+      return
+    connection.output.extend(writer.chunks)
+    if handler.close_connection:
+      connection.close_when_sent = True
+
+  def _Write(self, connection):
+    output = connection.output
+    while output:
+      chunk = output[0]
+      try:
+        sent = connection.socket.send(
+            buffer(chunk, connection.output_offset))
+      except socket.error, e:
+        if e[0] in _WOULD_BLOCK_ERRORS:
+          break
+        self._Close(connection)
+        return
+      connection.output_offset += sent
+      if connection.output_offset == len(chunk):
+        output.popleft()
+        connection.output_offset = 0
+
+    if not output and connection.close_when_sent:
+      self._Close(connection)
+      return
+    wants_write = bool(output)
+    if wants_write != connection.wants_write:
+      connection.wants_write = wants_write
+      self._poller.Modify(connection.socket.fileno(), wants_write)
@@ -0,0 +1,126 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import BaseHTTPServer
+import httplib
+import socket
+import threading
+import unittest
+
+from telemetry.core import event_loop_http_server
+
+
+_LARGE_BODY = 'x' * (8 * 1024 * 1024)
+
+
+class _TestRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  protocol_version = 'HTTP/1.1'
+
+  def do_GET(self):
+    if self.path == '/fail':
+      raise Exception('Failed to serve %s.' % self.path)
+    body = _LARGE_BODY if self.path == '/large' else self.path
+    self.send_response(200)
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.flush()
+    self.connection.sendall(buffer(body))
+
+  def log_message(self, fmt, *args):
+    pass
+
+
+def _ReceiveAll(sock):
+  chunks = []
+  while True:
+    data = sock.recv(64 * 1024)
+    if not data:
+      return ''.join(chunks)
+    chunks.append(data)
+
+
+class EventLoopHTTPServerTest(unittest.TestCase):
+  def setUp(self):
+    self._server = event_loop_http_server.EventLoopHTTPServer(
+        ('127.0.0.1', 0), _TestRequestHandler)
+    self._thread = threading.Thread(target=self._server.serve_forever)
+    self._thread.daemon = True
+    self._thread.start()
+
+  def tearDown(self):
+    self._server.shutdown()
+    self._thread.join()
+    self._server.server_close()
+
+  def _Connect(self):
+    return socket.create_connection(self._server.server_address, timeout=10)
+
+  def testKeepsConnectionsAlive(self):
+    connection = httplib.HTTPConnection(*self._server.server_address)
+    for path in ('/a', '/large', '/b'):
+      connection.request('GET', path)
+      response = connection.getresponse()
+      self.assertEquals(200, response.status)
+      self.assertEquals(_LARGE_BODY if path == '/large' else path,
+                        response.read())
+    connection.close()
+
+  def testAnswersPipelinedRequestsInOrder(self):
+    sock = self._Connect()
+    sock.sendall('GET /a HTTP/1.1\r\n\r\nGET /bc HTTP/1.1\r\n\r\n'
+                 'GET /d HTTP/1.1\r\nConnection: close\r\n\r\n')
+    data = _ReceiveAll(sock)
+    sock.close()
+    self.assertEquals(3, data.count('HTTP/1.1 200'))
+    self.assertTrue(data.index('/a') < data.index('/bc') < data.index('/d'))
+
+  def testClosesHttp10Connections(self):
+    sock = self._Connect()
+    sock.sendall('GET /a HTTP/1.0\r\n\r\n')
+    data = _ReceiveAll(sock)
+    sock.close()
+    self.assertTrue(data.startswith('HTTP/1.1 200'))
+    self.assertTrue(data.endswith('\r\n\r\n/a'))
+
+  def testClosesOnlyTheConnectionOfAFailedRequest(self):
+    sock = self._Connect()
+    sock.sendall('GET /fail HTTP/1.1\r\n\r\n')
+    self.assertEquals('', _ReceiveAll(sock))
+    sock.close()
+    connection = httplib.HTTPConnection(*self._server.server_address)
+    connection.request('GET', '/a')
+    self.assertEquals('/a', connection.getresponse().read())
+    connection.close()
+
+  def testClosesConnectionsWithOversizedHeaders(self):
+    sock = self._Connect()
+    # The server closes the connection with unread bytes, which resets it.
+    with self.assertRaises(socket.error):
+      sock.sendall('GET /a HTTP/1.1\r\nX: %s' % ('x' * 1024 * 1024))
+      _ReceiveAll(sock)
+    sock.close()
+
+  def testRejectsChunkedRequests(self):
+    sock = self._Connect()
+    sock.sendall('POST /a HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n'
+                 '3\r\nabc\r\n0\r\n\r\n')
+    data = _ReceiveAll(sock)
+    sock.close()
+    self.assertTrue(data.startswith('HTTP/1.1 501 '), data)
+    self.assertEquals(1, data.count('HTTP/1.1'))
+
+
+class EventLoopHTTPServerSelectTest(EventLoopHTTPServerTest):
+  """Runs the same tests with select, which is used where epoll is not
+  available."""
+  # pylint: disable=W0212
+
+  def setUp(self):
+    self._create_poller = event_loop_http_server._CreatePoller
+    event_loop_http_server._CreatePoller = event_loop_http_server._SelectPoller
+    super(EventLoopHTTPServerSelectTest, self).setUp()
+
+  def tearDown(self):
+    super(EventLoopHTTPServerSelectTest, self).tearDown()
+    event_loop_http_server._CreatePoller = self._create_poller
@@ -0,0 +1,662 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+"""A V8 heap snapshot kept in the flat integer arrays it is serialized as.
+
+The heap snapshot JSON format is defined by HeapSnapshotJSONSerializer in V8.
+Nodes and edges are serialized as flat lists of integers, node_fields and
+edge_fields integers per node or edge, and all strings are indices into a
+string table.
+
+Building an object per node and per edge takes minutes and gigabytes for the
+snapshot of a large renderer. HeapSnapshot instead keeps the node and edge
+lists in typed arrays, identifies nodes and edges by their ordinal (their
+index in the list divided by the field count) and only looks up names and
+types when they are asked for. HeapNode and HeapEdge are cheap views created
+on demand.
+
+heap_snapshot_numpy.py does the whole-snapshot passes when NumPy is
+available.
+"""
+
+import array
+import bisect
+import collections
+import json
+import re
+
+try:
+  from telemetry.core.heap import heap_snapshot_numpy
+except ImportError:
+  heap_snapshot_numpy = None  # NumPy is not installed
+
+# Node and edge fields are non-negative and fit in 32 bits.
+_TYPECODE = 'I'
+_PARSE_CHUNK_SIZE = 1 << 20
+_NO_NODE = -1
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+_REQUIRED_NODE_FIELDS = ('type', 'name', 'id', 'edge_count')
+_REQUIRED_EDGE_FIELDS = ('type', 'name_or_index', 'to_node')
+
+
+def _ParseIntegers(text, start, end):
+  """Returns the comma separated integers of text[start:end] in an array.
+
+  The text is split a chunk at a time so that a list of all the numbers
+  never exists.
+  """
+  if heap_snapshot_numpy:
+    return heap_snapshot_numpy.ParseIntegers(text[start:end], _TYPECODE)
+  values = array.array(_TYPECODE)
+  while start < end:
+    chunk_end = text.find(',', start + _PARSE_CHUNK_SIZE, end)
+    if chunk_end == -1:
+      chunk_end = end
+    chunk = text[start:chunk_end]
+    if chunk.strip():
+      values.extend(int(v) for v in chunk.split(','))
+    start = chunk_end + 1
+  return values
+
+
+def _ParseTopLevel(raw_data):
+  """Returns the top level object of the snapshot JSON as a dict.
+
+  The 'nodes' and 'edges' lists are parsed straight into arrays, everything
+  else with the json module.
+
+  Raises:
+    ValueError: raw_data is not a JSON object.
+  """
+  decoder = json.JSONDecoder()
+
+  def SkipWhitespace(pos):
+    return _WHITESPACE.match(raw_data, pos).end()
+
+  def Expect(pos, character):
+    pos = SkipWhitespace(pos)
+    if raw_data[pos:pos + 1] != character:
+      raise ValueError('Expected %r at %d in heap snapshot' % (character, pos))
+    return pos + 1
+
+  result = {}
+  pos = Expect(0, '{')
+  pos = SkipWhitespace(pos)
+  if raw_data[pos:pos + 1] == '}':
+    return result
+  while True:
+    key, pos = decoder.raw_decode(raw_data, SkipWhitespace(pos))
+    pos = SkipWhitespace(Expect(pos, ':'))
+    if key in ('nodes', 'edges') and raw_data[pos:pos + 1] == '[':
+      # Integer lists have no nested brackets, so the first ] ends them.
+      end = raw_data.find(']', pos)
+      if end == -1:
+        raise ValueError('Unterminated %s list in heap snapshot' % key)
+      result[key] = _ParseIntegers(raw_data, pos + 1, end)
+      pos = end + 1
+    else:
+      result[key], pos = decoder.raw_decode(raw_data, pos)
+    pos = SkipWhitespace(pos)
+    if raw_data[pos:pos + 1] == '}':
+      return result
+    pos = Expect(pos, ',')
+
+
+class HeapSnapshot(object):
+  """The nodes and edges of a heap snapshot, addressed by ordinal.
+
+  Attributes:
+    root: int, the ordinal of the root node.
+    nodes: array, the raw node list of the snapshot.
+    edges: array, the raw edge list of the snapshot.
+    strings: [str], the string table.
+    node_types: [str], the names of the node type values.
+    edge_types: [str], the names of the edge type values.
+    node_field_count: int, number of node fields.
+    edge_field_count: int, number of edge fields.
+    first_edge: array, first_edge[n] is the ordinal of the first edge of node
+        n, and first_edge[node_count] is edge_count.
+  """
+
+  def __init__(self, raw_data):
+    """
+    Raises:
+      ValueError: raw_data is not a heap snapshot.
+    """
+    heap = _ParseTopLevel(raw_data)
+    try:
+      meta = heap['snapshot']['meta']
+      self.nodes = heap['nodes']
+      self.edges = heap['edges']
+      self.strings = heap['strings']
+      self.node_types = meta['node_types'][0]
+      self.edge_types = meta['edge_types'][0]
+      node_fields = meta['node_fields']
+      edge_fields = meta['edge_fields']
+    except (KeyError, IndexError, TypeError):
+      raise ValueError('Heap snapshot is missing its data or metadata')
+    if (any(f not in node_fields for f in _REQUIRED_NODE_FIELDS) or
+        any(f not in edge_fields for f in _REQUIRED_EDGE_FIELDS)):
+      raise ValueError('Heap snapshot is missing node or edge fields')
+    if (not isinstance(self.nodes, array.array) or
+        not isinstance(self.edges, array.array)):
+      raise ValueError('Heap snapshot nodes and edges must be lists')
+
+    self.node_field_count = len(node_fields)
+    self.edge_field_count = len(edge_fields)
+    self._node_type_ix = node_fields.index('type')
+    self._node_name_ix = node_fields.index('name')
+    self._node_id_ix = node_fields.index('id')
+    self._node_edge_count_ix = node_fields.index('edge_count')
+    # Old snapshots have no sizes.
+    if 'self_size' in node_fields:
+      self._node_self_size_ix = node_fields.index('self_size')
+    else:
+      self._node_self_size_ix = None
+    self._edge_type_ix = edge_fields.index('type')
+    self._edge_name_or_index_ix = edge_fields.index('name_or_index')
+    self._edge_to_node_ix = edge_fields.index('to_node')
+
+    if len(self.nodes) % self.node_field_count:
+      raise ValueError('Snapshot node list too short')
+    if len(self.edges) % self.edge_field_count:
+      raise ValueError('Snapshot edge list too short')
+    self.node_count = len(self.nodes) / self.node_field_count
+    self.edge_count = len(self.edges) / self.edge_field_count
+
+    self.first_edge = self._ComputeFirstEdges()
+    if self.first_edge[-1] != self.edge_count:
+      raise ValueError('Snapshot edge list does not match the edge counts')
+
+    self._element_edge_types = frozenset(
+        i for i, t in enumerate(self.edge_types)
+        if t in ('element', 'hidden'))
+    self._object_type = self._TypeValue(self.node_types, 'object')
+    self._weak_edge_types = frozenset(
+        i for i, t in enumerate(self.edge_types) if t == 'weak')
+    # root_index is the index of the root in the node list.
+    self.root = heap['snapshot'].get('root_index', 0) / self.node_field_count
+    # Built the first time they are needed.
+    self._first_retainer = None
+    self._retaining_edges = None
+    self._ordinals_by_id = None
+    self._dominators = None
+    self._retained_sizes = None
+
+  @staticmethod
+  def _TypeValue(types, type_string):
+    if type_string in types:
+      return types.index(type_string)
+    return None
+
+  def _ComputeFirstEdges(self):
+    if heap_snapshot_numpy:
+      return heap_snapshot_numpy.FirstEdges(
+          self.nodes, self.node_field_count, self._node_edge_count_ix,
+          _TYPECODE)
+    first_edge = array.array(_TYPECODE, [0]) * (self.node_count + 1)
+    total = 0
+    edge_counts = self.nodes[self._node_edge_count_ix::self.node_field_count]
+    for node, edge_count in enumerate(edge_counts):
+      first_edge[node] = total
+      total += edge_count
+    first_edge[self.node_count] = total
+    return first_edge
+
+  # Nodes.
+
+  def GetNode(self, node):
+    return HeapNode(self, node)
+
+  def IterNodes(self):
+    for node in xrange(self.node_count):
+      yield HeapNode(self, node)
+
+  def GetNodeType(self, node):
+    return self.nodes[node * self.node_field_count + self._node_type_ix]
+
+  def GetNodeTypeString(self, node):
+    return self.node_types[self.GetNodeType(node)]
+
+  def GetNodeName(self, node):
+    return self.strings[
+        self.nodes[node * self.node_field_count + self._node_name_ix]]
+
+  def GetNodeId(self, node):
+    return self.nodes[node * self.node_field_count + self._node_id_ix]
+
+  def GetNodeSelfSize(self, node):
+    if self._node_self_size_ix is None:
+      return 0
+    return self.nodes[node * self.node_field_count + self._node_self_size_ix]
+
+  def GetNodeClassName(self, node):
+    """Returns the constructor name of object nodes and '(type)' otherwise."""
+    node_type = self.GetNodeType(node)
+    if node_type == self._object_type:
+      return self.GetNodeName(node)
+    return '(%s)' % self.node_types[node_type]
+
+  def FindNode(self, node_id):
+    """Returns the ordinal of the node with the given id, or None.
+
+    The first call indexes all the nodes by id.
+    """
+    if self._ordinals_by_id is None:
+      ids = self.nodes[self._node_id_ix::self.node_field_count]
+      self._ordinals_by_id = dict((node_id, node)
+                                  for node, node_id in enumerate(ids))
+    return self._ordinals_by_id.get(node_id)
+
+  # Edges.
+
+  def IterEdgesFrom(self, node):
+    """Returns the ordinals of the edges of node."""
+    return xrange(self.first_edge[node], self.first_edge[node + 1])
+
+  def GetEdgeType(self, edge):
+    return self.edges[edge * self.edge_field_count + self._edge_type_ix]
+
+  def GetEdgeTypeString(self, edge):
+    return self.edge_types[self.GetEdgeType(edge)]
+
+  def GetEdgeName(self, edge):
+    """Returns the property name of the edge, or its index as a string for
+    elements."""
+    name_or_index = self.edges[
+        edge * self.edge_field_count + self._edge_name_or_index_ix]
+    if (self.GetEdgeType(edge) in self._element_edge_types or
+        name_or_index >= len(self.strings)):
+      return str(name_or_index)
+    return self.strings[name_or_index]
+
+  def GetEdgeToNode(self, edge):
+    return (self.edges[edge * self.edge_field_count + self._edge_to_node_ix] /
+            self.node_field_count)
+
+  def GetEdgeFromNode(self, edge):
+    """Returns the node that edge starts at, in O(log(node_count))."""
+    return bisect.bisect_right(self.first_edge, edge) - 1
+
+  # Retainers.
+
+  def _BuildRetainers(self):
+    """Sorts the edge ordinals by the node they point to."""
+    if heap_snapshot_numpy:
+      self._first_retainer, self._retaining_edges = (
+          heap_snapshot_numpy.Retainers(
+              self.edges, self.edge_field_count, self._edge_to_node_ix,
+              self.node_field_count, self.node_count, _TYPECODE))
+      return
+    to_nodes = [to_node / self.node_field_count for to_node in
+                self.edges[self._edge_to_node_ix::self.edge_field_count]]
+    first_retainer = array.array(_TYPECODE, [0]) * (self.node_count + 1)
+    for to_node in to_nodes:
+      first_retainer[to_node + 1] += 1
+    for node in xrange(self.node_count):
+      first_retainer[node + 1] += first_retainer[node]
+    next_retainer = first_retainer[:-1]
+    retaining_edges = array.array(_TYPECODE, [0]) * self.edge_count
+    for edge, to_node in enumerate(to_nodes):
+      retaining_edges[next_retainer[to_node]] = edge
+      next_retainer[to_node] += 1
+    self._first_retainer = first_retainer
+    self._retaining_edges = retaining_edges
+
+  def GetRetainingEdges(self, node):
+    """Returns the ordinals of the edges pointing to node.
+
+    The first call indexes the edges of all nodes, in O(edge_count).
+    """
+    if self._retaining_edges is None:
+      self._BuildRetainers()
+    return self._retaining_edges[
+        self._first_retainer[node]:self._first_retainer[node + 1]]
+
+  # Dominators.
+
+  def _ComputePostorder(self):
+    """Returns the nodes reachable from the root over strong edges, in the
+    postorder of a depth first search."""
+    node_field_count = self.node_field_count
+    first_edge = self.first_edge
+    edge_types = self.edges[self._edge_type_ix::self.edge_field_count]
+    edge_to_nodes = self.edges[self._edge_to_node_ix::self.edge_field_count]
+    weak_edge_types = self._weak_edge_types
+    visited = bytearray(self.node_count)
+    visited[self.root] = 1
+    postorder = array.array(_TYPECODE)
+    # The stack holds the nodes being visited and their next edge.
+    node_stack = [self.root]
+    edge_stack = [first_edge[self.root]]
+    while node_stack:
+      node = node_stack[-1]
+      edge = edge_stack[-1]
+      end = first_edge[node + 1]
+      child = None
+      while edge < end:
+        if edge_types[edge] not in weak_edge_types:
+          to_node = edge_to_nodes[edge] / node_field_count
+          if not visited[to_node]:
+            child = to_node
+            break
+        edge += 1
+      if child is None:
+        postorder.append(node)
+        node_stack.pop()
+        edge_stack.pop()
+        continue
+      edge_stack[-1] = edge + 1
+      visited[child] = 1
+      node_stack.append(child)
+      edge_stack.append(first_edge[child])
+    return postorder
+
+  def _BuildDominatorTree(self):
+    """Computes the immediate dominators and retained sizes of all nodes.
+
+    Uses the iterative algorithm of Cooper, Harvey and Kennedy, "A Simple,
+    Fast Dominance Algorithm", on nodes numbered in postorder: dominators are
+    refined in reverse postorder until they stop changing, which takes a few
+    passes over the edges for heap graphs. Weak edges do not retain objects
+    and are ignored.
+    """
+    if not self.node_count:
+      self._dominators = array.array('i')
+      self._retained_sizes = array.array('d')
+      return
+    postorder = self._ComputePostorder()
+    num_reachable = len(postorder)
+    postorder_index = array.array('i', [-1]) * self.node_count
+    for i, node in enumerate(postorder):
+      postorder_index[node] = i
+
+    # The predecessors of each reachable node, by postorder index.
+    edge_types = self.edges[self._edge_type_ix::self.edge_field_count]
+    edge_to_nodes = self.edges[self._edge_to_node_ix::self.edge_field_count]
+    strong_edges = []
+    for i, node in enumerate(postorder):
+      for edge in xrange(self.first_edge[node], self.first_edge[node + 1]):
+        if edge_types[edge] not in self._weak_edge_types:
+          to_node = edge_to_nodes[edge] / self.node_field_count
+          strong_edges.append((i, postorder_index[to_node]))
+    first_predecessor = array.array('i', [0]) * (num_reachable + 1)
+    for _, to_index in strong_edges:
+      first_predecessor[to_index + 1] += 1
+    for i in xrange(num_reachable):
+      first_predecessor[i + 1] += first_predecessor[i]
+    next_predecessor = first_predecessor[:-1]
+    predecessors = array.array('i', [0]) * len(strong_edges)
+    for from_index, to_index in strong_edges:
+      predecessors[next_predecessor[to_index]] = from_index
+      next_predecessor[to_index] += 1
+    del strong_edges
+
+    undefined = -1
+    root_index = num_reachable - 1
+    doms = array.array('i', [undefined]) * num_reachable
+    doms[root_index] = root_index
+    changed = True
+    while changed:
+      changed = False
+      for b in xrange(root_index - 1, -1, -1):
+        new_idom = undefined
+        for p in predecessors[first_predecessor[b]:first_predecessor[b + 1]]:
+          if doms[p] == undefined:
+            continue
+          if new_idom == undefined:
+            new_idom = p
+            continue
+          # Walks both nodes up the tree to their closest common dominator.
+          finger1 = p
+          finger2 = new_idom
+          while finger1 != finger2:
+            while finger1 < finger2:
+              finger1 = doms[finger1]
+            while finger2 < finger1:
+              finger2 = doms[finger2]
+          new_idom = finger1
+        if doms[b] != new_idom:
+          doms[b] = new_idom
+          changed = True
+
+    # Nodes that cannot be reached from the root are attributed to it.
+    dominators = array.array('i', [self.root]) * self.node_count
+    dominators[self.root] = _NO_NODE
+    for b in xrange(root_index):
+      dominators[postorder[b]] = postorder[doms[b]]
+
+    # A dominator comes after the nodes it dominates in postorder.
+    retained_sizes = array.array('d', (self.GetNodeSelfSize(node)
+                                       for node in xrange(self.node_count)))
+    for b in xrange(root_index):
+      node = postorder[b]
+      retained_sizes[dominators[node]] += retained_sizes[node]
+    for node in xrange(self.node_count):
+      if postorder_index[node] == -1:
+        retained_sizes[self.root] += retained_sizes[node]
+    self._dominators = dominators
+    self._retained_sizes = retained_sizes
+
+  def GetDominator(self, node):
+    """Returns the immediate dominator of node, or None for the root.
+
+    The first call computes the dominator tree of the whole snapshot in
+    near-linear time. Nodes that cannot be reached from the root over strong
+    edges are dominated by the root.
+    """
+    if self._dominators is None:
+      self._BuildDominatorTree()
+    dominator = self._dominators[node]
+    if dominator == _NO_NODE:
+      return None
+    return dominator
+
+  def GetDominatorPath(self, node):
+    """Returns the dominators of node, from its immediate dominator to the
+    root. Every path from the root to node goes through all of them."""
+    path = []
+    dominator = self.GetDominator(node)
+    while dominator is not None:
+      path.append(dominator)
+      dominator = self.GetDominator(dominator)
+    return path
+
+  def GetRetainedSize(self, node):
+    """Returns the size of the objects that only node keeps alive, itself
+    included."""
+    if self._retained_sizes is None:
+      self._BuildDominatorTree()
+    return int(self._retained_sizes[node])
+
+  # Aggregates.
+
+  def _GetNodeIds(self):
+    return self.nodes[self._node_id_ix::self.node_field_count]
+
+  def GetNodesNotIn(self, other):
+    """Returns the ordinals of the nodes whose ids are not in the other
+    snapshot."""
+    ids = self._GetNodeIds()
+    other_ids = other._GetNodeIds()  # pylint: disable=W0212
+    if heap_snapshot_numpy:
+      return heap_snapshot_numpy.FindMissing(ids, other_ids)
+    other_ids = set(other_ids)
+    return [node for node, node_id in enumerate(ids)
+            if node_id not in other_ids]
+
+  def GetClassStats(self):
+    """Returns {class name: (node count, total self size)} over all nodes."""
+    if heap_snapshot_numpy:
+      counts, sizes = heap_snapshot_numpy.ClassStats(
+          self.nodes, self.node_field_count, self._node_type_ix,
+          self._node_name_ix, self._node_self_size_ix, self._object_type,
+          len(self.strings))
+    else:
+      counts = {}
+      sizes = {}
+      types = self.nodes[self._node_type_ix::self.node_field_count]
+      names = self.nodes[self._node_name_ix::self.node_field_count]
+      if self._node_self_size_ix is None:
+        self_sizes = [0] * self.node_count
+      else:
+        self_sizes = self.nodes[
+            self._node_self_size_ix::self.node_field_count]
+      # Classes are keyed like the NumPy version does: by name for objects,
+      # by len(strings) + type for other nodes.
+      num_strings = len(self.strings)
+      for node_type, name, self_size in zip(types, names, self_sizes):
+        if node_type == self._object_type:
+          key = name
+        else:
+          key = num_strings + node_type
+        counts[key] = counts.get(key, 0) + 1
+        sizes[key] = sizes.get(key, 0) + self_size
+    stats = {}
+    for key, count in counts.iteritems():
+      if key < len(self.strings):
+        class_name = self.strings[key]
+      else:
+        class_name = '(%s)' % self.node_types[key - len(self.strings)]
+      # Different strings can have the same value.
+      old_count, old_size = stats.get(class_name, (0, 0))
+      stats[class_name] = (old_count + count, old_size + sizes[key])
+    return stats
+
+
+class HeapNode(object):
+  """A view of a node of a HeapSnapshot.
+
+  Views are created on demand, so two views of the same node are equal but
+  not necessarily identical.
+  """
+  __slots__ = ('_snapshot', '_ordinal')
+
+  def __init__(self, snapshot, ordinal):
+    self._snapshot = snapshot
+    self._ordinal = ordinal
+
+  def __eq__(self, other):
+    return (isinstance(other, HeapNode) and
+            self._snapshot is other._snapshot and  # pylint: disable=W0212
+            self._ordinal == other._ordinal)  # pylint: disable=W0212
+
+  def __ne__(self, other):
+    return not self == other
+
+  def __hash__(self):
+    return hash((id(self._snapshot), self._ordinal))
+
+  @property
+  def ordinal(self):
+    return self._ordinal
+
+  @property
+  def node_id(self):
+    return self._snapshot.GetNodeId(self._ordinal)
+
+  @property
+  def type_string(self):
+    return self._snapshot.GetNodeTypeString(self._ordinal)
+
+  @property
+  def name(self):
+    return self._snapshot.GetNodeName(self._ordinal)
+
+  @property
+  def class_name(self):
+    return self._snapshot.GetNodeClassName(self._ordinal)
+
+  @property
+  def self_size(self):
+    return self._snapshot.GetNodeSelfSize(self._ordinal)
+
+  @property
+  def edges(self):
+    return [HeapEdge(self._snapshot, e)
+            for e in self._snapshot.IterEdgesFrom(self._ordinal)]
+
+  @property
+  def retaining_edges(self):
+    return [HeapEdge(self._snapshot, e)
+            for e in self._snapshot.GetRetainingEdges(self._ordinal)]
+
+  def __str__(self):
+    return 'HeapNode(%d %s)' % (self.node_id, self.class_name)
+
+
+class HeapEdge(object):
+  """A view of an edge of a HeapSnapshot."""
+  __slots__ = ('_snapshot', '_ordinal')
+
+  def __init__(self, snapshot, ordinal):
+    self._snapshot = snapshot
+    self._ordinal = ordinal
+
+  def __eq__(self, other):
+    return (isinstance(other, HeapEdge) and
+            self._snapshot is other._snapshot and  # pylint: disable=W0212
+            self._ordinal == other._ordinal)  # pylint: disable=W0212
+
+  def __ne__(self, other):
+    return not self == other
+
+  def __hash__(self):
+    return hash((id(self._snapshot), self._ordinal))
+
+  @property
+  def ordinal(self):
+    return self._ordinal
+
+  @property
+  def type_string(self):
+    return self._snapshot.GetEdgeTypeString(self._ordinal)
+
+  @property
+  def name_string(self):
+    return self._snapshot.GetEdgeName(self._ordinal)
+
+  @property
+  def from_node(self):
+    return HeapNode(self._snapshot,
+                    self._snapshot.GetEdgeFromNode(self._ordinal))
+
+  @property
+  def to_node(self):
+    return HeapNode(self._snapshot, self._snapshot.GetEdgeToNode(self._ordinal))
+
+  def __str__(self):
+    return 'HeapEdge(%s %s)' % (self.type_string, self.name_string)
+
+
+class ClassDiff(collections.namedtuple(
+    'ClassDiff', ['added_count', 'removed_count', 'added_size',
+                  'removed_size'])):
+  """How the objects of one class changed between two snapshots."""
+
+  @property
+  def count_delta(self):
+    return self.added_count - self.removed_count
+
+  @property
+  def size_delta(self):
+    return self.added_size - self.removed_size
+
+
+def DiffSnapshots(before, after):
+  """Returns {class name: ClassDiff} for the objects that are in only one of
+  two snapshots of the same heap.
+
+  V8 keeps the id of an object in all the snapshots of a heap, so objects
+  are matched by id.
+  """
+  changes = collections.defaultdict(lambda: [0, 0, 0, 0])
+  for snapshot, other, count_ix, size_ix in ((after, before, 0, 2),
+                                             (before, after, 1, 3)):
+    for node in snapshot.GetNodesNotIn(other):
+      change = changes[snapshot.GetNodeClassName(node)]
+      change[count_ix] += 1
+      change[size_ix] += snapshot.GetNodeSelfSize(node)
+  return dict((class_name, ClassDiff(*change))
+              for class_name, change in changes.iteritems())
@@ -0,0 +1,75 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""NumPy implementations of the whole-snapshot passes of heap_snapshot.py.
+
+heap_snapshot.py uses these when NumPy can be imported. They take and return
+the same typed arrays as the pure Python versions, looking at them through
+NumPy views, and are documented there.
+"""
+
+import array
+
+import numpy  # pylint: disable=F0401
+
+
+def _View(values):
+  return numpy.frombuffer(values, dtype=numpy.uint32)
+
+
+def _ToArray(values, typecode):
+  return array.array(typecode, numpy.asarray(values, numpy.uint32).tostring())
+
+
+def ParseIntegers(text, typecode):
+  if not text.strip():
+    return array.array(typecode)
+  return _ToArray(numpy.fromstring(text, dtype=numpy.uint32, sep=','),
+                  typecode)
+
+
+def FirstEdges(nodes, node_field_count, edge_count_ix, typecode):
+  edge_counts = _View(nodes)[edge_count_ix::node_field_count]
+  first_edge = numpy.zeros(len(edge_counts) + 1, dtype=numpy.uint32)
+  numpy.cumsum(edge_counts, out=first_edge[1:])
+  return _ToArray(first_edge, typecode)
+
+
+def Retainers(edges, edge_field_count, to_node_ix, node_field_count,
+              node_count, typecode):
+  to_nodes = _View(edges)[to_node_ix::edge_field_count] / node_field_count
+  # A stable sort keeps the retainers of each node in edge order.
+  retaining_edges = numpy.argsort(to_nodes, kind='mergesort')
+  first_retainer = numpy.zeros(node_count + 1, dtype=numpy.uint32)
+  numpy.cumsum(numpy.bincount(to_nodes, minlength=node_count),
+               out=first_retainer[1:])
+  return _ToArray(first_retainer, typecode), _ToArray(retaining_edges,
+                                                      typecode)
+
+
+def ClassStats(nodes, node_field_count, type_ix, name_ix, self_size_ix,
+               object_type, num_strings):
+  """Returns the node counts and self sizes keyed like the pure Python
+  version."""
+  if object_type is None:
+    object_type = -1
+  view = _View(nodes)
+  types = view[type_ix::node_field_count].astype(numpy.int64)
+  keys = numpy.where(types == object_type, view[name_ix::node_field_count],
+                     num_strings + types)
+  counts = numpy.bincount(keys)
+  if self_size_ix is None:
+    sizes = numpy.zeros(len(counts), dtype=numpy.int64)
+  else:
+    sizes = numpy.bincount(
+        keys, weights=view[self_size_ix::node_field_count]).astype(
+            numpy.int64)
+  present = numpy.flatnonzero(counts)
+  return (dict(zip(present.tolist(), counts[present].tolist())),
+          dict(zip(present.tolist(), sizes[present].tolist())))
+
+
+def FindMissing(ids, other_ids):
+  return numpy.flatnonzero(
+      ~numpy.in1d(_View(ids), _View(other_ids))).tolist()
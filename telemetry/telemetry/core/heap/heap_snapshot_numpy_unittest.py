@@ -0,0 +1,63 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import random
+import unittest
+
+from telemetry.core.heap import heap_snapshot
+from telemetry.core.heap import heap_snapshot_unittest
+
+
+def _CreateRandomSnapshotJson(rng, node_count, edge_count):
+  class_names = ['Object', 'Array', 'Window', 'HTMLDivElement']
+  nodes = [(rng.choice(heap_snapshot_unittest.NODE_TYPES),
+            rng.choice(class_names), 2 * i + 1, rng.randint(0, 1000))
+           for i in xrange(node_count)]
+  edges = sorted((rng.randrange(node_count),
+                  rng.choice(['property', 'element', 'hidden']),
+                  rng.randint(0, 3), rng.randrange(node_count))
+                 for _ in xrange(edge_count))
+  return heap_snapshot_unittest.CreateSnapshotJson(nodes, edges, class_names)
+
+
+@unittest.skipUnless(heap_snapshot.heap_snapshot_numpy,
+                     'NumPy is not installed.')
+class HeapSnapshotNumpyTest(unittest.TestCase):
+  """Checks that the NumPy functions match the pure Python ones on random
+  snapshots."""
+
+  def _CreateSnapshots(self, raw_data, other_snapshot):
+    numpy_snapshot = heap_snapshot.HeapSnapshot(raw_data)
+    heap_snapshot_numpy = heap_snapshot.heap_snapshot_numpy
+    heap_snapshot.heap_snapshot_numpy = None
+    try:
+      python_snapshot = heap_snapshot.HeapSnapshot(raw_data)
+      # Builds the lazy indices without NumPy too.
+      python_snapshot.GetRetainingEdges(0)
+      python_stats = python_snapshot.GetClassStats()
+      python_missing_nodes = python_snapshot.GetNodesNotIn(other_snapshot)
+    finally:
+      heap_snapshot.heap_snapshot_numpy = heap_snapshot_numpy
+    return (numpy_snapshot, python_snapshot, python_stats,
+            python_missing_nodes)
+
+  def testMatchesPurePython(self):
+    rng = random.Random(0)
+    for _ in xrange(20):
+      node_count = rng.randint(1, 50)
+      raw_data = _CreateRandomSnapshotJson(rng, node_count,
+                                           rng.randint(0, 100))
+      other_snapshot = heap_snapshot.HeapSnapshot(_CreateRandomSnapshotJson(
+          rng, rng.randint(1, 50), 0))
+      (numpy_snapshot, python_snapshot, python_stats,
+       python_missing_nodes) = self._CreateSnapshots(raw_data, other_snapshot)
+      self.assertEquals(python_snapshot.nodes, numpy_snapshot.nodes)
+      self.assertEquals(python_snapshot.edges, numpy_snapshot.edges)
+      self.assertEquals(python_snapshot.first_edge, numpy_snapshot.first_edge)
+      self.assertEquals(python_stats, numpy_snapshot.GetClassStats())
+      self.assertEquals(python_missing_nodes,
+                        numpy_snapshot.GetNodesNotIn(other_snapshot))
+      for node in xrange(node_count):
+        self.assertEquals(python_snapshot.GetRetainingEdges(node),
+                          numpy_snapshot.GetRetainingEdges(node))
@@ -0,0 +1,272 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import json
+import random
+import unittest
+
+from telemetry.core.heap import heap_snapshot
+
+
+NODE_TYPES = ['hidden', 'object', 'string', 'closure', 'synthetic']
+EDGE_TYPES = ['context', 'element', 'property', 'internal', 'hidden', 'weak']
+NODE_FIELDS = ['type', 'name', 'id', 'self_size', 'edge_count',
+               'trace_node_id']
+EDGE_FIELDS = ['type', 'name_or_index', 'to_node']
+
+
+def CreateSnapshotJson(nodes, edges, strings):
+  """Returns the JSON of a snapshot in the layout V8 writes.
+
+  Args:
+    nodes: [(type, name, id, self_size)], with types and names as strings.
+    edges: [(from node, type, name or index, to node)], with nodes given by
+        ordinal, types as strings and names as strings or ints.
+  """
+  strings = list(strings)
+
+  def StringIndex(string):
+    if string not in strings:
+      strings.append(string)
+    return strings.index(string)
+
+  edges_by_node = [[] for _ in nodes]
+  for edge in edges:
+    edges_by_node[edge[0]].append(edge)
+  node_list = []
+  edge_list = []
+  for ordinal, (node_type, name, node_id, self_size) in enumerate(nodes):
+    node_edges = edges_by_node[ordinal]
+    node_list.extend([NODE_TYPES.index(node_type), StringIndex(name), node_id,
+                      self_size, len(node_edges), 0])
+    for _, edge_type, name_or_index, to_node in node_edges:
+      if not isinstance(name_or_index, int):
+        name_or_index = StringIndex(name_or_index)
+      edge_list.extend([EDGE_TYPES.index(edge_type), name_or_index,
+                        to_node * len(NODE_FIELDS)])
+  meta = {'node_fields': NODE_FIELDS, 'node_types': [NODE_TYPES],
+          'edge_fields': EDGE_FIELDS, 'edge_types': [EDGE_TYPES]}
+  return ('{"snapshot":%s,\n"nodes":[%s],\n"edges":[%s],\n'
+          '"trace_function_infos":[],\n"trace_tree":[],\n"strings":%s}' % (
+              json.dumps({'meta': meta, 'node_count': len(nodes),
+                          'edge_count': len(edge_list) / 3}),
+              ',\n'.join(str(v) for v in node_list),
+              ',\n'.join(str(v) for v in edge_list),
+              json.dumps(strings)))
+
+
+# A window with a document holding two divs, one of which is also held by an
+# array element.
+SNAPSHOT_NODES = [
+    ('synthetic', '', 1, 0),
+    ('object', 'Window', 3, 32),
+    ('object', 'HTMLDocument', 5, 64),
+    ('object', 'HTMLDivElement', 7, 48),
+    ('object', 'HTMLDivElement', 9, 48),
+    ('object', 'Array', 11, 16),
+    ('string', 'hello', 13, 24),
+    ('hidden', 'system', 15, 8),
+]
+SNAPSHOT_EDGES = [
+    (0, 'element', 1, 1),
+    (1, 'property', 'document', 2),
+    (1, 'property', 'list', 5),
+    (1, 'hidden', 2, 7),
+    (2, 'property', 'first', 3),
+    (2, 'property', 'second', 4),
+    (3, 'property', 'text', 6),
+    (5, 'element', 0, 4),
+]
+
+
+def CreateSnapshot():
+  return heap_snapshot.HeapSnapshot(
+      CreateSnapshotJson(SNAPSHOT_NODES, SNAPSHOT_EDGES, ['']))
+
+
+def CreateGraphSnapshot(node_count, edges, self_size=1):
+  """Returns a snapshot of Object nodes with the given edges, given as (from
+  node, to node) or (from node, to node, edge type)."""
+  nodes = [('object', 'Object', 2 * i + 1, self_size)
+           for i in xrange(node_count)]
+  edges = [(e[0], e[2] if len(e) > 2 else 'property', 'p', e[1])
+           for e in edges]
+  return heap_snapshot.HeapSnapshot(CreateSnapshotJson(nodes, edges, []))
+
+
+def _ComputeDominatorsNaively(node_count, edges):
+  """Returns the immediate dominators of the nodes reachable from node 0, as
+  {node: dominator}, by removing each node in turn."""
+  def Reachable(removed):
+    seen = set([0])
+    stack = [0]
+    while stack:
+      node = stack.pop()
+      for from_node, to_node in edges:
+        if from_node == node and to_node != removed and to_node not in seen:
+          seen.add(to_node)
+          stack.append(to_node)
+    return seen
+
+  reachable = Reachable(None)
+  dominated_by = dict((d, reachable - Reachable(d)) for d in reachable
+                      if d != 0)
+  dominators = {}
+  for node in reachable - set([0]):
+    strict_dominators = [d for d in dominated_by
+                         if d != node and node in dominated_by[d]]
+    # The immediate dominator is the strict dominator closest to node, which
+    # dominates the fewest nodes.
+    dominators[node] = min(strict_dominators or [0],
+                           key=lambda d: len(dominated_by.get(d, reachable)))
+  return dominators
+
+
+class HeapSnapshotTest(unittest.TestCase):
+  def testNodes(self):
+    snapshot = CreateSnapshot()
+    self.assertEquals(8, snapshot.node_count)
+    self.assertEquals(8, snapshot.edge_count)
+    self.assertEquals([0, 1, 4, 6, 7, 7, 8, 8, 8], list(snapshot.first_edge))
+    node = snapshot.GetNode(3)
+    self.assertEquals(7, node.node_id)
+    self.assertEquals('object', node.type_string)
+    self.assertEquals('HTMLDivElement', node.class_name)
+    self.assertEquals(48, node.self_size)
+    self.assertEquals('(string)', snapshot.GetNode(6).class_name)
+    self.assertEquals('hello', snapshot.GetNode(6).name)
+    self.assertEquals(node, snapshot.GetNode(3))
+    self.assertEquals(4, snapshot.FindNode(9))
+    self.assertEquals(None, snapshot.FindNode(10))
+
+  def testEdges(self):
+    snapshot = CreateSnapshot()
+    edges = snapshot.GetNode(1).edges
+    self.assertEquals(['document', 'list', '2'],
+                      [e.name_string for e in edges])
+    self.assertEquals(['property', 'property', 'hidden'],
+                      [e.type_string for e in edges])
+    self.assertEquals([2, 5, 7], [e.to_node.ordinal for e in edges])
+    self.assertEquals([1, 1, 1], [e.from_node.ordinal for e in edges])
+    self.assertEquals('0', snapshot.GetNode(5).edges[0].name_string)
+
+  def testRetainers(self):
+    snapshot = CreateSnapshot()
+    retainers = snapshot.GetNode(4).retaining_edges
+    self.assertEquals([(2, 'second'), (5, '0')],
+                      [(e.from_node.ordinal, e.name_string)
+                       for e in retainers])
+    self.assertEquals([], snapshot.GetNode(0).retaining_edges)
+    self.assertEquals([1], [e.from_node.ordinal
+                            for e in snapshot.GetNode(7).retaining_edges])
+
+  def testClassStats(self):
+    stats = CreateSnapshot().GetClassStats()
+    self.assertEquals({
+        '(synthetic)': (1, 0),
+        'Window': (1, 32),
+        'HTMLDocument': (1, 64),
+        'HTMLDivElement': (2, 96),
+        'Array': (1, 16),
+        '(string)': (1, 24),
+        '(hidden)': (1, 8),
+    }, stats)
+
+  def testDominatorsAndRetainedSizes(self):
+    snapshot = CreateSnapshot()
+    self.assertEquals(None, snapshot.GetDominator(0))
+    self.assertEquals([0, 1, 2, 1, 1, 3, 1],
+                      [snapshot.GetDominator(n) for n in xrange(1, 8)])
+    self.assertEquals([3, 2, 1, 0], snapshot.GetDominatorPath(6))
+    self.assertEquals([240, 240, 136, 72, 48, 16, 24, 8],
+                      [snapshot.GetRetainedSize(n) for n in xrange(8)])
+
+  def testIrreducibleGraphDominators(self):
+    # Figure 4 of Cooper, Harvey and Kennedy, which needs several passes.
+    snapshot = CreateGraphSnapshot(6, [
+        (0, 1), (0, 2), (1, 3), (2, 4), (2, 5), (3, 4), (4, 3), (4, 5),
+        (5, 4)])
+    self.assertEquals([0] * 5,
+                      [snapshot.GetDominator(n) for n in xrange(1, 6)])
+    self.assertEquals(6, snapshot.GetRetainedSize(0))
+    self.assertEquals(1, snapshot.GetRetainedSize(2))
+
+  def testWeakEdgesDoNotRetain(self):
+    snapshot = CreateGraphSnapshot(4, [
+        (0, 1), (0, 2), (1, 3), (2, 3, 'weak')])
+    self.assertEquals(1, snapshot.GetDominator(3))
+    self.assertEquals(2, snapshot.GetRetainedSize(1))
+    self.assertEquals(1, snapshot.GetRetainedSize(2))
+
+  def testUnreachableNodesAreDominatedByTheRoot(self):
+    snapshot = CreateGraphSnapshot(4, [(0, 1), (2, 3)])
+    self.assertEquals(0, snapshot.GetDominator(2))
+    self.assertEquals(0, snapshot.GetDominator(3))
+    self.assertEquals(1, snapshot.GetRetainedSize(2))
+    self.assertEquals(4, snapshot.GetRetainedSize(0))
+
+  def testDominatorsMatchNaiveComputation(self):
+    rng = random.Random(0)
+    for _ in xrange(30):
+      node_count = rng.randint(2, 15)
+      edges = sorted(set((rng.randrange(node_count),
+                          rng.randrange(1, node_count))
+                         for _ in xrange(rng.randint(1, 3 * node_count))))
+      snapshot = CreateGraphSnapshot(node_count, edges)
+      expected = _ComputeDominatorsNaively(node_count, edges)
+      for node, dominator in expected.iteritems():
+        self.assertEquals(dominator, snapshot.GetDominator(node))
+      retained_sizes = dict((n, 1) for n in xrange(node_count))
+      for node in sorted(expected, key=lambda n: -len(
+          snapshot.GetDominatorPath(n))):
+        retained_sizes[expected[node]] += retained_sizes[node]
+      for node in expected:
+        self.assertEquals(retained_sizes[node],
+                          snapshot.GetRetainedSize(node))
+      self.assertEquals(node_count, snapshot.GetRetainedSize(0))
+
+  def testDiffSnapshots(self):
+    before = CreateSnapshot()
+    # Removes the second div and its array and adds a new div.
+    nodes = list(SNAPSHOT_NODES)
+    nodes[4] = ('object', 'HTMLDivElement', 17, 48)
+    nodes[5] = ('object', 'Object', 19, 40)
+    after = heap_snapshot.HeapSnapshot(
+        CreateSnapshotJson(nodes, SNAPSHOT_EDGES, ['']))
+    diff = heap_snapshot.DiffSnapshots(before, after)
+    self.assertEquals({
+        'HTMLDivElement': heap_snapshot.ClassDiff(1, 1, 48, 48),
+        'Array': heap_snapshot.ClassDiff(0, 1, 0, 16),
+        'Object': heap_snapshot.ClassDiff(1, 0, 40, 0),
+    }, diff)
+    self.assertEquals(0, diff['HTMLDivElement'].count_delta)
+    self.assertEquals(40, diff['Object'].size_delta)
+    self.assertEquals({}, heap_snapshot.DiffSnapshots(before, before))
+
+  def testEmptySnapshot(self):
+    snapshot = heap_snapshot.HeapSnapshot(CreateSnapshotJson([], [], []))
+    self.assertEquals(0, snapshot.node_count)
+    self.assertEquals({}, snapshot.GetClassStats())
+
+  def testLongListsAreParsedInChunks(self):
+    nodes = [('object', 'Object', 2 * i + 1, i) for i in xrange(50000)]
+    edges = [(i, 'property', 'next', i + 1) for i in xrange(49999)]
+    snapshot = heap_snapshot.HeapSnapshot(
+        CreateSnapshotJson(nodes, edges, []))
+    self.assertEquals(50000, snapshot.node_count)
+    self.assertEquals(49999, snapshot.GetNode(49999).self_size)
+    self.assertEquals(49998,
+                      snapshot.GetNode(49999).retaining_edges[0].ordinal)
+
+  def testRejectsInvalidSnapshots(self):
+    self.assertRaises(ValueError, heap_snapshot.HeapSnapshot, '[]')
+    self.assertRaises(ValueError, heap_snapshot.HeapSnapshot, '{"nodes":[]}')
+    data = json.loads(CreateSnapshotJson(SNAPSHOT_NODES, SNAPSHOT_EDGES, []))
+    data['snapshot']['meta']['node_fields'].remove('edge_count')
+    self.assertRaises(ValueError, heap_snapshot.HeapSnapshot,
+                      json.dumps(data))
+    data = json.loads(CreateSnapshotJson(SNAPSHOT_NODES, SNAPSHOT_EDGES, []))
+    data['edges'].pop()
+    self.assertRaises(ValueError, heap_snapshot.HeapSnapshot,
+                      json.dumps(data))
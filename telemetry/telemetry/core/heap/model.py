@@ -3,20 +3,61 @@
 # found in the LICENSE file.
 
 from telemetry.core.heap import chrome_js_heap_snapshot_parser
+from telemetry.core.heap import heap_snapshot
 
 
 class Model(object):
-  """ The heap snapshot model is a set of LiveHeapObjects. The LiveHeapObjects
+  """ The heap snapshot model.
+
+  The snapshot is kept as a heap_snapshot.HeapSnapshot, which answers queries
+  without creating an object per node. The set of LiveHeapObjects, which
   contain the RetainingEdge objects describing the relationships between the
-  LiveHeapObjects."""
+  LiveHeapObjects, is only built when all_live_heap_objects is first used.
+  """
 
   def __init__(self, raw_data):
-    if not chrome_js_heap_snapshot_parser.ChromeJsHeapSnapshotParser.CanImport(
-        raw_data):
+    try:
+      self._snapshot = heap_snapshot.HeapSnapshot(raw_data)
+    except ValueError:
       raise ValueError("Cannot import snapshot data")
-    parser = chrome_js_heap_snapshot_parser.ChromeJsHeapSnapshotParser(raw_data)
-    self._all_live_heap_objects = parser.GetAllLiveHeapObjects()
+    self._all_live_heap_objects = None
+
+  @property
+  def snapshot(self):
+    return self._snapshot
 
   @property
   def all_live_heap_objects(self):
+    if self._all_live_heap_objects is None:
+      parser = chrome_js_heap_snapshot_parser.ChromeJsHeapSnapshotParser(
+          snapshot=self._snapshot)
+      self._all_live_heap_objects = parser.GetAllLiveHeapObjects()
     return self._all_live_heap_objects
+
+  def _FindNode(self, object_id):
+    node = self._snapshot.FindNode(object_id)
+    if node is None:
+      raise ValueError('No object with id %d in the snapshot' % object_id)
+    return node
+
+  def GetClassStats(self):
+    """Returns {class name: (object count, total self size)}."""
+    return self._snapshot.GetClassStats()
+
+  def GetRetainedSize(self, object_id):
+    """Returns the size of the objects that only the object keeps alive.
+
+    The first call computes the dominator tree of the whole snapshot.
+    """
+    return self._snapshot.GetRetainedSize(self._FindNode(object_id))
+
+  def GetDominatorIds(self, object_id):
+    """Returns the ids of the objects every retaining path of the object goes
+    through, from its immediate dominator to the root."""
+    return [self._snapshot.GetNodeId(node) for node in
+            self._snapshot.GetDominatorPath(self._FindNode(object_id))]
+
+  def Diff(self, base_model):
+    """Returns {class name: heap_snapshot.ClassDiff} of the objects added and
+    removed since base_model, a snapshot of the same heap."""
+    return heap_snapshot.DiffSnapshots(base_model.snapshot, self._snapshot)
@@ -0,0 +1,41 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import unittest
+
+from telemetry.core.heap import heap_snapshot
+from telemetry.core.heap import heap_snapshot_unittest
+from telemetry.core.heap import model
+
+
+class ModelTest(unittest.TestCase):
+  def setUp(self):
+    self._model = model.Model(heap_snapshot_unittest.CreateSnapshotJson(
+        heap_snapshot_unittest.SNAPSHOT_NODES,
+        heap_snapshot_unittest.SNAPSHOT_EDGES, []))
+
+  def testRejectsOtherData(self):
+    self.assertRaises(ValueError, model.Model, '{"traceEvents": []}')
+
+  def testLiveHeapObjects(self):
+    # Hidden and synthetic nodes are left out.
+    self.assertEquals(
+        ['(string)', 'Array', 'HTMLDivElement', 'HTMLDivElement',
+         'HTMLDocument', 'Window'],
+        sorted(o.class_name for o in self._model.all_live_heap_objects))
+
+  def testRetainedSizes(self):
+    # The document holds the first div, which holds a string.
+    self.assertEquals(136, self._model.GetRetainedSize(5))
+    self.assertEquals([7, 5, 3, 1], self._model.GetDominatorIds(13))
+    self.assertRaises(ValueError, self._model.GetRetainedSize, 2)
+
+  def testDiff(self):
+    nodes = heap_snapshot_unittest.SNAPSHOT_NODES + [
+        ('object', 'HTMLDivElement', 17, 48)]
+    new_model = model.Model(heap_snapshot_unittest.CreateSnapshotJson(
+        nodes, heap_snapshot_unittest.SNAPSHOT_EDGES, []))
+    self.assertEquals(
+        {'HTMLDivElement': heap_snapshot.ClassDiff(1, 0, 48, 0)},
+        new_model.Diff(self._model))
@@ -117,7 +117,9 @@ class LocalServer(object):
       self.forwarder = None
     if self._subprocess:
       # TODO(tonyg): Should this block until it goes away?
-      self._subprocess.kill()
+      # The backend may already have exited, e.g. when it was terminated.
+      if self._subprocess.poll() is None:
+        self._subprocess.kill()
       self._subprocess = None
     if self._devnull:
       self._devnull.close()
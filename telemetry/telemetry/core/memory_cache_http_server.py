@@ -5,26 +5,226 @@
 import BaseHTTPServer
 import errno
 import gzip
+import hashlib
+import json
+import logging
 import mimetypes
+import mmap
+from multiprocessing import pool
 import os
+import select
+import signal
 import SimpleHTTPServer
 import socket
 import SocketServer
 import StringIO
 import sys
+import tempfile
+import threading
+import time
+import urllib2
 import urlparse
 from collections import namedtuple
 
+from telemetry.core import event_loop_http_server
 from telemetry.core import local_server
 
 ByteRange = namedtuple('ByteRange', ['from_byte', 'to_byte'])
 ResourceAndRange = namedtuple('ResourceAndRange', ['resource', 'byte_range'])
 
+# Serves the counters of the server as JSON, see
+# MemoryCacheHTTPServer.GetStats.
+STATS_PATH = '/_memory_cache_http_server_stats'
+
+_ZIPPED_CONTENT_TYPES = ('text/html', 'text/css', 'application/javascript')
+# Smaller files are read into memory rather than mapped, which would keep a
+# file descriptor open for each of them.
+_MIN_MMAP_SIZE = 1024 * 1024
+_DEFAULT_COMPRESSED_CACHE_DIR = os.path.join(
+    tempfile.gettempdir(), 'telemetry_memory_cache_http_server')
+# When a server starts, the least recently used gzipped files are deleted
+# until the compressed cache fits in this many bytes.
+_MAX_COMPRESSED_CACHE_SIZE = 512 * 1024 * 1024
+# Temporary files in the compressed cache start with this, and are only
+# deleted once they are older than _MAX_TEMP_FILE_AGE seconds.
+_TEMP_FILE_PREFIX = '.tmp-'
+_MAX_TEMP_FILE_AGE = 60 * 60
+# The backend reports its stats on stdout in a line starting with this when
+# it is terminated, see MemoryCacheHTTPServer.Close.
+_STATS_LINE_PREFIX = 'MemoryCacheHTTPServer stats: '
+_STATS_TIMEOUT = 2
+# zlib releases the GIL while it compresses, so files are gzipped in parallel
+# when they are loaded ahead of time.
+_PRELOAD_THREADS = 8
+
+
+def _PruneCompressedCache(cache_dir, max_size):
+  """Deletes the least recently used files in cache_dir until they fit in
+  max_size bytes."""
+  if not os.path.isdir(cache_dir):
+    return
+  entries = []
+  total_size = 0
+  now = time.time()
+  for name in os.listdir(cache_dir):
+    file_path = os.path.join(cache_dir, name)
+    try:
+      fs = os.stat(file_path)
+    except OSError:
+      continue  # Deleted by another server.
+    if name.startswith(_TEMP_FILE_PREFIX) and (
+        now - fs.st_mtime < _MAX_TEMP_FILE_AGE):
+      continue  # Still being written by another server.
+    entries.append((fs.st_mtime, fs.st_size, file_path))
+    total_size += fs.st_size
+  entries.sort()
+  for _, size, file_path in entries:
+    if total_size <= max_size:
+      break
+    try:
+      os.remove(file_path)
+    except OSError:
+      continue
+    total_size -= size
+
+
+def _LoadFile(file_path):
+  """Returns the contents of file_path as a str or, for large files, as a
+  read-only mmap."""
+  with open(file_path, 'rb') as fd:
+    if os.fstat(fd.fileno()).st_size < _MIN_MMAP_SIZE:
+      return fd.read()
+    return mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class _Resource(object):
+  """A file in the resource map.
+
+  Files are only looked at with os.stat when the server starts. Their
+  contents are loaded the first time they are requested, or by Preload, and
+  html, css and JavaScript files are gzipped then. Gzipped files are kept in
+  compressed_cache_dir, keyed by the path, size and modification time of the
+  original, so they are only compressed again when they change. Their
+  modification time is the time they were last used.
+  """
+
+  def __init__(self, file_path, compressed_cache_dir, stats):
+    fs = os.stat(file_path)
+    self.file_path = file_path
+    self.content_type = mimetypes.guess_type(file_path)[0]
+    self.last_modified = fs.st_mtime
+    self.zipped = self.content_type in _ZIPPED_CONTENT_TYPES
+    self._size = fs.st_size
+    self._compressed_cache_dir = compressed_cache_dir
+    self._stats = stats
+    self._response = None
+    self._lock = threading.Lock()
+
+  @property
+  def content_length(self):
+    if not self.zipped:
+      return self._size
+    return len(self.response)
+
+  def Preload(self):
+    """Loads the response now rather than when it is first requested."""
+    return self.response
+
+  @property
+  def response(self):
+    """The bytes to serve, as a str or an mmap."""
+    if self._response is None:
+      with self._lock:
+        if self._response is None:
+          if self.zipped:
+            self._response = self._LoadCompressed()
+          else:
+            self._response = _LoadFile(self.file_path)
+    return self._response
+
+  def _GetCompressedCachePath(self):
+    key = '%s\n%d\n%r' % (self.file_path, self._size, self.last_modified)
+    return os.path.join(self._compressed_cache_dir,
+                        hashlib.sha1(key).hexdigest() + '.gz')
+
+  def _LoadCompressed(self):
+    cache_path = None
+    if self._compressed_cache_dir:
+      cache_path = self._GetCompressedCachePath()
+      if os.path.exists(cache_path):
+        self._stats.Add(compressed_cache_hits=1)
+        response = _LoadFile(cache_path)
+        try:
+          os.utime(cache_path, None)
+        except OSError:
+          pass  # Pruned by another server, but already loaded.
+        return response
+
+    start_time = time.time()
+    sio = StringIO.StringIO()
+    gzf = gzip.GzipFile(fileobj=sio, compresslevel=9, mode='wb')
+    with open(self.file_path, 'rb') as fd:
+      gzf.write(fd.read())
+    gzf.close()
+    response = sio.getvalue()
+    sio.close()
+    self._stats.Add(files_compressed=1,
+                    compress_seconds=time.time() - start_time)
+
+    if cache_path:
+      try:
+        if not os.path.isdir(self._compressed_cache_dir):
+          os.makedirs(self._compressed_cache_dir)
+        # Writes to a temporary file first so that other servers never see
+        # a partial file.
+        fd, temp_path = tempfile.mkstemp(prefix=_TEMP_FILE_PREFIX,
+                                         dir=self._compressed_cache_dir)
+        try:
+          with os.fdopen(fd, 'wb') as f:
+            f.write(response)
+          os.rename(temp_path, cache_path)
+        finally:
+          if os.path.exists(temp_path):
+            os.remove(temp_path)
+      except (IOError, OSError):
+        # Another server may have cached the same file, and the cache is
+        # only an optimization.
+        logging.warning('Failed to cache %s', cache_path, exc_info=True)
+    return response
+
+
+class _ServerStats(object):
+  """Thread-safe counters of a _MemoryCacheHTTPServerImpl."""
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._counters = {
+        'startup_seconds': 0,
+        'num_files': 0,
+        'requests_served': 0,
+        'bytes_served': 0,
+        'files_compressed': 0,
+        'compress_seconds': 0,
+        'compressed_cache_hits': 0,
+    }
+
+  def Add(self, **counters):
+    with self._lock:
+      for name, value in counters.iteritems():
+        self._counters[name] += value
+
+  def AsDict(self):
+    with self._lock:
+      return dict(self._counters)
+
 
 class MemoryCacheHTTPRequestHandler(SimpleHTTPServer.SimpleHTTPRequestHandler):
 
   protocol_version = 'HTTP/1.1'  # override BaseHTTPServer setting
   wbufsize = -1  # override StreamRequestHandler (a base class) setting
+  # The headers and the body are sent separately, and Nagle's algorithm would
+  # hold the body back until the headers are acknowledged.
+  disable_nagle_algorithm = True
 
   def handle(self):
     try:
@@ -38,19 +238,34 @@ class MemoryCacheHTTPRequestHandler(SimpleHTTPServer.SimpleHTTPRequestHandler):
 
   def do_GET(self):
     """Serve a GET request."""
+    if self.path == STATS_PATH:
+      self.SendStats()
+      return
     resource_range = self.SendHead()
 
     if not resource_range or not resource_range.resource:
       return
-    response = resource_range.resource['response']
-
-    if not resource_range.byte_range:
-      self.wfile.write(response)
-      return
-
-    start_index = resource_range.byte_range.from_byte
-    end_index = resource_range.byte_range.to_byte
-    self.wfile.write(response[start_index:end_index + 1])
+    response = resource_range.resource.response
+
+    start_index = 0
+    length = len(response)
+    if resource_range.byte_range:
+      start_index = resource_range.byte_range.from_byte
+      length = resource_range.byte_range.to_byte - start_index + 1
+
+    # Sends the bytes straight from the str or mmap, without copying them
+    # into the buffer of wfile, which only holds the headers.
+    self.wfile.flush()
+    self.connection.sendall(buffer(response, start_index, length))
+    self.server.stats.Add(requests_served=1, bytes_served=length)
+
+  def SendStats(self):
+    body = json.dumps(self.server.stats.AsDict())
+    self.send_response(200)
+    self.send_header('Content-Length', str(len(body)))
+    self.send_header('Content-Type', 'application/json')
+    self.end_headers()
+    self.wfile.write(body)
 
   def do_HEAD(self):
     """Serve a HEAD request."""
@@ -70,7 +285,7 @@ class MemoryCacheHTTPRequestHandler(SimpleHTTPServer.SimpleHTTPRequestHandler):
       return None
 
     resource = self.server.resource_map[path]
-    total_num_of_bytes = resource['content-length']
+    total_num_of_bytes = resource.content_length
     byte_range = self.GetByteRange(total_num_of_bytes)
     if byte_range:
       # request specified a range, so set response code to 206.
@@ -84,10 +299,10 @@ class MemoryCacheHTTPRequestHandler(SimpleHTTPServer.SimpleHTTPRequestHandler):
       self.send_response(200)
 
     self.send_header('Content-Length', str(total_num_of_bytes))
-    self.send_header('Content-Type', resource['content-type'])
+    self.send_header('Content-Type', resource.content_type)
     self.send_header('Last-Modified',
-                     self.date_time_string(resource['last-modified']))
-    if resource['zipped']:
+                     self.date_time_string(resource.last_modified))
+    if resource.zipped:
       self.send_header('Content-Encoding', 'gzip')
     self.end_headers()
     return ResourceAndRange(resource, byte_range)
@@ -142,28 +357,37 @@ class MemoryCacheHTTPRequestHandler(SimpleHTTPServer.SimpleHTTPRequestHandler):
     return ByteRange(from_byte, to_byte)
 
 
-class _MemoryCacheHTTPServerImpl(SocketServer.ThreadingMixIn,
-                                 BaseHTTPServer.HTTPServer):
-  # Increase the request queue size. The default value, 5, is set in
-  # SocketServer.TCPServer (the parent of BaseHTTPServer.HTTPServer).
-  # Since we're intercepting many domains through this single server,
-  # it is quite possible to get more than 5 concurrent requests.
-  request_queue_size = 128
-
-  # Don't prevent python from exiting when there is thread activity.
-  daemon_threads = True
+class _ResourceMapMixin(object):
+  """The resource map and the counters of a memory cache server."""
 
-  def __init__(self, host_port, handler, paths):
-    BaseHTTPServer.HTTPServer.__init__(self, host_port, handler)
+  def _InitResourceMap(self, paths, compressed_cache_dir, preload=False):
+    """Builds the resource map. If preload is True, every file is also
+    loaded and gzipped, on several threads, instead of when it is first
+    requested."""
+    start_time = time.time()
+    self.stats = _ServerStats()
     self.resource_map = {}
+    self._compressed_cache_dir = compressed_cache_dir
+    if compressed_cache_dir:
+      _PruneCompressedCache(compressed_cache_dir, _MAX_COMPRESSED_CACHE_SIZE)
     for path in paths:
       if os.path.isdir(path):
         self.AddDirectoryToResourceMap(path)
       else:
         self.AddFileToResourceMap(path)
+    resources = list(set(self.resource_map.itervalues()))
+    if preload and resources:
+      thread_pool = pool.ThreadPool(min(_PRELOAD_THREADS, len(resources)))
+      try:
+        thread_pool.map(_Resource.Preload, resources)
+      finally:
+        thread_pool.close()
+        thread_pool.join()
+    self.stats.Add(startup_seconds=time.time() - start_time,
+                   num_files=len(resources))
 
   def AddDirectoryToResourceMap(self, directory_path):
-    """Loads all files in directory_path into the in-memory resource map."""
+    """Adds all files in directory_path to the resource map."""
     for root, dirs, files in os.walk(directory_path):
       # Skip hidden files and folders (like .svn and .git).
       files = [f for f in files if f[0] != '.']
@@ -176,31 +400,13 @@ class _MemoryCacheHTTPServerImpl(SocketServer.ThreadingMixIn,
         self.AddFileToResourceMap(file_path)
 
   def AddFileToResourceMap(self, file_path):
-    """Loads file_path into the in-memory resource map."""
+    """Adds file_path to the resource map. It is read when first requested."""
     file_path = os.path.realpath(file_path)
     if file_path in self.resource_map:
       return
 
-    with open(file_path, 'rb') as fd:
-      response = fd.read()
-      fs = os.fstat(fd.fileno())
-    content_type = mimetypes.guess_type(file_path)[0]
-    zipped = False
-    if content_type in ['text/html', 'text/css', 'application/javascript']:
-      zipped = True
-      sio = StringIO.StringIO()
-      gzf = gzip.GzipFile(fileobj=sio, compresslevel=9, mode='wb')
-      gzf.write(response)
-      gzf.close()
-      response = sio.getvalue()
-      sio.close()
-    self.resource_map[file_path] = {
-        'content-type': content_type,
-        'content-length': len(response),
-        'last-modified': fs.st_mtime,
-        'response': response,
-        'zipped': zipped
-        }
+    self.resource_map[file_path] = _Resource(
+        file_path, self._compressed_cache_dir, self.stats)
 
     index = 'index.html'
     if os.path.basename(file_path) == index:
@@ -208,6 +414,41 @@ class _MemoryCacheHTTPServerImpl(SocketServer.ThreadingMixIn,
       self.resource_map[dir_path] = self.resource_map[file_path]
 
 
+class _MemoryCacheHTTPServerImpl(_ResourceMapMixin,
+                                 SocketServer.ThreadingMixIn,
+                                 BaseHTTPServer.HTTPServer):
+  # Increase the request queue size. The default value, 5, is set in
+  # SocketServer.TCPServer (the parent of BaseHTTPServer.HTTPServer).
+  # Since we're intercepting many domains through this single server,
+  # it is quite possible to get more than 5 concurrent requests.
+  request_queue_size = 128
+
+  # Don't prevent python from exiting when there is thread activity.
+  daemon_threads = True
+
+  def __init__(self, host_port, handler, paths,
+               compressed_cache_dir=_DEFAULT_COMPRESSED_CACHE_DIR):
+    BaseHTTPServer.HTTPServer.__init__(self, host_port, handler)
+    self._InitResourceMap(paths, compressed_cache_dir)
+
+
+class _MemoryCacheEventLoopHTTPServerImpl(
+    _ResourceMapMixin, event_loop_http_server.EventLoopHTTPServer):
+  """Serves the resource map from a single thread, see
+  event_loop_http_server.
+
+  Every file is loaded and gzipped before the server starts serving, since
+  doing so for a large file on its first request would hold up every other
+  connection.
+  """
+
+  def __init__(self, host_port, handler, paths,
+               compressed_cache_dir=_DEFAULT_COMPRESSED_CACHE_DIR):
+    event_loop_http_server.EventLoopHTTPServer.__init__(
+        self, host_port, handler)
+    self._InitResourceMap(paths, compressed_cache_dir, preload=True)
+
+
 class MemoryCacheHTTPServerBackend(local_server.LocalServerBackend):
   def __init__(self):
     super(MemoryCacheHTTPServerBackend, self).__init__()
@@ -225,19 +466,39 @@ class MemoryCacheHTTPServerBackend(local_server.LocalServerBackend):
 
     server_address = (args['host'], args['port'])
     MemoryCacheHTTPRequestHandler.protocol_version = 'HTTP/1.1'
-    self._httpd = _MemoryCacheHTTPServerImpl(
+    if args.get('event_loop'):
+      server_class = _MemoryCacheEventLoopHTTPServerImpl
+    else:
+      server_class = _MemoryCacheHTTPServerImpl
+    self._httpd = server_class(
         server_address, MemoryCacheHTTPRequestHandler, paths)
+    if sys.platform != 'win32':
+      # On Windows the backend is terminated without a signal.
+      signal.signal(signal.SIGTERM, self._ExitWithStats)
     return [local_server.NamedPort('http', self._httpd.server_address[1])]
 
+  def _ExitWithStats(self, signum, frame):  # pylint: disable=W0613
+    print _STATS_LINE_PREFIX + json.dumps(self._httpd.stats.AsDict())
+    sys.stdout.flush()
+    os._exit(0)  # pylint: disable=W0212
+
   def ServeForever(self):
     return self._httpd.serve_forever()
 
 
 class MemoryCacheHTTPServer(local_server.LocalServer):
-  def __init__(self, paths):
+  def __init__(self, paths, event_loop=False):
+    """
+    Args:
+      paths: The files and directories to serve.
+      event_loop: Whether to serve all connections from a single thread,
+          see event_loop_http_server, rather than from a thread each. The
+          single-threaded server loads and gzips every file when it starts.
+    """
     super(MemoryCacheHTTPServer, self).__init__(
         MemoryCacheHTTPServerBackend)
     self._base_dir = None
+    self._event_loop = event_loop
 
     for path in paths:
       assert os.path.exists(path), '%s does not exist.' % path
@@ -257,12 +518,62 @@ class MemoryCacheHTTPServer(local_server.LocalServer):
     return {'base_dir': self._base_dir,
             'paths': self._paths,
             'host': self.host_ip,
-            'port': 0}
+            'port': 0,
+            'event_loop': self._event_loop}
 
   @property
   def paths(self):
     return self._paths_as_set
 
+  def GetStats(self):
+    """Returns the counters of the running server as a dict.
+
+    They are the seconds it took to build the resource map, the number of
+    files in it, the requests and bytes served, and the number of files
+    gzipped and found already gzipped in the compressed file cache.
+    """
+    url = 'http://%s:%d%s' % (self.host_ip,
+                              self.forwarder.port_pairs.http.local_port,
+                              STATS_PATH)
+    return json.load(urllib2.urlopen(url, timeout=10))
+
+  def _TerminateAndGetStats(self):
+    """Terminates the backend and returns the stats that it reports on its
+    way out, or None if it reports none in time."""
+    backend = self._subprocess
+    if sys.platform == 'win32' or backend.poll() is not None:
+      return None
+    backend.terminate()
+    deadline = time.time() + _STATS_TIMEOUT
+    while True:
+      timeout = deadline - time.time()
+      if timeout <= 0 or not select.select([backend.stdout], [], [],
+                                           timeout)[0]:
+        return None
+      line = backend.stdout.readline()
+      if not line:
+        return None
+      if line.startswith(_STATS_LINE_PREFIX):
+        return json.loads(line[len(_STATS_LINE_PREFIX):])
+
+  def Close(self):
+    if self.is_running:
+      try:
+        stats = self._TerminateAndGetStats()
+      except Exception:  # pylint: disable=W0703
+        logging.warning('Failed to get the stats of the HTTP server.',
+                        exc_info=True)
+        stats = None
+      if stats:
+        logging.info(
+            'Served %d requests (%d bytes) from %d files. Startup took %.3fs, '
+            '%d files were gzipped in %.3fs and %d found in the cache.',
+            stats['requests_served'], stats['bytes_served'],
+            stats['num_files'], stats['startup_seconds'],
+            stats['files_compressed'], stats['compress_seconds'],
+            stats['compressed_cache_hits'])
+    super(MemoryCacheHTTPServer, self).Close()
+
   @property
   def url(self):
     return self.forwarder.url
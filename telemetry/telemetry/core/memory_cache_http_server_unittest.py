@@ -2,12 +2,237 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 
+import gzip
+import httplib
+import json
 import os
+import shutil
+import StringIO
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import urlparse
 
+from telemetry.core import memory_cache_http_server
 from telemetry.core import util
+from telemetry.core.forwarders import do_nothing_forwarder
 from telemetry.unittest_util import tab_test_case
 
 
+class MemoryCacheHTTPServerImplTest(unittest.TestCase):
+  """Runs the server in process, without a browser."""
+  # pylint: disable=W0212
+
+  server_class = memory_cache_http_server._MemoryCacheHTTPServerImpl
+
+  def setUp(self):
+    self._temp_dir = tempfile.mkdtemp()
+    self._serving_dir = os.path.join(self._temp_dir, 'serving')
+    self._cache_dir = os.path.join(self._temp_dir, 'cache')
+    os.mkdir(self._serving_dir)
+    with open(os.path.join(self._serving_dir, 'index.html'), 'w') as f:
+      f.write('<p>Hello world</p>' * 100)
+    self._media = ''.join(chr(i % 256) for i in xrange(3 * 1024 * 1024))
+    with open(os.path.join(self._serving_dir, 'media.webm'), 'wb') as f:
+      f.write(self._media)
+    self._servers = []
+    # Like MemoryCacheHTTPServerBackend, serves paths relative to the cwd.
+    self._old_cwd = os.getcwd()
+    os.chdir(self._serving_dir)
+
+  def tearDown(self):
+    os.chdir(self._old_cwd)
+    for server, thread in self._servers:
+      server.shutdown()
+      thread.join()
+      server.server_close()
+    shutil.rmtree(self._temp_dir)
+
+  def _StartServer(self):
+    server = self.server_class(
+        ('127.0.0.1', 0),
+        memory_cache_http_server.MemoryCacheHTTPRequestHandler,
+        [self._serving_dir], compressed_cache_dir=self._cache_dir)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    self._servers.append((server, thread))
+    return server
+
+  def _Get(self, server, path, headers=None):
+    connection = httplib.HTTPConnection('127.0.0.1', server.server_address[1])
+    connection.request('GET', path, headers=headers or {})
+    response = connection.getresponse()
+    body = response.read()
+    connection.close()
+    return response, body
+
+  def testServesRanges(self):
+    server = self._StartServer()
+    response, body = self._Get(server, '/media.webm')
+    self.assertEquals(200, response.status)
+    self.assertEquals(self._media, body)
+    response, body = self._Get(server, '/media.webm',
+                               {'Range': 'bytes=100-199'})
+    self.assertEquals(206, response.status)
+    self.assertEquals('bytes 100-199/%d' % len(self._media),
+                      response.getheader('Content-Range'))
+    self.assertEquals(self._media[100:200], body)
+    response, body = self._Get(server, '/media.webm', {'Range': 'bytes=-10'})
+    self.assertEquals(self._media[-10:], body)
+    response, _ = self._Get(server, '/missing.html')
+    self.assertEquals(404, response.status)
+
+  def testCompressesOnFirstRequestAndCachesOnDisk(self):
+    server = self._StartServer()
+    self.assertFalse(os.path.exists(self._cache_dir))
+    response, body = self._Get(server, '/')
+    self.assertEquals('gzip', response.getheader('Content-Encoding'))
+    self.assertEquals('<p>Hello world</p>' * 100,
+                      gzip.GzipFile(fileobj=StringIO.StringIO(body)).read())
+    self.assertEquals(1, len(os.listdir(self._cache_dir)))
+
+    # Another server finds the compressed file in the cache.
+    other_server = self._StartServer()
+    _, other_body = self._Get(other_server, '/index.html')
+    self.assertEquals(body, other_body)
+    _, stats = self._Get(other_server, memory_cache_http_server.STATS_PATH)
+    stats = json.loads(stats)
+    self.assertEquals(0, stats['files_compressed'])
+    self.assertEquals(1, stats['compressed_cache_hits'])
+
+  def testRemovesTemporaryFileWhenCachingFails(self):
+    def FailToRename(src, dst):
+      raise OSError('Failed to rename %s to %s.' % (src, dst))
+    old_rename = os.rename
+    os.rename = FailToRename
+    try:
+      server = self._StartServer()
+      _, body = self._Get(server, '/')
+    finally:
+      os.rename = old_rename
+    self.assertEquals('<p>Hello world</p>' * 100,
+                      gzip.GzipFile(fileobj=StringIO.StringIO(body)).read())
+    self.assertEquals([], os.listdir(self._cache_dir))
+
+  def testStats(self):
+    server = self._StartServer()
+    self._Get(server, '/media.webm', {'Range': 'bytes=0-99'})
+    self._Get(server, '/media.webm', {'Range': 'bytes=100-149'})
+    _, stats = self._Get(server, memory_cache_http_server.STATS_PATH)
+    stats = json.loads(stats)
+    self.assertEquals(2, stats['num_files'])
+    self.assertEquals(2, stats['requests_served'])
+    self.assertEquals(150, stats['bytes_served'])
+    self.assertTrue(stats['startup_seconds'] >= 0)
+
+  def testKeepsConnectionsAlive(self):
+    server = self._StartServer()
+    connection = httplib.HTTPConnection('127.0.0.1', server.server_address[1])
+    for byte_range in ('bytes=0-9', 'bytes=10-19', 'bytes=20-'):
+      connection.request('GET', '/media.webm', headers={'Range': byte_range})
+      response = connection.getresponse()
+      self.assertEquals(206, response.status)
+      response.read()
+    connection.request('HEAD', '/media.webm')
+    response = connection.getresponse()
+    self.assertEquals(str(len(self._media)),
+                      response.getheader('Content-Length'))
+    self.assertEquals('', response.read())
+    connection.request('GET', '/media.webm')
+    self.assertEquals(self._media, connection.getresponse().read())
+    connection.close()
+
+
+class PruneCompressedCacheTest(unittest.TestCase):
+  # pylint: disable=W0212
+  def setUp(self):
+    self._cache_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self._cache_dir)
+
+  def _Write(self, name, size, age):
+    path = os.path.join(self._cache_dir, name)
+    with open(path, 'wb') as f:
+      f.write('x' * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+
+  def testDeletesLeastRecentlyUsedFiles(self):
+    self._Write('old.gz', 100, 300)
+    self._Write('used.gz', 100, 200)
+    self._Write('new.gz', 100, 100)
+    memory_cache_http_server._PruneCompressedCache(self._cache_dir, 250)
+    self.assertEquals(['new.gz', 'used.gz'],
+                      sorted(os.listdir(self._cache_dir)))
+
+  def testKeepsTemporaryFilesBeingWritten(self):
+    self._Write('.tmp-new', 100, 0)
+    self._Write('.tmp-old', 100, 2 * 60 * 60)
+    memory_cache_http_server._PruneCompressedCache(self._cache_dir, 0)
+    self.assertEquals(['.tmp-new'], os.listdir(self._cache_dir))
+
+
+class _FakeLocalServerController(object):
+  host_ip = '127.0.0.1'
+
+  def GetRemotePort(self, port):
+    return port
+
+  def CreateForwarder(self, port_pairs):
+    return do_nothing_forwarder.DoNothingForwarder(port_pairs)
+
+  def ServerDidClose(self, server):
+    pass
+
+
+class MemoryCacheHTTPServerBackendTest(unittest.TestCase):
+  """Runs the server in its own process, without a browser."""
+
+  @unittest.skipIf(sys.platform == 'win32', 'Stats are not reported.')
+  def testReportsStatsWhenTerminated(self):
+    path = os.path.join(util.GetUnittestDataDir(), 'blank.html')
+    server = memory_cache_http_server.MemoryCacheHTTPServer([path])
+    server.Start(_FakeLocalServerController())
+    try:
+      # The first request is counted by the time the second one is answered
+      # on the same connection.
+      connection = httplib.HTTPConnection(
+          urlparse.urlparse(server.url).netloc)
+      for _ in xrange(2):
+        connection.request('GET', urlparse.urlparse(server.UrlOf(path)).path)
+        connection.getresponse().read()
+      connection.close()
+      stats = server._TerminateAndGetStats()  # pylint: disable=W0212
+    finally:
+      server.Close()
+    self.assertEquals(1, stats['num_files'])
+    self.assertTrue(stats['requests_served'] >= 1)
+
+
+class MemoryCacheEventLoopHTTPServerImplTest(MemoryCacheHTTPServerImplTest):
+  """Runs the same tests on the single-threaded server."""
+  # pylint: disable=W0212
+
+  server_class = memory_cache_http_server._MemoryCacheEventLoopHTTPServerImpl
+
+  def testCompressesOnFirstRequestAndCachesOnDisk(self):
+    # Files are compressed before the server starts instead.
+    server = self._StartServer()
+    self.assertEquals(1, len(os.listdir(self._cache_dir)))
+    self.assertEquals(1, server.stats.AsDict()['files_compressed'])
+    response, body = self._Get(server, '/')
+    self.assertEquals('<p>Hello world</p>' * 100,
+                      gzip.GzipFile(fileobj=StringIO.StringIO(body)).read())
+    other_server = self._StartServer()
+    self.assertEquals(1, other_server.stats.AsDict()['compressed_cache_hits'])
+    self.assertEquals(body, self._Get(other_server, '/index.html')[1])
+    self.assertEquals('gzip', response.getheader('Content-Encoding'))
+
+
 class MemoryCacheHTTPServerTest(tab_test_case.TabTestCase):
   def setUp(self):
     super(MemoryCacheHTTPServerTest, self).setUp()
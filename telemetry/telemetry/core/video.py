@@ -2,10 +2,12 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 
+import logging
 import subprocess
 
 from telemetry.core import bitmap
 from telemetry.core import platform
+from telemetry.core import video_frame_reader
 from telemetry.util import cloud_storage
 
 HIGHLIGHT_ORANGE_FRAME = bitmap.WEB_PAGE_TEST_ORANGE
@@ -22,6 +24,13 @@ class Video(object):
     assert not video_file_obj.close_called
     self._video_file_obj = video_file_obj
     self._tab_contents_bounding_box = None
+    self._frame_reader_stats = None
+
+  @property
+  def frame_reader_stats(self):
+    """The video_frame_reader.FrameReaderStats of the last time the frames of
+    the video were read, or None."""
+    return self._frame_reader_stats
 
   def UploadToCloudStorage(self, bucket, target_path):
     """Uploads video file to cloud storage.
@@ -113,7 +122,13 @@ class Video(object):
 
     return self._tab_contents_bounding_box
 
-  def _FramesFromMp4(self, mp4_file):
+  def _FramesFromMp4(self, mp4_file, skip_duplicates=True):
+    """Yields the (timestamp_ms, bitmap) tuples of the frames of mp4_file.
+
+    The pixels of each bitmap are reused once the next frame is asked for.
+    If skip_duplicates is set, frames equal to the frame before them are
+    skipped.
+    """
     host_platform = platform.GetHostPlatform()
     if not host_platform.CanLaunchApplication('avconv'):
       host_platform.InstallApplication('avconv')
@@ -133,37 +148,28 @@ class Video(object):
                           output)
       return dimensions
 
-    def GetFrameTimestampMs(stderr):
-      """Returns the frame timestamp in integer milliseconds from the dump log.
-
-      The expected line format is:
-      '  dts=1.715  pts=1.715\n'
-
-      We have to be careful to only read a single timestamp per call to avoid
-      deadlock because avconv interleaves its writes to stdout and stderr.
-      """
-      while True:
-        line = ''
-        next_char = ''
-        while next_char != '\n':
-          next_char = stderr.read(1)
-          line += next_char
-        if 'pts=' in line:
-          return int(1000 * float(line.split('=')[-1]))
-
     dimensions = GetDimensions(mp4_file)
-    frame_length = dimensions[0] * dimensions[1] * 3
-    frame_data = bytearray(frame_length)
 
     # Use rawvideo so that we don't need any external library to parse frames.
     proc = subprocess.Popen(['avconv', '-i', mp4_file, '-vcodec',
                              'rawvideo', '-pix_fmt', 'rgb24', '-dump',
                              '-loglevel', 'debug', '-f', 'rawvideo', '-'],
                             stderr=subprocess.PIPE, stdout=subprocess.PIPE)
-    while True:
-      num_read = proc.stdout.readinto(frame_data)
-      if not num_read:
-        raise StopIteration
-      assert num_read == len(frame_data), 'Unexpected frame size: %d' % num_read
-      yield (GetFrameTimestampMs(proc.stderr),
-             bitmap.Bitmap(3, dimensions[0], dimensions[1], frame_data))
+    reader = video_frame_reader.VideoFrameReader(
+        proc.stdout, proc.stderr, dimensions[0], dimensions[1],
+        skip_duplicates=skip_duplicates)
+    try:
+      for timestamp, bmp in reader:
+        yield timestamp, bmp
+    finally:
+      reader.Stop()
+      if proc.poll() is None:
+        proc.kill()
+      proc.wait()
+      stats = reader.stats
+      self._frame_reader_stats = stats
+      logging.info(
+          'Read %d frames (%d duplicates) of %.1f fps video at %.1f frames/s '
+          '(%.1f MB/s).', stats.frames, stats.duplicate_frames,
+          stats.video_frame_rate, stats.frames_per_second,
+          stats.bytes_per_second / (1024 * 1024))
@@ -0,0 +1,196 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import collections
+import Queue
+import sys
+import threading
+import time
+
+from telemetry.core import bitmap
+
+
+class FrameReaderStats(collections.namedtuple(
+    'FrameReaderStats', ['frames', 'duplicate_frames', 'bytes_read',
+                         'read_seconds', 'first_timestamp_ms',
+                         'last_timestamp_ms'])):
+  """Counters of a VideoFrameReader.
+
+  frames counts all frames read, including the duplicate_frames that were
+  skipped.
+  """
+
+  @property
+  def frames_per_second(self):
+    """The number of frames read per second of reading."""
+    if not self.read_seconds:
+      return 0
+    return self.frames / self.read_seconds
+
+  @property
+  def bytes_per_second(self):
+    if not self.read_seconds:
+      return 0
+    return self.bytes_read / self.read_seconds
+
+  @property
+  def video_frame_rate(self):
+    """The number of frames per second of video."""
+    if self.frames < 2 or self.last_timestamp_ms == self.first_timestamp_ms:
+      return 0
+    return ((self.frames - 1) * 1000.0 /
+            (self.last_timestamp_ms - self.first_timestamp_ms))
+
+
+def ParseTimestampMs(line):
+  """Returns the frame timestamp in integer milliseconds of a line of the
+  avconv dump log, or None if it has none.
+
+  The expected line format is:
+  '  dts=1.715  pts=1.715\\n'
+  """
+  if 'pts=' not in line:
+    return None
+  return int(1000 * float(line.split('=')[-1]))
+
+
+class VideoFrameReader(object):
+  """Reads the RGB24 frames and timestamps that avconv writes, on background
+  threads.
+
+  One thread reads whole frames from avconv's stdout into a ring of
+  num_buffers reusable buffers. Another reads avconv's stderr a line at a
+  time to collect the timestamps, so that neither pipe fills up while the
+  other one is being read. Frames identical to the frame before them are
+  recognized on the reading thread, by comparing them with a copy of that
+  frame, and, if skip_duplicates is set, never handed out, so callers do not
+  analyze them again.
+
+  Iterating over the reader yields (timestamp_ms, bitmap) tuples. Like a
+  ring buffer, the bitmap's pixels are reused for a later frame once the
+  next frame is asked for, so callers must copy whatever they want to keep.
+  """
+
+  def __init__(self, frame_file, log_file, width, height, num_buffers=4,
+               skip_duplicates=True):
+    """
+    Args:
+      frame_file: The file avconv writes rawvideo rgb24 frames to.
+      log_file: The file avconv writes its -dump log to.
+      width, height: The size of the frames.
+      num_buffers: The number of frames that can be read ahead of the caller,
+          plus one for the frame the caller is looking at.
+      skip_duplicates: Whether to skip frames equal to the frame before them.
+    """
+    assert num_buffers > 1
+    self._width = width
+    self._height = height
+    self._skip_duplicates = skip_duplicates
+    frame_length = width * height * 3
+    self._buffers = [bytearray(frame_length) for _ in xrange(num_buffers)]
+    self._free_buffers = Queue.Queue()
+    for i in xrange(num_buffers):
+      self._free_buffers.put(i)
+    self._frames = Queue.Queue()
+    self._timestamps = Queue.Queue()
+    self._stopped = False
+    self._exc_info = None
+    self._lock = threading.Lock()
+    self._num_frames = 0
+    self._num_duplicate_frames = 0
+    self._bytes_read = 0
+    self._first_timestamp_ms = None
+    self._last_timestamp_ms = None
+    self._start_time = time.time()
+    self._end_time = None
+    self._threads = [
+        threading.Thread(target=self._ReadTimestamps, args=(log_file,)),
+        threading.Thread(target=self._ReadFrames, args=(frame_file,))]
+    for thread in self._threads:
+      thread.daemon = True
+      thread.start()
+
+  @property
+  def stats(self):
+    """A FrameReaderStats of the frames read so far."""
+    with self._lock:
+      end_time = self._end_time or time.time()
+      return FrameReaderStats(
+          self._num_frames, self._num_duplicate_frames, self._bytes_read,
+          end_time - self._start_time, self._first_timestamp_ms,
+          self._last_timestamp_ms)
+
+  def __iter__(self):
+    index = None
+    try:
+      while True:
+        if index is not None:
+          self._free_buffers.put(index)
+        item = self._frames.get()
+        if item is None:
+          break
+        timestamp, index = item
+        yield timestamp, bitmap.Bitmap(3, self._width, self._height,
+                                       self._buffers[index])
+    finally:
+      self.Stop()
+    if self._exc_info:
+      raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+
+  def Stop(self):
+    """Stops reading frames. The caller should also end avconv, whose stdout
+    is no longer read."""
+    self._stopped = True
+    # Wakes up the frame thread if it waits for a buffer.
+    self._free_buffers.put(None)
+
+  def _ReadTimestamps(self, log_file):
+    # Reads to the end even after a Stop, so that avconv is never blocked
+    # writing its log.
+    for line in iter(log_file.readline, ''):
+      timestamp = ParseTimestampMs(line)
+      if timestamp is not None:
+        self._timestamps.put(timestamp)
+    self._timestamps.put(None)
+
+  def _ReadFrames(self, frame_file):
+    try:
+      # The caller may be done with the buffer of the previous frame by the
+      # time the next one is read, so frames are compared with a copy.
+      previous_frame = None
+      while True:
+        index = self._free_buffers.get()
+        if index is None or self._stopped:
+          return
+        frame_data = self._buffers[index]
+        num_read = frame_file.readinto(frame_data)
+        if not num_read:
+          return
+        assert num_read == len(frame_data), (
+            'Unexpected frame size: %d' % num_read)
+        timestamp = self._timestamps.get()
+        assert timestamp is not None, 'Missing timestamp of frame.'
+        is_duplicate = frame_data == previous_frame
+        if previous_frame is None:
+          previous_frame = bytearray(frame_data)
+        elif not is_duplicate:
+          previous_frame[:] = frame_data
+        with self._lock:
+          self._num_frames += 1
+          self._bytes_read += num_read
+          if self._first_timestamp_ms is None:
+            self._first_timestamp_ms = timestamp
+          self._last_timestamp_ms = timestamp
+          if is_duplicate:
+            self._num_duplicate_frames += 1
+        if is_duplicate and self._skip_duplicates:
+          self._free_buffers.put(index)
+        else:
+          self._frames.put((timestamp, index))
+    except Exception:  # pylint: disable=W0703
+      self._exc_info = sys.exc_info()
+    finally:
+      with self._lock:
+        self._end_time = time.time()
+      self._frames.put(None)
@@ -0,0 +1,96 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+import io
+import unittest
+
+from telemetry.core import video_frame_reader
+
+
+_WIDTH = 4
+_HEIGHT = 2
+
+
+def _CreateAvconvOutput(frame_values, timestamps):
+  """Returns files like avconv's stdout and stderr for frames filled with
+  frame_values."""
+  frames = ''.join(chr(v) * (_WIDTH * _HEIGHT * 3) for v in frame_values)
+  log = ''.join('[rawvideo] packet\n  dts=%.3f  pts=%.3f\n' % (t, t)
+                for t in timestamps)
+  return io.BytesIO(frames), io.BytesIO('avconv version 9\n' + log)
+
+
+class VideoFrameReaderTest(unittest.TestCase):
+  def _ReadFrames(self, frame_values, timestamps, **kwargs):
+    frame_file, log_file = _CreateAvconvOutput(frame_values, timestamps)
+    reader = video_frame_reader.VideoFrameReader(
+        frame_file, log_file, _WIDTH, _HEIGHT, **kwargs)
+    frames = [(t, bmp.pixels[0]) for t, bmp in reader]
+    return frames, reader.stats
+
+  def testParseTimestampMs(self):
+    self.assertEquals(
+        1715, video_frame_reader.ParseTimestampMs('  dts=1.715  pts=1.715\n'))
+    self.assertEquals(None, video_frame_reader.ParseTimestampMs('frame=1\n'))
+
+  def testReadsFramesWithTheirTimestamps(self):
+    frames, stats = self._ReadFrames([1, 2, 3], [0, 0.5, 1],
+                                     skip_duplicates=False)
+    self.assertEquals([(0, 1), (500, 2), (1000, 3)], frames)
+    self.assertEquals(3, stats.frames)
+    self.assertEquals(0, stats.duplicate_frames)
+    self.assertEquals(3 * _WIDTH * _HEIGHT * 3, stats.bytes_read)
+    self.assertEquals(2, stats.video_frame_rate)
+
+  def testSkipsDuplicateFrames(self):
+    frames, stats = self._ReadFrames([1, 1, 2, 2, 2, 1], range(6))
+    self.assertEquals([(0, 1), (2000, 2), (5000, 1)], frames)
+    self.assertEquals(6, stats.frames)
+    self.assertEquals(3, stats.duplicate_frames)
+
+  def testFramesDifferingInOneByteAreNotDuplicates(self):
+    frame = bytearray(_WIDTH * _HEIGHT * 3)
+    other_frame = bytearray(frame)
+    other_frame[-1] = 1
+    reader = video_frame_reader.VideoFrameReader(
+        io.BytesIO(str(frame + other_frame + other_frame)),
+        io.BytesIO('  dts=0  pts=0\n' * 3), _WIDTH, _HEIGHT)
+    self.assertEquals(2, len(list(reader)))
+    self.assertEquals(1, reader.stats.duplicate_frames)
+
+  def testKeepsDuplicateFrames(self):
+    frames, stats = self._ReadFrames([1, 1, 2], range(3),
+                                     skip_duplicates=False)
+    self.assertEquals([(0, 1), (1000, 1), (2000, 2)], frames)
+    self.assertEquals(1, stats.duplicate_frames)
+
+  def testReusesBuffers(self):
+    frame_file, log_file = _CreateAvconvOutput(range(10), range(10))
+    reader = video_frame_reader.VideoFrameReader(
+        frame_file, log_file, _WIDTH, _HEIGHT, num_buffers=2)
+    pixel_buffers = set()
+    for i, (_, bmp) in enumerate(reader):
+      self.assertEquals(i, bmp.pixels[0])
+      # pylint: disable=W0212
+      pixel_buffers.add(id(bmp._pixels))
+    self.assertEquals(2, len(pixel_buffers))
+
+  def testStopsWhenTheCallerStops(self):
+    frame_file, log_file = _CreateAvconvOutput(range(10), range(10))
+    reader = video_frame_reader.VideoFrameReader(
+        frame_file, log_file, _WIDTH, _HEIGHT, num_buffers=2)
+    frames = iter(reader)
+    frames.next()
+    frames.close()
+    # pylint: disable=W0212
+    for thread in reader._threads:
+      thread.join(5)
+      self.assertFalse(thread.is_alive())
+    self.assertTrue(reader.stats.frames < 10)
+
+  def testRaisesOnPartialFrames(self):
+    frame_file, log_file = _CreateAvconvOutput([1], [0])
+    frame_file = io.BytesIO(frame_file.getvalue()[:-1])
+    reader = video_frame_reader.VideoFrameReader(
+        frame_file, log_file, _WIDTH, _HEIGHT)
+    self.assertRaises(AssertionError, list, reader)
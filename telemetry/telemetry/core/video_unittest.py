@@ -42,7 +42,8 @@ class VideoTest(unittest.TestCase):
 
     # Calling _FramesFromMp4 should return all frames.
     # pylint: disable=W0212
-    for i, timestamp_bitmap in enumerate(video_obj._FramesFromMp4(vid)):
+    for i, timestamp_bitmap in enumerate(video_obj._FramesFromMp4(
+        vid, skip_duplicates=False)):
       timestamp, bmp = timestamp_bitmap
       self.assertEquals(timestamp, expected_timestamps[i])
       expected_bitmap = bitmap.Bitmap.FromPngFile(os.path.join(
@@ -12,6 +12,7 @@ class BuildbotOutputFormatter(output_formatter.OutputFormatter):
   def __init__(self, output_stream, trace_tag=''):
     super(BuildbotOutputFormatter, self).__init__(output_stream)
     self._trace_tag = trace_tag
+    self._summary = summary_module.Summary()
 
   def _PrintPerfResult(self, measurement, trace, v, units,
                        result_type='default'):
@@ -20,6 +21,16 @@ class BuildbotOutputFormatter(output_formatter.OutputFormatter):
     self.output_stream.write(output + '\n')
     self.output_stream.flush()
 
+  def DidRunPage(self, page_test_results):
+    # Buildbot output only has merged values, so they are printed in Format,
+    # but the summary aggregates the values as the pages run.
+    self._AddNewPageRunsToSummary(page_test_results)
+
+  def _AddNewPageRunsToSummary(self, page_test_results):
+    for page_run in self._GetNewPageRuns(page_test_results):
+      self._summary.AddValues(
+          page_test_results.GetValuesOfPageRuns([page_run]))
+
   def Format(self, page_test_results):
     """Print summary data in a format expected by buildbot for perf dashboards.
 
@@ -31,7 +42,8 @@ class BuildbotOutputFormatter(output_formatter.OutputFormatter):
     # Print out the list of unique pages.
     perf_tests_helper.PrintPages(
         [page.display_name for page in page_test_results.pages_that_succeeded])
-    summary = summary_module.Summary(page_test_results.all_page_specific_values)
+    self._AddNewPageRunsToSummary(page_test_results)
+    summary = self._summary
     for value in summary.interleaved_computed_per_page_values_and_summaries:
       if value.page:
         self._PrintComputedPerPageValue(value)
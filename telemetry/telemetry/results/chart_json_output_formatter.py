@@ -30,7 +30,14 @@ def _ResultsAsChartDict(benchmark_metadata, page_specific_values,
   Returns:
     A Chart JSON dict corresponding to the given data.
   """
-  summary = summary_module.Summary(page_specific_values)
+  return _SummaryAsChartDict(
+      benchmark_metadata, summary_module.Summary(page_specific_values),
+      summary_values)
+
+
+def _SummaryAsChartDict(benchmark_metadata, summary, summary_values):
+  """Like _ResultsAsChartDict, but from a Summary of the page-specific values.
+  """
   values = itertools.chain(
       summary.interleaved_computed_per_page_values_and_summaries,
       summary_values)
@@ -63,11 +70,23 @@ class ChartJsonOutputFormatter(output_formatter.OutputFormatter):
   def __init__(self, output_stream, benchmark_metadata):
     super(ChartJsonOutputFormatter, self).__init__(output_stream)
     self._benchmark_metadata = benchmark_metadata
+    self._summary = summary_module.Summary()
+
+  def DidRunPage(self, page_test_results):
+    # Charts only have merged values, so they are written in Format, but the
+    # summary aggregates the values as the pages run.
+    self._AddNewPageRunsToSummary(page_test_results)
+
+  def _AddNewPageRunsToSummary(self, page_test_results):
+    for page_run in self._GetNewPageRuns(page_test_results):
+      self._summary.AddValues(
+          page_test_results.GetValuesOfPageRuns([page_run]))
 
   def Format(self, page_test_results):
-    json.dump(_ResultsAsChartDict(
+    self._AddNewPageRunsToSummary(page_test_results)
+    json.dump(_SummaryAsChartDict(
         self._benchmark_metadata,
-        page_test_results.all_page_specific_values,
+        self._summary,
         page_test_results.all_summary_values),
               self.output_stream)
     self.output_stream.write('\n')
@@ -11,10 +11,21 @@ from telemetry.value import merge_values
 class CsvOutputFormatter(output_formatter.OutputFormatter):
   def __init__(self, output_stream):
     super(CsvOutputFormatter, self).__init__(output_stream)
+    self._same_page_value_groups = merge_values.SamePageValueGroups()
+
+  def DidRunPage(self, page_test_results):
+    # The header needs the names of all values, so rows are only written in
+    # Format, but the values are grouped by page as the pages run.
+    self._AddNewPageRuns(page_test_results)
+
+  def _AddNewPageRuns(self, page_test_results):
+    for page_run in self._GetNewPageRuns(page_test_results):
+      self._same_page_value_groups.AddValues(
+          page_test_results.GetValuesOfPageRuns([page_run]))
 
   def Format(self, page_test_results):
-    values = merge_values.MergeLikeValuesFromSamePage(
-        page_test_results.all_page_specific_values)
+    self._AddNewPageRuns(page_test_results)
+    values = self._same_page_value_groups.Merge()
     writer = csv.writer(self.output_stream)
     header_value_names = self._OutputHeader(values, writer)
     value_groups_by_page = merge_values.GroupStably(
@@ -42,20 +42,27 @@ class CsvPivotTableOutputFormatter(output_formatter.OutputFormatter):
     csv_writer.writerow(self.FIELDS + tag_headers)
 
     # Write all values. Each row contains a value + page-level metadata.
-    for run in page_test_results.all_page_runs:
-      run_index = page_test_results.all_page_runs.index(run)
+    for run_index, run in enumerate(page_test_results.all_page_runs):
       page_dict = {
           'page': run.page.display_name,
           'page_set': run.page.page_set.Name(),
           'run_index': run_index,
       }
-      for value in run.values:
-        if isinstance(value, scalar.ScalarValue):
+      for value, series, value_index in run.IterEntries():
+        if value is not None and isinstance(value, scalar.ScalarValue):
           value_dict = {
             'name': value.name,
             'value': value.value,
             'units': value.units,
           }
-          value_dict.update(page_dict.items())
-          csv_writer.writerow(
-              [value_dict[field] for field in self.FIELDS] + tag_values)
+        elif value is None and series.value_type is scalar.ScalarValue:
+          value_dict = {
+            'name': series.name,
+            'value': series.GetSamples(value_index)[0],
+            'units': series.units,
+          }
+        else:
+          continue
+        value_dict.update(page_dict.items())
+        csv_writer.writerow(
+            [value_dict[field] for field in self.FIELDS] + tag_values)
@@ -3,13 +3,16 @@
 # found in the LICENSE file.
 
 import datetime
+import hashlib
 import json
 import logging
 import os
 import re
+import tempfile
 
 from telemetry.core import util
 from telemetry.results import buildbot_output_formatter
+from telemetry.results import results_history
 from telemetry.util import cloud_storage
 
 util.AddDirToPythonPath(util.GetChromiumSrcDir(), 'build', 'util')
@@ -24,12 +27,27 @@ _PLUGINS = [('third_party', 'flot', 'jquery.flot.min.js'),
             ('third_party', 'WebKit', 'PerformanceTests', 'resources',
              'statistics.js')]
 _UNIT_JSON = ('tools', 'perf', 'unit-info.json')
+# The number of previous runs shown with the results of a run.
+_MAX_EXISTING_RESULTS = 512
+
+
+def GetResultsHistoryPath(html_path):
+  """Returns the path of the results history of the HTML file at html_path."""
+  return os.path.splitext(html_path)[0] + '-history.js'
 
 
 # TODO(chrishenry): This should not really extend BuildbotOutputFormatter.
 # Leaving as-is now since we are going to move HtmlOutputFormatter to be
 # based on JSON anyway.
 class HtmlOutputFormatter(buildbot_output_formatter.BuildbotOutputFormatter):
+  """Writes an HTML page comparing the results of this and previous runs.
+
+  The results of all runs are kept in a results_history.ResultsHistory next
+  to the HTML file, to which each run appends its own results. The HTML page
+  loads the history when it is opened, so it is only rewritten when the
+  template changes or the results are reset.
+  """
+
   def __init__(self, output_stream, metadata, reset_results, upload_results,
       browser_type, results_label=None, trace_tag=''):
     # Pass output_stream=None so that we blow up if
@@ -39,7 +57,11 @@ class HtmlOutputFormatter(buildbot_output_formatter.BuildbotOutputFormatter):
     self._reset_results = reset_results
     self._upload_results = upload_results
     self._html_output_stream = output_stream
-    self._existing_results = self._ReadExistingResults(output_stream)
+    self._existing_html = output_stream.read()
+    self._results_history = results_history.ResultsHistory(
+        GetResultsHistoryPath(output_stream.name),
+        max_runs=_MAX_EXISTING_RESULTS + 1)
+    self._did_append_results = False
     self._result = {
         'buildTime': self._GetBuildTime(),
         'revision': self._GetRevision(),
@@ -71,17 +93,33 @@ class HtmlOutputFormatter(buildbot_output_formatter.BuildbotOutputFormatter):
     with open(os.path.join(util.GetChromiumSrcDir(), *_UNIT_JSON)) as f:
       return f.read()
 
-  def _ReadExistingResults(self, output_stream):
-    results_html = output_stream.read()
-    if self._reset_results or not results_html:
+  def _GetHtml(self, template, results, history_path):
+    html = template.replace('%template_hash%', _GetTemplateHash(template))
+    html = html.replace('%json_results%', json.dumps(results))
+    html = html.replace('%json_results_history_path%',
+                        json.dumps(history_path))
+    html = html.replace('%json_units%', self._GetUnitJson())
+    html = html.replace('%plugins%', self._GetPlugins())
+    return html
+
+  def _IsExistingHtmlUpToDate(self, template):
+    m = re.search('<meta name="results-template-hash" content="(\\w+)">',
+                  self._existing_html)
+    return (m and m.group(1) == _GetTemplateHash(template) and
+            not self._ReadResultsInExistingHtml())
+
+  def _ReadResultsInExistingHtml(self):
+    """Returns the results that HTML files written before there was a results
+    history contain."""
+    if not self._existing_html:
       return []
     m = re.search(
         '^<script id="results-json" type="application/json">(.*?)</script>$',
-        results_html, re.MULTILINE | re.DOTALL)
+        self._existing_html, re.MULTILINE | re.DOTALL)
     if not m:
       logging.warn('Failed to extract previous results from HTML output')
       return []
-    return json.loads(m.group(1))[:512]
+    return json.loads(m.group(1))
 
   def _SaveResults(self, results):
     self._html_output_stream.seek(0)
@@ -109,32 +147,62 @@ class HtmlOutputFormatter(buildbot_output_formatter.BuildbotOutputFormatter):
     return self._result
 
   def GetCombinedResults(self):
-    all_results = list(self._existing_results)
-    all_results.append(self.GetResults())
-    return all_results
+    """Returns the results of up to 512 previous runs followed by those of
+    this run.
+
+    These are the 512 most recent runs. HTML files with embedded results
+    used to keep the 512 oldest ones instead, which left out every new run
+    once there were that many."""
+    if self._did_append_results:
+      return self._results_history.ReadLast(_MAX_EXISTING_RESULTS + 1)
+    if self._reset_results:
+      return [self.GetResults()]
+    existing_results = (self._ReadResultsInExistingHtml() +
+                        self._results_history.ReadLast(_MAX_EXISTING_RESULTS))
+    return existing_results[-_MAX_EXISTING_RESULTS:] + [self.GetResults()]
 
   def Format(self, page_test_results):
     super(HtmlOutputFormatter, self).Format(page_test_results)
 
-    html = self._GetHtmlTemplate()
-    html = html.replace('%json_results%', json.dumps(self.GetCombinedResults()))
-    html = html.replace('%json_units%', self._GetUnitJson())
-    html = html.replace('%plugins%', self._GetPlugins())
-    self._SaveResults(html)
+    if self._reset_results:
+      self._results_history.Reset()
+    else:
+      # Moves the results out of HTML files that embed them.
+      self._results_history.Extend(self._ReadResultsInExistingHtml())
+    self._results_history.Append(self.GetResults())
+    self._did_append_results = True
+
+    template = self._GetHtmlTemplate()
+    if self._reset_results or not self._IsExistingHtmlUpToDate(template):
+      self._SaveResults(self._GetHtml(
+          template, [],
+          os.path.basename(self._results_history.path)))
 
     if self._upload_results:
-      file_path = os.path.abspath(self._html_output_stream.name)
-      file_name = 'html-results/results-%s' % datetime.datetime.now().strftime(
-          '%Y-%m-%d_%H-%M-%S')
-      try:
-        cloud_storage.Insert(cloud_storage.PUBLIC_BUCKET, file_name, file_path)
-        print
-        print ('View online at '
-               'http://storage.googleapis.com/chromium-telemetry/%s'
-               % file_name)
-      except cloud_storage.PermissionError as e:
-        logging.error('Cannot upload profiling files to cloud storage due to '
-                      ' permission error: %s' % e.message)
+      self._UploadResults(template)
     print
     print 'View result at file://%s' % os.path.abspath(
         self._html_output_stream.name)
+
+  def _UploadResults(self, template):
+    # The uploaded HTML has the results in it, since the results history is
+    # not uploaded.
+    with tempfile.NamedTemporaryFile(suffix='.html', delete=False) as f:
+      f.write(self._GetHtml(template, self.GetCombinedResults(), None))
+    file_name = 'html-results/results-%s' % datetime.datetime.now().strftime(
+        '%Y-%m-%d_%H-%M-%S')
+    try:
+      cloud_storage.Insert(cloud_storage.PUBLIC_BUCKET, file_name, f.name)
+      print
+      print ('View online at '
+             'http://storage.googleapis.com/chromium-telemetry/%s'
+             % file_name)
+    except cloud_storage.PermissionError as e:
+      logging.error('Cannot upload profiling files to cloud storage due to '
+                    ' permission error: %s' % e.message)
+    finally:
+      os.remove(f.name)
+
+
+def _GetTemplateHash(template):
+  return hashlib.sha1(template).hexdigest()
@@ -2,7 +2,8 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 import os
-import StringIO
+import shutil
+import tempfile
 import unittest
 
 from telemetry import benchmark
@@ -32,16 +33,23 @@ class FakeMetadataForTest(benchmark.BenchmarkMetadata):
   def __init__(self):
     super(FakeMetadataForTest, self).__init__('test_name')
 
-# Wrap string IO with a .name property so that it behaves more like a file.
-class StringIOFile(StringIO.StringIO):
-  name = 'fake_output_file'
-
 
 class HtmlOutputFormatterTest(unittest.TestCase):
+  def setUp(self):
+    self._temp_dir = tempfile.mkdtemp()
+    output_path = os.path.join(self._temp_dir, 'results.html')
+    self._history_path = html_output_formatter.GetResultsHistoryPath(
+        output_path)
+    open(output_path, 'a').close()
+    self._output_file = open(output_path, 'r+')
+
+  def tearDown(self):
+    self._output_file.close()
+    shutil.rmtree(self._temp_dir)
 
   def test_basic_summary(self):
     test_page_set = _MakePageSet()
-    output_file = StringIOFile()
+    output_file = self._output_file
 
     # Run the first time and verify the results are written to the HTML file.
     results = page_test_results.PageTestResults()
@@ -189,7 +197,7 @@ class HtmlOutputFormatterTest(unittest.TestCase):
         "revision": "revision"
       }]
     self.assertEquals(expected, formatter.GetCombinedResults())
-    last_output_len = len(output_file.getvalue())
+    last_output_len = os.path.getsize(self._history_path)
 
     # Now reset the results and verify the old ones are gone.
     output_file.seek(0)
@@ -245,4 +253,4 @@ class HtmlOutputFormatterTest(unittest.TestCase):
       "revision": "revision"
     }]
     self.assertEquals(expected, formatter.GetCombinedResults())
-    self.assertTrue(len(output_file.getvalue()) < last_output_len)
+    self.assertTrue(os.path.getsize(self._history_path) < last_output_len)
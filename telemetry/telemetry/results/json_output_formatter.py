@@ -7,6 +7,8 @@ import os
 
 from telemetry.results import output_formatter
 from telemetry.util import file_handle
+from telemetry.value import trace
+from telemetry.value import value_store
 
 
 def ResultsAsDict(page_test_results, benchmark_metadata):
@@ -24,10 +26,18 @@ def ResultsAsDict(page_test_results, benchmark_metadata):
   result_dict = {
     'format_version': '0.2',
     'benchmark_name': benchmark_metadata.name,
+    'per_page_values': _ValuesAsDicts(
+        page_test_results.all_page_specific_values),
+  }
+  result_dict.update(_ResultsAsDictWithoutValues(page_test_results))
+  return result_dict
+
+
+def _ResultsAsDictWithoutValues(page_test_results):
+  """Returns the keys of ResultsAsDict that come after per_page_values."""
+  result_dict = {
     'summary_values': [v.AsDict() for v in
                        page_test_results.all_summary_values],
-    'per_page_values': [v.AsDict() for v in
-                        page_test_results.all_page_specific_values],
     'pages': {p.id: p.AsDict() for p in _GetAllPages(page_test_results)}
   }
   if page_test_results.serialized_trace_file_ids_to_paths:
@@ -35,6 +45,12 @@ def ResultsAsDict(page_test_results, benchmark_metadata):
   return result_dict
 
 
+def _ValuesAsDicts(values):
+  if isinstance(values, value_store.StoredValues):
+    return list(values.IterDicts())
+  return [v.AsDict() for v in values]
+
+
 def _GetAllPages(page_test_results):
   pages = set(page_run.page for page_run in
               page_test_results.all_page_runs)
@@ -42,16 +58,61 @@ def _GetAllPages(page_test_results):
 
 
 class JsonOutputFormatter(output_formatter.OutputFormatter):
+  """Writes results as JSON.
+
+  The values of each page run are written as soon as the page has run, so
+  that the values do not all have to be serialized at the end of a long
+  benchmark. Trace values are written by Format, after the traces have been
+  serialized to files. The output is the JSON of ResultsAsDict, with the
+  trace values at the end of per_page_values.
+  """
+
   def __init__(self, output_stream, benchmark_metadata):
     super(JsonOutputFormatter, self).__init__(output_stream)
     self._benchmark_metadata = benchmark_metadata
+    self._num_values_written = 0
 
   @property
   def benchmark_metadata(self):
     return self._benchmark_metadata
 
+  def DidRunPage(self, page_test_results):
+    self._WriteNewPageRuns(page_test_results)
+    self.output_stream.flush()
+
+  def _WriteNewPageRuns(self, page_test_results):
+    for page_run in self._GetNewPageRuns(page_test_results):
+      self._WriteValueDicts(_NonTraceValueDicts(page_run))
+
+  def _WriteValueDicts(self, value_dicts):
+    for d in value_dicts:
+      if not self._num_values_written:
+        self.output_stream.write(
+            '{"format_version": "0.2", "benchmark_name": %s, '
+            '"per_page_values": [' % json.dumps(self.benchmark_metadata.name))
+      else:
+        self.output_stream.write(', ')
+      json.dump(d, self.output_stream)
+      self._num_values_written += 1
+
   def Format(self, page_test_results):
-    json.dump(
-        ResultsAsDict(page_test_results, self.benchmark_metadata),
-        self.output_stream)
+    self._WriteNewPageRuns(page_test_results)
+    self._WriteValueDicts(
+        v.AsDict() for v in page_test_results.FindAllTraceValues())
+    if not self._num_values_written:
+      json.dump(ResultsAsDict(page_test_results, self.benchmark_metadata),
+                self.output_stream)
+    else:
+      # Closes per_page_values and adds the remaining keys of the dict.
+      self.output_stream.write('], ')
+      self.output_stream.write(
+          json.dumps(_ResultsAsDictWithoutValues(page_test_results))[1:])
     self.output_stream.write('\n')
+
+
+def _NonTraceValueDicts(page_run):
+  for value, series, value_index in page_run.IterEntries():
+    if value is None:
+      yield series.AsDict(value_index)
+    elif not isinstance(value, trace.TraceValue):
+      yield value.AsDict()
@@ -50,6 +50,29 @@ class JsonOutputFormatterTest(unittest.TestCase):
     self._formatter.Format(results)
     json.loads(self._output.getvalue())
 
+  def testOutputIsWrittenAsPagesRun(self):
+    results = page_test_results.PageTestResults(
+        output_formatters=[self._formatter])
+
+    results.WillRunPage(self._page_set[0])
+    results.AddValue(scalar.ScalarValue(results.current_page, 'foo',
+                                        'seconds', 3))
+    results.DidRunPage(self._page_set[0])
+    self.assertIn('"foo"', self._output.getvalue())
+
+    results.WillRunPage(self._page_set[1])
+    results.AddValue(scalar.ScalarValue(results.current_page, 'bar',
+                                        'seconds', 4))
+    results.DidRunPage(self._page_set[1])
+    self.assertIn('"bar"', self._output.getvalue())
+
+    self._formatter.Format(results)
+    d = json.loads(self._output.getvalue())
+    self.assertEquals(
+        json.loads(json.dumps(json_output_formatter.ResultsAsDict(
+            results, self._formatter.benchmark_metadata))),
+        d)
+
   def testAsDictBaseKeys(self):
     results = page_test_results.PageTestResults()
     d = json_output_formatter.ResultsAsDict(results,
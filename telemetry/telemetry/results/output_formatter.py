@@ -20,11 +20,32 @@ class OutputFormatter(object):
       output_stream: The stream to write the formatted output to.
     """
     self._output_stream = output_stream
+    self._num_page_runs_seen = 0
+
+  def DidRunPage(self, page_test_results):
+    """Called when a page run finished and was added to page_test_results.
+
+    Formatters can override this to write out or aggregate the values of
+    each page run as the benchmark goes, rather than all of them in Format.
+
+    Args:
+      page_test_results: The PageTestResults of the current benchmark run,
+         whose all_page_runs ends with the page run that just finished.
+    """
+    pass
+
+  def _GetNewPageRuns(self, page_test_results):
+    """Returns the page runs of page_test_results that this method has not
+    returned before, in order."""
+    page_runs = page_test_results.all_page_runs[self._num_page_runs_seen:]
+    self._num_page_runs_seen += len(page_runs)
+    return page_runs
 
   def Format(self, page_test_results):
     """Formats the given PageTestResults into the output stream.
 
-    This will be called once at the end of a benchmark.
+    This will be called once at the end of a benchmark, after DidRunPage
+    was called for each page run.
 
     Args:
       page_test_results: A PageTestResults object containing all results
@@ -2,18 +2,74 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 
+import array
+import itertools
+
 from telemetry.value import failure
 from telemetry.value import skip
 
 
 class PageRun(object):
-  def __init__(self, page):
+  def __init__(self, page, value_store=None):
+    """
+    Args:
+      page: The page that runs.
+      value_store: An optional value_store.ValueStore in which to store the
+          values that it can store, instead of keeping them as objects.
+    """
     self._page = page
+    self._value_store = value_store
+    # The values that are kept as objects.
     self._values = []
+    # With a value_store, the (series_index, value_index) of each value in the
+    # order they were added. Values in self._values have a series_index of -1
+    # and their index in self._values instead.
+    self._entries = array.array('l')
 
   def AddValue(self, value):
+    if self._value_store:
+      stored_value = self._value_store.AddValue(value)
+      if stored_value:
+        self._entries.extend(stored_value)
+        return
+      self._entries.extend((-1, len(self._values)))
     self._values.append(value)
 
+  def RemoveStoredValues(self):
+    """Removes the values of this run from the value store."""
+    if not self._value_store:
+      return
+    for i in xrange(len(self._entries) - 2, -1, -2):
+      if self._entries[i] != -1:
+        self._value_store.RemoveLastValue(self._entries[i])
+    self._entries = array.array('l')
+    self._values = []
+
+  def IterEntries(self):
+    """Yields (value, None, None) for the values kept as objects and
+    (None, series, value_index) for the values in the value store, in the
+    order they were added."""
+    if not self._value_store:
+      for value in self._values:
+        yield value, None, None
+      return
+    get_series = self._value_store.GetSeries
+    for series_index, value_index in itertools.izip(self._entries[::2],
+                                                    self._entries[1::2]):
+      if series_index == -1:
+        yield self._values[value_index], None, None
+      else:
+        yield None, get_series(series_index), value_index
+
+  def GetValue(self, index):
+    """Returns the value at index, without creating the other values."""
+    if not self._value_store:
+      return self._values[index]
+    series_index, value_index = self._entries[2 * index:2 * index + 2]
+    if series_index == -1:
+      return self._values[value_index]
+    return self._value_store.GetSeries(series_index).GetValue(value_index)
+
   @property
   def page(self):
     return self._page
@@ -21,7 +77,16 @@ class PageRun(object):
   @property
   def values(self):
     """The values that correspond to this page run."""
-    return self._values
+    if not self._value_store:
+      return self._values
+    return [value if value is not None else series.GetValue(value_index)
+            for value, series, value_index in self.IterEntries()]
+
+  @property
+  def num_values(self):
+    if not self._value_store:
+      return len(self._values)
+    return len(self._entries) / 2
 
   @property
   def ok(self):
@@ -38,7 +103,8 @@ class PageRun(object):
 
     To be precise: returns true if there is any SkipValue in self.values.
     """
-    return any(isinstance(v, skip.SkipValue) for v in self.values)
+    # Skip and failure values are never in the value store.
+    return any(isinstance(v, skip.SkipValue) for v in self._values)
 
   @property
   def failed(self):
@@ -48,4 +114,4 @@ class PageRun(object):
     SkipValue in self.values.
     """
     return not self.skipped and any(
-        isinstance(v, failure.FailureValue) for v in self.values)
+        isinstance(v, failure.FailureValue) for v in self._values)
@@ -18,11 +18,13 @@ from telemetry.util import cloud_storage
 from telemetry.value import failure
 from telemetry.value import skip
 from telemetry.value import trace
+from telemetry.value import value_store as value_store_module
 
 
 class PageTestResults(object):
   def __init__(self, output_stream=None, output_formatters=None,
-               progress_reporter=None, trace_tag='', output_dir=None):
+               progress_reporter=None, trace_tag='', output_dir=None,
+               value_store=None, trace_processor=None):
     """
     Args:
       output_stream: The output stream to use to write test results.
@@ -33,6 +35,12 @@ class PageTestResults(object):
           to be used to output test status/results progressively.
       trace_tag: A string to append to the buildbot trace
       name. Currently only used for buildbot.
+      value_store: An optional value_store.ValueStore to keep the numbers of
+          scalar values in. all_page_specific_values then returns
+          value_store.StoredValues rather than a list.
+      trace_processor: An optional trace_processor.TraceProcessor to which
+          the TraceValues of each page run are submitted when the run
+          finishes, to serialize or upload them while the next pages run.
     """
     # TODO(chrishenry): Figure out if trace_tag is still necessary.
 
@@ -45,6 +53,8 @@ class PageTestResults(object):
         output_formatters if output_formatters is not None else [])
     self._trace_tag = trace_tag
     self._output_dir = output_dir
+    self._value_store = value_store
+    self._trace_processor = trace_processor
 
     self._current_page_run = None
     self._all_page_runs = []
@@ -71,15 +81,33 @@ class PageTestResults(object):
   def pages_to_profiling_files_cloud_url(self):
     return self._pages_to_profiling_files_cloud_url
 
+  def _GetAllPageRunsAndCurrent(self):
+    runs = list(self._all_page_runs)
+    if self._current_page_run:
+      runs.append(self._current_page_run)
+    return runs
+
   @property
   def all_page_specific_values(self):
+    return self.GetValuesOfPageRuns(self._GetAllPageRunsAndCurrent())
+
+  def GetValuesOfPageRuns(self, page_runs):
+    """Returns the values of page_runs, as a value_store.StoredValues if these
+    results have a value store."""
+    if self._value_store:
+      return value_store_module.StoredValues(page_runs)
     values = []
-    for run in self._all_page_runs:
+    for run in page_runs:
       values += run.values
-    if self._current_page_run:
-      values += self._current_page_run.values
     return values
 
+  def _IterObjectValues(self):
+    """Yields the page specific values that are not in the value store."""
+    for run in self._GetAllPageRunsAndCurrent():
+      for value, _, _ in run.IterEntries():
+        if value is not None:
+          yield value
+
   @property
   def all_summary_values(self):
     return self._all_summary_values
@@ -116,12 +144,12 @@ class PageTestResults(object):
 
   @property
   def failures(self):
-    values = self.all_page_specific_values
+    values = self._IterObjectValues()
     return [v for v in values if isinstance(v, failure.FailureValue)]
 
   @property
   def skipped_values(self):
-    values = self.all_page_specific_values
+    values = self._IterObjectValues()
     return [v for v in values if isinstance(v, skip.SkipValue)]
 
   def _GetStringFromExcInfo(self, err):
@@ -129,7 +157,7 @@ class PageTestResults(object):
 
   def WillRunPage(self, page):
     assert not self._current_page_run, 'Did not call DidRunPage.'
-    self._current_page_run = page_run.PageRun(page)
+    self._current_page_run = page_run.PageRun(page, self._value_store)
     self._progress_reporter.WillRunPage(self)
 
   def DidRunPage(self, page, discard_run=False):  # pylint: disable=W0613
@@ -141,9 +169,18 @@ class PageTestResults(object):
     """
     assert self._current_page_run, 'Did not call WillRunPage.'
     self._progress_reporter.DidRunPage(self)
-    if not discard_run:
-      self._all_page_runs.append(self._current_page_run)
+    if discard_run:
+      self._current_page_run.RemoveStoredValues()
+      self._current_page_run = None
+      return
+    self._all_page_runs.append(self._current_page_run)
+    if self._trace_processor:
+      for value, _, _ in self._current_page_run.IterEntries():
+        if isinstance(value, trace.TraceValue):
+          self._trace_processor.Submit(value)
     self._current_page_run = None
+    for output_formatter in self._output_formatters:
+      output_formatter.DidRunPage(self)
 
   def AddValue(self, value):
     assert self._current_page_run, 'Not currently running test.'
@@ -170,6 +207,7 @@ class PageTestResults(object):
 
   def PrintSummary(self):
     self._progress_reporter.DidFinishAllTests(self)
+    self._WaitForTraceProcessor()
 
     # Only serialize the trace if output_format is json.
     from telemetry.results import json_output_formatter
@@ -180,37 +218,70 @@ class PageTestResults(object):
     for output_formatter in self._output_formatters:
       output_formatter.Format(self)
 
-  def FindPageSpecificValuesForPage(self, page, value_name):
+  def _FindPageSpecificValues(self, predicate):
+    """Returns the page specific values for which predicate is true, only
+    creating Value objects for matching values in the value store.
+
+    predicate is called with either the value or its ValueSeries, which have
+    the same page and name.
+    """
     values = []
-    for value in self.all_page_specific_values:
-      if value.page == page and value.name == value_name:
-        values.append(value)
+    for run in self._GetAllPageRunsAndCurrent():
+      for value, series, value_index in run.IterEntries():
+        if value is not None:
+          if predicate(value):
+            values.append(value)
+        elif predicate(series):
+          values.append(series.GetValue(value_index))
     return values
 
+  def FindPageSpecificValuesForPage(self, page, value_name):
+    return self._FindPageSpecificValues(
+        lambda value: value.page == page and value.name == value_name)
+
   def FindAllPageSpecificValuesNamed(self, value_name):
-    values = []
-    for value in self.all_page_specific_values:
-      if value.name == value_name:
-        values.append(value)
-    return values
+    return self._FindPageSpecificValues(
+        lambda value: value.name == value_name)
 
   def FindAllTraceValues(self):
-    values = []
-    for value in self.all_page_specific_values:
-      if isinstance(value, trace.TraceValue):
-        values.append(value)
-    return values
+    return [value for value in self._IterObjectValues()
+            if isinstance(value, trace.TraceValue)]
+
+  def _WaitForTraceProcessor(self):
+    """Waits for the trace processor to finish the submitted traces, and logs
+    how long each of them took."""
+    if not self._trace_processor:
+      return
+    timings = self._trace_processor.Join()
+    self._trace_processor = None
+    for t in timings:
+      logging.info(
+          'Processed trace of %s: queued for %.3fs, serialized in %.3fs, '
+          'uploaded in %.3fs', t.value.page.url if t.value.page else None,
+          t.queued_seconds, t.serialize_seconds, t.upload_seconds)
+    if timings:
+      logging.info(
+          'Processed %d traces: %.3fs queued, %.3fs serializing, '
+          '%.3fs uploading in total', len(timings),
+          sum(t.queued_seconds for t in timings),
+          sum(t.serialize_seconds for t in timings),
+          sum(t.upload_seconds for t in timings))
 
   def _SerializeTracesToDirPath(self, dir_path):
     """ Serialize all trace values to files in dir_path and return a list of
-    file handles to those files. """
+    file handles to those files. Traces that the trace processor already
+    serialized are not serialized again."""
+    self._WaitForTraceProcessor()
     for value in self.FindAllTraceValues():
-      fh = value.Serialize(dir_path)
+      fh = value.serialized_file_handle or value.Serialize(dir_path)
       self._serialized_trace_file_ids_to_paths[fh.id] = fh.GetAbsPath()
 
   def UploadTraceFilesToCloud(self, bucket):
+    """Uploads the traces that the trace processor did not upload already."""
+    self._WaitForTraceProcessor()
     for value in self.FindAllTraceValues():
-      value.UploadToCloud(bucket)
+      if not value.cloud_url:
+        value.UploadToCloud(bucket)
 
   def UploadProfilingFilesToCloud(self, bucket):
     for page, file_handle_list in self._pages_to_profiling_files.iteritems():
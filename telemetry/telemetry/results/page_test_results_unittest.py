@@ -7,12 +7,17 @@ import os
 from telemetry.page import page_set
 from telemetry.results import base_test_results_unittest
 from telemetry.results import page_test_results
+from telemetry import value as value_module
 from telemetry.timeline import tracing_timeline_data
 from telemetry.value import failure
 from telemetry.value import histogram
+from telemetry.value import list_of_scalar_values
+from telemetry.value import merge_values
 from telemetry.value import scalar
 from telemetry.value import skip
+from telemetry.value import summary as summary_module
 from telemetry.value import trace
+from telemetry.value import value_store
 
 
 class PageTestResultsTest(base_test_results_unittest.BaseTestResultsUnittest):
@@ -201,3 +206,94 @@ class PageTestResultsTest(base_test_results_unittest.BaseTestResultsUnittest):
 
     values = results.FindAllTraceValues()
     self.assertEquals(2, len(values))
+
+  def testTraceValuesAreSubmittedToTheTraceProcessor(self):
+    class FakeTraceProcessor(object):
+      def __init__(self):
+        self.submitted_values = []
+        self.joined = False
+
+      def Submit(self, value):
+        self.submitted_values.append(value)
+
+      def Join(self):
+        self.joined = True
+        return []
+
+    processor = FakeTraceProcessor()
+    results = page_test_results.PageTestResults(trace_processor=processor)
+    results.WillRunPage(self.pages[0])
+    value = trace.TraceValue(
+        None, tracing_timeline_data.TracingTimelineData({'test' : 1}))
+    results.AddValue(value)
+    results.DidRunPage(self.pages[0])
+
+    results.WillRunPage(self.pages[1])
+    results.AddValue(trace.TraceValue(
+        None, tracing_timeline_data.TracingTimelineData({'test' : 2})))
+    results.DidRunPage(self.pages[1], discard_run=True)
+
+    self.assertEquals([value], processor.submitted_values)
+    results.PrintSummary()
+    self.assertTrue(processor.joined)
+
+  def testValueStoreGivesTheSameResults(self):
+    def RunPages(results):
+      for repeat in xrange(3):
+        for i, page in enumerate(self.pages):
+          results.WillRunPage(page)
+          results.AddValue(scalar.ScalarValue(page, 'a.x', 'ms', i + repeat))
+          results.AddValue(scalar.ScalarValue(page, 'b.x', 'ms', 0.5 * i))
+          results.AddValue(list_of_scalar_values.ListOfScalarValues(
+              page, 'c', 'count', [repeat, 1.5],
+              same_page_merge_policy=value_module.PICK_FIRST))
+          results.AddValue(list_of_scalar_values.ListOfScalarValues(
+              page, 'd', 'count', [i, repeat]))
+          if i == 1:
+            results.AddValue(scalar.ScalarValue(page, 'e', 'ms', None,
+                                                none_value_reason='No data.'))
+            results.AddValue(skip.SkipValue(page, 'Skipped.'))
+          else:
+            results.AddValue(scalar.ScalarValue(page, 'e', 'ms', repeat))
+          results.DidRunPage(page, discard_run=(repeat == 1 and i == 2))
+
+    results = page_test_results.PageTestResults()
+    RunPages(results)
+    compact_results = page_test_results.PageTestResults(
+        value_store=value_store.ValueStore())
+    RunPages(compact_results)
+
+    def Reprs(values):
+      return [repr(v) for v in values]
+    values = results.all_page_specific_values
+    compact_values = compact_results.all_page_specific_values
+    self.assertTrue(isinstance(compact_values, value_store.StoredValues))
+    self.assertEquals(Reprs(values), Reprs(compact_values))
+    self.assertEquals(
+        Reprs(values[-2:] + values),
+        Reprs(compact_values[i]
+              for i in xrange(-2, len(compact_values))))
+    self.assertRaises(IndexError, lambda: compact_values[len(values)])
+    self.assertRaises(IndexError, lambda: compact_values[-len(values) - 1])
+    self.assertEquals([v.AsDict() for v in values],
+                      list(compact_values.IterDicts()))
+    self.assertEquals(
+        Reprs(merge_values.MergeLikeValuesFromSamePage(values)),
+        Reprs(merge_values.MergeLikeValuesFromSamePage(compact_values)))
+    for group_by_name_suffix in (False, True):
+      self.assertEquals(
+          Reprs(merge_values.MergeLikeValuesFromDifferentPages(
+              values, group_by_name_suffix)),
+          Reprs(merge_values.MergeLikeValuesFromDifferentPages(
+              compact_values, group_by_name_suffix)))
+    self.assertEquals(
+        Reprs(summary_module.Summary(
+            values).interleaved_computed_per_page_values_and_summaries),
+        Reprs(summary_module.Summary(
+            compact_values).interleaved_computed_per_page_values_and_summaries))
+    self.assertEquals(
+        Reprs(results.FindPageSpecificValuesForPage(self.pages[1], 'e')),
+        Reprs(compact_results.FindPageSpecificValuesForPage(
+            self.pages[1], 'e')))
+    self.assertEquals(Reprs(results.skipped_values),
+                      Reprs(compact_results.skipped_values))
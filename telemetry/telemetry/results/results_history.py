@@ -0,0 +1,145 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""An append-only file of the results of past benchmark runs.
+
+HtmlOutputFormatter keeps the results of each run in a ResultsHistory next to
+the HTML file, rather than in the HTML file itself, so that a run only appends
+its own results instead of rewriting those of all previous runs.
+
+The file has one line per run, which is a JavaScript statement passing the
+results of the run as JSON to a function:
+  addTelemetryResults({"buildTime": ..., "tests": {...}, ...});
+so that the HTML page can load it with a <script> tag, even from a file://
+URL. The last runs are read back by scanning the lines from the end of the
+file, so reading them costs time proportional to the number of runs read.
+
+Once the file grows past its maximum size, it is rewritten with only the
+most recent runs, which take up at most half of that size. A run that was
+cut off while it was being appended is removed before the next one is.
+"""
+
+import json
+import logging
+import os
+import sys
+
+_LINE_PREFIX = 'addTelemetryResults('
+_LINE_SUFFIX = ');'
+# The number of bytes read at a time when reading the file backwards.
+_BLOCK_SIZE = 64 * 1024
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+
+class ResultsHistory(object):
+  def __init__(self, path, max_runs=None, max_size=DEFAULT_MAX_SIZE):
+    """If max_runs is given, at most that many runs are kept when the file
+    is rewritten for growing past max_size bytes."""
+    self._path = path
+    self._max_runs = max_runs
+    self._max_size = max_size
+
+  @property
+  def path(self):
+    return self._path
+
+  def Reset(self):
+    """Removes all results from the history."""
+    open(self._path, 'w').close()
+
+  def Append(self, results):
+    """Appends the results of one run, a dict serializable to JSON."""
+    self.Extend([results])
+
+  def Extend(self, results_list):
+    """Appends the results of several runs, oldest first."""
+    with open(self._path, 'a+b') as f:
+      self._RemovePartialLastLine(f)
+      for results in results_list:
+        # json.dumps escapes newlines in strings, so each run is one line.
+        f.write(_LINE_PREFIX + json.dumps(results) + _LINE_SUFFIX + '\n')
+      size = f.tell()
+    if size > self._max_size:
+      self._DropOldestRuns()
+
+  def ReadLast(self, count):
+    """Returns the results of the last count runs, oldest first. Runs that
+    cannot be parsed are skipped."""
+    if not os.path.exists(self._path):
+      return []
+    runs = []
+    for line in self._ReadLastLines(count):
+      try:
+        runs.append(_ParseLine(line))
+      except ValueError:
+        logging.warning('Skipping an invalid run in %s: %s', self._path,
+                        line[:100])
+    return runs
+
+  def _RemovePartialLastLine(self, f):
+    """Truncates f after its last newline, which drops a run that was cut
+    off and would otherwise stop the page from loading the history."""
+    f.seek(0, os.SEEK_END)
+    position = f.tell()
+    if position == 0:
+      return
+    f.seek(position - 1)
+    if f.read(1) == '\n':
+      return
+    end = 0
+    while position > 0:
+      block_size = min(_BLOCK_SIZE, position)
+      position -= block_size
+      f.seek(position)
+      newline = f.read(block_size).rfind('\n')
+      if newline >= 0:
+        end = position + newline + 1
+        break
+    logging.warning('Removing an incomplete run from %s', self._path)
+    f.truncate(end)
+    f.seek(0, os.SEEK_END)
+
+  def _DropOldestRuns(self):
+    """Rewrites the file with the last runs that fit in half of its maximum
+    size, so that it is only rewritten once in a while. The last run is kept
+    even if it does not fit."""
+    lines = self._ReadLastLines(self._max_runs or sys.maxint)
+    size = 0
+    first_kept = len(lines)
+    while first_kept > 0:
+      size += len(lines[first_kept - 1]) + 1
+      if size > self._max_size / 2 and first_kept < len(lines):
+        break
+      first_kept -= 1
+    temp_path = '%s.%d.tmp' % (self._path, os.getpid())
+    with open(temp_path, 'wb') as f:
+      for line in lines[first_kept:]:
+        f.write(line + '\n')
+    os.remove(self._path)
+    os.rename(temp_path, self._path)
+
+  def _ReadLastLines(self, count):
+    lines = []
+    with open(self._path, 'rb') as f:
+      f.seek(0, os.SEEK_END)
+      position = f.tell()
+      # The bytes from the start of the block that was read last to the end
+      # of the first complete line after it.
+      partial_line = ''
+      while position > 0 and len(lines) < count:
+        block_size = min(_BLOCK_SIZE, position)
+        position -= block_size
+        f.seek(position)
+        block_lines = (f.read(block_size) + partial_line).split('\n')
+        partial_line = block_lines.pop(0)
+        lines[:0] = [l for l in block_lines if l]
+      if position == 0 and partial_line:
+        lines.insert(0, partial_line)
+    return lines[-count:] if count else []
+
+
+def _ParseLine(line):
+  if not line.startswith(_LINE_PREFIX) or not line.endswith(_LINE_SUFFIX):
+    raise ValueError('Invalid line in results history')
+  return json.loads(line[len(_LINE_PREFIX):-len(_LINE_SUFFIX)])
@@ -0,0 +1,74 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+import os
+import shutil
+import tempfile
+import unittest
+
+from telemetry.results import results_history
+
+
+class ResultsHistoryTest(unittest.TestCase):
+  def setUp(self):
+    self._temp_dir = tempfile.mkdtemp()
+    self._history = results_history.ResultsHistory(
+        os.path.join(self._temp_dir, 'results-history.js'))
+
+  def tearDown(self):
+    shutil.rmtree(self._temp_dir)
+
+  def testReadLastOfMissingFile(self):
+    self.assertEquals([], self._history.ReadLast(10))
+
+  def testAppendAndReadLast(self):
+    self._history.Append({'run': 0, 'label': 'line\nbreak'})
+    self._history.Extend([{'run': 1}, {'run': 2}])
+    self.assertEquals([{'run': 1}, {'run': 2}], self._history.ReadLast(2))
+    self.assertEquals([{'run': 0, 'label': 'line\nbreak'}, {'run': 1},
+                       {'run': 2}], self._history.ReadLast(10))
+    self.assertEquals([], self._history.ReadLast(0))
+
+  def testReadLastAcrossBlocks(self):
+    # Lines that are longer than the blocks in which the file is read back.
+    runs = [{'run': i, 'padding': 'x' * (40000 * (i % 3))} for i in xrange(7)]
+    self._history.Extend(runs)
+    for count in xrange(1, 9):
+      self.assertEquals(runs[-count:], self._history.ReadLast(count))
+
+  def testSkipsRunsThatCannotBeParsed(self):
+    self._history.Extend([{'run': 0}, {'run': 1}])
+    with open(self._history.path, 'a') as f:
+      f.write('addTelemetryResults({"run": 2')
+    self.assertEquals([{'run': 0}, {'run': 1}], self._history.ReadLast(3))
+
+  def testRemovesIncompleteRunBeforeAppending(self):
+    self._history.Append({'run': 0})
+    with open(self._history.path, 'a') as f:
+      f.write('addTelemetryResults({"run": 1')
+    self._history.Append({'run': 2})
+    self.assertEquals([{'run': 0}, {'run': 2}], self._history.ReadLast(10))
+    with open(self._history.path) as f:
+      self.assertEquals(2, len(f.readlines()))
+
+  def testDropsOldestRunsWhenTooLarge(self):
+    history = results_history.ResultsHistory(
+        self._history.path, max_runs=3, max_size=1000)
+    runs = [{'run': i, 'padding': 'x' * 50} for i in xrange(30)]
+    for run in runs:
+      history.Append(run)
+      self.assertTrue(os.path.getsize(history.path) <= 1000)
+    # Only the last 3 runs were kept when the file was last rewritten.
+    kept_runs = history.ReadLast(len(runs))
+    self.assertTrue(3 <= len(kept_runs) < 10, len(kept_runs))
+    self.assertEquals(runs[-len(kept_runs):], kept_runs)
+    # Runs larger than half the maximum size are kept one at a time.
+    history.Append({'padding': 'x' * 600})
+    self.assertEquals([{'padding': 'x' * 600}], history.ReadLast(10))
+
+  def testReset(self):
+    self._history.Append({'run': 0})
+    self._history.Reset()
+    self.assertEquals([], self._history.ReadLast(10))
+    self._history.Append({'run': 1})
+    self.assertEquals([{'run': 1}], self._history.ReadLast(10))
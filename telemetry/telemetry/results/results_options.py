@@ -16,6 +16,9 @@ from telemetry.results import html_output_formatter
 from telemetry.results import json_output_formatter
 from telemetry.results import page_test_results
 from telemetry.results import progress_reporter
+from telemetry.results import trace_processor
+from telemetry.util import cloud_storage
+from telemetry.value import value_store
 
 # Allowed output formats. The default is the first item in the list.
 _OUTPUT_FORMAT_CHOICES = ('html', 'buildbot', 'csv', 'gtest', 'json',
@@ -60,6 +63,13 @@ def AddResultsOptions(parser):
   group.add_option('--suppress_gtest_report',
                    default=False,
                    help='Whether to suppress GTest progress report.')
+  group.add_option('--compact-results', action='store_true',
+                   help='Keep the numbers of scalar results in typed arrays '
+                   'rather than in one object per result. Saves memory on '
+                   'runs with many pages and repeats.')
+  group.add_option('--trace-workers', type='int', default=2,
+                   help='Number of threads that serialize and upload traces '
+                   'while the benchmark runs. 0 does it after the run.')
   parser.add_option_group(group)
 
 
@@ -161,4 +171,23 @@ def CreateResults(benchmark_metadata, options):
                                   options.suppress_gtest_report)
   return page_test_results.PageTestResults(
       output_formatters=output_formatters, progress_reporter=reporter,
-      output_dir=options.output_dir)
+      output_dir=options.output_dir,
+      value_store=(value_store.ValueStore() if options.compact_results
+                   else None),
+      trace_processor=_CreateTraceProcessor(options, output_formatters))
+
+
+def _CreateTraceProcessor(options, output_formatters):
+  # Traces are serialized for JSON output only, and uploaded to the bucket
+  # that Benchmark.Run uploads them to.
+  output_dir = None
+  if any(isinstance(o, json_output_formatter.JsonOutputFormatter)
+         for o in output_formatters):
+    output_dir = options.output_dir
+  upload_bucket = (cloud_storage.INTERNAL_BUCKET if options.upload_results
+                   else None)
+  if options.trace_workers <= 0 or not (output_dir or upload_bucket):
+    return None
+  return trace_processor.TraceProcessor(
+      output_dir=output_dir, upload_bucket=upload_bucket,
+      num_workers=options.trace_workers)
@@ -0,0 +1,113 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import collections
+import logging
+import Queue
+import sys
+import threading
+import time
+
+
+TraceTimings = collections.namedtuple(
+    'TraceTimings',
+    ['value', 'queued_seconds', 'serialize_seconds', 'upload_seconds'])
+
+
+class TraceProcessor(object):
+  """Serializes and uploads TraceValues on worker threads.
+
+  Converting a trace to HTML and uploading it can take longer than running a
+  page, so PageTestResults hands the TraceValues of each page run to a
+  TraceProcessor when the run finishes and goes on with the next page. At
+  most max_pending_traces traces wait for a worker: Submit blocks when there
+  are more, so that traces do not pile up in memory faster than they are
+  written.
+  """
+
+  def __init__(self, output_dir=None, upload_bucket=None, num_workers=2,
+               max_pending_traces=4):
+    """
+    Args:
+      output_dir: The directory to serialize the traces to, or None not to
+          serialize them.
+      upload_bucket: The cloud storage bucket to upload gzipped traces to, or
+          None not to upload them.
+      num_workers: The number of threads that process traces.
+      max_pending_traces: The number of submitted traces that can wait for a
+          worker before Submit blocks.
+    """
+    assert num_workers > 0
+    self._output_dir = output_dir
+    self._upload_bucket = upload_bucket
+    self._queue = Queue.Queue(max_pending_traces)
+    self._timings = []
+    self._exc_info = None
+    self._lock = threading.Lock()
+    self._workers = [threading.Thread(target=self._ProcessTraces)
+                     for _ in xrange(num_workers)]
+    for worker in self._workers:
+      worker.daemon = True
+      worker.start()
+
+  @property
+  def output_dir(self):
+    return self._output_dir
+
+  @property
+  def upload_bucket(self):
+    return self._upload_bucket
+
+  def Submit(self, trace_value):
+    """Queues trace_value to be processed, blocking while the queue is full."""
+    assert self._workers, 'Submit called after Join.'
+    self._queue.put((trace_value, time.time()))
+
+  def Join(self):
+    """Waits for all submitted traces to be processed and stops the workers.
+
+    Returns:
+      A list of TraceTimings, one for each trace, in the order the traces
+      were processed.
+    Raises:
+      The first exception that processing a trace raised, if any.
+    """
+    for _ in self._workers:
+      self._queue.put(None)
+    for worker in self._workers:
+      worker.join()
+    self._workers = []
+    if self._exc_info:
+      raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+    return self._timings
+
+  def _ProcessTraces(self):
+    while True:
+      item = self._queue.get()
+      if item is None:
+        return
+      trace_value, submit_time = item
+      try:
+        timings = self._ProcessTrace(trace_value, submit_time)
+      except Exception:  # pylint: disable=W0703
+        logging.exception('Failed to process trace of %s', trace_value)
+        with self._lock:
+          if not self._exc_info:
+            self._exc_info = sys.exc_info()
+        continue
+      with self._lock:
+        self._timings.append(timings)
+
+  def _ProcessTrace(self, trace_value, submit_time):
+    start_time = time.time()
+    serialize_seconds = upload_seconds = 0
+    if self._output_dir:
+      trace_value.Serialize(self._output_dir)
+      serialize_seconds = time.time() - start_time
+    if self._upload_bucket:
+      upload_start_time = time.time()
+      trace_value.UploadToCloud(self._upload_bucket, compress=True)
+      upload_seconds = time.time() - upload_start_time
+    return TraceTimings(trace_value, start_time - submit_time,
+                        serialize_seconds, upload_seconds)
@@ -0,0 +1,89 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+import threading
+import unittest
+
+from telemetry.results import trace_processor
+
+
+class FakeTraceValue(object):
+  def __init__(self, name, fail=False):
+    self.name = name
+    self.serialized_to = None
+    self.uploaded_to = None
+    self._fail = fail
+
+  def Serialize(self, dir_path):
+    if self._fail:
+      raise IOError('Failed to serialize %s' % self.name)
+    self.serialized_to = dir_path
+
+  def UploadToCloud(self, bucket, compress=False):
+    assert compress
+    self.uploaded_to = bucket
+
+
+class BlockingTraceValue(FakeTraceValue):
+  """A trace value whose serialization waits until it is released."""
+  def __init__(self, name):
+    super(BlockingTraceValue, self).__init__(name)
+    self.started = threading.Event()
+    self.release = threading.Event()
+
+  def Serialize(self, dir_path):
+    self.started.set()
+    self.release.wait()
+    super(BlockingTraceValue, self).Serialize(dir_path)
+
+
+class TraceProcessorTest(unittest.TestCase):
+  def testSerializesAndUploadsAllTraces(self):
+    processor = trace_processor.TraceProcessor(
+        output_dir='out', upload_bucket='bucket', num_workers=3)
+    values = [FakeTraceValue(str(i)) for i in xrange(10)]
+    for v in values:
+      processor.Submit(v)
+    timings = processor.Join()
+    self.assertEquals(set(values), set(t.value for t in timings))
+    for v in values:
+      self.assertEquals('out', v.serialized_to)
+      self.assertEquals('bucket', v.uploaded_to)
+    for t in timings:
+      self.assertTrue(t.queued_seconds >= 0)
+      self.assertTrue(t.serialize_seconds >= 0)
+      self.assertTrue(t.upload_seconds >= 0)
+
+  def testOnlyUploads(self):
+    processor = trace_processor.TraceProcessor(upload_bucket='bucket')
+    v = FakeTraceValue('0')
+    processor.Submit(v)
+    processor.Join()
+    self.assertEquals(None, v.serialized_to)
+    self.assertEquals('bucket', v.uploaded_to)
+
+  def testSubmitBlocksWhenQueueIsFull(self):
+    processor = trace_processor.TraceProcessor(
+        output_dir='out', num_workers=1, max_pending_traces=1)
+    blocking_value = BlockingTraceValue('blocking')
+    processor.Submit(blocking_value)
+    blocking_value.started.wait()
+    # The worker is busy, so one more trace fills the queue.
+    processor.Submit(FakeTraceValue('queued'))
+    submitted = threading.Event()
+    def SubmitOneMore():
+      processor.Submit(FakeTraceValue('blocked'))
+      submitted.set()
+    submitter = threading.Thread(target=SubmitOneMore)
+    submitter.start()
+    self.assertFalse(submitted.wait(0.1))
+    blocking_value.release.set()
+    submitter.join()
+    self.assertTrue(submitted.is_set())
+    self.assertEquals(3, len(processor.Join()))
+
+  def testJoinRaisesTheFirstException(self):
+    processor = trace_processor.TraceProcessor(output_dir='out')
+    processor.Submit(FakeTraceValue('ok'))
+    processor.Submit(FakeTraceValue('failing', fail=True))
+    self.assertRaises(IOError, processor.Join)
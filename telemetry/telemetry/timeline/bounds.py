@@ -78,8 +78,10 @@ class Bounds(object):
       self.is_empty_ = False
       return
 
-    self.max_ = max(self.max_, value)
-    self.min_ = min(self.min_, value)
+    if value > self.max_:
+      self.max_ = value
+    elif value < self.min_:
+      self.min_ = value
 
   def AddEvent(self, event):
     self.AddValue(event.start)
@@ -2,6 +2,7 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 
+import telemetry.timeline.bounds as timeline_bounds
 import telemetry.timeline.event_container as event_container
 
 
@@ -75,6 +76,16 @@ class Counter(event_container.TimelineEventContainer):
       if event_predicate(test_sample):
         yield CounterSample(self, i)
 
+  def GetBoundsOfEventsInThisContainer(self):
+    counter_bounds = timeline_bounds.Bounds()
+    if self.timestamps:
+      counter_bounds.AddValue(min(self.timestamps))
+      counter_bounds.AddValue(max(self.timestamps))
+    return counter_bounds
+
+  def ShiftTimestampsInThisContainer(self, shift_amount):
+    self.timestamps = [t - shift_amount for t in self.timestamps]
+
   @property
   def num_series(self):
     return len(self.series_names)
@@ -2,6 +2,23 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 
+class LazyArgs(object):
+  """Arguments of an event that are only decoded once they are accessed.
+
+     decode(raw) must return the args dict. TimelineEvent and StoredSlice
+     replace a LazyArgs by its decoded args the first time their args are
+     read.
+  """
+  __slots__ = ('decode', 'raw')
+
+  def __init__(self, decode, raw):
+    self.decode = decode
+    self.raw = raw
+
+  def Decode(self):
+    return self.decode(self.raw)
+
+
 class TimelineEvent(object):
   """Represents a timeline event.
 
@@ -20,7 +37,18 @@ class TimelineEvent(object):
     self.duration = duration
     self.thread_start = thread_start
     self.thread_duration = thread_duration
-    self.args = args
+    self._args = args
+
+  @property
+  def args(self):
+    args = self._args
+    if type(args) is LazyArgs:
+      args = self._args = args.Decode()
+    return args
+
+  @args.setter
+  def args(self, args):
+    self._args = args
 
   @property
   def end(self):
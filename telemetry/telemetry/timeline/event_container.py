@@ -3,7 +3,9 @@
 # found in the LICENSE file.
 
 from telemetry.timeline import async_slice as async_slice_module
+from telemetry.timeline import bounds
 from telemetry.timeline import flow_event as flow_event_module
+from telemetry.timeline import interval_index
 from telemetry.timeline import slice as slice_module
 
 
@@ -44,6 +46,75 @@ class TimelineEventContainer(object):
     return
     yield # pylint: disable=W0101
 
+  def IterSlicesInRangeInThisContainer(self, start, end, overlapping):
+    """Iterates the Slices in this container that lie within [start, end], or
+    that overlap [start, end) if overlapping is True.
+
+    See interval_index.IsContained and interval_index.Overlaps for the exact
+    semantics. Containers that keep an index over their slices should override
+    this to avoid testing every slice.
+    """
+    if overlapping:
+      matches = interval_index.Overlaps
+    else:
+      matches = interval_index.IsContained
+    return self.IterEventsInThisContainer(
+        event_type_predicate=lambda t: t == slice_module.Slice,
+        event_predicate=lambda s: matches(s.start, s.end, start, end))
+
+  def IterEventsOfNameInThisContainer(self, name, event_type_predicate,
+                                      event_predicate):
+    """Like IterEventsInThisContainer, restricted to events with the given
+    name. Containers that index their events by name should override this."""
+    return self.IterEventsInThisContainer(
+        event_type_predicate,
+        lambda e: e.name == name and event_predicate(e))
+
+  def IterEventsOfCategoryInThisContainer(self, category, event_type_predicate,
+                                          event_predicate):
+    """Like IterEventsInThisContainer, restricted to events in the given
+    category. Containers that index their events by category should override
+    this."""
+    return self.IterEventsInThisContainer(
+        event_type_predicate,
+        lambda e: getattr(e, 'category', None) == category and
+                  event_predicate(e))
+
+  def GetBoundsOfEventsInThisContainer(self):
+    """Returns the wall clock Bounds of the events in this container.
+
+    Containers that keep track of their bounds as events are added should
+    override this to avoid visiting every event.
+    """
+    container_bounds = bounds.Bounds()
+    for e in self.IterEventsInThisContainer(lambda t: True, lambda e: True):
+      container_bounds.AddValue(e.start)
+      container_bounds.AddValue(e.end)
+    return container_bounds
+
+  def ShiftTimestampsInThisContainer(self, shift_amount):
+    """Subtracts shift_amount from the start of every event in this container.
+
+    Only wall clock timestamps are shifted. Containers that can move their
+    events without visiting them one by one should override this.
+    """
+    for e in self.IterEventsInThisContainer(lambda t: True, lambda e: True):
+      e.start -= shift_amount
+
+  def _IterContainers(self, recursive):
+    if not recursive:
+      yield self
+      return
+    # TODO(nduca): Write this as a proper iterator instead of one that creates a
+    # list and then iterates it.
+    containers = []
+    def GetContainersRecursive(container):
+      containers.append(container)
+      for container in container.IterChildContainers():
+        GetContainersRecursive(container)
+    GetContainersRecursive(self)
+    for c in containers:
+      yield c
 
   def IterAllEvents(self,
                     recursive=True,
@@ -60,34 +131,30 @@ class TimelineEventContainer(object):
     event_predicate is given actual events:
         event_predicate(thread.slices[7])
     """
-    if not recursive:
-      for e in self.IterEventsInThisContainer(
-          event_type_predicate, event_predicate):
-        yield e
-      return
-
-    # TODO(nduca): Write this as a proper iterator instead of one that creates a
-    # list and then iterates it.
-    containers = []
-    def GetContainersRecursive(container):
-      containers.append(container)
-      for container in container.IterChildContainers():
-        GetContainersRecursive(container)
-    GetContainersRecursive(self)
-
-    # Actually create the iterator.
-    for c in containers:
+    for c in self._IterContainers(recursive):
       for e in c.IterEventsInThisContainer(event_type_predicate,
                                            event_predicate):
         yield e
 
+  def _IterAllEventsOfName(self, name, recursive, event_type_predicate,
+                           event_predicate=lambda e: True):
+    for c in self._IterContainers(recursive):
+      for e in c.IterEventsOfNameInThisContainer(
+          name, event_type_predicate, event_predicate):
+        yield e
+
   # Helper functions for finding common kinds of events. Must always take an
-  # optinal recurisve parameter and be implemented in terms fo IterAllEvents.
+  # optinal recurisve parameter and be implemented in terms fo IterAllEvents,
+  # IterAllSlicesInRange or _IterAllEventsOfName.
   def IterAllEventsOfName(self, name, recursive=True):
-    return self.IterAllEvents(
-      recursive=recursive,
-      event_type_predicate=lambda t: True,
-      event_predicate=lambda e: e.name == name)
+    return self._IterAllEventsOfName(
+      name, recursive, event_type_predicate=lambda t: True)
+
+  def IterAllEventsOfCategory(self, category, recursive=True):
+    for c in self._IterContainers(recursive):
+      for e in c.IterEventsOfCategoryInThisContainer(
+          category, lambda t: True, lambda e: True):
+        yield e
 
   def IterAllSlices(self, recursive=True):
     return self.IterAllEvents(
@@ -95,30 +162,35 @@ class TimelineEventContainer(object):
       event_type_predicate=lambda t: t == slice_module.Slice)
 
   def IterAllSlicesInRange(self, start, end, recursive=True):
-    return self.IterAllEvents(
-      recursive=recursive,
-      event_type_predicate=lambda t: t == slice_module.Slice,
-      event_predicate=lambda s: s.start >= start and s.end <= end)
+    """Iterates all slices that lie within [start, end]."""
+    for c in self._IterContainers(recursive):
+      for s in c.IterSlicesInRangeInThisContainer(start, end,
+                                                  overlapping=False):
+        yield s
+
+  def IterAllSlicesOverlappingRange(self, start, end, recursive=True):
+    """Iterates all slices that overlap [start, end)."""
+    for c in self._IterContainers(recursive):
+      for s in c.IterSlicesInRangeInThisContainer(start, end,
+                                                  overlapping=True):
+        yield s
 
   def IterAllSlicesOfName(self, name, recursive=True):
-    return self.IterAllEvents(
-      recursive=recursive,
-      event_type_predicate=lambda t: t == slice_module.Slice,
-      event_predicate=lambda e: e.name == name)
+    return self._IterAllEventsOfName(
+      name, recursive,
+      event_type_predicate=lambda t: t == slice_module.Slice)
 
   def IterAllToplevelSlicesOfName(self, name, recursive=True):
-    return self.IterAllEvents(
-      recursive=recursive,
+    return self._IterAllEventsOfName(
+      name, recursive,
       event_type_predicate=lambda t: t == slice_module.Slice,
-      event_predicate=lambda e: e.name == name and e.parent_slice == None)
+      event_predicate=lambda e: e.parent_slice == None)
 
   def IterAllAsyncSlicesOfName(self, name, recursive=True):
     def IsAsyncSlice(t):
       return t == async_slice_module.AsyncSlice
-    return self.IterAllEvents(
-      recursive=recursive,
-      event_type_predicate=IsAsyncSlice,
-      event_predicate=lambda e: e.name == name)
+    return self._IterAllEventsOfName(
+      name, recursive, event_type_predicate=IsAsyncSlice)
 
   def IterAllFlowEvents(self, recursive=True):
     return self.IterAllEvents(
@@ -0,0 +1,43 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import collections
+
+
+class EventIndex(object):
+  '''Lists the events of a container by name and by category.
+
+  Events are grouped by the type their container reports them as (the type
+  passed to event_type_predicate in IterEventsInThisContainer), in the order
+  given by event_types, and otherwise keep the order they were added in.
+
+  The index stores whatever handle the container gives it for an event, which
+  lets containers with compact storage avoid keeping event objects alive.
+  '''
+  def __init__(self, event_types):
+    self._event_types = event_types
+    self._by_name = collections.defaultdict(dict)
+    self._by_category = collections.defaultdict(dict)
+
+  def Add(self, event_type, handle, name, category):
+    self._by_name[name].setdefault(event_type, []).append(handle)
+    self._by_category[category].setdefault(event_type, []).append(handle)
+
+  def IterHandlesOfName(self, name, event_type_predicate):
+    '''Yields (event type, handle) for the events with the given name.'''
+    return self._IterHandles(self._by_name.get(name), event_type_predicate)
+
+  def IterHandlesOfCategory(self, category, event_type_predicate):
+    '''Yields (event type, handle) for the events in the given category.'''
+    return self._IterHandles(self._by_category.get(category),
+                             event_type_predicate)
+
+  def _IterHandles(self, handles_by_type, event_type_predicate):
+    if not handles_by_type:
+      return
+    for event_type in self._event_types:
+      handles = handles_by_type.get(event_type)
+      if handles and event_type_predicate(event_type):
+        for handle in handles:
+          yield event_type, handle
@@ -0,0 +1,27 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import unittest
+
+from telemetry.timeline import event_index
+
+
+class EventIndexTest(unittest.TestCase):
+  def testLookupKeepsTypeOrderThenInsertionOrder(self):
+    index = event_index.EventIndex((int, str))
+    index.Add(str, 'a', 'name', 'cat1')
+    index.Add(int, 1, 'name', 'cat1')
+    index.Add(str, 'b', 'name', 'cat2')
+    index.Add(int, 2, 'other', 'cat2')
+
+    self.assertEqual([(int, 1), (str, 'a'), (str, 'b')],
+                     list(index.IterHandlesOfName('name', lambda t: True)))
+    self.assertEqual([(str, 'a'), (str, 'b')],
+                     list(index.IterHandlesOfName('name',
+                                                  lambda t: t is str)))
+    self.assertEqual([(int, 2), (str, 'b')],
+                     list(index.IterHandlesOfCategory('cat2',
+                                                      lambda t: True)))
+    self.assertEqual([], list(index.IterHandlesOfName('missing',
+                                                      lambda t: True)))
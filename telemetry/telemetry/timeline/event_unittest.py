@@ -22,3 +22,15 @@ class TimelineEventTest(unittest.TestCase):
     self.assertFalse(event_2.has_thread_timestamps)
     self.assertFalse(event_3.has_thread_timestamps)
     self.assertTrue(event_4.has_thread_timestamps)
+
+  def testLazyArgsAreDecodedOnce(self):
+    decoded = []
+    def Decode(raw):
+      decoded.append(raw)
+      return {'value': raw}
+    e = event.TimelineEvent('test', 'foo', 0, 10,
+                            args=event.LazyArgs(Decode, 3))
+    self.assertEqual([], decoded)
+    self.assertEqual({'value': 3}, e.args)
+    self.assertIs(e.args, e.args)
+    self.assertEqual([3], decoded)
@@ -0,0 +1,131 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+from telemetry.timeline import bounds as bounds_module
+
+
+# console.time() markers identify tabs and interaction records, so they are
+# imported whatever the filter.
+MARKER_CATEGORIES = frozenset(['blink.console', 'webkit.console'])
+
+
+class ImportFilter(object):
+  """Selects the trace events that are imported into a TimelineModel.
+
+  Events that are filtered out are dropped while the trace is parsed, before
+  any slice or other object is created for them. Every criterion left as None
+  lets all events through:
+
+    categories: a set of categories. Events are imported if any of their
+        comma separated categories is in the set.
+    excluded_categories: a set of categories. Events are dropped if all of
+        their categories are in the set.
+    names: a set of event names. The sub slices of an async slice count as
+        being named like it.
+    name_prefixes: a set of prefixes that event names may start with instead
+        of being in names.
+    pids: a set of process ids.
+    threads: a set of (pid, tid) pairs.
+    time_range: a Bounds, in milliseconds of the trace clock, that imported
+        events must overlap.
+
+  Slices whose parents are filtered out are nested differently. A filtered
+  model only spans the events it kept, so its timestamps are shifted by a
+  different amount when the world is shifted to zero.
+  """
+  def __init__(self, categories=None, excluded_categories=None, names=None,
+               name_prefixes=None, pids=None, threads=None, time_range=None):
+    self.categories = _FrozenSetOrNone(categories)
+    self.excluded_categories = frozenset(excluded_categories or [])
+    if names is None and name_prefixes is None:
+      self.names = self.name_prefixes = None
+    else:
+      self.names = frozenset(names or [])
+      self.name_prefixes = frozenset(name_prefixes or [])
+    self.pids = _FrozenSetOrNone(pids)
+    self.threads = _FrozenSetOrNone(threads)
+    self.time_range = time_range
+    self._category_is_imported = {}
+
+  def __getstate__(self):
+    state = self.__dict__.copy()
+    state['_category_is_imported'] = {}
+    return state
+
+  @staticmethod
+  def Union(import_filters):
+    """Returns a filter that imports every event that any of import_filters
+    imports, or None if one of them is None and so imports everything.
+
+    The result may import more events than all of the filters together."""
+    import_filters = list(import_filters)
+    if not import_filters or None in import_filters:
+      return None
+    def UnionOfSets(sets):
+      if None in sets:
+        return None
+      return frozenset().union(*sets)
+    time_range = None
+    if all(f.time_range is not None for f in import_filters):
+      time_range = bounds_module.Bounds()
+      for f in import_filters:
+        time_range.AddBounds(f.time_range)
+    names = UnionOfSets([f.names for f in import_filters])
+    name_prefixes = UnionOfSets([f.name_prefixes for f in import_filters])
+    return ImportFilter(
+        categories=UnionOfSets([f.categories for f in import_filters]),
+        excluded_categories=frozenset.intersection(
+            *[f.excluded_categories for f in import_filters]),
+        names=names,
+        name_prefixes=name_prefixes,
+        pids=UnionOfSets([f.pids for f in import_filters]),
+        threads=UnionOfSets([f.threads for f in import_filters]),
+        time_range=time_range)
+
+  def IsThreadImported(self, pid, tid):
+    """Returns whether events of a thread are imported. A tid of None stands
+    for the process itself, which is imported if any of its threads are."""
+    if self.pids is not None and pid not in self.pids:
+      return False
+    if self.threads is None:
+      return True
+    if tid is None:
+      return any(thread_pid == pid for thread_pid, _ in self.threads)
+    return (pid, tid) in self.threads
+
+  def IsCategoryImported(self, category):
+    imported = self._category_is_imported.get(category)
+    if imported is None:
+      categories = (category or '').split(',')
+      imported = (
+          (self.categories is None or
+           any(c in self.categories for c in categories)) and
+          not all(c in self.excluded_categories for c in categories))
+      self._category_is_imported[category] = imported
+    return imported
+
+  def IsNameImported(self, name):
+    if self.names is None or name in self.names:
+      return True
+    return any(name.startswith(prefix) for prefix in self.name_prefixes)
+
+  def IsTimeRangeImported(self, start, end):
+    """Returns whether events from start to end, in milliseconds, overlap the
+    time range of this filter. An end of None means the event never ended."""
+    if self.time_range is None:
+      return True
+    if self.time_range.is_empty:
+      return False
+    return (start <= self.time_range.max and
+            (end is None or end >= self.time_range.min))
+
+  def IsBeforeTimeRange(self, timestamp):
+    return (self.time_range is not None and not self.time_range.is_empty and
+            timestamp < self.time_range.min)
+
+
+def _FrozenSetOrNone(values):
+  if values is None:
+    return None
+  return frozenset(values)
@@ -0,0 +1,76 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import unittest
+
+from telemetry.timeline import bounds
+from telemetry.timeline import import_filter
+
+
+def _CreateBounds(start, end):
+  b = bounds.Bounds()
+  b.AddValue(start)
+  b.AddValue(end)
+  return b
+
+
+class ImportFilterTest(unittest.TestCase):
+  def testCategories(self):
+    f = import_filter.ImportFilter(categories=['cc', 'gpu'],
+                                   excluded_categories=['debug'])
+    self.assertTrue(f.IsCategoryImported('cc'))
+    self.assertTrue(f.IsCategoryImported('blink,gpu'))
+    self.assertFalse(f.IsCategoryImported('blink'))
+    self.assertFalse(f.IsCategoryImported('debug'))
+    self.assertTrue(f.IsCategoryImported('cc,debug'))
+    f = import_filter.ImportFilter(excluded_categories=['debug'])
+    self.assertTrue(f.IsCategoryImported('blink'))
+    self.assertFalse(f.IsCategoryImported('debug'))
+
+  def testNamesAndPrefixes(self):
+    f = import_filter.ImportFilter(names=['a'], name_prefixes=['Interaction.'])
+    self.assertTrue(f.IsNameImported('a'))
+    self.assertTrue(f.IsNameImported('Interaction.Foo/is_smooth'))
+    self.assertFalse(f.IsNameImported('b'))
+    self.assertTrue(import_filter.ImportFilter().IsNameImported('b'))
+
+  def testThreads(self):
+    f = import_filter.ImportFilter(threads=[(1, 2)])
+    self.assertTrue(f.IsThreadImported(1, 2))
+    self.assertTrue(f.IsThreadImported(1, None))
+    self.assertFalse(f.IsThreadImported(1, 3))
+    self.assertFalse(f.IsThreadImported(2, None))
+
+  def testTimeRange(self):
+    f = import_filter.ImportFilter(time_range=_CreateBounds(10, 20))
+    self.assertTrue(f.IsTimeRangeImported(5, 10))
+    self.assertTrue(f.IsTimeRangeImported(5, None))
+    self.assertFalse(f.IsTimeRangeImported(5, 9))
+    self.assertFalse(f.IsTimeRangeImported(21, 22))
+    self.assertTrue(f.IsBeforeTimeRange(9))
+    self.assertFalse(f.IsBeforeTimeRange(10))
+
+  def testUnion(self):
+    self.assertIsNone(import_filter.ImportFilter.Union(
+        [import_filter.ImportFilter(names=['a']), None]))
+    union = import_filter.ImportFilter.Union([
+        import_filter.ImportFilter(names=['a'], pids=[1],
+                                   excluded_categories=['x', 'y'],
+                                   time_range=_CreateBounds(10, 20)),
+        import_filter.ImportFilter(name_prefixes=['b'], pids=[2],
+                                   excluded_categories=['y'],
+                                   time_range=_CreateBounds(30, 40))])
+    self.assertTrue(union.IsNameImported('a'))
+    self.assertTrue(union.IsNameImported('bc'))
+    self.assertFalse(union.IsNameImported('c'))
+    self.assertEqual(frozenset([1, 2]), union.pids)
+    self.assertEqual(frozenset(['y']), union.excluded_categories)
+    self.assertEqual((10, 40), (union.time_range.min, union.time_range.max))
+    self.assertIsNone(union.categories)
+
+    union = import_filter.ImportFilter.Union([
+        import_filter.ImportFilter(names=['a']),
+        import_filter.ImportFilter(pids=[1])])
+    self.assertTrue(union.IsNameImported('c'))
+    self.assertIsNone(union.pids)
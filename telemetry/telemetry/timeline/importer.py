@@ -21,6 +21,14 @@ class TimelineImporter(object):
     new timeline events to the model"""
     raise NotImplementedError
 
+  def ImportEventsInParallel(self, jobs): # pylint: disable=W0613
+    """Like ImportEvents, but may spread the work over |jobs| processes.
+
+    This is only called when this importer is the only one for the model, so
+    it may also finalize the processes it creates. By default the events are
+    imported serially."""
+    self.ImportEvents()
+
   def FinalizeImport(self):
     """Called after all other importers for the model are run."""
     raise NotImplementedError
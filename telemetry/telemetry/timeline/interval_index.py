@@ -0,0 +1,101 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+'''A static index answering interval range queries in O(log n + k).
+
+Intervals are sorted by start time. On top of the sorted end times sits an
+implicit segment tree holding the maximum end time of every subtree, so that
+overlap queries can skip whole runs of intervals that ended before the query
+range begins.
+'''
+
+import array
+import bisect
+
+
+_NEGATIVE_INFINITY = float('-inf')
+
+
+def Overlaps(interval_start, interval_end, range_start, range_end):
+  '''Returns whether [interval_start, interval_end] overlaps the half-open
+  range [range_start, range_end).
+
+  Intervals that merely touch the range do not overlap it. Zero length
+  intervals overlap the range if they lie inside it.
+  '''
+  if interval_start >= range_end:
+    return False
+  if interval_end > range_start:
+    return True
+  return interval_start == interval_end and interval_start >= range_start
+
+
+def IsContained(interval_start, interval_end, range_start, range_end):
+  '''Returns whether [interval_start, interval_end] lies within
+  [range_start, range_end].'''
+  return interval_start >= range_start and interval_end <= range_end
+
+
+class IntervalIndex(object):
+  def __init__(self, starts, ends):
+    '''Indexes the intervals [starts[i], ends[i]].
+
+    Queries yield the positions i of the matching intervals, ordered by start
+    time, so that callers can keep their intervals in whatever form suits them.
+    '''
+    assert len(starts) == len(ends)
+    order = sorted(xrange(len(starts)), key=starts.__getitem__)
+    self._positions = array.array('l', order)
+    self._starts = array.array('d', (starts[i] for i in order))
+    self._ends = array.array('d', (ends[i] for i in order))
+
+    leaf_count = 1
+    while leaf_count < len(order):
+      leaf_count *= 2
+    self._leaf_count = leaf_count
+    max_ends = array.array('d', [_NEGATIVE_INFINITY]) * (2 * leaf_count)
+    max_ends[leaf_count:leaf_count + len(order)] = self._ends
+    for node in xrange(leaf_count - 1, 0, -1):
+      max_ends[node] = max(max_ends[2 * node], max_ends[2 * node + 1])
+    self._max_ends = max_ends
+
+  def __len__(self):
+    return len(self._positions)
+
+  def IterOverlapping(self, range_start, range_end):
+    '''Yields the positions of intervals overlapping [range_start, range_end),
+    see Overlaps().'''
+    # Only intervals starting before range_end can overlap the range.
+    end_rank = bisect.bisect_left(self._starts, range_end)
+    if not end_rank:
+      return
+    starts = self._starts
+    ends = self._ends
+    max_ends = self._max_ends
+    leaf_count = self._leaf_count
+    # Depth first walk of the segment tree, left child first so that results
+    # come out sorted by start time. Entries are (node, first rank covered,
+    # number of ranks covered).
+    stack = [(1, 0, leaf_count)]
+    while stack:
+      node, first_rank, rank_count = stack.pop()
+      if first_rank >= end_rank or max_ends[node] < range_start:
+        continue
+      if rank_count == 1:
+        if Overlaps(starts[first_rank], ends[first_rank],
+                    range_start, range_end):
+          yield self._positions[first_rank]
+        continue
+      half = rank_count // 2
+      stack.append((2 * node + 1, first_rank + half, half))
+      stack.append((2 * node, first_rank, half))
+
+  def IterContained(self, range_start, range_end):
+    '''Yields the positions of intervals within [range_start, range_end], see
+    IsContained().'''
+    ends = self._ends
+    first_rank = bisect.bisect_left(self._starts, range_start)
+    end_rank = bisect.bisect_right(self._starts, range_end)
+    for rank in xrange(first_rank, end_rank):
+      if ends[rank] <= range_end:
+        yield self._positions[rank]
@@ -0,0 +1,52 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import random
+import unittest
+
+from telemetry.timeline import interval_index
+
+
+class IntervalIndexTest(unittest.TestCase):
+  def testOverlaps(self):
+    self.assertTrue(interval_index.Overlaps(0, 10, 5, 20))
+    self.assertTrue(interval_index.Overlaps(5, 6, 0, 20))
+    self.assertFalse(interval_index.Overlaps(0, 5, 5, 20))
+    self.assertFalse(interval_index.Overlaps(20, 30, 5, 20))
+    self.assertTrue(interval_index.Overlaps(5, 5, 5, 20))
+    self.assertFalse(interval_index.Overlaps(20, 20, 5, 20))
+
+  def testEmpty(self):
+    index = interval_index.IntervalIndex([], [])
+    self.assertEqual(0, len(index))
+    self.assertEqual([], list(index.IterOverlapping(0, 10)))
+    self.assertEqual([], list(index.IterContained(0, 10)))
+
+  def testResultsAreSortedByStart(self):
+    starts = [30, 10, 20, 0]
+    ends = [40, 50, 25, 100]
+    index = interval_index.IntervalIndex(starts, ends)
+    self.assertEqual([3, 1, 2, 0], list(index.IterOverlapping(0, 35)))
+    self.assertEqual([3, 1, 0], list(index.IterOverlapping(26, 35)))
+    self.assertEqual([2, 0], list(index.IterContained(15, 45)))
+
+  def testMatchesBruteForce(self):
+    rng = random.Random(0)
+    for size in (1, 2, 3, 7, 8, 9, 100, 257):
+      starts = [rng.randint(0, 200) for _ in xrange(size)]
+      ends = [s + rng.choice([0, 0, 1, 5, 50, 150]) for s in starts]
+      index = interval_index.IntervalIndex(starts, ends)
+      for _ in xrange(50):
+        range_start = rng.randint(-10, 260)
+        range_end = range_start + rng.randint(0, 60)
+        expected = [i for i in xrange(size) if interval_index.Overlaps(
+            starts[i], ends[i], range_start, range_end)]
+        self.assertEqual(
+            sorted(expected),
+            sorted(index.IterOverlapping(range_start, range_end)))
+        expected = [i for i in xrange(size) if interval_index.IsContained(
+            starts[i], ends[i], range_start, range_end)]
+        self.assertEqual(
+            sorted(expected),
+            sorted(index.IterContained(range_start, range_end)))
@@ -7,6 +7,8 @@ trace_viewer project:
 https://code.google.com/p/trace-viewer/
 '''
 
+import logging
+import os
 from operator import attrgetter
 
 import telemetry.timeline.process as process_module
@@ -16,7 +18,9 @@ from telemetry.timeline import bounds
 from telemetry.timeline import empty_timeline_data_importer
 from telemetry.timeline import event_container
 from telemetry.timeline import inspector_importer
+from telemetry.timeline import model_cache
 from telemetry.timeline import trace_event_importer
+from telemetry.timeline import tracing_timeline_data
 
 # Register importers for data
 
@@ -45,12 +49,34 @@ def IsSliceOrAsyncSlice(t):
 
 
 class TimelineModel(event_container.TimelineEventContainer):
-  def __init__(self, timeline_data=None, shift_world_to_zero=True):
+  def __init__(self, timeline_data=None, shift_world_to_zero=True,
+               columnar_slices=False, import_jobs=1, lazy_args=False,
+               import_filter=None):
     """ Initializes a TimelineModel. timeline_data can be a single TimelineData
     object, a list of TimelineData objects, or None. If timeline_data is not
     None, all events from it will be imported into the model. The events will
     be shifted such that the first event starts at time 0, if
     shift_world_to_zero is True.
+
+    If columnar_slices is True, the slices of every thread are kept in compact
+    typed arrays (see slice_store.py) and Slice objects are only created when
+    they are accessed. This uses far less memory for large traces, but slices
+    obtained twice are equal rather than identical.
+
+    If import_jobs is greater than 1 and timeline_data is a single trace, the
+    events of each process are imported by a pool of that many worker
+    processes and the results merged back into this model.
+
+    If lazy_args is True, the args of slices loaded from a model cache are
+    kept as JSON and only decoded when they are first accessed. Traces
+    given as JSON strings or files are always decoded eagerly, and the args
+    of events given as Python objects are shared with the caller.
+
+    A single TracingTimelineData with a cache_dir is looked up in, or saved
+    to, that cache directory.
+
+    If import_filter is given, only the trace events it selects are imported
+    (see import_filter.py).
     """
     super(TimelineModel, self).__init__(name='TimelineModel', parent=None)
     self._bounds = bounds.Bounds()
@@ -58,6 +84,10 @@ class TimelineModel(event_container.TimelineEventContainer):
     self._processes = {}
     self._browser_process = None
     self._frozen = False
+    self._columnar_slices = columnar_slices
+    self._import_jobs = import_jobs
+    self._lazy_args = lazy_args
+    self._import_filter = import_filter
     self._tab_ids_to_renderer_threads_map = {}
     self.import_errors = []
     self.metadata = []
@@ -86,6 +116,28 @@ class TimelineModel(event_container.TimelineEventContainer):
   def processes(self):
     return self._processes
 
+  @property
+  def columnar_slices(self):
+    return self._columnar_slices
+
+  @property
+  def import_jobs(self):
+    return self._import_jobs
+
+  @property
+  def lazy_args(self):
+    return self._lazy_args
+
+  @property
+  def import_filter(self):
+    """The ImportFilter the events of this model were selected with, or None
+    if all events were imported."""
+    return self._import_filter
+
+  @property
+  def tab_ids(self):
+    return self._tab_ids_to_renderer_threads_map.keys()
+
   @property
   #pylint: disable=E0202
   def browser_process(self):
@@ -102,9 +154,22 @@ class TimelineModel(event_container.TimelineEventContainer):
                       'trace is imported')
     self._tab_ids_to_renderer_threads_map[tab_id] = renderer_thread
 
-  def ImportTraces(self, timeline_data, shift_world_to_zero=True):
+  def ImportTraces(self, timeline_data, shift_world_to_zero=True,
+                   import_filter=None):
     if self._frozen:
       raise Exception("Cannot add events once trace is imported")
+    if import_filter is not None:
+      self._import_filter = import_filter
+
+    cache_path = None
+    # Filtered models are not cached, as they depend on more than the trace.
+    if (isinstance(timeline_data, tracing_timeline_data.TracingTimelineData)
+        and timeline_data.cache_dir and self._import_filter is None):
+      cache_path = model_cache.GetCachePath(
+          timeline_data.cache_dir, timeline_data.GetContentHash(),
+          shift_world_to_zero)
+      if self._LoadCache(cache_path):
+        return
 
     importers = []
     if isinstance(timeline_data, list):
@@ -117,8 +182,39 @@ class TimelineModel(event_container.TimelineEventContainer):
 
     for importer in importers:
       # TODO: catch exceptions here and add it to error list
-      importer.ImportEvents()
+      if self._import_jobs > 1 and len(importers) == 1:
+        importer.ImportEventsInParallel(self._import_jobs)
+      else:
+        importer.ImportEvents()
     self.FinalizeImport(shift_world_to_zero, importers)
+    if cache_path:
+      self._SaveCache(cache_path)
+
+  def _SaveCache(self, cache_path):
+    cache_dir = os.path.dirname(cache_path)
+    try:
+      try:
+        os.makedirs(cache_dir)
+      except OSError:
+        # Another process may have created it.
+        if not os.path.isdir(cache_dir):
+          raise
+      model_cache.Save(self, cache_path)
+    except (IOError, OSError):
+      # The model is already imported, and the cache is only an optimization.
+      logging.warning('Failed to save the model to %s', cache_path,
+                      exc_info=True)
+
+  def _LoadCache(self, cache_path):
+    if not os.path.exists(cache_path) or self._processes:
+      return False
+    try:
+      model_cache.Load(cache_path, self)
+    except model_cache.InvalidCacheError:
+      return False
+    self.UpdateBounds()
+    self._frozen = True
+    return True
 
   def FinalizeImport(self, shift_world_to_zero=False, importers=None):
     if importers == None:
@@ -137,7 +233,8 @@ class TimelineModel(event_container.TimelineEventContainer):
 
     if shift_world_to_zero:
       self.ShiftWorldToZero()
-    self.UpdateBounds()
+    else:
+      self.UpdateBounds()
 
     # Because of FinalizeImport, it would probably be a good idea
     # to prevent the timeline from from being modified.
@@ -148,32 +245,38 @@ class TimelineModel(event_container.TimelineEventContainer):
     if self._bounds.is_empty:
       return
     shift_amount = self._bounds.min
-    for event in self.IterAllEvents():
-      event.start -= shift_amount
+    for container in self._IterContainers(recursive=True):
+      container.ShiftTimestampsInThisContainer(shift_amount)
+    self.UpdateBounds()
 
   def UpdateBounds(self):
+    """Recomputes the bounds of the model from those of its containers.
+
+    Threads keep their bounds up to date as events are added, so this does not
+    visit their events.
+    """
     self._bounds.Reset()
-    for event in self.IterAllEvents():
-      self._bounds.AddValue(event.start)
-      self._bounds.AddValue(event.end)
+    for container in self._IterContainers(recursive=True):
+      self._bounds.AddBounds(container.GetBoundsOfEventsInThisContainer())
 
     self._thread_time_bounds = {}
     for thread in self.GetAllThreads():
-      self._thread_time_bounds[thread] = bounds.Bounds()
-      for event in thread.IterEventsInThisContainer(
-          event_type_predicate=lambda t: True,
-          event_predicate=lambda e: True):
-        if event.thread_start != None:
-          self._thread_time_bounds[thread].AddValue(event.thread_start)
-        if event.thread_end != None:
-          self._thread_time_bounds[thread].AddValue(event.thread_end)
+      self._thread_time_bounds[thread] = thread.thread_time_bounds
 
   def GetOrCreateProcess(self, pid):
     if pid not in self._processes:
       assert not self._frozen
-      self._processes[pid] = process_module.Process(self, pid)
+      self._processes[pid] = process_module.Process(
+          self, pid, columnar_slices=self._columnar_slices)
     return self._processes[pid]
 
+  def AdoptProcess(self, process):
+    """Adds a process that was imported into another model to this one."""
+    assert not self._frozen
+    assert process.pid not in self._processes
+    process.parent = self
+    self._processes[process.pid] = process
+
   def FindTimelineMarkers(self, timeline_marker_names):
     """Find the timeline events with the given names.
 
@@ -191,15 +294,12 @@ class TimelineModel(event_container.TimelineEventContainer):
     for name in names:
       name_set.add(name)
 
-    def IsEventNeeded(event):
-      if event.parent_slice != None:
-        return
-      return event.name in name_set
-
-    events = list(self.IterAllEvents(
-      recursive=True,
-      event_type_predicate=IsSliceOrAsyncSlice,
-      event_predicate=IsEventNeeded))
+    for name in name_set:
+      events.extend(self._IterAllEventsOfName(
+        name,
+        recursive=True,
+        event_type_predicate=IsSliceOrAsyncSlice,
+        event_predicate=lambda e: e.parent_slice == None))
     events.sort(key=attrgetter('start'))
 
     # Check if the number and order of events matches the provided names,
@@ -0,0 +1,497 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+'''Saves finalized TimelineModels to compact binary files and loads them back
+without parsing or importing the trace again.
+
+A cache file has a fixed size header followed by
+  * columns of fixed width records, one typed array per field, for the slices
+    of every thread (including their tree links), async slices, flow events,
+    samples and counter samples,
+  * a string table holding every category, name, id and JSON encoded args
+    dict as UTF-8, with a column of the offsets at which they end,
+  * a JSON directory describing the processes, threads and counters, and
+    where each of their columns is.
+
+The slice columns of a thread are exactly the columns of a SliceStore, so
+loading them is a matter of copying bytes out of the memory mapped file.
+Columns are written in native byte order and are byte swapped when read on a
+machine with the other one.
+'''
+
+import array
+import itertools
+import json
+import mmap
+import os
+import struct
+import sys
+
+from telemetry.timeline import async_slice as async_slice_module
+from telemetry.timeline import event as event_module
+from telemetry.timeline import flow_event as flow_event_module
+from telemetry.timeline import process as process_module
+from telemetry.timeline import slice_store as slice_store_module
+
+_MAGIC = 'TLMCACHE'
+# Must be bumped whenever the layout of cache files changes.
+_VERSION = 1
+# Magic, version, byte order of the columns (0 for little endian), and offset
+# and size of the JSON directory.
+_HEADER = struct.Struct('<8sIIQQ')
+_ALIGNMENT = 8
+
+_MISSING = float('nan')
+_NONE = -1
+
+_SLICE_COLUMNS = ('start', 'duration', 'thread_start', 'thread_duration',
+                  'category_id', 'name_id', 'did_not_finish', 'parent',
+                  'first_child', 'last_child', 'next_sibling')
+
+
+class InvalidCacheError(Exception):
+  pass
+
+
+def GetCachePath(cache_dir, content_hash, shift_world_to_zero):
+  '''Returns where the model imported from a trace is cached in cache_dir.'''
+  return os.path.join(cache_dir, '%s-v%d-%s.timeline' % (
+      content_hash, _VERSION,
+      'shifted' if shift_world_to_zero else 'unshifted'))
+
+
+def _ToStored(value):
+  if value is None:
+    return _MISSING
+  return value
+
+
+def _FromStored(value):
+  if value != value:  # NaN
+    return None
+  return value
+
+
+class _Writer(object):
+  def __init__(self, f):
+    self._f = f
+    self._string_ids = {}
+    self._string_ends = array.array('i')
+    self._string_data = []
+    self._string_size = 0
+    f.write('\0' * _HEADER.size)
+
+  def _Align(self):
+    padding = -self._f.tell() % _ALIGNMENT
+    if padding:
+      self._f.write('\0' * padding)
+
+  def WriteColumn(self, values):
+    '''Writes a typed array and returns its directory entry.'''
+    self._Align()
+    offset = self._f.tell()
+    values.tofile(self._f)
+    return [values.typecode, offset, len(values)]
+
+  def AddString(self, string):
+    if string is None:
+      return _NONE
+    string_id = self._string_ids.get(string)
+    if string_id is None:
+      data = string.encode('utf-8')
+      self._string_size += len(data)
+      self._string_data.append(data)
+      self._string_ends.append(self._string_size)
+      string_id = len(self._string_ends) - 1
+      self._string_ids[string] = string_id
+    return string_id
+
+  def AddJson(self, value):
+    if type(value) is event_module.LazyArgs:
+      value = value.Decode()
+    if value is None:
+      return _NONE
+    return self.AddString(json.dumps(value, separators=(',', ':')))
+
+  def Finish(self, directory):
+    self._Align()
+    directory['strings'] = {
+        'offset': self._f.tell(),
+        'ends': None,
+    }
+    for data in self._string_data:
+      self._f.write(data)
+    directory['strings']['ends'] = self.WriteColumn(self._string_ends)
+    directory_offset = self._f.tell()
+    encoded_directory = json.dumps(directory)
+    self._f.write(encoded_directory)
+    self._f.seek(0)
+    self._f.write(_HEADER.pack(_MAGIC, _VERSION,
+                               0 if sys.byteorder == 'little' else 1,
+                               directory_offset, len(encoded_directory)))
+
+
+class _Reader(object):
+  def __init__(self, data, lazy_args):
+    if len(data) < _HEADER.size:
+      raise InvalidCacheError('Truncated timeline cache')
+    magic, version, byte_order, directory_offset, directory_size = (
+        _HEADER.unpack_from(data, 0))
+    if magic != _MAGIC or version != _VERSION:
+      raise InvalidCacheError('Not a version %d timeline cache' % _VERSION)
+    self._data = data
+    self._swap = byte_order != (0 if sys.byteorder == 'little' else 1)
+    self.directory = json.loads(
+        data[directory_offset:directory_offset + directory_size])
+    strings = self.directory['strings']
+    self._strings_offset = strings['offset']
+    self._string_ends = self.ReadColumn(strings['ends'])
+    self._decoded_strings = {}
+    self._lazy_args = lazy_args
+    self._raw_args = {}
+
+  def ReadColumn(self, entry):
+    typecode, offset, count = entry
+    values = array.array(str(typecode))
+    # Reads straight out of the mapped file rather than through a copy.
+    values.fromstring(buffer(self._data, offset, count * values.itemsize))
+    if len(values) != count:
+      raise InvalidCacheError('Truncated timeline cache')
+    if self._swap:
+      values.byteswap()
+    return values
+
+  def _GetStringData(self, string_id):
+    if string_id == 0:
+      start = 0
+    else:
+      start = self._string_ends[string_id - 1]
+    return self._data[self._strings_offset + start:
+                      self._strings_offset + self._string_ends[string_id]]
+
+  def GetString(self, string_id):
+    if string_id == _NONE:
+      return None
+    string = self._decoded_strings.get(string_id)
+    if string is None:
+      string = self._GetStringData(string_id).decode('utf-8')
+      self._decoded_strings[string_id] = string
+    return string
+
+  def GetJson(self, string_id):
+    if string_id == _NONE:
+      return None
+    return json.loads(self._GetStringData(string_id))
+
+  def GetArgs(self, string_id):
+    '''Returns the args dict with the given id, or LazyArgs decoding it if
+    the model keeps args lazily.'''
+    if string_id == _NONE or not self._lazy_args:
+      return self.GetJson(string_id)
+    # Events with equal args share the JSON they are decoded from.
+    raw = self._raw_args.get(string_id)
+    if raw is None:
+      raw = self._GetStringData(string_id)
+      self._raw_args[string_id] = raw
+    return event_module.LazyArgs(json.loads, raw)
+
+
+def _GetNestedStore(thread):
+  '''Returns a SliceStore holding the slices of a thread and the indices of
+  its top level slices.'''
+  store = thread.slice_store
+  if store is not None:
+    return store, [s.index for s in thread.toplevel_slices]
+  store = slice_store_module.SliceStore(thread)
+  index_of = {}
+  for s in thread.all_slices:
+    index_of[id(s)] = store.AppendSlice(s)
+  for s in thread.all_slices:
+    for sub_slice in s.sub_slices:
+      store.AddChild(index_of[id(s)], index_of[id(sub_slice)])
+  return store, [index_of[id(s)] for s in thread.toplevel_slices]
+
+
+def _SaveThread(writer, thread):
+  store, toplevel_indices = _GetNestedStore(thread)
+  if thread.slice_store is not None:
+    all_args = store.args
+  else:
+    # Slice objects tell apart empty args from no args at all.
+    all_args = [s.args for s in thread.all_slices]
+  return {
+      'tid': thread.tid,
+      'name': thread.name,
+      'strings': [store.strings.GetString(i)
+                  for i in xrange(len(store.strings))],
+      'slices': dict((column, writer.WriteColumn(getattr(store, column)))
+                     for column in _SLICE_COLUMNS),
+      'slice_args': writer.WriteColumn(
+          array.array('i', [writer.AddJson(args) for args in all_args])),
+      'toplevel_slices': writer.WriteColumn(
+          array.array('i', toplevel_indices)),
+  }
+
+
+class _Table(object):
+  '''Collects rows of events into typed columns.'''
+  def __init__(self, **typecodes):
+    self.columns = dict((name, array.array(typecode))
+                        for name, typecode in typecodes.iteritems())
+
+  def __len__(self):
+    return len(self.columns.itervalues().next())
+
+  def AddRow(self, **values):
+    for name, value in values.iteritems():
+      self.columns[name].append(value)
+    return len(self) - 1
+
+  def Write(self, writer):
+    return dict((name, writer.WriteColumn(values))
+                for name, values in self.columns.iteritems())
+
+
+def Save(timeline_model, path):
+  '''Writes a finalized model to path, replacing any file already there.'''
+  directory = {'processes': []}
+  threads = []
+  temp_path = '%s.%d.tmp' % (path, os.getpid())
+  try:
+    with open(temp_path, 'wb') as f:
+      writer = _Writer(f)
+      for pid in sorted(timeline_model.processes):
+        process = timeline_model.processes[pid]
+        overflow_timestamp = None
+        if process.trace_buffer_did_overflow:
+          overflow_timestamp = process.trace_buffer_overflow_event.start
+        process_info = {
+            'pid': pid,
+            'name': process.name,
+            'trace_buffer_overflow': overflow_timestamp,
+            'threads': [],
+            'counters': [],
+        }
+        for tid in sorted(process.threads):
+          thread = process.threads[tid]
+          threads.append(thread)
+          process_info['threads'].append(_SaveThread(writer, thread))
+        for full_name in sorted(process.counters):
+          counter = process.counters[full_name]
+          process_info['counters'].append({
+              'category': counter.category,
+              'name': counter.name,
+              'series_names': counter.series_names,
+              'timestamps': writer.WriteColumn(
+                  array.array('d', counter.timestamps)),
+              'samples': writer.WriteColumn(array.array('d', counter.samples)),
+          })
+        directory['processes'].append(process_info)
+
+      thread_index = dict((id(thread), i) for i, thread in enumerate(threads))
+      def GetThreadIndex(thread):
+        if thread is None:
+          return _NONE
+        return thread_index[id(thread)]
+
+      async_slices = _Table(
+          owner='i', parent='i', start='d', duration='d', thread_start='d',
+          thread_duration='d', category='i', name='i', id='i', args='i',
+          start_thread='i', end_thread='i')
+      flow_events = _Table(owner='i', start='d', category='i', name='i',
+                           id='i', args='i')
+      samples = _Table(owner='i', start='d', category='i', name='i', args='i')
+      flow_event_rows = {}
+
+      def AddAsyncSlice(owner, parent, s):
+        row = async_slices.AddRow(
+            owner=owner, parent=parent, start=s.start, duration=s.duration,
+            thread_start=_ToStored(s.thread_start),
+            thread_duration=_ToStored(s.thread_duration),
+            category=writer.AddString(s.category),
+            name=writer.AddString(s.name), id=writer.AddJson(s.id),
+            args=writer.AddJson(s.args),
+            start_thread=GetThreadIndex(s.start_thread),
+            end_thread=GetThreadIndex(s.end_thread))
+        for sub_slice in s.sub_slices:
+          AddAsyncSlice(owner, row, sub_slice)
+
+      for owner, thread in enumerate(threads):
+        for s in thread.async_slices:
+          AddAsyncSlice(owner, _NONE, s)
+        for flow_event in thread.IterAllFlowEvents(recursive=False):
+          flow_event_rows[id(flow_event)] = flow_events.AddRow(
+              owner=owner, start=flow_event.start,
+              category=writer.AddString(flow_event.category),
+              name=writer.AddString(flow_event.name),
+              id=writer.AddJson(flow_event.event_id),
+              args=writer.AddJson(flow_event.args))
+        for sample in thread.samples:
+          samples.AddRow(owner=owner, start=sample.start,
+                         category=writer.AddString(sample.category),
+                         name=writer.AddString(sample.name),
+                         args=writer.AddJson(sample.args))
+
+      directory['async_slices'] = async_slices.Write(writer)
+      directory['flow_events'] = flow_events.Write(writer)
+      directory['samples'] = samples.Write(writer)
+      directory['flows'] = [
+          writer.WriteColumn(array.array(
+              'i', [flow_event_rows[id(flow[i])]
+                    for flow in timeline_model.flow_events]))
+          for i in (0, 1)]
+
+      browser_process = timeline_model.browser_process
+      directory['browser_pid'] = (
+          browser_process.pid if browser_process else None)
+      directory['tab_ids'] = [
+          [tab_id, GetThreadIndex(
+              timeline_model.GetRendererThreadFromTabId(tab_id))]
+          for tab_id in timeline_model.tab_ids]
+      directory['metadata'] = timeline_model.metadata
+      directory['import_errors'] = timeline_model.import_errors
+      writer.Finish(directory)
+    if os.path.exists(path):
+      os.remove(path)
+    os.rename(temp_path, path)
+  finally:
+    if os.path.exists(temp_path):
+      os.remove(temp_path)
+
+
+def _LoadThread(reader, thread, thread_info):
+  store = slice_store_module.SliceStore(thread)
+  for string in thread_info['strings']:
+    store.strings.GetId(string)
+  for column, entry in thread_info['slices'].iteritems():
+    setattr(store, column, reader.ReadColumn(entry))
+  store.args = [reader.GetArgs(string_id) for string_id in
+                reader.ReadColumn(thread_info['slice_args'])]
+  thread.SetFinalizedSlices(
+      store, reader.ReadColumn(thread_info['toplevel_slices']).tolist())
+
+
+def _ReadTable(reader, entries):
+  return dict((name, reader.ReadColumn(entry))
+              for name, entry in entries.iteritems())
+
+
+def Load(path, timeline_model):
+  '''Loads the model saved at path into an empty, unfinalized model.
+
+  Raises InvalidCacheError, leaving the model untouched, if path does not hold
+  a cache that this version can read.
+  '''
+  with open(path, 'rb') as f:
+    try:
+      data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+      raise InvalidCacheError('Empty timeline cache')
+  try:
+    _Load(_Reader(data, timeline_model.lazy_args), timeline_model)
+  except (IndexError, KeyError, TypeError, ValueError, struct.error), e:
+    raise InvalidCacheError('Corrupt timeline cache: %s' % e)
+  finally:
+    data.close()
+
+
+def _Load(reader, timeline_model):
+  '''Reads the whole cache before adding anything to the model, so that the
+  model is left untouched if the cache turns out to be corrupt.'''
+  directory = reader.directory
+  processes = []
+  threads = []
+  for process_info in directory['processes']:
+    process = process_module.Process(
+        timeline_model, process_info['pid'],
+        columnar_slices=timeline_model.columnar_slices)
+    processes.append(process)
+    process.name = process_info['name']
+    if process_info['trace_buffer_overflow'] is not None:
+      process.SetTraceBufferOverflowTimestamp(
+          process_info['trace_buffer_overflow'])
+    for thread_info in process_info['threads']:
+      thread = process.GetOrCreateThread(thread_info['tid'])
+      thread.name = thread_info['name']
+      _LoadThread(reader, thread, thread_info)
+      threads.append(thread)
+    for counter_info in process_info['counters']:
+      counter = process.GetOrCreateCounter(counter_info['category'],
+                                           counter_info['name'])
+      counter.series_names = counter_info['series_names']
+      counter.timestamps = reader.ReadColumn(
+          counter_info['timestamps']).tolist()
+      counter.samples = reader.ReadColumn(counter_info['samples']).tolist()
+      counter.FinalizeImport()
+
+  def GetThread(index):
+    if index == _NONE:
+      return None
+    return threads[index]
+
+  table = _ReadTable(reader, directory['async_slices'])
+  async_slices = []
+  for row in xrange(len(table['owner'])):
+    s = async_slice_module.AsyncSlice(
+        reader.GetString(table['category'][row]),
+        reader.GetString(table['name'][row]),
+        table['start'][row],
+        args=reader.GetArgs(table['args'][row]),
+        duration=table['duration'][row],
+        start_thread=GetThread(table['start_thread'][row]),
+        end_thread=GetThread(table['end_thread'][row]),
+        thread_start=_FromStored(table['thread_start'][row]),
+        thread_duration=_FromStored(table['thread_duration'][row]))
+    s.id = reader.GetJson(table['id'][row])
+    async_slices.append(s)
+    parent = table['parent'][row]
+    if parent != _NONE:
+      s.parent_slice = async_slices[parent]
+      async_slices[parent].AddSubSlice(s)
+  # Sub slices have to be in place before the slice is added to its thread.
+  for row, s in enumerate(async_slices):
+    if table['parent'][row] == _NONE:
+      threads[table['owner'][row]].AddAsyncSlice(s)
+
+  table = _ReadTable(reader, directory['flow_events'])
+  flow_events = []
+  for row in xrange(len(table['owner'])):
+    flow_event = flow_event_module.FlowEvent(
+        reader.GetString(table['category'][row]),
+        reader.GetJson(table['id'][row]),
+        reader.GetString(table['name'][row]),
+        table['start'][row],
+        reader.GetArgs(table['args'][row]))
+    threads[table['owner'][row]].AddFlowEvent(flow_event)
+    flow_events.append(flow_event)
+  flow_starts, flow_ends = [reader.ReadColumn(entry)
+                            for entry in directory['flows']]
+  flows = [[flow_events[start], flow_events[end]]
+           for start, end in itertools.izip(flow_starts, flow_ends)]
+
+  table = _ReadTable(reader, directory['samples'])
+  for row in xrange(len(table['owner'])):
+    threads[table['owner'][row]].AddSample(
+        reader.GetString(table['category'][row]),
+        reader.GetString(table['name'][row]),
+        table['start'][row],
+        reader.GetArgs(table['args'][row]))
+
+  processes_by_pid = dict((process.pid, process) for process in processes)
+  browser_process = None
+  if directory['browser_pid'] is not None:
+    browser_process = processes_by_pid[directory['browser_pid']]
+  tab_threads = [(tab_id, GetThread(thread_index))
+                 for tab_id, thread_index in directory['tab_ids']]
+  metadata = list(directory['metadata'])
+  import_errors = list(directory['import_errors'])
+
+  for process in processes:
+    timeline_model.AdoptProcess(process)
+  timeline_model.flow_events.extend(flows)
+  if browser_process:
+    timeline_model.browser_process = browser_process
+  for tab_id, thread in tab_threads:
+    timeline_model.AddMappingFromTabIdToRendererThread(tab_id, thread)
+  timeline_model.metadata.extend(metadata)
+  timeline_model.import_errors.extend(import_errors)
@@ -0,0 +1,218 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from telemetry.timeline import model as model_module
+from telemetry.timeline import model_cache
+from telemetry.timeline import tracing_timeline_data
+
+
+_EVENTS = [
+    {'name': 'a', 'args': {'x': 1}, 'pid': 52, 'ts': 520, 'tts': 280,
+     'cat': 'foo', 'tid': 53, 'ph': 'B'},
+    {'name': 'b', 'args': {}, 'pid': 52, 'ts': 530, 'cat': 'bar', 'tid': 53,
+     'ph': 'X', 'dur': 10},
+    {'name': 'a', 'args': {}, 'pid': 52, 'ts': 560, 'tts': 310, 'cat': 'foo',
+     'tid': 53, 'ph': 'E'},
+    {'name': 'open', 'args': {}, 'pid': 52, 'ts': 600, 'cat': 'foo',
+     'tid': 54, 'ph': 'B'},
+    {'name': 'tab1', 'args': {}, 'pid': 52, 'ts': 610, 'cat': 'foo',
+     'tid': 54, 'ph': 'S', 'id': 3},
+    {'name': 'tab1', 'args': {}, 'pid': 52, 'ts': 615, 'cat': 'foo',
+     'tid': 54, 'ph': 'F', 'id': 3},
+    {'name': 'thread_name', 'args': {'name': u'Renderer\u2014Main'},
+     'pid': 52, 'ts': 0, 'cat': '__metadata', 'tid': 54, 'ph': 'M'},
+    {'name': 'load', 'args': {'url': 'x'}, 'pid': 52, 'ts': 524,
+     'cat': 'net', 'tid': 53, 'ph': 'S', 'id': '0x1'},
+    {'name': 'load', 'args': {'step': 'wait'}, 'pid': 52, 'ts': 540,
+     'cat': 'net', 'tid': 54, 'ph': 'T', 'id': '0x1'},
+    {'name': 'load', 'args': {}, 'pid': 52, 'ts': 580, 'cat': 'net',
+     'tid': 54, 'ph': 'F', 'id': '0x1'},
+    {'name': 'flow', 'args': {}, 'pid': 52, 'ts': 525, 'cat': 'foo',
+     'tid': 53, 'ph': 's', 'id': 7},
+    {'name': 'flow', 'args': {}, 'pid': 52, 'ts': 590, 'cat': 'foo',
+     'tid': 54, 'ph': 'f', 'id': 7},
+    {'name': 'sample', 'args': {}, 'pid': 52, 'ts': 550, 'cat': 'foo',
+     'tid': 53, 'ph': 'P'},
+    {'name': 'ctr', 'args': {'value': 3, 'other': 4}, 'pid': 60, 'ts': 530,
+     'cat': 'foo', 'tid': 1, 'ph': 'C'},
+    {'name': 'ctr', 'args': {'value': 5, 'other': 1}, 'pid': 60, 'ts': 570,
+     'cat': 'foo', 'tid': 1, 'ph': 'C'},
+    {'name': 'unfinished', 'args': {}, 'pid': 60, 'ts': 575, 'cat': 'foo',
+     'tid': 2, 'ph': 'S', 'id': 9},
+]
+
+
+def _DescribeModel(m):
+  '''Returns a comparable summary of everything a model holds.'''
+  def DescribeEvent(e):
+    return (e.category, e.name, e.start, e.duration, e.thread_start,
+            e.thread_duration, e.args or {})
+  def DescribeSlice(s):
+    return (DescribeEvent(s), s.did_not_finish,
+            s.parent_slice.name if s.parent_slice else None,
+            [sub.name for sub in s.sub_slices])
+  def DescribeAsyncSlice(s):
+    return (DescribeEvent(s), s.id, s.start_thread.tid,
+            s.end_thread.tid if s.end_thread else None,
+            [DescribeAsyncSlice(sub) for sub in s.sub_slices])
+  processes = []
+  for pid in sorted(m.processes):
+    process = m.processes[pid]
+    threads = []
+    for tid in sorted(process.threads):
+      thread = process.threads[tid]
+      threads.append((
+          tid, thread.name,
+          [DescribeSlice(s) for s in thread.all_slices],
+          [s.name for s in thread.toplevel_slices],
+          [DescribeAsyncSlice(s) for s in thread.async_slices],
+          [DescribeEvent(s) for s in thread.samples],
+          [(DescribeEvent(e), e.event_id)
+           for e in thread.IterAllFlowEvents()],
+          thread.bounds.min, thread.bounds.max,
+          thread.thread_time_bounds.min, thread.thread_time_bounds.max))
+    counters = [(c.full_name, c.series_names, c.timestamps, c.samples,
+                 c.totals, c.max_total)
+                for _, c in sorted(process.counters.items())]
+    processes.append((pid, process.name, threads, counters))
+  flows = [(a.name, a.start, b.start) for a, b in m.flow_events]
+  tab_threads = [(tab_id, m.GetRendererThreadFromTabId(tab_id).tid)
+                 for tab_id in sorted(m.tab_ids)]
+  return (processes, flows, m.import_errors, m.metadata, tab_threads,
+          m.browser_process.pid if m.browser_process else None,
+          m.bounds.min, m.bounds.max)
+
+
+class ModelCacheTest(unittest.TestCase):
+  def setUp(self):
+    self._cache_dir = tempfile.mkdtemp()
+    self._path = os.path.join(self._cache_dir, 'model.timeline')
+
+  def tearDown(self):
+    shutil.rmtree(self._cache_dir)
+
+  def _RoundTrip(self, columnar_when_saved, columnar_when_loaded,
+                 lazy_args=False):
+    m = model_module.TimelineModel(
+        tracing_timeline_data.TracingTimelineData(
+            {'traceEvents': _EVENTS, 'tabIds': ['tab1']}),
+        columnar_slices=columnar_when_saved)
+    m.browser_process = m.processes[52]
+    model_cache.Save(m, self._path)
+    loaded = model_module.TimelineModel(
+        columnar_slices=columnar_when_loaded, lazy_args=lazy_args)
+    model_cache.Load(self._path, loaded)
+    loaded.UpdateBounds()
+    self.assertEqual(_DescribeModel(m), _DescribeModel(loaded))
+    return loaded
+
+  def testRoundTripWithSliceObjects(self):
+    loaded = self._RoundTrip(False, False)
+    thread = loaded.processes[52].threads[53]
+    self.assertIs(thread.toplevel_slices[0], thread.all_slices[0])
+    self.assertIs(thread.all_slices[0], thread.all_slices[1].parent_slice)
+
+  def testRoundTripWithColumnarSlices(self):
+    loaded = self._RoundTrip(True, True)
+    self.assertEqual(
+        2, len(loaded.processes[52].threads[53].slice_store))
+
+  def testRoundTripBetweenSliceStorages(self):
+    self._RoundTrip(False, True)
+    self._RoundTrip(True, False)
+
+  def testRoundTripWithLazyArgs(self):
+    self._RoundTrip(False, False, lazy_args=True)
+    self._RoundTrip(True, True, lazy_args=True)
+
+  def testLoadRejectsOtherFiles(self):
+    with open(self._path, 'wb') as f:
+      f.write('{"traceEvents": []}')
+    m = model_module.TimelineModel()
+    self.assertRaises(model_cache.InvalidCacheError,
+                      lambda: model_cache.Load(self._path, m))
+    self.assertEqual({}, m.processes)
+
+  def testLoadRejectsCorruptCaches(self):
+    m = model_module.TimelineModel(
+        tracing_timeline_data.TracingTimelineData(
+            {'traceEvents': _EVENTS, 'tabIds': ['tab1']}))
+    model_cache.Save(m, self._path)
+    with open(self._path, 'rb') as f:
+      data = f.read()
+    corruptions = [
+        # Read after every process has been.
+        data.replace('"tab_ids"', '"tab_idz"'),
+        # A column that runs past the end of the file.
+        re.sub(r'("samples": \["d", \d+, )\d', r'\g<1>9', data),
+        data[:len(data) - 10],
+    ]
+    for corrupt_data in corruptions:
+      with open(self._path, 'wb') as f:
+        f.write(corrupt_data)
+      loaded = model_module.TimelineModel()
+      self.assertRaises(model_cache.InvalidCacheError,
+                        lambda: model_cache.Load(self._path, loaded))
+      self.assertEqual({}, loaded.processes)
+      self.assertEqual([], loaded.metadata)
+
+  def testModelIsLoadedFromCacheDir(self):
+    def CreateModel():
+      return model_module.TimelineModel(
+          tracing_timeline_data.TracingTimelineData(
+              _EVENTS, cache_dir=self._cache_dir))
+    m = CreateModel()
+    path = model_cache.GetCachePath(
+        self._cache_dir,
+        tracing_timeline_data.TracingTimelineData(_EVENTS).GetContentHash(),
+        True)
+    self.assertTrue(os.path.exists(path))
+    cached = CreateModel()
+    self.assertEqual(_DescribeModel(m), _DescribeModel(cached))
+    self.assertRaises(
+        Exception, lambda: cached.GetOrCreateProcess(1))
+
+    # A corrupt cache file is imported over.
+    with open(path, 'wb') as f:
+      f.write('garbage')
+    self.assertEqual(_DescribeModel(m), _DescribeModel(CreateModel()))
+
+  def testSaveRemovesTemporaryFileWhenItFails(self):
+    m = model_module.TimelineModel(
+        tracing_timeline_data.TracingTimelineData(_EVENTS))
+    # A directory cannot be replaced by the cache file.
+    os.mkdir(self._path)
+    self.assertRaises(OSError, lambda: model_cache.Save(m, self._path))
+    self.assertEqual(['model.timeline'], os.listdir(self._cache_dir))
+
+  def testModelIsImportedWhenCacheDirIsNotWritable(self):
+    # A file where the cache directory should be, which fails like a
+    # read-only directory even for root.
+    cache_dir = os.path.join(self._cache_dir, 'file')
+    with open(cache_dir, 'wb') as f:
+      f.write('x')
+    m = model_module.TimelineModel(
+        tracing_timeline_data.TracingTimelineData(
+            _EVENTS, cache_dir=cache_dir))
+    self.assertEqual(_DescribeModel(model_module.TimelineModel(
+        tracing_timeline_data.TracingTimelineData(_EVENTS))),
+                     _DescribeModel(m))
+    self.assertEqual(['file'], os.listdir(self._cache_dir))
+
+  def testContentHashOfFileStartsAtItsPosition(self):
+    with tempfile.TemporaryFile() as f:
+      f.write('xyz{"traceEvents": []}')
+      f.seek(3)
+      data = tracing_timeline_data.TracingTimelineData(f)
+      self.assertEqual(
+          tracing_timeline_data.TracingTimelineData(
+              '{"traceEvents": []}').GetContentHash(),
+          data.GetContentHash())
+      self.assertEqual(3, f.tell())
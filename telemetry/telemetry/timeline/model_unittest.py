@@ -14,3 +14,27 @@ class TimelineModelUnittest(unittest.TestCase):
         tracing_timeline_data.TracingTimelineData([]))
     model.TimelineModel(
         tracing_timeline_data.TracingTimelineData(''))
+
+  def testTrackedBoundsMatchAllEvents(self):
+    events = [
+        {'name': 'a', 'args': {}, 'pid': 1, 'ts': 1000, 'cat': 'foo',
+         'tid': 1, 'ph': 'B'},
+        {'name': 'a', 'args': {}, 'pid': 1, 'ts': 4000, 'cat': 'foo',
+         'tid': 1, 'ph': 'E'},
+        {'name': 'ctr', 'args': {'value': 1}, 'pid': 1, 'ts': 500,
+         'cat': 'foo', 'tid': 1, 'ph': 'C'},
+        {'name': 'async', 'args': {}, 'pid': 1, 'ts': 2000, 'cat': 'foo',
+         'tid': 2, 'ph': 'S', 'id': 7},
+        {'name': 'async', 'args': {}, 'pid': 1, 'ts': 6000, 'cat': 'foo',
+         'tid': 2, 'ph': 'F', 'id': 7},
+        {'name': 'flow', 'args': {}, 'pid': 1, 'ts': 3000, 'cat': 'foo',
+         'tid': 1, 'ph': 's', 'id': 9},
+        {'name': 'flow', 'args': {}, 'pid': 1, 'ts': 3500, 'cat': 'foo',
+         'tid': 2, 'ph': 'f', 'id': 9},
+        {'name': 'sample', 'args': {}, 'pid': 1, 'ts': 2500, 'cat': 'foo',
+         'tid': 2, 'ph': 'P'}]
+    m = model.TimelineModel(tracing_timeline_data.TracingTimelineData(events))
+    all_events = list(m.IterAllEvents())
+    self.assertEqual(0, min(e.start for e in all_events))
+    self.assertEqual(5.5, max(e.end for e in all_events))
+    self.assertEqual((0, 5.5), (m.bounds.min, m.bounds.max))
@@ -11,9 +11,10 @@ import telemetry.timeline.thread as tracing_thread
 class Process(event_container.TimelineEventContainer):
   ''' The Process represents a single userland process in the trace.
   '''
-  def __init__(self, parent, pid):
+  def __init__(self, parent, pid, columnar_slices=False):
     super(Process, self).__init__('process %s' % pid, parent)
     self.pid = pid
+    self._columnar_slices = columnar_slices
     self._threads = {}
     self._counters = {}
     self._trace_buffer_overflow_event = None
@@ -52,7 +53,8 @@ class Process(event_container.TimelineEventContainer):
     thread = self.threads.get(tid, None)
     if thread:
       return thread
-    thread = tracing_thread.Thread(self, tid)
+    thread = tracing_thread.Thread(self, tid,
+                                   columnar_slices=self._columnar_slices)
     self._threads[tid] = thread
     return thread
 
@@ -0,0 +1,303 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+'''Columnar storage for the slices of a Thread.
+
+A full Slice object costs several hundred bytes (an instance __dict__, an args
+dict and a sub_slices list), which dominates memory and GC time for traces
+with millions of events. A SliceStore keeps the same information in parallel
+typed arrays with interned names and categories, and hands out lightweight
+StoredSlice views that read and write through to the arrays on demand.
+'''
+
+import array
+
+import telemetry.timeline.event as event_module
+import telemetry.timeline.slice as slice_module
+
+# Thread timestamps are optional; missing ones are stored as NaN.
+_MISSING = float('nan')
+_NO_SLICE = -1
+
+
+def _FromStored(value):
+  if value != value:  # NaN
+    return None
+  return value
+
+
+def _ToStored(value):
+  if value is None:
+    return _MISSING
+  return value
+
+
+class StringTable(object):
+  '''Interns strings and maps them to small integer ids.'''
+  def __init__(self):
+    self._strings = []
+    self._ids = {}
+
+  def GetId(self, string):
+    string_id = self._ids.get(string)
+    if string_id is None:
+      string_id = len(self._strings)
+      self._strings.append(string)
+      self._ids[string] = string_id
+    return string_id
+
+  def GetString(self, string_id):
+    return self._strings[string_id]
+
+  def __len__(self):
+    return len(self._strings)
+
+
+class SliceStore(object):
+  '''Stores the slices of one thread as columns indexed by slice number.
+
+  Slice numbers are assigned in insertion order. The slice tree is kept as
+  parent/first child/last child/next sibling index columns, with -1 meaning
+  "no slice".
+  '''
+  def __init__(self, parent_thread):
+    self.parent_thread = parent_thread
+    self.strings = StringTable()
+    self.start = array.array('d')
+    self.duration = array.array('d')
+    self.thread_start = array.array('d')
+    self.thread_duration = array.array('d')
+    self.category_id = array.array('i')
+    self.name_id = array.array('i')
+    self.did_not_finish = array.array('b')
+    self.parent = array.array('i')
+    self.first_child = array.array('i')
+    self.last_child = array.array('i')
+    self.next_sibling = array.array('i')
+    # Most slices have no arguments, so empty args are stored as None and only
+    # turned into a dict if somebody asks for them.
+    self.args = []
+
+  def __len__(self):
+    return len(self.start)
+
+  def Append(self, category, name, start, duration=0, thread_start=None,
+             thread_duration=None, args=None, did_not_finish=False):
+    '''Adds a slice without a parent and returns its index.'''
+    index = len(self.start)
+    self.start.append(start)
+    self.duration.append(duration)
+    self.thread_start.append(_ToStored(thread_start))
+    self.thread_duration.append(_ToStored(thread_duration))
+    self.category_id.append(self.strings.GetId(category))
+    self.name_id.append(self.strings.GetId(name))
+    self.did_not_finish.append(did_not_finish)
+    self.parent.append(_NO_SLICE)
+    self.first_child.append(_NO_SLICE)
+    self.last_child.append(_NO_SLICE)
+    self.next_sibling.append(_NO_SLICE)
+    self.args.append(args or None)
+    return index
+
+  def AppendSlice(self, s):
+    '''Copies a free-standing Slice object into the store.'''
+    return self.Append(s.category, s.name, s.start, s.duration, s.thread_start,
+                       s.thread_duration, s.args, s.did_not_finish)
+
+  def GetSlice(self, index):
+    return StoredSlice(self, index)
+
+  def IterSlices(self, indices=None):
+    if indices is None:
+      indices = xrange(len(self.start))
+    for index in indices:
+      yield StoredSlice(self, index)
+
+  def GetEnd(self, index):
+    return self.start[index] + self.duration[index]
+
+  def AddChild(self, parent, child):
+    '''Appends |child| to the sub slices of |parent|.'''
+    self.parent[child] = parent
+    last = self.last_child[parent]
+    if last == _NO_SLICE:
+      self.first_child[parent] = child
+    else:
+      self.next_sibling[last] = child
+    self.last_child[parent] = child
+
+  def IterChildren(self, index):
+    child = self.first_child[index]
+    while child != _NO_SLICE:
+      yield child
+      child = self.next_sibling[child]
+
+  def AutoCloseOpenSlices(self, max_timestamp, max_thread_timestamp):
+    '''Ends every unfinished slice and returns whether there were any.'''
+    closed_any = False
+    for i in xrange(len(self.start)):
+      if not self.did_not_finish[i]:
+        continue
+      closed_any = True
+      self.duration[i] = max_timestamp - self.start[i]
+      assert self.duration[i] >= 0
+      if self.thread_start[i] == self.thread_start[i]:
+        self.thread_duration[i] = max_thread_timestamp - self.thread_start[i]
+        assert self.thread_duration[i] >= 0
+    return closed_any
+
+  def ShiftTimestamps(self, shift_amount):
+    '''Subtracts shift_amount from the start of every slice.'''
+    self.start = array.array('d', [s - shift_amount for s in self.start])
+
+  def BuildSubRows(self):
+    '''Nests the slices exactly like Thread._BuildSliceSubRows does for Slice
+    objects and returns the indices of the top level slices.'''
+    start = self.start
+    duration = self.duration
+    end_micros = [round((start[i] + duration[i]) * 1000)
+                  for i in xrange(len(start))]
+    # Sort by start time, breaking ties by having the slice with the greatest
+    # end timestamp come first.
+    sorted_indices = sorted(xrange(len(start)),
+                            key=lambda i: (start[i], -(start[i] + duration[i])))
+
+    def Fits(root, child):
+      return (start[child] >= start[root] and
+              end_micros[child] <= end_micros[root])
+
+    toplevel = []
+    root = _NO_SLICE
+    for child in sorted_indices:
+      if root == _NO_SLICE or not Fits(root, child):
+        root = child
+        toplevel.append(root)
+        continue
+      # Since |child| starts after everything seen so far, only the last
+      # slice of each row can contain it.
+      parent = root
+      last = self.last_child[parent]
+      while last != _NO_SLICE and Fits(last, child):
+        parent = last
+        last = self.last_child[parent]
+      self.AddChild(parent, child)
+    return toplevel
+
+
+class StoredSlice(slice_module.Slice):
+  '''A Slice whose state lives in a SliceStore.
+
+  Views are cheap and created on demand, so two views of the same slice are
+  equal but not necessarily identical.
+  '''
+
+  def __init__(self, store, index):  # pylint: disable=W0231
+    # Slice.__init__ is deliberately not called: every attribute it would set
+    # is a property backed by the store.
+    self._store = store
+    self._index = index
+
+  def __eq__(self, other):
+    return (isinstance(other, StoredSlice) and
+            self._store is other._store and  # pylint: disable=W0212
+            self._index == other._index)  # pylint: disable=W0212
+
+  def __ne__(self, other):
+    return not self == other
+
+  def __hash__(self):
+    return hash((id(self._store), self._index))
+
+  @property
+  def index(self):
+    return self._index
+
+  @property
+  def category(self):
+    return self._store.strings.GetString(self._store.category_id[self._index])
+
+  @property
+  def name(self):
+    return self._store.strings.GetString(self._store.name_id[self._index])
+
+  @property
+  def start(self):
+    return self._store.start[self._index]
+
+  @start.setter
+  def start(self, value):
+    self._store.start[self._index] = value
+
+  @property
+  def duration(self):
+    return self._store.duration[self._index]
+
+  @duration.setter
+  def duration(self, value):
+    self._store.duration[self._index] = value
+
+  @property
+  def thread_start(self):
+    return _FromStored(self._store.thread_start[self._index])
+
+  @thread_start.setter
+  def thread_start(self, value):
+    self._store.thread_start[self._index] = _ToStored(value)
+
+  @property
+  def thread_duration(self):
+    return _FromStored(self._store.thread_duration[self._index])
+
+  @thread_duration.setter
+  def thread_duration(self, value):
+    self._store.thread_duration[self._index] = _ToStored(value)
+
+  @property
+  def args(self):
+    args = self._store.args[self._index]
+    if args is None:
+      args = {}
+      self._store.args[self._index] = args
+    elif type(args) is event_module.LazyArgs:
+      args = args.Decode()
+      self._store.args[self._index] = args
+    return args
+
+  @args.setter
+  def args(self, value):
+    self._store.args[self._index] = value
+
+  @property
+  def did_not_finish(self):
+    return bool(self._store.did_not_finish[self._index])
+
+  @did_not_finish.setter
+  def did_not_finish(self, value):
+    self._store.did_not_finish[self._index] = value
+
+  @property
+  def parent_thread(self):
+    return self._store.parent_thread
+
+  @property
+  def parent_slice(self):
+    parent = self._store.parent[self._index]
+    if parent == _NO_SLICE:
+      return None
+    return StoredSlice(self._store, parent)
+
+  @parent_slice.setter
+  def parent_slice(self, value):
+    if value is None:
+      self._store.parent[self._index] = _NO_SLICE
+      return
+    assert value._store is self._store  # pylint: disable=W0212
+    self._store.parent[self._index] = value.index
+
+  @property
+  def sub_slices(self):
+    return list(self._store.IterSlices(self._store.IterChildren(self._index)))
+
+  def AddSubSlice(self, sub_slice):
+    assert sub_slice.parent_slice == self
+    self._store.AddChild(self._index, sub_slice.index)
@@ -0,0 +1,118 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import random
+import unittest
+
+from telemetry.timeline import model as model_module
+from telemetry.timeline import slice_store
+from telemetry.timeline import tracing_timeline_data
+
+
+def _RandomTraceEvents(seed, count):
+  rng = random.Random(seed)
+  events = []
+  ts = 0
+  for _ in xrange(count):
+    ts += rng.randint(0, 3)
+    tid = rng.randint(1, 3)
+    event = {'name': rng.choice('abcd'), 'cat': rng.choice(['x', 'y']),
+             'pid': 1, 'tid': tid, 'ts': ts, 'ph': 'X',
+             'args': rng.choice([{}, {'n': ts}])}
+    if rng.random() < 0.9:
+      event['dur'] = rng.randint(0, 20)
+    if rng.random() < 0.5:
+      event['tts'] = ts / 2
+      event['tdur'] = rng.randint(0, 5)
+    events.append(event)
+  return events
+
+
+def _DescribeTree(slices):
+  return [(s.name, s.category, s.start, s.duration, s.thread_start,
+           s.thread_duration, s.did_not_finish, dict(s.args or {}),
+           _DescribeTree(s.sub_slices)) for s in slices]
+
+
+class SliceStoreTest(unittest.TestCase):
+  def testStringTable(self):
+    table = slice_store.StringTable()
+    self.assertEqual(0, table.GetId('a'))
+    self.assertEqual(1, table.GetId('b'))
+    self.assertEqual(0, table.GetId('a'))
+    self.assertEqual('b', table.GetString(1))
+    self.assertEqual(2, len(table))
+
+  def testStoredSliceReadsAndWritesThrough(self):
+    store = slice_store.SliceStore(None)
+    index = store.Append('cat', 'name', 10, 5, thread_start=None)
+    s = store.GetSlice(index)
+    self.assertEqual('cat', s.category)
+    self.assertEqual('name', s.name)
+    self.assertEqual(15, s.end)
+    self.assertIsNone(s.thread_start)
+    self.assertIsNone(s.thread_end)
+    self.assertIsNone(s.parent_slice)
+    self.assertEqual({}, s.args)
+
+    s.start -= 10
+    s.thread_start = 2
+    s.thread_duration = 1
+    s.args['x'] = 1
+    other = store.GetSlice(index)
+    self.assertEqual(s, other)
+    self.assertEqual(0, other.start)
+    self.assertEqual(3, other.thread_end)
+    self.assertEqual({'x': 1}, other.args)
+
+  def testSubSlices(self):
+    store = slice_store.SliceStore(None)
+    parent = store.GetSlice(store.Append('c', 'parent', 0, 10))
+    child = store.GetSlice(store.Append('c', 'child', 1, 2))
+    child.parent_slice = parent
+    parent.AddSubSlice(child)
+    self.assertEqual([child], parent.sub_slices)
+    self.assertEqual(parent, child.parent_slice)
+    self.assertEqual(8, parent.self_time)
+    self.assertEqual([child], parent.GetAllSubSlices())
+
+  def testColumnarModelMatchesObjectModel(self):
+    for seed in xrange(5):
+      events = _RandomTraceEvents(seed, 300)
+      object_model = model_module.TimelineModel(
+          tracing_timeline_data.TracingTimelineData(events))
+      columnar_model = model_module.TimelineModel(
+          tracing_timeline_data.TracingTimelineData(events),
+          columnar_slices=True)
+      for tid in (1, 2, 3):
+        object_thread = object_model.GetAllProcesses()[0].threads[tid]
+        columnar_thread = columnar_model.GetAllProcesses()[0].threads[tid]
+        self.assertEqual(len(object_thread.all_slices),
+                         len(columnar_thread.slice_store))
+        self.assertEqual(_DescribeTree(object_thread.toplevel_slices),
+                         _DescribeTree(columnar_thread.toplevel_slices))
+        self.assertEqual(
+            [s.name for s in object_thread.IterAllSlices()],
+            [s.name for s in columnar_thread.IterAllSlices()])
+      self.assertEqual(object_model.bounds.min, columnar_model.bounds.min)
+      self.assertEqual(object_model.bounds.max, columnar_model.bounds.max)
+
+  def testBeginEndSlices(self):
+    model = model_module.TimelineModel(columnar_slices=True)
+    thread = model.GetOrCreateProcess(1).GetOrCreateThread(2)
+    thread.BeginSlice('cat', 'outer', 10, 5)
+    thread.BeginSlice('cat', 'inner', 12, 6, args={'a': 1})
+    inner = thread.EndSlice(14, 7)
+    self.assertEqual('inner', inner.name)
+    self.assertEqual(1, inner.thread_duration)
+    thread.BeginSlice('cat', 'unfinished', 20)
+    model.FinalizeImport(shift_world_to_zero=False)
+
+    self.assertEqual(['outer'], [s.name for s in thread.toplevel_slices])
+    outer = thread.toplevel_slices[0]
+    self.assertEqual(['inner', 'unfinished'],
+                     [s.name for s in outer.sub_slices])
+    self.assertTrue(outer.did_not_finish)
+    self.assertEqual(10, outer.duration)
+    self.assertEqual({'a': 1}, outer.sub_slices[0].args)
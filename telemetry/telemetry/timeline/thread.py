@@ -1,20 +1,35 @@
 # Copyright 2014 The Chromium Authors. All rights reserved.
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
+import itertools
+import operator
+
 import telemetry.timeline.async_slice as async_slice_module
+import telemetry.timeline.bounds as timeline_bounds
 import telemetry.timeline.event_container as event_container
+import telemetry.timeline.event_index as event_index_module
 import telemetry.timeline.flow_event as flow_event_module
+import telemetry.timeline.interval_index as interval_index_module
 import telemetry.timeline.sample as sample_module
 import telemetry.timeline.slice as slice_module
+import telemetry.timeline.slice_store as slice_store_module
 
+# The event types a Thread reports to event_type_predicate, in the order its
+# events are iterated.
+_EVENT_TYPES = (slice_module.Slice, async_slice_module.AsyncSlice,
+                flow_event_module.FlowEvent, sample_module.Sample)
 
 class Thread(event_container.TimelineEventContainer):
   ''' A Thread stores all the trace events collected for a particular
   thread. We organize the synchronous slices on a thread by "subrows," where
   subrow 0 has all the root slices, subrow 1 those nested 1 deep, and so on.
   The asynchronous slices are stored in an AsyncSliceGroup object.
+
+  If columnar_slices is True, the synchronous slices are kept in a SliceStore
+  rather than as individual Slice objects, and the slices handed out by this
+  thread are StoredSlice views created on demand.
   '''
-  def __init__(self, process, tid):
+  def __init__(self, process, tid, columnar_slices=False):
     super(Thread, self).__init__('thread %s' % tid, parent=process)
     self.tid = tid
     self._async_slices = []
@@ -22,19 +37,55 @@ class Thread(event_container.TimelineEventContainer):
     self._samples = []
     self._toplevel_slices = []
     self._all_slices = []
+    if columnar_slices:
+      self._slice_store = slice_store_module.SliceStore(self)
+    else:
+      self._slice_store = None
+
+    # Kept up to date as events are added, so that the model does not need to
+    # visit every event to find its bounds.
+    self._bounds = timeline_bounds.Bounds()
+    self._thread_time_bounds = timeline_bounds.Bounds()
+
+    # Built on the first range query, and dropped whenever slices change.
+    self._slice_interval_index = None
+    self._indexed_slices = None
+    # Built on the first lookup by name or category, and dropped whenever
+    # events are added.
+    self._event_index = None
 
     # State only valid during import.
     self._open_slices = []
     self._newly_added_slices = []
+    self._import_finalized = False
 
   @property
   def toplevel_slices(self):
+    if self._slice_store is not None:
+      return list(self._slice_store.IterSlices(self._toplevel_slices))
     return self._toplevel_slices
 
   @property
   def all_slices(self):
+    if self._slice_store is not None:
+      return list(self._slice_store.IterSlices())
     return self._all_slices
 
+  @property
+  def slice_store(self):
+    """The SliceStore backing this thread, or None if slices are objects."""
+    return self._slice_store
+
+  @property
+  def bounds(self):
+    """The wall clock Bounds of all the events on this thread."""
+    return self._bounds
+
+  @property
+  def thread_time_bounds(self):
+    """The thread clock Bounds of all the events on this thread."""
+    return self._thread_time_bounds
+
   @property
   def samples(self):
     return self._samples
@@ -53,6 +104,10 @@ class Thread(event_container.TimelineEventContainer):
 
   def IterEventsInThisContainer(self, event_type_predicate, event_predicate):
     if event_type_predicate(slice_module.Slice):
+      if self._slice_store is not None:
+        for s in self._slice_store.IterSlices():
+          if event_predicate(s):
+            yield s
       for s in self._newly_added_slices:
         if event_predicate(s):
           yield s
@@ -78,6 +133,121 @@ class Thread(event_container.TimelineEventContainer):
         if event_predicate(sample):
           yield sample
 
+  def GetBoundsOfEventsInThisContainer(self):
+    return self._bounds
+
+  def ShiftTimestampsInThisContainer(self, shift_amount):
+    if self._slice_store is not None:
+      self._slice_store.ShiftTimestamps(shift_amount)
+    for s in self._newly_added_slices:
+      s.start -= shift_amount
+    for s in self._all_slices:
+      s.start -= shift_amount
+    for async_slice in self._async_slices:
+      async_slice.start -= shift_amount
+      for sub_slice in async_slice.IterEventsInThisContainerRecrusively():
+        sub_slice.start -= shift_amount
+    for flow_event in self._flow_events:
+      flow_event.start -= shift_amount
+    for sample in self._samples:
+      sample.start -= shift_amount
+    if not self._bounds.is_empty:
+      shifted_bounds = timeline_bounds.Bounds()
+      shifted_bounds.AddValue(self._bounds.min - shift_amount)
+      shifted_bounds.AddValue(self._bounds.max - shift_amount)
+      self._bounds = shifted_bounds
+    self.InvalidateSliceIndex()
+
+  def IterSlicesInRangeInThisContainer(self, start, end, overlapping):
+    index = self._GetSliceIntervalIndex()
+    if overlapping:
+      positions = index.IterOverlapping(start, end)
+    else:
+      positions = index.IterContained(start, end)
+    if self._slice_store is not None:
+      for position in positions:
+        yield self._slice_store.GetSlice(position)
+    else:
+      for position in positions:
+        yield self._indexed_slices[position]
+
+  def IterEventsOfNameInThisContainer(self, name, event_type_predicate,
+                                      event_predicate):
+    return self._IterIndexedEvents(
+        self._GetEventIndex().IterHandlesOfName(name, event_type_predicate),
+        event_predicate)
+
+  def IterEventsOfCategoryInThisContainer(self, category, event_type_predicate,
+                                          event_predicate):
+    return self._IterIndexedEvents(
+        self._GetEventIndex().IterHandlesOfCategory(category,
+                                                    event_type_predicate),
+        event_predicate)
+
+  def _IterIndexedEvents(self, handles, event_predicate):
+    for event_type, handle in handles:
+      if event_type is slice_module.Slice and self._slice_store is not None:
+        event = self._slice_store.GetSlice(handle)
+      else:
+        event = handle
+      if event_predicate(event):
+        yield event
+
+  def _GetEventIndex(self):
+    if self._event_index is not None:
+      return self._event_index
+    index = event_index_module.EventIndex(_EVENT_TYPES)
+    for event_type in _EVENT_TYPES:
+      if event_type is slice_module.Slice and self._slice_store is not None:
+        # Index slice numbers rather than creating a view for every slice.
+        store = self._slice_store
+        get_string = store.strings.GetString
+        for i in xrange(len(store)):
+          index.Add(event_type, i, get_string(store.name_id[i]),
+                    get_string(store.category_id[i]))
+        continue
+      for event in self.IterEventsInThisContainer(
+          lambda t, event_type=event_type: t is event_type,
+          lambda e: True):
+        index.Add(event_type, event, event.name, event.category)
+    self._event_index = index
+    return index
+
+  def _GetSliceIntervalIndex(self):
+    if self._slice_interval_index is None:
+      if self._slice_store is not None:
+        store = self._slice_store
+        starts = store.start
+        ends = [store.GetEnd(i) for i in xrange(len(store))]
+      else:
+        self._indexed_slices = self._newly_added_slices + self._all_slices
+        starts = [s.start for s in self._indexed_slices]
+        ends = [s.end for s in self._indexed_slices]
+      self._slice_interval_index = interval_index_module.IntervalIndex(
+          starts, ends)
+    return self._slice_interval_index
+
+  def InvalidateSliceIndex(self):
+    """Must be called when the timestamps of existing slices are modified."""
+    self._slice_interval_index = None
+    self._indexed_slices = None
+
+  def _OnEventsAdded(self):
+    self.InvalidateSliceIndex()
+    self._event_index = None
+
+  def _AddToBounds(self, start, end, thread_start=None, thread_end=None):
+    self._bounds.AddValue(start)
+    self._bounds.AddValue(end)
+    if thread_start is not None:
+      self._thread_time_bounds.AddValue(thread_start)
+    if thread_end is not None:
+      self._thread_time_bounds.AddValue(thread_end)
+
+  def _AddEventToBounds(self, event):
+    self._AddToBounds(event.start, event.end, event.thread_start,
+                      event.thread_end)
+
   def AddSample(self, category, name, timestamp, args=None):
     if len(self._samples) and timestamp < self._samples[-1].start:
       raise ValueError(
@@ -85,12 +255,20 @@ class Thread(event_container.TimelineEventContainer):
     sample = sample_module.Sample(self,
         category, name, timestamp, args=args)
     self._samples.append(sample)
+    self._AddToBounds(timestamp, timestamp)
+    self._OnEventsAdded()
 
   def AddAsyncSlice(self, async_slice):
     self._async_slices.append(async_slice)
+    self._AddEventToBounds(async_slice)
+    for sub_slice in async_slice.IterEventsInThisContainerRecrusively():
+      self._AddEventToBounds(sub_slice)
+    self._OnEventsAdded()
 
   def AddFlowEvent(self, flow_event):
     self._flow_events.append(flow_event)
+    self._AddEventToBounds(flow_event)
+    self._OnEventsAdded()
 
   def BeginSlice(self, category, name, timestamp, thread_timestamp=None,
                  args=None):
@@ -110,6 +288,14 @@ class Thread(event_container.TimelineEventContainer):
     if len(self._open_slices) > 0 and timestamp < self._open_slices[-1].start:
       raise ValueError(
           'Slices must be added in increasing timestamp order')
+    self._OnEventsAdded()
+    if self._slice_store is not None:
+      self._AddToBounds(timestamp, timestamp, thread_timestamp)
+      new_slice = self._slice_store.GetSlice(self._slice_store.Append(
+          category, name, timestamp, thread_start=thread_timestamp, args=args,
+          did_not_finish=True))
+      self._open_slices.append(new_slice)
+      return new_slice
     new_slice = slice_module.Slice(self, category, name, timestamp,
                                     thread_timestamp=thread_timestamp,
                                     args=args)
@@ -132,6 +318,7 @@ class Thread(event_container.TimelineEventContainer):
       raise ValueError(
           'EndSlice called without an open slice')
     curr_slice = self._open_slices.pop()
+    self.InvalidateSliceIndex()
     if end_timestamp < curr_slice.start:
       raise ValueError(
           'Slice %s end time is before its start.' % curr_slice.name)
@@ -144,10 +331,30 @@ class Thread(event_container.TimelineEventContainer):
       curr_slice.thread_duration = (end_thread_timestamp -
                                     curr_slice.thread_start)
     curr_slice.did_not_finish = False
+    self._AddToBounds(curr_slice.start, end_timestamp, None,
+                      end_thread_timestamp)
     return curr_slice
 
   def PushCompleteSlice(self, category, name, timestamp, duration,
                         thread_timestamp, thread_duration, args=None):
+    self._OnEventsAdded()
+    if self._slice_store is not None:
+      if duration == None:
+        self._AddToBounds(timestamp, timestamp, thread_timestamp)
+        index = self._slice_store.Append(
+            category, name, timestamp, thread_start=thread_timestamp,
+            args=args, did_not_finish=True)
+      else:
+        index = self._slice_store.Append(
+            category, name, timestamp, duration, thread_timestamp,
+            thread_duration, args)
+        if thread_timestamp is None or thread_duration is None:
+          thread_end = None
+        else:
+          thread_end = thread_timestamp + thread_duration
+        self._AddToBounds(timestamp, timestamp + duration, thread_timestamp,
+                          thread_end)
+      return self._slice_store.GetSlice(index)
     new_slice = slice_module.Slice(self, category, name, timestamp,
                                    thread_timestamp=thread_timestamp,
                                    args=args)
@@ -160,17 +367,30 @@ class Thread(event_container.TimelineEventContainer):
     return new_slice
 
   def PushSlice(self, new_slice):
+    self._OnEventsAdded()
+    self._AddEventToBounds(new_slice)
+    if self._slice_store is not None:
+      return self._slice_store.GetSlice(
+          self._slice_store.AppendSlice(new_slice))
     self._newly_added_slices.append(new_slice)
     return new_slice
 
   def AutoCloseOpenSlices(self, max_timestamp, max_thread_timestamp):
+    self.InvalidateSliceIndex()
+    closed_any = False
+    if self._slice_store is not None:
+      closed_any = self._slice_store.AutoCloseOpenSlices(max_timestamp,
+                                                         max_thread_timestamp)
     for s in self._newly_added_slices:
       if s.did_not_finish:
+        closed_any = True
         s.duration = max_timestamp - s.start
         assert s.duration >= 0
         if s.thread_start != None:
           s.thread_duration = max_thread_timestamp - s.thread_start
           assert s.thread_duration >= 0
+    if closed_any:
+      self._AddToBounds(max_timestamp, max_timestamp, max_thread_timestamp)
     self._open_slices = []
 
   def IsTimestampValidForBeginOrEnd(self, timestamp):
@@ -179,7 +399,59 @@ class Thread(event_container.TimelineEventContainer):
     return timestamp >= self._open_slices[-1].start
 
   def FinalizeImport(self):
+    # Threads imported in a worker process are finalized there, before they
+    # are merged into the model.
+    if self._import_finalized:
+      return
+    self._OnEventsAdded()
     self._BuildSliceSubRows()
+    self._import_finalized = True
+
+  def SetFinalizedSlices(self, store, toplevel_indices):
+    '''Makes the slices of store, already nested, the slices of this thread.
+
+    toplevel_indices lists the top level slices of store in order. This is how
+    threads saved by model_cache are loaded; the thread needs no finalization
+    afterwards. Without columnar slices, Slice objects are created from store.
+    '''
+    assert not self._newly_added_slices and not self._all_slices
+    assert self._slice_store is None or not len(self._slice_store)
+    self._OnEventsAdded()
+    if self._slice_store is not None:
+      store.parent_thread = self
+      self._slice_store = store
+      self._toplevel_slices = list(toplevel_indices)
+    else:
+      for i in xrange(len(store)):
+        view = store.GetSlice(i)
+        new_slice = slice_module.Slice(
+            self, view.category, view.name, view.start, view.duration,
+            view.thread_start, view.thread_duration, store.args[i])
+        new_slice.did_not_finish = view.did_not_finish
+        self._all_slices.append(new_slice)
+      for i, new_slice in enumerate(self._all_slices):
+        if store.parent[i] != -1:
+          new_slice.parent_slice = self._all_slices[store.parent[i]]
+        new_slice.sub_slices = [self._all_slices[child]
+                                for child in store.IterChildren(i)]
+      self._toplevel_slices = [self._all_slices[i] for i in toplevel_indices]
+
+    if len(store):
+      ends = map(operator.add, store.start, store.duration)
+      self._AddToBounds(min(store.start), max(ends))
+      # Missing thread timestamps are stored as NaN, which is not equal to
+      # itself.
+      thread_starts = [t for t in store.thread_start if t == t]
+      if thread_starts:
+        self._thread_time_bounds.AddValue(min(thread_starts))
+        self._thread_time_bounds.AddValue(max(thread_starts))
+      thread_ends = [t + d for t, d in
+                     itertools.izip(store.thread_start, store.thread_duration)
+                     if t == t and d == d]
+      if thread_ends:
+        self._thread_time_bounds.AddValue(min(thread_ends))
+        self._thread_time_bounds.AddValue(max(thread_ends))
+    self._import_finalized = True
 
   def _BuildSliceSubRows(self):
     '''This function works by walking through slices by start time.
@@ -221,6 +493,9 @@ class Thread(event_container.TimelineEventContainer):
 
     assert len(self._toplevel_slices) == 0
     assert len(self._all_slices) == 0
+    if self._slice_store is not None:
+      self._toplevel_slices = self._slice_store.BuildSubRows()
+      return
     if not len(self._newly_added_slices):
       return
 
@@ -30,3 +30,100 @@ class ThreadUnittest(unittest.TestCase):
     slice_names = set(s.name for s in
                       renderer_main.IterAllSlicesInRange(start=12, end=65))
     self.assertEqual(slice_names, {'Z', 'Y', 'T'})
+
+  def testIterAllSlicesOverlappingRange(self):
+    for columnar_slices in (False, True):
+      model = model_module.TimelineModel(columnar_slices=columnar_slices)
+      renderer_main = model.GetOrCreateProcess(1).GetOrCreateThread(2)
+      #    [       X     ] [   Y    ] [   U   ]
+      #        [   Z   ]     [ T ]
+      #      |                 |
+      #    start              end
+      renderer_main.BeginSlice('cat1', 'X', 10)
+      renderer_main.BeginSlice('cat1', 'Z', 20)
+      renderer_main.EndSlice(30)
+      renderer_main.EndSlice(40)
+      renderer_main.BeginSlice('cat1', 'Y', 50)
+      renderer_main.BeginSlice('cat1', 'T', 52)
+      renderer_main.EndSlice(55)
+      renderer_main.EndSlice(60)
+      renderer_main.BeginSlice('cat1', 'U', 60)
+      renderer_main.EndSlice(70)
+
+      model.FinalizeImport(shift_world_to_zero=False)
+      slice_names = [s.name for s in
+                     renderer_main.IterAllSlicesOverlappingRange(
+                         start=25, end=52)]
+      self.assertEqual(['X', 'Z', 'Y'], slice_names)
+      slice_names = [s.name for s in
+                     model.IterAllSlicesOverlappingRange(start=60, end=61)]
+      self.assertEqual(['U'], slice_names)
+
+  def testSliceIndexFollowsWorldShift(self):
+    model = model_module.TimelineModel()
+    renderer_main = model.GetOrCreateProcess(1).GetOrCreateThread(2)
+    renderer_main.BeginSlice('cat1', 'X', 10)
+    renderer_main.EndSlice(20)
+    renderer_main.BeginSlice('cat1', 'Y', 30)
+    renderer_main.EndSlice(40)
+    self.assertEqual(['X'], [s.name for s in
+                             renderer_main.IterAllSlicesInRange(10, 20)])
+
+    model.FinalizeImport(shift_world_to_zero=True)
+    self.assertEqual(['X'], [s.name for s in
+                             renderer_main.IterAllSlicesInRange(0, 10)])
+    self.assertEqual(['Y'], [s.name for s in
+                             renderer_main.IterAllSlicesInRange(10, 30)])
+
+  def testLookupByNameAndCategory(self):
+    for columnar_slices in (False, True):
+      model = model_module.TimelineModel(columnar_slices=columnar_slices)
+      thread = model.GetOrCreateProcess(1).GetOrCreateThread(2)
+      thread.BeginSlice('cat1', 'X', 10)
+      thread.BeginSlice('cat2', 'Y', 20)
+      thread.EndSlice(30)
+      thread.EndSlice(40)
+      thread.BeginSlice('cat2', 'X', 50)
+      thread.EndSlice(60)
+      thread.AddSample('cat2', 'X', 70)
+      # Look up once before finalizing to make sure the lazily built index is
+      # refreshed when events are added afterwards.
+      self.assertEqual(2, len(list(thread.IterAllSlicesOfName('X'))))
+      model.FinalizeImport(shift_world_to_zero=False)
+      thread.AddSample('cat3', 'Z', 80)
+
+      self.assertEqual([10, 50, 70],
+                       [e.start for e in model.IterAllEventsOfName('X')])
+      self.assertEqual([10, 50],
+                       [e.start for e in model.IterAllSlicesOfName('X')])
+      self.assertEqual([20], [e.start for e in
+                              model.IterAllSlicesOfName('Y')])
+      self.assertEqual([], list(model.IterAllToplevelSlicesOfName('Y')))
+      self.assertEqual([20, 50, 70], [e.start for e in
+                                      model.IterAllEventsOfCategory('cat2')])
+      self.assertEqual(['Z'], [e.name for e in
+                               thread.IterAllEventsOfCategory('cat3')])
+      self.assertEqual([], list(model.IterAllEventsOfName('missing')))
+
+  def testBoundsAreTrackedAsEventsArrive(self):
+    for columnar_slices in (False, True):
+      model = model_module.TimelineModel(columnar_slices=columnar_slices)
+      thread = model.GetOrCreateProcess(1).GetOrCreateThread(2)
+      thread.BeginSlice('cat1', 'X', 10, thread_timestamp=5)
+      thread.EndSlice(20, end_thread_timestamp=8)
+      thread.PushCompleteSlice('cat1', 'Y', 25, 10, 9, 2)
+      thread.AddSample('cat1', 'S', 40)
+      thread.BeginSlice('cat1', 'Open', 30, thread_timestamp=10)
+      self.assertEqual((10, 40), (thread.bounds.min, thread.bounds.max))
+      self.assertEqual((5, 11), (thread.thread_time_bounds.min,
+                                 thread.thread_time_bounds.max))
+
+      model.FinalizeImport(shift_world_to_zero=True)
+      self.assertEqual((0, 30), (model.bounds.min, model.bounds.max))
+      self.assertEqual((0, 30), (thread.bounds.min, thread.bounds.max))
+      self.assertEqual([0, 15, 20, 30],
+                       sorted(e.start for e in thread.IterAllEvents()))
+      # The open slice is closed at the end of the trace.
+      open_slice = list(thread.IterAllSlicesOfName('Open'))[0]
+      self.assertEqual(30, open_slice.end)
+      self.assertEqual(11, open_slice.thread_end)
@@ -7,20 +7,86 @@ This is a port of the trace event importer from
 https://code.google.com/p/trace-viewer/
 '''
 
-import copy
+import collections
 import json
+import multiprocessing
 import re
 
 import telemetry.timeline.async_slice as tracing_async_slice
+import telemetry.timeline.event as event_module
 import telemetry.timeline.flow_event as tracing_flow_event
+from telemetry.timeline import import_filter as import_filter_module
 from telemetry.timeline import importer
+from telemetry.timeline import trace_event_stream
 from telemetry.timeline import tracing_timeline_data
 
 
+# Phases of events that only affect the process they were recorded in. Events
+# of the other phases are linked up across processes in FinalizeImport.
+_PER_PROCESS_PHASES = frozenset(['B', 'E', 'X', 'I', 'i', 'P', 'C', 'M'])
+
+
 class TraceBufferOverflowException(Exception):
   pass
 
 
+def _GetLatestTimestamp(event):
+  '''Returns the latest timestamp that importing a per-process event adds to
+  the bounds of the model, or None if it adds none.'''
+  phase = event['ph']
+  if phase == 'M':
+    if event['name'] == 'trace_buffer_overflowed':
+      return event['args']['overflowed_at_ts']
+    return None
+  timestamp = event['ts'] / 1000.0
+  if phase == 'X' and 'dur' in event:
+    return max(timestamp, timestamp + event['dur'] / 1000.0)
+  return timestamp
+
+
+# The events of every process, in the worker processes of
+# TraceEventTimelineImporter.ImportEventsInParallel. Handing them over when the
+# pool starts lets forked workers share them instead of unpickling copies.
+_worker_events_by_pid = None
+
+
+def _InitializeWorker(events_by_pid):
+  global _worker_events_by_pid  # pylint: disable=W0603
+  _worker_events_by_pid = events_by_pid
+
+
+def _ImportProcessInWorker(args):
+  '''Imports the events of one process into a scratch model, closes its open
+  slices at max_timestamp and nests its slices.
+
+  Runs in a worker process of TraceEventTimelineImporter.ImportEventsInParallel.
+  Returns the pid, the detached Process (or None if none was created), the
+  import errors and the latest timestamp seen before slices were closed.
+  '''
+  pid, max_timestamp, columnar_slices, lazy_args = args
+  events = _worker_events_by_pid[pid]
+  # The model module imports this one, so it cannot be imported at the top.
+  from telemetry.timeline import model as model_module
+  scratch_model = model_module.TimelineModel(columnar_slices=columnar_slices,
+                                             lazy_args=lazy_args)
+  TraceEventTimelineImporter(
+      scratch_model,
+      tracing_timeline_data.TracingTimelineData(events)).ImportEvents()
+  scratch_model.UpdateBounds()
+  latest_timestamp = scratch_model.bounds.max
+
+  process = scratch_model.processes.get(pid)
+  if process:
+    if max_timestamp is not None:
+      process.AutoCloseOpenSlices(
+          max_timestamp,
+          dict((thread, thread.thread_time_bounds)
+               for thread in process.threads.itervalues()))
+    process.FinalizeImport()
+    process.parent = None
+  return pid, process, scratch_model.import_errors, latest_timestamp
+
+
 class TraceEventTimelineImporter(importer.TimelineImporter):
   def __init__(self, model, timeline_data):
     super(TraceEventTimelineImporter, self).__init__(
@@ -29,9 +95,32 @@ class TraceEventTimelineImporter(importer.TimelineImporter):
     event_data = timeline_data.EventData()
 
     self._events_were_from_string = False
-    self._all_async_events = []
+    self._events_are_streamed = False
+    # Async and flow events are linked up in FinalizeImport, within groups of
+    # events that can belong together. Each event is kept as a
+    # (timestamp, sequence number, event, thread) tuple, so sorting a group
+    # orders it by time and then by import order.
+    self._num_linked_events = 0
+    self._async_events_by_name_and_id = collections.defaultdict(list)
+    self._flow_events_by_id = collections.defaultdict(list)
+    # Events that cannot be grouped, as (timestamp, sequence number, error).
+    self._async_event_errors = []
+    self._flow_event_errors = []
+    self._import_filter = model.import_filter
+    # With an import filter, what became of the B events that are still open
+    # on each (pid, tid): True if they were imported, False if they were
+    # dropped, or the event itself if it is held back. See _FilterEvent.
+    self._begin_event_stacks = collections.defaultdict(list)
     self._all_object_events = []
-    self._all_flow_events = []
+
+    if tracing_timeline_data.IsTraceFile(event_data):
+      # Stream events out of the file one at a time as ImportEvents consumes
+      # them instead of materializing the whole event list up front. Every
+      # event is a freshly decoded object, so no copies are needed.
+      self._events = trace_event_stream.TraceEventStreamReader(event_data)
+      self._events_were_from_string = True
+      self._events_are_streamed = True
+      return
 
     if type(event_data) is str:
       # If the event data begins with a [, then we know it should end with a ].
@@ -79,6 +168,9 @@ class TraceEventTimelineImporter(importer.TimelineImporter):
     #   - event_data that starts with [ are probably trace_event
     #   - event_data that starts with { are probably trace_event
     # May be encoded JSON. Treat files that start with { as importable by us.
+    if tracing_timeline_data.IsTraceFile(event_data):
+      return True
+
     if isinstance(event_data, str):
       return len(event_data) > 0 and (event_data[0] == '{'
           or event_data[0] == '[')
@@ -99,20 +191,27 @@ class TraceEventTimelineImporter(importer.TimelineImporter):
   def _GetOrCreateProcess(self, pid):
     return self._model.GetOrCreateProcess(pid)
 
-  def _DeepCopyIfNeeded(self, obj):
-    if self._events_were_from_string:
-      return obj
-    return copy.deepcopy(obj)
-
   def _ProcessAsyncEvent(self, event):
     '''Helper to process an 'async finish' event, which will close an
     open slice.
     '''
     thread = (self._GetOrCreateProcess(event['pid'])
         .GetOrCreateThread(event['tid']))
-    self._all_async_events.append({
-        'event': event,
-        'thread': thread})
+    self._num_linked_events += 1
+    sequence_number = self._num_linked_events
+    name = event.get('name', None)
+    event_id = event.get('id')
+    if name is None:
+      self._async_event_errors.append((
+          event['ts'], sequence_number,
+          'Async events (ph: S, T or F) require an name parameter.'))
+    elif event_id is None:
+      self._async_event_errors.append((
+          event['ts'], sequence_number,
+          'Async events (ph: S, T or F) require an id parameter.'))
+    else:
+      self._async_events_by_name_and_id[(name, event_id)].append(
+          (event['ts'], sequence_number, event, thread))
 
   def _ProcessCounterEvent(self, event):
     '''Helper that creates and adds samples to a Counter object based on
@@ -181,13 +280,17 @@ class TraceEventTimelineImporter(importer.TimelineImporter):
       new_slice = thread.EndSlice(
           event['ts'] / 1000.0,
           event['tts'] / 1000.0 if 'tts' in event else None)
-      for arg_name, arg_value in event.get('args', {}).iteritems():
-        if arg_name in new_slice.args:
-          self._model.import_errors.append(
-              'Both the B and E phases of ' + new_slice.name +
-              ' provided values for argument ' + arg_name + '. ' +
-              'The value of the E phase event will be used.')
-        new_slice.args[arg_name] = arg_value
+      if event.get('args'):
+        self._MergeEndArgs(new_slice.name, new_slice.args, event['args'])
+
+  def _MergeEndArgs(self, name, args, end_args):
+    for arg_name, arg_value in end_args.iteritems():
+      if arg_name in args:
+        self._model.import_errors.append(
+            'Both the B and E phases of ' + name +
+            ' provided values for argument ' + arg_name + '. ' +
+            'The value of the E phase event will be used.')
+      args[arg_name] = arg_value
 
   def _ProcessCompleteEvent(self, event):
     thread = (self._GetOrCreateProcess(event['pid'])
@@ -238,49 +341,261 @@ class TraceEventTimelineImporter(importer.TimelineImporter):
   def _ProcessFlowEvent(self, event):
     thread = (self._GetOrCreateProcess(event['pid'])
         .GetOrCreateThread(event['tid']))
-    self._all_flow_events.append({
-        'event': event,
-        'thread': thread})
+    self._num_linked_events += 1
+    sequence_number = self._num_linked_events
+    if 'name' not in event:
+      self._flow_event_errors.append((
+          event['ts'], sequence_number,
+          'Flow events (ph: s, t or f) require a name parameter.'))
+    elif 'id' not in event:
+      self._flow_event_errors.append((
+          event['ts'], sequence_number,
+          'Flow events (ph: s, t or f) require an id parameter.'))
+    else:
+      self._flow_events_by_id[event['id']].append(
+          (event['ts'], sequence_number, event, thread))
+
+  def _IsEventImported(self, event, phase):
+    import_filter = self._import_filter
+    # Counters belong to processes rather than threads.
+    tid = None if phase == 'C' else event.get('tid')
+    return (import_filter.IsThreadImported(event['pid'], tid) and
+            import_filter.IsCategoryImported(event.get('cat')) and
+            import_filter.IsNameImported(event.get('name', '')))
+
+  def _FilterEvent(self, event, phase):
+    '''Returns the event to import in place of |event|, or None if the import
+    filter drops it.
+
+    E events are imported if their B event was. B events from before the time
+    range of the filter are held back until their E event shows whether the
+    slice reaches into the range, and are then imported as an X event.
+    Async and flow events are filtered by time once they are linked up.
+    '''
+    import_filter = self._import_filter
+    if phase == 'M':
+      tid = event.get('tid') if event['name'] == 'thread_name' else None
+      if (event['name'] == 'trace_buffer_overflowed' or
+          import_filter.IsThreadImported(event['pid'], tid)):
+        return event
+      return None
+
+    if phase == 'E':
+      stack = self._begin_event_stacks.get((event['pid'], event['tid']))
+      if not stack:
+        # Reported as an E event without a B event.
+        return event
+      begin_event = stack.pop()
+      if begin_event is True or begin_event is False:
+        return event if begin_event else None
+      return self._CreateHeldBackCompleteEvent(begin_event, event)
+
+    if (phase in ('S', 'T', 'F') and
+        event.get('cat') in import_filter_module.MARKER_CATEGORIES):
+      return event
+    imported = self._IsEventImported(event, phase)
+    timestamp = event['ts'] / 1000.0
+    if phase == 'B':
+      stack = self._begin_event_stacks[(event['pid'], event['tid'])]
+      if imported and import_filter.IsBeforeTimeRange(timestamp):
+        stack.append(event)
+        return None
+      imported = imported and import_filter.IsTimeRangeImported(timestamp,
+                                                                None)
+      stack.append(imported)
+    elif not imported:
+      return None
+    elif phase == 'X':
+      end = None
+      if 'dur' in event:
+        end = timestamp + event['dur'] / 1000.0
+      imported = import_filter.IsTimeRangeImported(timestamp, end)
+    elif phase in ('I', 'i', 'P', 'C'):
+      imported = import_filter.IsTimeRangeImported(timestamp, timestamp)
+    return event if imported else None
+
+  def _CreateHeldBackCompleteEvent(self, begin_event, end_event):
+    '''Returns an X event for a held back B event and its E event, or None if
+    they end before the time range of the import filter. An end_event of None
+    means the slice never ended.'''
+    complete_event = {
+        'ph': 'X',
+        'pid': begin_event['pid'],
+        'tid': begin_event['tid'],
+        'cat': begin_event['cat'],
+        'name': begin_event['name'],
+        'ts': begin_event['ts'],
+        'args': dict(begin_event.get('args') or {}),
+    }
+    if 'tts' in begin_event:
+      complete_event['tts'] = begin_event['tts']
+    if end_event is None:
+      return complete_event
+
+    if not self._import_filter.IsTimeRangeImported(begin_event['ts'] / 1000.0,
+                                                   end_event['ts'] / 1000.0):
+      return None
+    complete_event['dur'] = end_event['ts'] - begin_event['ts']
+    if 'tts' in begin_event and 'tts' in end_event:
+      complete_event['tdur'] = end_event['tts'] - begin_event['tts']
+    if end_event.get('args'):
+      self._MergeEndArgs(begin_event['name'], complete_event['args'],
+                         end_event['args'])
+    return complete_event
+
+  def _PopHeldBackBeginEvents(self):
+    '''Returns the B events held back by the import filter that never ended,
+    as unfinished X events.'''
+    complete_events = []
+    for key in sorted(self._begin_event_stacks):
+      for begin_event in self._begin_event_stacks[key]:
+        if begin_event is not True and begin_event is not False:
+          complete_events.append(
+              self._CreateHeldBackCompleteEvent(begin_event, None))
+    self._begin_event_stacks.clear()
+    return complete_events
+
+  def _ImportHeldBackBeginEvents(self):
+    for complete_event in self._PopHeldBackBeginEvents():
+      self._ProcessCompleteEvent(complete_event)
+
+  def _ProcessEvent(self, event):
+    phase = event.get('ph', None)
+    if self._import_filter is not None:
+      event = self._FilterEvent(event, phase)
+      if event is None:
+        return
+      phase = event['ph']
+    self._ProcessFilteredEvent(event, phase)
+
+  def _ProcessFilteredEvent(self, event, phase):
+    if phase == 'B' or phase == 'E':
+      self._ProcessDurationEvent(event)
+    elif phase == 'X':
+      self._ProcessCompleteEvent(event)
+    elif phase == 'S' or phase == 'F' or phase == 'T':
+      self._ProcessAsyncEvent(event)
+    # Note, I is historic. The instant event marker got changed, but we
+    # want to support loading old trace files so we have both I and i.
+    elif phase == 'I' or phase == 'i':
+      self._ProcessInstantEvent(event)
+    elif phase == 'P':
+      self._ProcessSampleEvent(event)
+    elif phase == 'C':
+      self._ProcessCounterEvent(event)
+    elif phase == 'M':
+      self._ProcessMetadataEvent(event)
+    elif phase == 'N' or phase == 'D' or phase == 'O':
+      self._ProcessObjectEvent(event)
+    elif phase == 's' or phase == 't' or phase == 'f':
+      self._ProcessFlowEvent(event)
+    else:
+      self._model.import_errors.append('Unrecognized event phase: ' +
+          phase + '(' + event['name'] + ')')
 
   def ImportEvents(self):
     ''' Walks through the events_ list and outputs the structures discovered to
     model_.
     '''
     for event in self._events:
-      phase = event.get('ph', None)
-      if phase == 'B' or phase == 'E':
-        self._ProcessDurationEvent(event)
-      elif phase == 'X':
-        self._ProcessCompleteEvent(event)
-      elif phase == 'S' or phase == 'F' or phase == 'T':
-        self._ProcessAsyncEvent(event)
-      # Note, I is historic. The instant event marker got changed, but we
-      # want to support loading old trace files so we have both I and i.
-      elif phase == 'I' or phase == 'i':
-        self._ProcessInstantEvent(event)
-      elif phase == 'P':
-        self._ProcessSampleEvent(event)
-      elif phase == 'C':
-        self._ProcessCounterEvent(event)
-      elif phase == 'M':
-        self._ProcessMetadataEvent(event)
-      elif phase == 'N' or phase == 'D' or phase == 'O':
-        self._ProcessObjectEvent(event)
-      elif phase == 's' or phase == 't' or phase == 'f':
-        self._ProcessFlowEvent(event)
-      else:
-        self._model.import_errors.append('Unrecognized event phase: ' +
-            phase + '(' + event['name'] + ')')
+      self._ProcessEvent(event)
+    self._ImportHeldBackBeginEvents()
+
+    if self._events_are_streamed:
+      self._model.metadata.extend(self._events.metadata)
+
+    return self._model
+
+  def ImportEventsInParallel(self, jobs):
+    '''Imports the events of every process in a pool of |jobs| worker
+    processes, which also close the open slices of the process and nest its
+    slices, and merges the processes into the model. Events linking processes
+    together are then imported as usual.
+
+    Per-process events are run through the import filter here, so that the
+    workers close open slices at the end of the events that are imported.
+    The import errors of each process are reported together, in pid order,
+    after those of the import filter. The processes are pickled on their way
+    back from the workers, which is much cheaper with columnar slices than
+    with Slice objects.
+    '''
+    if self._model.processes:
+      # Processes already in the model have to be finalized along with it.
+      return self.ImportEvents()
+
+    # Slices left open are closed at the end of the whole trace, so the workers
+    # need to know when that is before they start.
+    events_by_pid = collections.defaultdict(list)
+    other_events = []
+    filtered_events = self._FilterPerProcessEvents(other_events)
+    max_timestamp = None
+    for event in filtered_events:
+      events_by_pid[event['pid']].append(event)
+      timestamp = _GetLatestTimestamp(event)
+      if timestamp is not None and (max_timestamp is None or
+                                    timestamp > max_timestamp):
+        max_timestamp = timestamp
+
+    results = []
+    if events_by_pid:
+      # Hand out the biggest processes first so that the workers finish at
+      # about the same time.
+      pids = sorted(events_by_pid,
+                    key=lambda pid: len(events_by_pid[pid]), reverse=True)
+      pool = multiprocessing.Pool(min(jobs, len(pids)), _InitializeWorker,
+                                  (events_by_pid,))
+      try:
+        results = pool.map(
+            _ImportProcessInWorker,
+            [(pid, max_timestamp, self._model.columnar_slices,
+              self._model.lazy_args)
+             for pid in pids],
+            chunksize=1)
+      finally:
+        pool.close()
+        pool.join()
+
+    latest_timestamps = [r[3] for r in results if r[3] is not None]
+    if max(latest_timestamps or [None]) != max_timestamp:
+      # One of the events that max_timestamp came from was rejected, so the
+      # workers closed open slices too late. Import everything here instead.
+      for pid in sorted(events_by_pid):
+        for event in events_by_pid[pid]:
+          self._ProcessFilteredEvent(event, event['ph'])
+    else:
+      for pid, process, errors, _ in sorted(results, key=lambda r: r[0]):
+        self._model.import_errors.extend(errors)
+        if process:
+          self._model.AdoptProcess(process)
+
+    for event in other_events:
+      self._ProcessEvent(event)
+
+    if self._events_are_streamed:
+      self._model.metadata.extend(self._events.metadata)
 
     return self._model
 
+  def _FilterPerProcessEvents(self, other_events):
+    '''Yields the per-process events that the import filter keeps, in place
+    of the events they stand for, and appends all other events to
+    other_events.'''
+    for event in self._events:
+      phase = event.get('ph', None)
+      if phase not in _PER_PROCESS_PHASES:
+        other_events.append(event)
+        continue
+      if self._import_filter is not None:
+        event = self._FilterEvent(event, phase)
+        if event is None:
+          continue
+      yield event
+    for complete_event in self._PopHeldBackBeginEvents():
+      yield complete_event
+
   def FinalizeImport(self):
     '''Called by the Model after all other importers have imported their
     events.'''
-    self._model.UpdateBounds()
-
-    # We need to reupdate the bounds in case the minimum start time changes
-    self._model.UpdateBounds()
     self._CreateAsyncSlices()
     self._CreateFlowSlices()
     self._SetBrowserProcess()
@@ -289,112 +604,130 @@ class TraceEventTimelineImporter(importer.TimelineImporter):
     self._CreateTabIdsToThreadsMap()
 
   def _CreateAsyncSlices(self):
-    if len(self._all_async_events) == 0:
-      return
-
-    self._all_async_events.sort(
-        cmp=lambda x, y: int(x['event']['ts'] - y['event']['ts']))
-
-    async_event_states_by_name_then_id = {}
-
-    all_async_events = self._all_async_events
-    for async_event_state in all_async_events:
-      event = async_event_state['event']
-      name = event.get('name', None)
-      if name is None:
-        self._model.import_errors.append(
-            'Async events (ph: S, T or F) require an name parameter.')
-        continue
-
-      event_id = event.get('id')
-      if event_id is None:
-        self._model.import_errors.append(
-            'Async events (ph: S, T or F) require an id parameter.')
-        continue
-
+    groups = self._async_events_by_name_and_id
+    for group in groups.itervalues():
+      group.sort()
+
+    # An unmatched T or F event is reported differently depending on whether a
+    # slice of the same name was started earlier on, with any id.
+    first_start_by_name = {}
+    for (name, _), group in groups.iteritems():
+      for timestamp, sequence_number, event, _ in group:
+        if event['ph'] == 'S':
+          first_start = first_start_by_name.get(name)
+          if first_start is None or (timestamp, sequence_number) < first_start:
+            first_start_by_name[name] = (timestamp, sequence_number)
+          break
+
+    errors = self._async_event_errors
+    finished_slices = []
+    for (name, event_id), group in groups.iteritems():
       # TODO(simonjam): Add a synchronous tick on the appropriate thread.
-
-      if event['ph'] == 'S':
-        if not name in async_event_states_by_name_then_id:
-          async_event_states_by_name_then_id[name] = {}
-        if event_id in async_event_states_by_name_then_id[name]:
-          self._model.import_errors.append(
-              'At %d, a slice of the same id %s was already open.' % (
-                  event['ts'], event_id))
+      open_events = None
+      for async_event in group:
+        timestamp, sequence_number, event, _ = async_event
+        if event['ph'] == 'S':
+          if open_events is not None:
+            errors.append((timestamp, sequence_number,
+                'At %d, a slice of the same id %s was already open.' % (
+                    event['ts'], event_id)))
+            continue
+          open_events = [async_event]
           continue
 
-        async_event_states_by_name_then_id[name][event_id] = []
-        async_event_states_by_name_then_id[name][event_id].append(
-            async_event_state)
-      else:
-        if name not in async_event_states_by_name_then_id:
-          self._model.import_errors.append(
-              'At %d, no slice named %s was open.' % (event['ts'], name,))
+        if open_events is None:
+          first_start = first_start_by_name.get(name)
+          if first_start is None or first_start > (timestamp, sequence_number):
+            errors.append((timestamp, sequence_number,
+                'At %d, no slice named %s was open.' % (event['ts'], name,)))
+          else:
+            errors.append((timestamp, sequence_number,
+                'At %d, no slice named %s with id=%s was open.' % (
+                    event['ts'], name, event_id)))
           continue
-        if event_id not in async_event_states_by_name_then_id[name]:
-          self._model.import_errors.append(
-              'At %d, no slice named %s with id=%s was open.' % (
-                  event['ts'], name, event_id))
-          continue
-        events = async_event_states_by_name_then_id[name][event_id]
-        events.append(async_event_state)
+        open_events.append(async_event)
 
         if event['ph'] == 'F':
-          # Create a slice from start to end.
-          async_slice = tracing_async_slice.AsyncSlice(
-              events[0]['event']['cat'],
-              name,
-              events[0]['event']['ts'] / 1000.0)
-
-          async_slice.duration = ((event['ts'] / 1000.0)
-              - (events[0]['event']['ts'] / 1000.0))
-
-          async_slice.start_thread = events[0]['thread']
-          async_slice.end_thread = async_event_state['thread']
-          if async_slice.start_thread == async_slice.end_thread:
-            if 'tts' in event and 'tts' in events[0]['event']:
-              async_slice.thread_start = events[0]['event']['tts'] / 1000.0
-              async_slice.thread_duration = ((event['tts'] / 1000.0)
-                  - (events[0]['event']['tts'] / 1000.0))
-          async_slice.id = event_id
-          async_slice.args = events[0]['event']['args']
-
-          # Create sub_slices for each step.
-          for j in xrange(1, len(events)):
-            sub_name = name
-            if events[j - 1]['event']['ph'] == 'T':
-              sub_name = name + ':' + events[j - 1]['event']['args']['step']
-            sub_slice = tracing_async_slice.AsyncSlice(
-                events[0]['event']['cat'],
-                sub_name,
-                events[j - 1]['event']['ts'] / 1000.0)
-            sub_slice.parent_slice = async_slice
-
-            sub_slice.duration = ((events[j]['event']['ts'] / 1000.0)
-                - (events[j - 1]['event']['ts'] / 1000.0))
-
-            sub_slice.start_thread = events[j - 1]['thread']
-            sub_slice.end_thread = events[j]['thread']
-            if sub_slice.start_thread == sub_slice.end_thread:
-              if 'tts' in events[j]['event'] and \
-                  'tts' in events[j - 1]['event']:
-                sub_slice.thread_duration = \
-                    ((events[j]['event']['tts'] / 1000.0)
-                        - (events[j - 1]['event']['tts'] / 1000.0))
-
-            sub_slice.id = event_id
-            sub_slice.args = events[j - 1]['event']['args']
-
-            async_slice.AddSubSlice(sub_slice)
-
-          # The args for the finish event go in the last sub_slice.
-          last_slice = async_slice.sub_slices[-1]
-          for arg_name, arg_value in event['args'].iteritems():
-            last_slice.args[arg_name] = arg_value
-
-          # Add |async_slice| to the start-thread's async_slices.
-          async_slice.start_thread.AddAsyncSlice(async_slice)
-          del async_event_states_by_name_then_id[name][event_id]
+          if self._IsLinkedGroupImported(open_events):
+            finished_slices.append((timestamp, sequence_number,
+                                    self._CreateAsyncSlice(name, open_events)))
+          open_events = None
+
+    # Keep the errors and the async slices of each thread in trace order.
+    errors.sort()
+    self._model.import_errors.extend(error for _, _, error in errors)
+    finished_slices.sort()
+    for _, _, async_slice in finished_slices:
+      # Add |async_slice| to the start-thread's async_slices.
+      async_slice.start_thread.AddAsyncSlice(async_slice)
+
+  def _IsLinkedGroupImported(self, linked_events):
+    '''Returns whether sorted async or flow events are imported, given the
+    time they span.'''
+    if self._import_filter is None:
+      return True
+    _, _, first_event, _ = linked_events[0]
+    _, _, last_event, _ = linked_events[-1]
+    return (first_event.get('cat') in import_filter_module.MARKER_CATEGORIES or
+            self._import_filter.IsTimeRangeImported(
+                first_event['ts'] / 1000.0, last_event['ts'] / 1000.0))
+
+  @staticmethod
+  def _CreateAsyncSlice(name, async_events):
+    '''Creates a slice from the S event to the F event of |async_events|, with
+    a sub slice for each step.'''
+    events = [event for _, _, event, _ in async_events]
+    threads = [thread for _, _, _, thread in async_events]
+    async_slice = tracing_async_slice.AsyncSlice(
+        events[0]['cat'],
+        name,
+        events[0]['ts'] / 1000.0)
+
+    async_slice.duration = ((events[-1]['ts'] / 1000.0)
+        - (events[0]['ts'] / 1000.0))
+
+    async_slice.start_thread = threads[0]
+    async_slice.end_thread = threads[-1]
+    if async_slice.start_thread == async_slice.end_thread:
+      if 'tts' in events[-1] and 'tts' in events[0]:
+        async_slice.thread_start = events[0]['tts'] / 1000.0
+        async_slice.thread_duration = ((events[-1]['tts'] / 1000.0)
+            - (events[0]['tts'] / 1000.0))
+    async_slice.id = events[0]['id']
+    async_slice.args = events[0]['args']
+
+    # Create sub_slices for each step.
+    for j in xrange(1, len(events)):
+      sub_name = name
+      if events[j - 1]['ph'] == 'T':
+        sub_name = name + ':' + events[j - 1]['args']['step']
+      sub_slice = tracing_async_slice.AsyncSlice(
+          events[0]['cat'],
+          sub_name,
+          events[j - 1]['ts'] / 1000.0)
+      sub_slice.parent_slice = async_slice
+
+      sub_slice.duration = ((events[j]['ts'] / 1000.0)
+          - (events[j - 1]['ts'] / 1000.0))
+
+      sub_slice.start_thread = threads[j - 1]
+      sub_slice.end_thread = threads[j]
+      if sub_slice.start_thread == sub_slice.end_thread:
+        if 'tts' in events[j] and 'tts' in events[j - 1]:
+          sub_slice.thread_duration = \
+              ((events[j]['tts'] / 1000.0)
+                  - (events[j - 1]['tts'] / 1000.0))
+
+      sub_slice.id = events[0]['id']
+      sub_slice.args = events[j - 1]['args']
+
+      async_slice.AddSubSlice(sub_slice)
+
+    # The args for the finish event go in the last sub_slice.
+    last_slice = async_slice.sub_slices[-1]
+    for arg_name, arg_value in events[-1]['args'].iteritems():
+      last_slice.args[arg_name] = arg_value
+    return async_slice
 
   def _CreateExplicitObjects(self):
     # TODO(tengs): Implement object instance parsing
@@ -405,54 +738,54 @@ class TraceEventTimelineImporter(importer.TimelineImporter):
     pass
 
   def _CreateFlowSlices(self):
-    if len(self._all_flow_events) == 0:
-      return
-
-    self._all_flow_events.sort(
-        cmp=lambda x, y: int(x['event']['ts'] - y['event']['ts']))
-
-    flow_id_to_event = {}
-    for data in self._all_flow_events:
-      event = data['event']
-      thread = data['thread']
-      if 'name' not in event:
-        self._model.import_errors.append(
-          'Flow events (ph: s, t or f) require a name parameter.')
-        continue
-      if 'id' not in event:
-        self._model.import_errors.append(
-          'Flow events (ph: s, t or f) require an id parameter.')
+    errors = self._flow_event_errors
+    flow_events = []
+    flow_pairs = []
+    for event_id, group in self._flow_events_by_id.iteritems():
+      group.sort()
+      if not self._IsLinkedGroupImported(group):
         continue
-
-      flow_event = tracing_flow_event.FlowEvent(
-          event['cat'],
-          event['id'],
-          event['name'],
-          event['ts'] / 1000.0,
-          event['args'])
+      flow_position = None
+      for timestamp, sequence_number, event, thread in group:
+        flow_event = tracing_flow_event.FlowEvent(
+            event['cat'],
+            event_id,
+            event['name'],
+            event['ts'] / 1000.0,
+            event['args'])
+        flow_events.append((timestamp, sequence_number, thread, flow_event))
+
+        if event['ph'] == 's':
+          if flow_position is not None:
+            errors.append((timestamp, sequence_number,
+                'event id %s already seen when encountering start of'
+                'flow event.' % event_id))
+            continue
+          flow_position = flow_event
+        elif event['ph'] == 't' or event['ph'] == 'f':
+          if flow_position is None:
+            errors.append((timestamp, sequence_number,
+                'Found flow phase %s for id: %s but no flow start found.' % (
+                    event['ph'], event_id)))
+            continue
+          flow_pairs.append((timestamp, sequence_number,
+                             [flow_position, flow_event]))
+
+          if event['ph'] == 'f':
+            flow_position = None
+          else:
+            # Make this event the next start event in this flow.
+            flow_position = flow_event
+
+    # Keep the errors, the flow events of each thread and the flows of the
+    # model in trace order.
+    errors.sort()
+    self._model.import_errors.extend(error for _, _, error in errors)
+    flow_events.sort()
+    for _, _, thread, flow_event in flow_events:
       thread.AddFlowEvent(flow_event)
-
-      if event['ph'] == 's':
-        if event['id'] in flow_id_to_event:
-          self._model.import_errors.append(
-              'event id %s already seen when encountering start of'
-              'flow event.' % event['id'])
-          continue
-        flow_id_to_event[event['id']] = flow_event
-      elif event['ph'] == 't' or event['ph'] == 'f':
-        if not event['id'] in flow_id_to_event:
-          self._model.import_errors.append(
-            'Found flow phase %s for id: %s but no flow start found.' % (
-                event['ph'], event['id']))
-          continue
-        flow_position = flow_id_to_event[event['id']]
-        self._model.flow_events.append([flow_position, flow_event])
-
-        if event['ph'] == 'f':
-          del flow_id_to_event[event['id']]
-        else:
-          # Make this event the next start event in this flow.
-          flow_id_to_event[event['id']] = flow_event
+    flow_pairs.sort()
+    self._model.flow_events.extend(pair for _, _, pair in flow_pairs)
 
   def _SetBrowserProcess(self):
     for thread in self._model.GetAllThreads():
@@ -462,11 +795,15 @@ class TraceEventTimelineImporter(importer.TimelineImporter):
   def _CheckTraceBufferOverflow(self):
     for process in self._model.GetAllProcesses():
       if process.trace_buffer_did_overflow:
+        if self._events_are_streamed:
+          raw_trace_data = '<not retained by streaming import>'
+        else:
+          raw_trace_data = repr(self._events)
         raise TraceBufferOverflowException(
             'Trace buffer of process with pid=%d overflowed at timestamp %d. '
             'Raw trace data:\n%s' %
             (process.pid, process.trace_buffer_overflow_event.start,
-             repr(self._events)))
+             raw_trace_data))
 
   def _CreateTabIdsToThreadsMap(self):
     # Since _CreateTabIdsToThreadsMap() relies on markers output on timeline
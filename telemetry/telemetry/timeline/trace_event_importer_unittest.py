@@ -3,10 +3,13 @@
 # found in the LICENSE file.
 
 import json
+import StringIO
 import unittest
 
 import telemetry.timeline.counter as tracing_counter
 import telemetry.timeline.model as timeline_model
+from telemetry.timeline import bounds
+from telemetry.timeline import import_filter
 from telemetry.timeline import trace_event_importer
 from telemetry.timeline import tracing_timeline_data
 
@@ -17,6 +20,34 @@ def FindEventNamed(events, name):
       return event
   raise ValueError('No event found with name %s' % name)
 
+def DescribeModel(m):
+  '''Returns a comparable summary of everything imported into a model.'''
+  def DescribeSlice(s):
+    return (s.name, s.start, s.duration, s.thread_start, s.thread_duration,
+            s.parent_slice.name if s.parent_slice else None,
+            [sub.name for sub in s.sub_slices])
+  processes = []
+  for pid in sorted(m.processes):
+    process = m.processes[pid]
+    threads = []
+    for tid in sorted(process.threads):
+      thread = process.threads[tid]
+      threads.append((
+          tid, thread.name,
+          [DescribeSlice(s) for s in thread.all_slices],
+          [s.name for s in thread.toplevel_slices],
+          [(s.name, s.start, s.duration, s.end_thread.tid,
+            [DescribeSlice(sub) for sub in s.sub_slices])
+           for s in thread.async_slices],
+          [(s.name, s.start) for s in thread.samples]))
+    counters = [(c.full_name, c.timestamps, c.samples, c.totals)
+                for _, c in sorted(process.counters.items())]
+    processes.append((pid, process.name, threads, counters))
+  flows = [(a.name, a.start, b.start) for a, b in m.flow_events]
+  return (processes, flows, sorted(m.import_errors), m.bounds.min,
+          m.bounds.max)
+
+
 class TraceEventTimelineImporterTest(unittest.TestCase):
   def testCanImportEmpty(self):
     # TraceEventTimelineImporter needs to return false for empty lists and
@@ -736,6 +767,45 @@ class TraceEventTimelineImporterTest(unittest.TestCase):
     self.assertEqual(1, len(processes))
     self.assertEqual(1, len(processes[0].threads[53].all_slices))
 
+  def testImportFile(self):
+    events = [
+      {'name': 'a', 'args': {}, 'pid': 52, 'ts': 524, 'cat': 'foo',
+       'tid': 53, 'ph': 'B'},
+      {'name': 'b', 'args': {}, 'pid': 52, 'ts': 530, 'cat': 'foo',
+       'tid': 53, 'ph': 'X', 'dur': 5},
+      {'name': 'a', 'args': {}, 'pid': 52, 'ts': 560, 'cat': 'foo',
+       'tid': 53, 'ph': 'E'}
+    ]
+    expected = timeline_model.TimelineModel(
+        timeline_data=tracing_timeline_data.TracingTimelineData(events))
+
+    timeline_data = tracing_timeline_data.TracingTimelineData(
+        StringIO.StringIO(json.dumps(events)))
+    m = timeline_model.TimelineModel(timeline_data=timeline_data)
+    processes = m.GetAllProcesses()
+    self.assertEqual(1, len(processes))
+    t = processes[0].threads[53]
+    self.assertEqual(
+        [(s.name, s.start, s.duration) for s in
+         expected.GetAllProcesses()[0].threads[53].all_slices],
+        [(s.name, s.start, s.duration) for s in t.all_slices])
+    self.assertEqual(['b'], [s.name for s in t.all_slices[0].sub_slices])
+
+  def testImportFileWithEndingCommaButMissingCloseSquareBracket(self):
+    lines = [
+      '[',
+      '{"name": "a", "args": {}, "pid": 52, "ts": 524, "cat": "foo", '
+        '"tid": 53, "ph": "B"},',
+      '{"name": "a", "args": {}, "pid": 52, "ts": 560, "cat": "foo", '
+        '"tid": 53, "ph": "E"},'
+      ]
+    timeline_data = tracing_timeline_data.TracingTimelineData(
+        StringIO.StringIO('\r\n'.join(lines)))
+    m = timeline_model.TimelineModel(timeline_data=timeline_data)
+    processes = m.GetAllProcesses()
+    self.assertEqual(1, len(processes))
+    self.assertEqual(1, len(processes[0].threads[53].all_slices))
+
   def testImportOldFormat(self):
     lines = [
       '[',
@@ -1214,3 +1284,292 @@ class TraceEventTimelineImporterTest(unittest.TestCase):
     self.assertEqual(2, len(p.threads))
     self.assertIs(p.threads[1], m.GetRendererThreadFromTabId('tab-id-1'))
     self.assertIs(p.threads[2], m.GetRendererThreadFromTabId('tab-id-2'))
+
+  def testTraceFileWithTabIdsMarkers(self):
+    trace_events = [
+      {'name': 'tab-id-1', 'args': {}, 'pid': 1, 'ts': 25, 'cat': 'foo',
+       'tid': 1, 'ph': 'S', 'id': 72},
+      {'name': 'tab-id-1', 'args': {}, 'pid': 1, 'ts': 35, 'cat': 'foo',
+       'tid': 1, 'ph': 'F', 'id': 72},
+     ]
+    # Put the metadata after the events to make sure it is still picked up.
+    trace_file = StringIO.StringIO(
+        '{"traceEvents": %s, "tabIds": ["tab-id-1"]}' %
+        json.dumps(trace_events))
+    timeline_data = tracing_timeline_data.TracingTimelineData(trace_file)
+    m = timeline_model.TimelineModel(timeline_data=timeline_data)
+    p = m.GetAllProcesses()[0]
+    self.assertIs(p.threads[1], m.GetRendererThreadFromTabId('tab-id-1'))
+    self.assertEqual([{'name': 'tabIds', 'value': ['tab-id-1']}], m.metadata)
+
+  def testParallelImportMatchesSerialImport(self):
+    trace_events = [
+      {'name': 'process_name', 'args': {'name': 'Browser'}, 'pid': 1,
+       'tid': 1, 'ph': 'M'},
+      {'name': 'a', 'args': {}, 'pid': 1, 'ts': 10, 'tts': 5, 'cat': 'foo',
+       'tid': 1, 'ph': 'B'},
+      {'name': 'b', 'args': {}, 'pid': 1, 'ts': 12, 'dur': 3, 'tts': 6,
+       'tdur': 1, 'cat': 'foo', 'tid': 1, 'ph': 'X'},
+      {'name': 'async', 'args': {}, 'pid': 1, 'ts': 14, 'cat': 'foo',
+       'tid': 1, 'ph': 'S', 'id': 3},
+      {'name': 'c', 'args': {}, 'pid': 2, 'ts': 15, 'cat': 'foo', 'tid': 7,
+       'ph': 'B'},
+      {'name': 'flow', 'args': {}, 'pid': 1, 'ts': 16, 'cat': 'foo',
+       'tid': 1, 'ph': 's', 'id': 9},
+      {'name': 'ctr', 'args': {'value': 4}, 'pid': 2, 'ts': 17, 'cat': 'foo',
+       'tid': 7, 'ph': 'C'},
+      {'name': 'c', 'args': {}, 'pid': 2, 'ts': 20, 'cat': 'foo', 'tid': 7,
+       'ph': 'E'},
+      {'name': 'flow', 'args': {}, 'pid': 2, 'ts': 21, 'cat': 'foo',
+       'tid': 7, 'ph': 'f', 'id': 9},
+      {'name': 'async', 'args': {}, 'pid': 2, 'ts': 22, 'cat': 'foo',
+       'tid': 7, 'ph': 'F', 'id': 3},
+      {'name': 'i', 'args': {}, 'pid': 3, 'ts': 23, 'cat': 'foo', 'tid': 1,
+       'ph': 'i'},
+      {'name': 'sample', 'args': {}, 'pid': 3, 'ts': 24, 'cat': 'foo',
+       'tid': 1, 'ph': 'P'},
+      # Left open, so it is closed at the end of the trace, which is in a
+      # different process.
+      {'name': 'd', 'args': {}, 'pid': 1, 'ts': 25, 'tts': 8, 'cat': 'foo',
+       'tid': 1, 'ph': 'B'},
+      {'name': 'e', 'args': {}, 'pid': 2, 'ts': 30, 'dur': 10, 'cat': 'foo',
+       'tid': 7, 'ph': 'X'},
+      {'name': 'unknown', 'args': {}, 'pid': 2, 'ts': 31, 'cat': 'foo',
+       'tid': 7, 'ph': '?'},
+    ]
+    for columnar_slices in (False, True):
+      serial = timeline_model.TimelineModel(
+          tracing_timeline_data.TracingTimelineData(trace_events),
+          columnar_slices=columnar_slices)
+      parallel = timeline_model.TimelineModel(
+          tracing_timeline_data.TracingTimelineData(trace_events),
+          columnar_slices=columnar_slices, import_jobs=2)
+      self.assertEqual(DescribeModel(serial), DescribeModel(parallel))
+      open_slice = FindEventNamed(parallel.processes[1].threads[1].all_slices,
+                                  'd')
+      # The trace ends at 40us, and is shifted to start at 10us.
+      self.assertAlmostEqual(0.030, open_slice.end)
+
+  def testParallelImportFallsBackWhenTheLastEventIsRejected(self):
+    trace_events = [
+      {'name': 'a', 'args': {}, 'pid': 1, 'ts': 10, 'cat': 'foo', 'tid': 1,
+       'ph': 'B'},
+      {'name': 'b', 'args': {}, 'pid': 2, 'ts': 12, 'dur': 3, 'cat': 'foo',
+       'tid': 1, 'ph': 'X'},
+      # Ignored because it has no matching B event.
+      {'name': 'c', 'args': {}, 'pid': 2, 'ts': 40, 'cat': 'foo', 'tid': 2,
+       'ph': 'E'},
+    ]
+    serial = timeline_model.TimelineModel(
+        tracing_timeline_data.TracingTimelineData(trace_events))
+    parallel = timeline_model.TimelineModel(
+        tracing_timeline_data.TracingTimelineData(trace_events),
+        import_jobs=2)
+    self.assertEqual(DescribeModel(serial), DescribeModel(parallel))
+    self.assertAlmostEqual(
+        0.005, parallel.processes[1].threads[1].all_slices[0].duration)
+
+  def testParallelImportWithImportFilter(self):
+    # pylint: disable=W0212
+    time_range = bounds.Bounds()
+    time_range.AddValue(0.020)
+    time_range.AddValue(0.030)
+    trace_events = [
+      # Held back until its E event.
+      {'name': 'a', 'args': {'x': 1}, 'pid': 1, 'ts': 10, 'cat': 'foo',
+       'tid': 1, 'ph': 'B'},
+      {'name': 'b', 'args': {}, 'pid': 2, 'ts': 21, 'cat': 'foo', 'tid': 1,
+       'ph': 'B'},
+      {'name': 'a', 'args': {'y': 2}, 'pid': 1, 'ts': 25, 'cat': 'foo',
+       'tid': 1, 'ph': 'E'},
+      {'name': 'c', 'args': {}, 'pid': 2, 'ts': 28, 'cat': 'bar', 'tid': 1,
+       'ph': 'X', 'dur': 1},
+      # The latest events of the trace are dropped by the filter.
+      {'name': 'd', 'args': {}, 'pid': 1, 'ts': 31, 'cat': 'foo', 'tid': 1,
+       'ph': 'I'},
+      {'name': 'e', 'args': {}, 'pid': 2, 'ts': 29, 'cat': 'bar', 'tid': 1,
+       'ph': 'X', 'dur': 10},
+    ]
+    processed_phases = []
+    importer_class = trace_event_importer.TraceEventTimelineImporter
+    process_filtered_event = importer_class._ProcessFilteredEvent
+    def RecordPhase(importer, event, phase):
+      processed_phases.append(phase)
+      process_filtered_event(importer, event, phase)
+    importer_class._ProcessFilteredEvent = RecordPhase
+    try:
+      for columnar_slices in (False, True):
+        models = []
+        for import_jobs in (1, 2):
+          models.append(timeline_model.TimelineModel(
+              tracing_timeline_data.TracingTimelineData(
+                  json.dumps(trace_events)),
+              columnar_slices=columnar_slices, import_jobs=import_jobs,
+              lazy_args=True, shift_world_to_zero=False,
+              import_filter=import_filter.ImportFilter(
+                  categories=['foo'], time_range=time_range)))
+        serial, parallel = models
+        self.assertEqual(DescribeModel(serial), DescribeModel(parallel))
+        b = FindEventNamed(parallel.processes[2].threads[1].all_slices, 'b')
+        # Closed at the end of the imported events, which is where a ends.
+        self.assertAlmostEqual(0.025, b.end)
+        self.assertEqual(
+            {'x': 1, 'y': 2},
+            FindEventNamed(parallel.processes[1].threads[1].all_slices,
+                           'a').args)
+    finally:
+      importer_class._ProcessFilteredEvent = process_filtered_event
+    # The serial imports processed their events here, the parallel imports
+    # left them all to the workers.
+    self.assertEqual(['B', 'X'] * 2, processed_phases)
+
+  def testAsyncEventsAreOrderedByExactTimestamp(self):
+    events = [
+      {'name': 'a', 'args': {}, 'pid': 52, 'ts': 10.6, 'cat': 'foo',
+       'tid': 53, 'ph': 'S', 'id': 72},
+      {'name': 'a', 'args': {}, 'pid': 52, 'ts': 10.2, 'cat': 'foo',
+       'tid': 53, 'ph': 'F', 'id': 72},
+    ]
+    m = timeline_model.TimelineModel(
+        tracing_timeline_data.TracingTimelineData(events))
+    self.assertEqual([], m.GetAllThreads()[0].async_slices)
+    self.assertEqual(['At 10, no slice named a was open.'], m.import_errors)
+
+  def testAsyncSlicesAndErrorsKeepTraceOrder(self):
+    events = [
+      {'name': 'b', 'args': {}, 'pid': 52, 'ts': 100, 'cat': 'foo',
+       'tid': 53, 'ph': 'S', 'id': 2},
+      {'name': 'a', 'args': {}, 'pid': 52, 'ts': 110, 'cat': 'foo',
+       'tid': 53, 'ph': 'S', 'id': 1},
+      {'name': 'a', 'args': {}, 'pid': 52, 'ts': 120, 'cat': 'foo',
+       'tid': 53, 'ph': 'F', 'id': 1},
+      {'name': 'b', 'args': {}, 'pid': 52, 'ts': 130, 'cat': 'foo',
+       'tid': 53, 'ph': 'F', 'id': 2},
+      {'name': 'a', 'args': {}, 'pid': 52, 'ts': 140, 'cat': 'foo',
+       'tid': 53, 'ph': 'F', 'id': 3},
+      {'name': 'c', 'args': {}, 'pid': 52, 'ts': 135, 'cat': 'foo',
+       'tid': 53, 'ph': 'F', 'id': 1},
+    ]
+    m = timeline_model.TimelineModel(
+        tracing_timeline_data.TracingTimelineData(events),
+        shift_world_to_zero=False)
+    self.assertEqual(['a', 'b'],
+                     [s.name for s in m.GetAllThreads()[0].async_slices])
+    self.assertEqual(['At 135, no slice named c was open.',
+                      'At 140, no slice named a with id=3 was open.'],
+                     m.import_errors)
+
+  def testLazyArgsOfJsonTraces(self):
+    events = [
+      {'name': 'a', 'args': {'x': 1}, 'pid': 52, 'ts': 10, 'cat': 'foo',
+       'tid': 53, 'ph': 'B'},
+      {'name': 'a', 'args': {'y': 2}, 'pid': 52, 'ts': 20, 'cat': 'foo',
+       'tid': 53, 'ph': 'E'},
+      {'name': 'c', 'args': {'v': [1, {'w': 2}]}, 'pid': 52, 'ts': 12,
+       'cat': 'foo', 'tid': 53, 'ph': 'X', 'dur': 2},
+    ]
+    m = timeline_model.TimelineModel(
+        tracing_timeline_data.TracingTimelineData(json.dumps(events)),
+        lazy_args=True)
+    # JSON traces are decoded eagerly, lazy_args only applies to models
+    # loaded from a cache.
+    slices = m.GetAllThreads()[0].all_slices
+    self.assertEqual(dict, type(slices[1]._args))  # pylint: disable=W0212
+    self.assertEqual({'x': 1, 'y': 2}, slices[0].args)
+    self.assertEqual({'v': [1, {'w': 2}]}, slices[1].args)
+
+  def testImportFilterDropsEventsBeforeCreatingSlices(self):
+    events = [
+      {'name': 'a', 'args': {}, 'pid': 1, 'ts': 10, 'cat': 'foo', 'tid': 1,
+       'ph': 'B'},
+      {'name': 'b', 'args': {}, 'pid': 1, 'ts': 11, 'cat': 'bar', 'tid': 1,
+       'ph': 'B'},
+      {'name': 'c', 'args': {}, 'pid': 1, 'ts': 12, 'cat': 'foo', 'tid': 1,
+       'ph': 'X', 'dur': 1},
+      {'name': 'b', 'args': {}, 'pid': 1, 'ts': 14, 'cat': 'bar', 'tid': 1,
+       'ph': 'E'},
+      {'name': 'a', 'args': {'x': 1}, 'pid': 1, 'ts': 15, 'cat': 'foo',
+       'tid': 1, 'ph': 'E'},
+      {'name': 'd', 'args': {}, 'pid': 2, 'ts': 12, 'cat': 'foo', 'tid': 2,
+       'ph': 'X', 'dur': 1},
+      {'name': 'thread_name', 'args': {'name': 'Other'}, 'pid': 2, 'ts': 0,
+       'cat': '__metadata', 'tid': 2, 'ph': 'M'},
+      {'name': 'e', 'args': {}, 'pid': 1, 'ts': 12, 'cat': 'foo', 'tid': 1,
+       'ph': 'S', 'id': 1},
+      {'name': 'e', 'args': {}, 'pid': 1, 'ts': 13, 'cat': 'foo', 'tid': 1,
+       'ph': 'F', 'id': 1},
+      {'name': 'marker', 'args': {}, 'pid': 2, 'ts': 12,
+       'cat': 'blink.console', 'tid': 2, 'ph': 'S', 'id': 2},
+      {'name': 'marker', 'args': {}, 'pid': 2, 'ts': 13,
+       'cat': 'blink.console', 'tid': 2, 'ph': 'F', 'id': 2},
+    ]
+    m = timeline_model.TimelineModel(
+        tracing_timeline_data.TracingTimelineData(events),
+        shift_world_to_zero=False,
+        import_filter=import_filter.ImportFilter(
+            categories=['foo'], names=['a', 'c', 'e'], pids=[1]))
+    self.assertEqual([1, 2], sorted(m.processes))
+    thread = m.processes[1].threads[1]
+    self.assertEqual(['a', 'c'], [s.name for s in thread.all_slices])
+    self.assertEqual({'x': 1}, thread.all_slices[0].args)
+    self.assertEqual(['c'], [s.name for s in thread.all_slices[0].sub_slices])
+    self.assertEqual(['e'], [s.name for s in thread.async_slices])
+    # Markers are always imported, but nothing else of process 2.
+    other_thread = m.processes[2].threads[2]
+    self.assertEqual(['marker'], [s.name for s in other_thread.async_slices])
+    self.assertEqual([], other_thread.all_slices)
+    self.assertEqual('thread 2', other_thread.name)
+    self.assertEqual([], m.import_errors)
+
+  def testImportFilterTimeRange(self):
+    time_range = bounds.Bounds()
+    time_range.AddValue(0.020)
+    time_range.AddValue(0.030)
+    events = [
+      # Starts before the range and ends in it.
+      {'name': 'a', 'args': {'x': 1}, 'pid': 1, 'ts': 10, 'tts': 5,
+       'cat': 'foo', 'tid': 1, 'ph': 'B'},
+      # Ends before the range.
+      {'name': 'b', 'args': {}, 'pid': 1, 'ts': 11, 'cat': 'foo', 'tid': 1,
+       'ph': 'B'},
+      {'name': 'b', 'args': {}, 'pid': 1, 'ts': 12, 'cat': 'foo', 'tid': 1,
+       'ph': 'E'},
+      {'name': 'c', 'args': {}, 'pid': 1, 'ts': 21, 'cat': 'foo', 'tid': 1,
+       'ph': 'X', 'dur': 2},
+      {'name': 'a', 'args': {'x': 2}, 'pid': 1, 'ts': 25, 'tts': 9,
+       'cat': 'foo', 'tid': 1, 'ph': 'E'},
+      # Starts before the range and never ends.
+      {'name': 'open', 'args': {}, 'pid': 1, 'ts': 15, 'cat': 'foo',
+       'tid': 2, 'ph': 'B'},
+      {'name': 'late', 'args': {}, 'pid': 1, 'ts': 31, 'cat': 'foo',
+       'tid': 2, 'ph': 'I'},
+      {'name': 'early', 'args': {}, 'pid': 1, 'ts': 1, 'cat': 'foo',
+       'tid': 1, 'ph': 'S', 'id': 1},
+      {'name': 'early', 'args': {}, 'pid': 1, 'ts': 2, 'cat': 'foo',
+       'tid': 1, 'ph': 'F', 'id': 1},
+      {'name': 'during', 'args': {}, 'pid': 1, 'ts': 2, 'cat': 'foo',
+       'tid': 1, 'ph': 'S', 'id': 2},
+      {'name': 'during', 'args': {}, 'pid': 1, 'ts': 22, 'cat': 'foo',
+       'tid': 1, 'ph': 'F', 'id': 2},
+    ]
+    m = timeline_model.TimelineModel(
+        tracing_timeline_data.TracingTimelineData(events),
+        shift_world_to_zero=False,
+        import_filter=import_filter.ImportFilter(time_range=time_range))
+    thread = m.processes[1].threads[1]
+    # Held back slices are added once they end.
+    self.assertEqual(['c', 'a'], [s.name for s in thread.all_slices])
+    a = FindEventNamed(thread.all_slices, 'a')
+    self.assertEqual([a], thread.toplevel_slices)
+    self.assertAlmostEqual(0.015, a.duration)
+    self.assertAlmostEqual(0.004, a.thread_duration)
+    self.assertEqual({'x': 2}, a.args)
+    self.assertEqual(['c'], [s.name for s in a.sub_slices])
+    self.assertEqual(['during'], [s.name for s in thread.async_slices])
+    open_slice, = m.processes[1].threads[2].all_slices
+    self.assertEqual('open', open_slice.name)
+    self.assertTrue(open_slice.did_not_finish)
+    self.assertAlmostEqual(0.025, open_slice.end)
+    self.assertEqual(['Both the B and E phases of a provided values for '
+                      'argument x. The value of the E phase event will be '
+                      'used.'], m.import_errors)
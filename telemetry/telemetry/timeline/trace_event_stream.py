@@ -0,0 +1,149 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+'''Incremental tokenizer for TraceEvent-formatted JSON.
+
+Parses one trace event at a time out of a file object (or any iterable of
+string chunks) so that importing a multi-gigabyte trace never needs the raw
+JSON string or the full list of event dicts to be resident at once.
+'''
+
+import json
+import re
+
+# Large enough that most reads contain many complete events, small enough that
+# re-decoding an event straddling a chunk boundary stays cheap.
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+_WHITESPACE_RE = re.compile(r'[ \t\n\r]*')
+
+
+class TraceEventStreamReader(object):
+  '''Yields the trace events contained in a stream of TraceEvent JSON.
+
+  Both the bare array format ([ {...}, ... ]) and the container format
+  ({ "traceEvents": [ ... ], ... }) are supported. Any field of the container
+  other than traceEvents is collected into |metadata| as it is encountered,
+  using the same {'name': ..., 'value': ...} form as TimelineModel.metadata.
+
+  Like the string importer, the reader is forgiving about traces that were cut
+  off: a missing closing ']' and a dangling ',' at the end of the stream are
+  tolerated.
+  '''
+  def __init__(self, source, chunk_size=DEFAULT_CHUNK_SIZE):
+    if hasattr(source, 'read'):
+      self._read_chunk = lambda: source.read(chunk_size)
+    else:
+      chunks = iter(source)
+      self._read_chunk = lambda: next(chunks, '')
+    self._decoder = json.JSONDecoder()
+    self._buffer = ''
+    self._pos = 0
+    self._eof = False
+    self.metadata = []
+
+  def __iter__(self):
+    c = self._SkipWhitespace()
+    if c == '[':
+      self._pos += 1
+      for event in self._IterArray():
+        yield event
+    elif c == '{':
+      self._pos += 1
+      for event in self._IterContainer():
+        yield event
+    elif c:
+      raise ValueError('Trace data must start with [ or {, found %r' % c)
+
+  def _Fill(self, min_size=1):
+    '''Appends chunks with at least min_size bytes in total to the buffer, or
+    the rest of the stream if it is shorter. Returns False at end of stream.'''
+    chunks = []
+    size = 0
+    while size < min_size and not self._eof:
+      chunk = self._read_chunk()
+      if not chunk:
+        self._eof = True
+        break
+      chunks.append(chunk)
+      size += len(chunk)
+    if not chunks:
+      return False
+    # Drop everything that was already consumed so the buffer only ever holds
+    # the tail of a partially read value plus the new chunks.
+    chunks[0:0] = [self._buffer[self._pos:]]
+    self._buffer = ''.join(chunks)
+    self._pos = 0
+    return True
+
+  def _SkipWhitespace(self):
+    '''Advances past whitespace and returns the next character, or '' at the
+    end of the stream.'''
+    while True:
+      self._pos = _WHITESPACE_RE.match(self._buffer, self._pos).end()
+      if self._pos < len(self._buffer):
+        return self._buffer[self._pos]
+      if not self._Fill():
+        return ''
+
+  def _DecodeValue(self):
+    while True:
+      try:
+        value, end = self._decoder.raw_decode(self._buffer, self._pos)
+      except ValueError:
+        # The value continues past the buffer. Reading at least as much again
+        # as the partial value before retrying keeps the number of decoding
+        # attempts and buffer copies logarithmic in the size of large values,
+        # like a systemTraceEvents string, instead of linear.
+        if not self._Fill(len(self._buffer) - self._pos):
+          raise
+        continue
+      # A value that runs up to the end of the buffer may be a number or
+      # literal that continues in the next chunk, so only trust it once we
+      # have seen what follows it.
+      if end < len(self._buffer) or not self._Fill():
+        self._pos = end
+        return value
+
+  def _IterArray(self):
+    c = self._SkipWhitespace()
+    while c and c != ']':
+      yield self._DecodeValue()
+      c = self._SkipWhitespace()
+      if c == ',':
+        self._pos += 1
+        c = self._SkipWhitespace()
+      elif c and c != ']':
+        raise ValueError('Expected , or ] in trace event array, found %r' % c)
+    if c == ']':
+      self._pos += 1
+
+  def _IterContainer(self):
+    c = self._SkipWhitespace()
+    while c and c != '}':
+      field_name = self._DecodeValue()
+      if not isinstance(field_name, basestring):
+        raise ValueError('Expected a field name in trace container')
+      if self._SkipWhitespace() != ':':
+        raise ValueError('Expected : after field %s' % field_name)
+      self._pos += 1
+
+      c = self._SkipWhitespace()
+      if field_name == 'traceEvents' and c == '[':
+        self._pos += 1
+        for event in self._IterArray():
+          yield event
+      else:
+        # Any other fields in the container should be treated as metadata.
+        self.metadata.append({
+            'name': field_name,
+            'value': self._DecodeValue()})
+
+      c = self._SkipWhitespace()
+      if c == ',':
+        self._pos += 1
+        c = self._SkipWhitespace()
+      elif c and c != '}':
+        raise ValueError('Expected , or } in trace container, found %r' % c)
+    if c == '}':
+      self._pos += 1
@@ -0,0 +1,95 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import json
+import StringIO
+import unittest
+
+from telemetry.timeline import trace_event_stream
+
+
+_EVENTS = [
+  {'name': 'a', 'args': {'x': 1.5, 'y': [1, 2, 3]}, 'pid': 52, 'ts': 524,
+   'cat': 'foo', 'tid': 53, 'ph': 'B'},
+  {'name': u'\u00e9t\u00e9', 'args': {'s': 'with ] and } and ,'}, 'pid': 52,
+   'ts': 560, 'cat': 'foo', 'tid': 53, 'ph': 'E'},
+  {'name': 'c', 'args': {}, 'pid': 52, 'ts': 123456789012, 'cat': 'foo',
+   'tid': 53, 'ph': 'X', 'dur': 10},
+]
+
+
+def _ReadAll(text, chunk_size=trace_event_stream.DEFAULT_CHUNK_SIZE):
+  reader = trace_event_stream.TraceEventStreamReader(
+      StringIO.StringIO(text), chunk_size=chunk_size)
+  return list(reader), reader.metadata
+
+
+class TraceEventStreamReaderTest(unittest.TestCase):
+  def testEmpty(self):
+    self.assertEqual(([], []), _ReadAll(''))
+    self.assertEqual(([], []), _ReadAll('[]'))
+    self.assertEqual(([], []), _ReadAll('{}'))
+
+  def testArray(self):
+    events, metadata = _ReadAll(json.dumps(_EVENTS))
+    self.assertEqual(_EVENTS, events)
+    self.assertEqual([], metadata)
+
+  def testEveryChunkSize(self):
+    # Exercise every possible split of values across chunk boundaries,
+    # including numbers that could be mistaken for complete values.
+    text = json.dumps({'traceEvents': _EVENTS, 'tabIds': ['1', '2'],
+                       'count': 1234567})
+    for chunk_size in xrange(1, 40):
+      events, metadata = _ReadAll(text, chunk_size=chunk_size)
+      self.assertEqual(_EVENTS, events)
+      self.assertEqual(
+          sorted([{'name': 'tabIds', 'value': ['1', '2']},
+                  {'name': 'count', 'value': 1234567}]),
+          sorted(metadata))
+
+  def testContainerMetadataAroundEvents(self):
+    text = ('{"before": {"a": 1}, "traceEvents": %s, "after": "x"}' %
+            json.dumps(_EVENTS))
+    events, metadata = _ReadAll(text, chunk_size=7)
+    self.assertEqual(_EVENTS, events)
+    self.assertEqual([{'name': 'before', 'value': {'a': 1}},
+                      {'name': 'after', 'value': 'x'}], metadata)
+
+  def testMissingCloseSquareBracket(self):
+    text = json.dumps(_EVENTS)[:-1]
+    self.assertEqual(_EVENTS, _ReadAll(text)[0])
+    self.assertEqual(_EVENTS, _ReadAll(text + ',\r\n')[0])
+
+  def testChunkIterable(self):
+    text = json.dumps(_EVENTS)
+    chunks = [text[i:i + 5] for i in xrange(0, len(text), 5)]
+    reader = trace_event_stream.TraceEventStreamReader(iter(chunks))
+    self.assertEqual(_EVENTS, list(reader))
+
+  def testLargeValueSpanningManyChunks(self):
+    system_trace = ''.join('  <idle>-0 [001] 1234.%06d: sched_switch\n' % i
+                           for i in xrange(100000))
+    text = json.dumps({'traceEvents': _EVENTS,
+                       'systemTraceEvents': system_trace})
+    self.assertTrue(len(text) > 4 * 1024 * 1024)
+    reader = trace_event_stream.TraceEventStreamReader(
+        StringIO.StringIO(text), chunk_size=1024)
+    decoder = reader._decoder  # pylint: disable=W0212
+    calls = []
+    class CountingDecoder(object):
+      def raw_decode(self, s, idx):
+        calls.append(idx)
+        return decoder.raw_decode(s, idx)
+    reader._decoder = CountingDecoder()  # pylint: disable=W0212
+    self.assertEqual(_EVENTS, list(reader))
+    self.assertEqual([{'name': 'systemTraceEvents', 'value': system_trace}],
+                     reader.metadata)
+    # Decoding is retried a logarithmic number of times, not once per chunk.
+    self.assertTrue(len(calls) < 50, len(calls))
+
+  def testMalformed(self):
+    self.assertRaises(ValueError, _ReadAll, 'x')
+    self.assertRaises(ValueError, _ReadAll, '[{"a": 1} {"b": 2}]')
+    self.assertRaises(ValueError, _ReadAll, '[{"a": ')
@@ -2,19 +2,62 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 
+import hashlib
 import json
+import shutil
 
 from telemetry.timeline.timeline_data import TimelineData
 
 
+def IsTraceFile(event_data):
+  """Returns whether event_data is a file-like object holding trace JSON.
+
+  Such event data is imported incrementally instead of being parsed into
+  memory in one go."""
+  return hasattr(event_data, 'read')
+
+
 class TracingTimelineData(TimelineData):
-  def __init__(self, event_data):
+  def __init__(self, event_data, cache_dir=None):
+    """event_data may be a list of trace events, a dict with a traceEvents
+    field, the JSON encoding of either as a string, or a file object from which
+    that JSON can be read. File objects are streamed during import, which keeps
+    memory use low for very large traces, but can only be imported once.
+
+    If cache_dir is given, models imported from this data are saved there and
+    later imports of the same trace load them instead (see model_cache.py)."""
     super(TracingTimelineData, self).__init__()
     self._event_data = event_data
+    self._cache_dir = cache_dir
+
+  @property
+  def cache_dir(self):
+    return self._cache_dir
+
+  def GetContentHash(self):
+    """Returns a hex digest that identifies the trace held by this object.
+
+    File objects are hashed from their position, which they are put back at."""
+    digest = hashlib.sha1()
+    if IsTraceFile(self._event_data):
+      position = self._event_data.tell()
+      for chunk in iter(lambda: self._event_data.read(1 << 20), ''):
+        digest.update(chunk)
+      self._event_data.seek(position)
+    elif isinstance(self._event_data, basestring):
+      digest.update(self._event_data.encode('utf-8')
+                    if isinstance(self._event_data, unicode)
+                    else self._event_data)
+    else:
+      digest.update(json.dumps(self._event_data, sort_keys=True))
+    return digest.hexdigest()
 
   def Serialize(self, f):
     """Serializes the trace result to a file-like object"""
-    if 'traceEvents' in self._event_data:
+    if IsTraceFile(self._event_data):
+      self._event_data.seek(0)
+      shutil.copyfileobj(self._event_data, f)
+    elif 'traceEvents' in self._event_data:
       json.dump(self._event_data, f, indent=4)
     else:
       json.dump({'traceEvents' : self._event_data}, f, indent=4)
@@ -237,7 +237,8 @@ class CloudStorageModuleStub(object):
     CloudStorageModuleStub.CheckPermissionLevelForBucket(self, bucket)
     return remote_path in self.remote_paths[bucket]
 
-  def Insert(self, bucket, remote_path, local_path):
+  def Insert(self, bucket, remote_path, local_path, publicly_readable=False,
+             content_encoding=None, content_type=None):  # pylint: disable=W0613
     CloudStorageModuleStub.CheckPermissionLevelForBucket(self, bucket)
     if not local_path in self.GetLocalDataFiles():
       file_path_error = 'Local file path does not exist'
@@ -279,6 +280,10 @@ class CloudStorageModuleStub(object):
           self, self.INTERNAL_BUCKET, remote_path, local_path, True)
     return result
 
+  def GetFilesIfChanged(self, file_paths, bucket=None):
+    return [file_path for file_path in file_paths
+            if CloudStorageModuleStub.GetIfChanged(self, file_path, bucket)]
+
   def CalculateHash(self, file_path):
     return self.local_file_hashes[file_path]
 
@@ -129,7 +129,8 @@ def _UpdateUserStoryArchivesIfChanged(page_set):
     if page.is_file:
       all_serving_dirs.add(page.serving_dir)
   # Scan all serving dirs.
-  for serving_dir in all_serving_dirs:
+  paths = []
+  for serving_dir in sorted(all_serving_dirs):
     if os.path.splitdrive(serving_dir)[1] == '/':
       raise ValueError('Trying to serve root directory from HTTP server.')
     for dirpath, _, filenames in os.walk(serving_dir):
@@ -138,7 +139,9 @@ def _UpdateUserStoryArchivesIfChanged(page_set):
             os.path.join(dirpath, filename))
         if extension != '.sha1':
           continue
-        cloud_storage.GetIfChanged(path, page_set.bucket)
+        paths.append(path)
+  # Hashes and downloads the files in parallel.
+  cloud_storage.GetFilesIfChanged(paths, page_set.bucket)
 
 
 class UserStoryGroup(object):
@@ -8,10 +8,15 @@ import contextlib
 import cStringIO
 import hashlib
 import logging
+from multiprocessing import pool
 import os
+import shutil
 import subprocess
 import sys
 import tarfile
+import tempfile
+import threading
+import time
 import urllib2
 
 from telemetry.core import util
@@ -36,6 +41,23 @@ _DOWNLOAD_PATH = os.path.join(path.GetTelemetryDir(), 'third_party', 'gsutil')
 #     http://crbug.com/359293. See |_RunCommand|.
 _CROS_GSUTIL_HOME_WAR = '/home/chromeos-test/'
 
+# FindGsutil may download gsutil, which must only happen once at a time.
+_gsutil_lock = threading.Lock()
+
+# Downloaded files are kept here by hash, so that all checkouts of a user share
+# them. See FileCache.
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'),
+                                 '.telemetry-cloud-storage-cache')
+DEFAULT_MAX_CACHE_SIZE = 4 * 1024 * 1024 * 1024
+# Setting this environment variable to 1 turns the default cache off.
+DISABLE_CACHE_ENV = 'TELEMETRY_DISABLE_CLOUD_STORAGE_CACHE'
+# Temporary files in the cache directory start with this, and are only
+# evicted once they are older than _MAX_TEMP_FILE_AGE seconds.
+_TEMP_FILE_PREFIX = '.tmp-'
+_MAX_TEMP_FILE_AGE = 24 * 60 * 60
+_DEFAULT_HASH_THREADS = 8
+_DEFAULT_DOWNLOAD_THREADS = 8
+
 
 class CloudStorageError(Exception):
   @staticmethod
@@ -102,13 +124,14 @@ def FindGsutil():
   #if gsutil_path:
   #  return gsutil_path
 
-  # Look for a gsutil installation.
-  gsutil_path = _FindExecutableInPath('gsutil', _DOWNLOAD_PATH)
-  if gsutil_path:
-    return gsutil_path
+  with _gsutil_lock:
+    # Look for a gsutil installation.
+    gsutil_path = _FindExecutableInPath('gsutil', _DOWNLOAD_PATH)
+    if gsutil_path:
+      return gsutil_path
 
-  # Failed to find it. Download it!
-  return _DownloadGsutil()
+    # Failed to find it. Download it!
+    return _DownloadGsutil()
 
 
 def SupportsProdaccess(gsutil_path):
@@ -191,7 +214,8 @@ def Get(bucket, remote_path, local_path):
     _RunCommand(['cp', url, local_path])
 
 
-def Insert(bucket, remote_path, local_path, publicly_readable=False):
+def Insert(bucket, remote_path, local_path, publicly_readable=False,
+           content_encoding=None, content_type=None):
   """ Upload file in |local_path| to cloud storage.
   Args:
     bucket: the google cloud storage bucket name.
@@ -199,12 +223,21 @@ def Insert(bucket, remote_path, local_path, publicly_readable=False):
     local_path: path of the local file to be uploaded.
     publicly_readable: whether the uploaded file has publicly readable
     permission.
+    content_encoding: the Content-Encoding header of the uploaded file, e.g.
+    'gzip' if the file in |local_path| is gzipped.
+    content_type: the Content-Type header of the uploaded file. If None,
+    gsutil guesses it from the name of |local_path|.
 
   Returns:
     The url where the file is uploaded to.
   """
   url = 'gs://%s/%s' % (bucket, remote_path)
-  command_and_args = ['cp']
+  command_and_args = []
+  if content_encoding:
+    command_and_args += ['-h', 'Content-Encoding:%s' % content_encoding]
+  if content_type:
+    command_and_args += ['-h', 'Content-Type:%s' % content_type]
+  command_and_args += ['cp']
   extra_info = ''
   if publicly_readable:
     command_and_args += ['-a', 'public-read']
@@ -216,40 +249,257 @@ def Insert(bucket, remote_path, local_path, publicly_readable=False):
       bucket, remote_path)
 
 
-def GetIfChanged(file_path, bucket=None):
-  """Gets the file at file_path if it has a hash file that doesn't match.
+class FileCache(object):
+  """A content-addressed cache of downloaded files, shared across checkouts.
 
-  If the file is not in Cloud Storage, log a warning instead of raising an
-  exception. We assume that the user just hasn't uploaded the file yet.
+  Files are stored under their SHA-1 hash, so a file that is needed by
+  several checkouts, or again after a checkout went back to an older version,
+  is only downloaded once. Entries are added and copied out through
+  temporary files and renames, so several processes can use the cache at
+  once. When the cache grows beyond max_size bytes, the least recently used
+  files are deleted.
 
-  Returns:
-    True if the binary was changed.
+  The cache is only an optimization: failures to read or write it are logged
+  and otherwise ignored.
   """
-  hash_path = file_path + '.sha1'
-  if not os.path.exists(hash_path):
-    logging.warning('Hash file not found: %s' % hash_path)
-    return False
 
-  expected_hash = ReadHash(hash_path)
-  if os.path.exists(file_path) and CalculateHash(file_path) == expected_hash:
-    return False
+  def __init__(self, cache_dir=DEFAULT_CACHE_DIR,
+               max_size=DEFAULT_MAX_CACHE_SIZE):
+    self._cache_dir = cache_dir
+    self._max_size = max_size
 
-  if bucket:
-    buckets = [bucket]
-  else:
-    buckets = [PUBLIC_BUCKET, PARTNER_BUCKET, INTERNAL_BUCKET]
+  def _GetPath(self, file_hash):
+    return os.path.join(self._cache_dir, file_hash[:2], file_hash)
+
+  def Get(self, file_hash, local_path):
+    """Copies the file with file_hash to local_path.
+
+    An entry that does not match its hash, e.g. because it was corrupted on
+    disk, is deleted instead.
+
+    Returns:
+      True if the file was in the cache.
+    """
+    cache_path = self._GetPath(file_hash)
+    if not os.path.exists(cache_path):
+      return False
+    try:
+      if CalculateHash(cache_path) != file_hash:
+        logging.warning('Deleting %s from the cache, which does not match its '
+                        'hash.', cache_path)
+        os.remove(cache_path)
+        return False
+      _CopyFile(cache_path, local_path)
+      # The modification time of an entry is the time it was last used.
+      os.utime(cache_path, None)
+    except (IOError, OSError):
+      logging.warning('Failed to copy %s from the cache.', local_path,
+                      exc_info=True)
+      return False
+    return True
+
+  def Put(self, file_hash, local_path):
+    """Adds the file at local_path, whose hash is file_hash, to the cache.
 
+    Call Evict afterwards to keep the cache within its maximum size.
+    """
+    try:
+      _CopyFile(local_path, self._GetPath(file_hash))
+    except (IOError, OSError):
+      logging.warning('Failed to add %s to the cache.', local_path,
+                      exc_info=True)
+
+  def Evict(self):
+    """Deletes the least recently used files until the cache fits in its
+    maximum size."""
+    entries = []
+    total_size = 0
+    now = time.time()
+    for dirpath, _, filenames in os.walk(self._cache_dir):
+      for filename in filenames:
+        file_path = os.path.join(dirpath, filename)
+        try:
+          fs = os.stat(file_path)
+        except OSError:
+          continue  # Deleted by another process.
+        if (filename.startswith(_TEMP_FILE_PREFIX) and
+            now - fs.st_mtime < _MAX_TEMP_FILE_AGE):
+          continue  # Still being written by another process.
+        entries.append((fs.st_mtime, fs.st_size, file_path))
+        total_size += fs.st_size
+    entries.sort()
+    for _, size, file_path in entries:
+      if total_size <= self._max_size:
+        break
+      try:
+        os.remove(file_path)
+      except OSError:
+        logging.warning('Failed to evict %s from the cache.', file_path,
+                        exc_info=True)
+        continue
+      total_size -= size
+
+
+def _CopyFile(source_path, destination_path):
+  """Copies a file through a temporary file in the destination directory, so
+  that nobody sees a partial file at destination_path."""
+  destination_dir = os.path.dirname(os.path.abspath(destination_path))
+  if not os.path.isdir(destination_dir):
+    try:
+      os.makedirs(destination_dir)
+    except OSError:
+      if not os.path.isdir(destination_dir):
+        raise
+  fd, temp_path = tempfile.mkstemp(prefix=_TEMP_FILE_PREFIX,
+                                   dir=destination_dir)
+  try:
+    with os.fdopen(fd, 'wb') as f:
+      with open(source_path, 'rb') as source:
+        shutil.copyfileobj(source, f, 1024 * 1024)
+    if sys.platform == 'win32' and os.path.exists(destination_path):
+      os.remove(destination_path)
+    os.rename(temp_path, destination_path)
+  finally:
+    if os.path.exists(temp_path):
+      os.remove(temp_path)
+
+
+def _GetFromBuckets(buckets, expected_hash, file_path):
+  """Downloads the file with expected_hash from the first of buckets that has
+  it, and returns whether one did."""
   for bucket in buckets:
     try:
       Get(bucket, expected_hash, file_path)
       return True
     except NotFoundError:
       continue
-
-  logging.warning('Unable to find file in Cloud Storage: %s', file_path)
   return False
 
 
+def _ParallelMap(function, items, num_threads):
+  """Like map, on up to num_threads threads."""
+  if len(items) < 2 or num_threads < 2:
+    return map(function, items)
+  thread_pool = pool.ThreadPool(min(num_threads, len(items)))
+  try:
+    return thread_pool.map(function, items)
+  finally:
+    thread_pool.close()
+    thread_pool.join()
+
+
+class _NoFileCache(object):
+  """Stands in for a FileCache when caching is turned off."""
+
+  def Get(self, file_hash, local_path):  # pylint: disable=W0613
+    return False
+
+  def Put(self, file_hash, local_path):  # pylint: disable=W0613
+    pass
+
+  def Evict(self):
+    pass
+
+
+def _GetDefaultCache():
+  if os.environ.get(DISABLE_CACHE_ENV) == '1' or util.IsRunningOnCrosDevice():
+    return _NoFileCache()
+  return FileCache()
+
+
+def _GetHashIfExists(file_path):
+  if not os.path.exists(file_path):
+    return None
+  return CalculateHash(file_path)
+
+
+def GetFilesIfChanged(file_paths, bucket=None, cache=None,
+                      hash_threads=_DEFAULT_HASH_THREADS,
+                      download_threads=_DEFAULT_DOWNLOAD_THREADS):
+  """Gets the files at file_paths whose hash files don't match them.
+
+  Like GetIfChanged on each file, but the local files are hashed in parallel,
+  files are copied from cache when it has them, and the others are downloaded
+  by up to download_threads gsutil processes at once. Downloaded files are
+  added to the cache.
+
+  Args:
+    file_paths: Paths of files with a .sha1 hash file next to them.
+    bucket: The bucket to get the files from. If None, the public, partner and
+        internal buckets are tried in order.
+    cache: A FileCache. If None, the cache in DEFAULT_CACHE_DIR is used,
+        unless the DISABLE_CACHE_ENV environment variable is set to 1 or this
+        runs on a ChromeOS device, whose disk is small.
+
+  Returns:
+    The list of the file_paths that were changed, in order.
+  """
+  if cache is None:
+    cache = _GetDefaultCache()
+  if bucket:
+    buckets = [bucket]
+  else:
+    buckets = [PUBLIC_BUCKET, PARTNER_BUCKET, INTERNAL_BUCKET]
+
+  expected_hashes = {}
+  candidates = []
+  for file_path in file_paths:
+    if file_path in expected_hashes:
+      continue
+    hash_path = file_path + '.sha1'
+    if not os.path.exists(hash_path):
+      logging.warning('Hash file not found: %s' % hash_path)
+      continue
+    expected_hashes[file_path] = ReadHash(hash_path)
+    candidates.append(file_path)
+  if not candidates:
+    return []
+
+  start_time = time.time()
+  local_hashes = _ParallelMap(_GetHashIfExists, candidates, hash_threads)
+  stale_paths = [p for p, local_hash in zip(candidates, local_hashes)
+                 if local_hash != expected_hashes[p]]
+  to_download = [p for p in stale_paths
+                 if not cache.Get(expected_hashes[p], p)]
+
+  def Download(file_path):
+    expected_hash = expected_hashes[file_path]
+    if not _GetFromBuckets(buckets, expected_hash, file_path):
+      logging.warning('Unable to find file in Cloud Storage: %s', file_path)
+      return False
+    if CalculateHash(file_path) == expected_hash:
+      cache.Put(expected_hash, file_path)
+    else:
+      logging.warning('Downloaded %s does not match its hash file.',
+                      file_path)
+    return True
+
+  downloaded = dict(zip(to_download,
+                        _ParallelMap(Download, to_download, download_threads)))
+  if to_download:
+    cache.Evict()
+  changed_paths = [p for p in stale_paths if downloaded.get(p, True)]
+  if stale_paths:
+    logging.info('Updated %d of %d files in %.1fs: %d from the cache, %d '
+                 'downloaded.', len(changed_paths), len(candidates),
+                 time.time() - start_time,
+                 len(stale_paths) - len(to_download),
+                 sum(1 for d in downloaded.itervalues() if d))
+  return changed_paths
+
+
+def GetIfChanged(file_path, bucket=None):
+  """Gets the file at file_path if it has a hash file that doesn't match.
+
+  If the file is not in Cloud Storage, log a warning instead of raising an
+  exception. We assume that the user just hasn't uploaded the file yet.
+
+  Returns:
+    True if the binary was changed.
+  """
+  return bool(GetFilesIfChanged([file_path], bucket))
+
+
 def CalculateHash(file_path):
   """Calculates and returns the hash of the file at file_path."""
   sha1 = hashlib.sha1()
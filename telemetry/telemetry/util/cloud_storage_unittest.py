@@ -2,6 +2,10 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 
+import hashlib
+import os
+import shutil
+import tempfile
 import unittest
 
 from telemetry import decorators
@@ -33,6 +37,20 @@ class CloudStorageUnitTest(unittest.TestCase):
     finally:
       cloud_storage._RunCommand = orig_run_command
 
+  def testInsertCompressed(self):
+    orig_run_command = cloud_storage._RunCommand
+    commands = []
+    try:
+      cloud_storage._RunCommand = commands.append
+      cloud_storage.Insert(cloud_storage.PUBLIC_BUCKET, 'trace.html',
+                           '/tmp/trace.gz', content_encoding='gzip',
+                           content_type='text/html')
+    finally:
+      cloud_storage._RunCommand = orig_run_command
+    self.assertEqual(
+        [['-h', 'Content-Encoding:gzip', '-h', 'Content-Type:text/html', 'cp',
+          '/tmp/trace.gz', 'gs://chromium-telemetry/trace.html']], commands)
+
   def testExistsReturnsFalse(self):
     stubs = system_stub.Override(cloud_storage, ['subprocess'])
     orig_find_gs_util = cloud_storage.FindGsutil
@@ -47,3 +65,192 @@ class CloudStorageUnitTest(unittest.TestCase):
     finally:
       stubs.Restore()
       cloud_storage.FindGsutil = orig_find_gs_util
+
+
+# Stands in for gsutil cp. It serves gs://bucket/path from buckets/bucket/path
+# next to itself and records each download in buckets/downloads.
+_FAKE_GSUTIL = """
+import os
+import shutil
+import sys
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'buckets')
+command, url, local_path = sys.argv[1:]
+assert command == 'cp'
+remote_path = os.path.join(root, *url[len('gs://'):].split('/'))
+if not os.path.exists(remote_path):
+  sys.stderr.write('CommandException: No URLs matched: %s\\n' % url)
+  sys.exit(1)
+with open(os.path.join(root, 'downloads'), 'a') as f:
+  f.write(url + '\\n')
+shutil.copyfile(remote_path, local_path)
+"""
+
+
+class GetFilesIfChangedTest(unittest.TestCase):
+  def setUp(self):
+    self._temp_dir = tempfile.mkdtemp()
+    self._checkout_dir = os.path.join(self._temp_dir, 'checkout')
+    os.mkdir(self._checkout_dir)
+    gsutil_path = os.path.join(self._temp_dir, 'gsutil')
+    with open(gsutil_path, 'w') as f:
+      f.write(_FAKE_GSUTIL)
+    self._buckets_dir = os.path.join(self._temp_dir, 'buckets')
+    for bucket in (cloud_storage.PUBLIC_BUCKET, cloud_storage.INTERNAL_BUCKET):
+      os.makedirs(os.path.join(self._buckets_dir, bucket))
+    self._cache = cloud_storage.FileCache(
+        os.path.join(self._temp_dir, 'cache'))
+    self._orig_find_gsutil = cloud_storage.FindGsutil
+    cloud_storage.FindGsutil = lambda: gsutil_path
+
+  def tearDown(self):
+    cloud_storage.FindGsutil = self._orig_find_gsutil
+    shutil.rmtree(self._temp_dir)
+
+  def _Upload(self, contents, bucket=cloud_storage.PUBLIC_BUCKET):
+    file_hash = hashlib.sha1(contents).hexdigest()
+    with open(os.path.join(self._buckets_dir, bucket, file_hash), 'wb') as f:
+      f.write(contents)
+    return file_hash
+
+  def _AddFile(self, name, file_hash, contents=None,
+               checkout_dir=None):
+    file_path = os.path.join(checkout_dir or self._checkout_dir, name)
+    with open(file_path + '.sha1', 'w') as f:
+      f.write(file_hash + '\n')
+    if contents is not None:
+      with open(file_path, 'wb') as f:
+        f.write(contents)
+    return file_path
+
+  def _GetDownloads(self):
+    downloads_path = os.path.join(self._buckets_dir, 'downloads')
+    if not os.path.exists(downloads_path):
+      return []
+    with open(downloads_path) as f:
+      return sorted(f.read().splitlines())
+
+  def _ReadFile(self, file_path):
+    with open(file_path, 'rb') as f:
+      return f.read()
+
+  def testGetsChangedFiles(self):
+    current = self._AddFile('current.wpr', self._Upload('current'), 'current')
+    stale = self._AddFile('stale.wpr', self._Upload('new'), 'old')
+    missing = self._AddFile('missing.wpr', self._Upload('missing'))
+    not_uploaded = self._AddFile('not_uploaded.wpr',
+                                 hashlib.sha1('unknown').hexdigest())
+    changed = cloud_storage.GetFilesIfChanged(
+        [current, stale, missing, not_uploaded, stale],
+        cloud_storage.PUBLIC_BUCKET, cache=self._cache)
+    self.assertEquals([stale, missing], changed)
+    self.assertEquals('new', self._ReadFile(stale))
+    self.assertEquals('missing', self._ReadFile(missing))
+    self.assertFalse(os.path.exists(not_uploaded))
+    self.assertEquals(2, len(self._GetDownloads()))
+
+  def testTriesAllBucketsInOrder(self):
+    internal = self._AddFile(
+        'internal.wpr', self._Upload('internal', cloud_storage.INTERNAL_BUCKET))
+    self.assertEquals([internal], cloud_storage.GetFilesIfChanged(
+        [internal], cache=self._cache))
+    self.assertEquals(
+        ['gs://%s/%s' % (cloud_storage.INTERNAL_BUCKET,
+                         hashlib.sha1('internal').hexdigest())],
+        self._GetDownloads())
+
+  def testCopiesFilesFromTheCache(self):
+    file_hash = self._Upload('shared')
+    first = self._AddFile('shared.wpr', file_hash)
+    cloud_storage.GetFilesIfChanged([first], cache=self._cache)
+
+    # Another checkout needs the same file.
+    other_checkout_dir = os.path.join(self._temp_dir, 'other_checkout')
+    os.mkdir(other_checkout_dir)
+    second = self._AddFile('shared.wpr', file_hash,
+                           checkout_dir=other_checkout_dir)
+    self.assertEquals([second], cloud_storage.GetFilesIfChanged(
+        [second], cache=self._cache))
+    self.assertEquals('shared', self._ReadFile(second))
+    self.assertEquals(1, len(self._GetDownloads()))
+
+  def testGetIfChanged(self):
+    file_path = self._AddFile('file.wpr', self._Upload('contents'))
+    orig_file_cache = cloud_storage.FileCache
+    cloud_storage.FileCache = lambda: self._cache
+    try:
+      self.assertTrue(cloud_storage.GetIfChanged(file_path))
+      self.assertFalse(cloud_storage.GetIfChanged(file_path))
+    finally:
+      cloud_storage.FileCache = orig_file_cache
+    self.assertEquals(1, len(self._GetDownloads()))
+
+
+class FileCacheTest(unittest.TestCase):
+  def setUp(self):
+    self._temp_dir = tempfile.mkdtemp()
+    self._cache_dir = os.path.join(self._temp_dir, 'cache')
+
+  def tearDown(self):
+    shutil.rmtree(self._temp_dir)
+
+  def _WriteFile(self, name, contents):
+    file_path = os.path.join(self._temp_dir, name)
+    with open(file_path, 'wb') as f:
+      f.write(contents)
+    return file_path
+
+  def _Put(self, cache, contents, mtime=None):
+    file_hash = hashlib.sha1(contents).hexdigest()
+    cache.Put(file_hash, self._WriteFile(contents, contents))
+    cache_path = os.path.join(self._cache_dir, file_hash[:2], file_hash)
+    if mtime is not None:
+      os.utime(cache_path, (mtime, mtime))
+    return file_hash, cache_path
+
+  def testEvictsLeastRecentlyUsedFiles(self):
+    cache = cloud_storage.FileCache(self._cache_dir, max_size=25)
+    a, b, c = [self._Put(cache, name * 10, 1000 + i)[0]
+               for i, name in enumerate(['a', 'b', 'c'])]
+    # Using a makes b the least recently used file.
+    self.assertTrue(cache.Get(a, os.path.join(self._temp_dir, 'a2')))
+    cache.Evict()
+    self.assertFalse(cache.Get(b, os.path.join(self._temp_dir, 'b2')))
+    self.assertTrue(cache.Get(a, os.path.join(self._temp_dir, 'a3')))
+    self.assertTrue(cache.Get(c, os.path.join(self._temp_dir, 'c2')))
+    with open(os.path.join(self._temp_dir, 'a3'), 'rb') as f:
+      self.assertEquals('a' * 10, f.read())
+
+  def testDeletesEntriesThatDoNotMatchTheirHash(self):
+    cache = cloud_storage.FileCache(self._cache_dir)
+    file_hash, cache_path = self._Put(cache, 'contents')
+    with open(cache_path, 'wb') as f:
+      f.write('corrupt')
+    local_path = os.path.join(self._temp_dir, 'local')
+    self.assertFalse(cache.Get(file_hash, local_path))
+    self.assertFalse(os.path.exists(cache_path))
+    self.assertFalse(os.path.exists(local_path))
+
+  def testEvictSkipsFilesBeingWritten(self):
+    cache = cloud_storage.FileCache(self._cache_dir, max_size=0)
+    _, cache_path = self._Put(cache, 'contents')
+    os.makedirs(os.path.join(self._cache_dir, 'ab'))
+    temp_path = os.path.join(self._cache_dir, 'ab', '.tmp-new')
+    stale_temp_path = os.path.join(self._cache_dir, 'ab', '.tmp-old')
+    for file_path in (temp_path, stale_temp_path):
+      with open(file_path, 'wb') as f:
+        f.write('partial')
+    os.utime(stale_temp_path, (1000, 1000))
+    cache.Evict()
+    self.assertFalse(os.path.exists(cache_path))
+    self.assertFalse(os.path.exists(stale_temp_path))
+    self.assertTrue(os.path.exists(temp_path))
+
+  def testDefaultCacheCanBeDisabled(self):
+    get_default_cache = cloud_storage._GetDefaultCache  # pylint: disable=W0212
+    os.environ[cloud_storage.DISABLE_CACHE_ENV] = '1'
+    try:
+      self.assertFalse(isinstance(get_default_cache(),
+                                  cloud_storage.FileCache))
+    finally:
+      del os.environ[cloud_storage.DISABLE_CACHE_ENV]
@@ -4,9 +4,12 @@
 
 import os
 import shutil
+import threading
 
 
 _next_file_id = 0
+# Trace values can be serialized on several threads at once.
+_next_file_id_lock = threading.Lock()
 
 
 class FileHandle(object):
@@ -28,8 +31,9 @@ class FileHandle(object):
     self._absolute_path = absolute_path
 
     global _next_file_id
-    self._id = _next_file_id
-    _next_file_id += 1
+    with _next_file_id_lock:
+      self._id = _next_file_id
+      _next_file_id += 1
 
   @property
   def id(self):
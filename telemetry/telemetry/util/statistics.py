@@ -2,10 +2,19 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 
-"""A collection of statistical utility functions to be used by metrics."""
+"""A collection of statistical utility functions to be used by metrics.
+
+The functions that are slow on long lists of samples use the versions in
+statistics_numpy.py instead when NumPy is available.
+"""
 
 import math
 
+try:
+  from telemetry.util import statistics_numpy
+except ImportError:
+  statistics_numpy = None  # NumPy is not installed
+
 
 def Clamp(value, low=0.0, high=1.0):
   """Clamp a value between some low and high value."""
@@ -24,6 +33,8 @@ def NormalizeSamples(samples):
   is not bounded (it is for Monte Carlo integration, where discrepancy was
   first used).
   """
+  if statistics_numpy:
+    return statistics_numpy.NormalizeSamples(samples)
   if not samples:
     return samples, 1.0
   samples = sorted(samples)
@@ -48,6 +59,8 @@ def Discrepancy(samples, location_count=None):
   http://en.wikipedia.org/wiki/Low-discrepancy_sequence
   http://mathworld.wolfram.com/Discrepancy.html
   """
+  if statistics_numpy:
+    return statistics_numpy.Discrepancy(samples, location_count)
   if not samples:
     return 0.0
 
@@ -182,7 +195,10 @@ def DurationsDiscrepancy(durations, absolute=True,
   if not durations:
     return 0.0
 
-  timestamps = reduce(lambda x, y: x + [x[-1] + y], durations, [0])
+  if statistics_numpy:
+    timestamps = statistics_numpy.CumulativeSums(durations)
+  else:
+    timestamps = reduce(lambda x, y: x + [x[-1] + y], durations, [0])
   return TimestampsDiscrepancy(timestamps, absolute, location_count)
 
 
@@ -209,6 +225,8 @@ def StandardDeviation(data):
   Returns:
     The standard deviation of the samples provided.
   """
+  if statistics_numpy:
+    return statistics_numpy.StandardDeviation(data)
   if len(data) == 1:
     return 0.0
 
@@ -295,6 +313,8 @@ def Percentile(values, percentile):
   Returns:
     The Nth percentile for the list of values, where N is the given percentage.
   """
+  if statistics_numpy:
+    return statistics_numpy.Percentile(values, percentile)
   if not values:
     return 0.0
   sorted_values = sorted(values)
@@ -314,6 +334,8 @@ def Percentile(values, percentile):
 
 def GeometricMean(values):
   """Compute a rounded geometric mean from an array of values."""
+  if statistics_numpy:
+    return statistics_numpy.GeometricMean(values)
   if not values:
     return None
   # To avoid infinite value errors, make sure no value is less than 0.001.
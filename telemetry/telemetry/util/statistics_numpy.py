@@ -0,0 +1,121 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""NumPy implementations of the slow functions of statistics.py.
+
+statistics.py uses these when NumPy can be imported. They return the same
+values as the pure Python versions, up to floating point rounding, and are
+documented there.
+"""
+
+import numpy  # pylint: disable=F0401
+
+
+def NormalizeSamples(samples):
+  if not len(samples):
+    return samples, 1.0
+  samples = numpy.sort(numpy.asarray(samples, dtype=float))
+  low = samples[0]
+  high = samples[-1]
+  new_low = 0.5 / len(samples)
+  new_high = (len(samples)-0.5) / len(samples)
+  if high-low == 0.0:
+    return [0.5] * len(samples), 1.0
+  scale = (new_high - new_low) / (high - low)
+  return ((samples - low) * scale + new_low).tolist(), float(scale)
+
+
+def Discrepancy(samples, location_count=None):
+  """Computes the discrepancy in O(N) for N samples or locations.
+
+  The pure Python version looks at every interval [location i, location j]
+  and takes the largest of |count(i, j) / N - length(i, j)|. Both the count of
+  samples in and the length of an interval are differences of a value at j
+  and a value at i, so with
+    a[k] = count_less_equal[k] / N - locations[k]
+    b[k] = count_less[k] / N - locations[k]
+  the local discrepancies of closed intervals are |a[j] - b[i]| and those of
+  open intervals |b[j] - a[i]|. Their largest value over all i < j is found
+  from running minimums and maximums of a and b.
+  """
+  if not len(samples):
+    return 0.0
+  samples = numpy.asarray(samples, dtype=float)
+  sample_count = len(samples)
+  inv_sample_count = 1.0 / sample_count
+
+  if location_count:
+    locations = (numpy.arange(int(location_count), dtype=float) /
+                 (location_count-1))
+    count_less = numpy.searchsorted(samples, locations, side='left')
+    count_less_equal = numpy.searchsorted(samples, locations, side='right')
+  else:
+    # Use the sample positions as locations. Add 0 and 1 if necessary.
+    locations = [samples]
+    count_less = [numpy.arange(sample_count)]
+    count_less_equal = [numpy.arange(1, sample_count + 1)]
+    if samples[0] > 0.0:
+      locations.insert(0, [0.0])
+      count_less.insert(0, [0])
+      count_less_equal.insert(0, [0])
+    if samples[-1] < 1.0:
+      locations.append([1.0])
+      count_less.append([sample_count])
+      count_less_equal.append([sample_count])
+    locations = numpy.concatenate(locations)
+    count_less = numpy.concatenate(count_less)
+    count_less_equal = numpy.concatenate(count_less_equal)
+
+  if len(locations) < 2:
+    return 0.0
+  a = count_less_equal * inv_sample_count - locations
+  b = count_less * inv_sample_count - locations
+  max_local_discrepancy = 0.0
+  for at_j, at_i in ((a, b), (b, a)):
+    max_local_discrepancy = max(
+        max_local_discrepancy,
+        numpy.max(at_j[1:] - numpy.minimum.accumulate(at_i[:-1])),
+        numpy.max(numpy.maximum.accumulate(at_i[:-1]) - at_j[1:]))
+  return float(max_local_discrepancy)
+
+
+def CumulativeSums(durations):
+  """Returns [0, d0, d0 + d1, ...] for the durations."""
+  timestamps = numpy.empty(len(durations) + 1)
+  timestamps[0] = 0
+  numpy.cumsum(durations, out=timestamps[1:])
+  return timestamps.tolist()
+
+
+def StandardDeviation(data):
+  if len(data) <= 1:
+    return 0.0
+  return float(numpy.std(numpy.asarray(data, dtype=float)))
+
+
+def Percentile(values, percentile):
+  if not len(values):
+    return 0.0
+  sorted_values = numpy.sort(values)
+  n = len(values)
+  percentile /= 100.0
+  if percentile <= 0.5 / n:
+    return sorted_values[0].item()
+  elif percentile >= (n - 0.5) / n:
+    return sorted_values[-1].item()
+  else:
+    floor_index = int(numpy.floor(n * percentile -  0.5))
+    floor_value = sorted_values[floor_index].item()
+    ceil_value = sorted_values[floor_index+1].item()
+    alpha = n * percentile - 0.5 - floor_index
+    return floor_value + alpha * (ceil_value - floor_value)
+
+
+def GeometricMean(values):
+  if not len(values):
+    return None
+  # To avoid infinite value errors, make sure no value is less than 0.001.
+  log_values = numpy.log(numpy.maximum(numpy.asarray(values, dtype=float),
+                                       0.001))
+  return int(round(numpy.exp(numpy.mean(log_values))))
@@ -0,0 +1,100 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import random
+import unittest
+
+from telemetry.util import statistics
+
+
+def _CreateRandomTimestamps(rng):
+  """Returns timestamps like those of frames, with random janks, repeats and
+  sometimes integer values."""
+  timestamps = [0.0]
+  for _ in xrange(rng.randint(1, 60)):
+    kind = rng.random()
+    if kind < 0.1:
+      interval = 0.0
+    elif kind < 0.2:
+      interval = rng.uniform(30, 300)
+    else:
+      interval = rng.uniform(15, 18)
+    timestamps.append(timestamps[-1] + interval)
+  if rng.random() < 0.2:
+    timestamps = [int(t) for t in timestamps]
+  return timestamps
+
+
+@unittest.skipUnless(statistics.statistics_numpy, 'NumPy is not installed.')
+class StatisticsNumpyUnitTest(unittest.TestCase):
+  """Checks that the NumPy functions match the pure Python ones on random
+  inputs."""
+
+  def setUp(self):
+    self._rng = random.Random(0)
+
+  def _AssertMatches(self, function, *args):
+    numpy_result = function(*args)
+    statistics_numpy = statistics.statistics_numpy
+    statistics.statistics_numpy = None
+    try:
+      python_result = function(*args)
+    finally:
+      statistics.statistics_numpy = statistics_numpy
+    message = '%s%r' % (function.__name__, args)
+    if isinstance(python_result, tuple):
+      self.assertEqual(len(python_result), len(numpy_result), message)
+      for python_value, numpy_value in zip(python_result, numpy_result):
+        self._AssertValuesMatch(python_value, numpy_value, message)
+    else:
+      self._AssertValuesMatch(python_result, numpy_result, message)
+
+  def _AssertValuesMatch(self, python_value, numpy_value, message):
+    if isinstance(python_value, list):
+      self.assertEqual(len(python_value), len(numpy_value), message)
+      for p, n in zip(python_value, numpy_value):
+        self.assertAlmostEqual(p, n, places=9, msg=message)
+    elif python_value is None or isinstance(python_value, int):
+      self.assertEqual(python_value, numpy_value, message)
+    else:
+      self.assertAlmostEqual(python_value, numpy_value, places=9, msg=message)
+
+  def testDiscrepancy(self):
+    for _ in xrange(300):
+      samples = sorted(self._rng.random()
+                       for _ in xrange(self._rng.randint(0, 40)))
+      if samples and self._rng.random() < 0.2:
+        samples[0] = 0.0
+      if samples and self._rng.random() < 0.2:
+        samples[-1] = 1.0
+      if len(samples) > 2 and self._rng.random() < 0.2:
+        samples[1] = samples[2]
+      self._AssertMatches(statistics.Discrepancy, samples)
+      self._AssertMatches(statistics.Discrepancy, samples,
+                          self._rng.randint(2, 50))
+
+  def testTimestampsAndDurationsDiscrepancy(self):
+    for _ in xrange(200):
+      timestamps = _CreateRandomTimestamps(self._rng)
+      self._AssertMatches(statistics.NormalizeSamples, timestamps)
+      for absolute in (True, False):
+        self._AssertMatches(statistics.TimestampsDiscrepancy, timestamps,
+                            absolute)
+        durations = [b - a for a, b in zip(timestamps, timestamps[1:])]
+        self._AssertMatches(statistics.DurationsDiscrepancy, durations,
+                            absolute)
+    self._AssertMatches(statistics.TimestampsDiscrepancy,
+                        [_CreateRandomTimestamps(self._rng) for _ in xrange(5)])
+
+  def testPercentileAndMeans(self):
+    for _ in xrange(200):
+      values = [self._rng.choice([self._rng.uniform(-10, 1000),
+                                  self._rng.randint(0, 5)])
+                for _ in xrange(self._rng.randint(0, 40))]
+      self._AssertMatches(statistics.Percentile, values,
+                          self._rng.uniform(0, 100))
+      self._AssertMatches(statistics.Median, values)
+      self._AssertMatches(statistics.StandardDeviation, values)
+      self._AssertMatches(statistics.GeometricMean,
+                          [abs(v) for v in values])
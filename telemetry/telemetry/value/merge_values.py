@@ -4,6 +4,7 @@
 
 from telemetry.value import failure
 from telemetry.value import skip
+from telemetry.value import value_store
 
 
 def MergeLikeValuesFromSamePage(all_values):
@@ -26,10 +27,9 @@ def MergeLikeValuesFromSamePage(all_values):
   key pass the Value.IsMergableWith test. If this is not obeyed, the
   results will be undefined.
   """
-  return _MergeLikeValuesCommon(
-      all_values,
-      lambda x: (x.page, x.name),
-      lambda v0, merge_group: v0.MergeLikeValuesFromSamePage(merge_group))
+  groups = SamePageValueGroups()
+  groups.AddValues(all_values)
+  return groups.Merge()
 
 
 def MergeLikeValuesFromDifferentPages(all_values, group_by_name_suffix=False):
@@ -60,48 +60,103 @@ def MergeLikeValuesFromDifferentPages(all_values, group_by_name_suffix=False):
   the Value.IsMergableWith test. If this is not obeyed, the results
   will be undefined.
   """
+  groups = DifferentPagesValueGroups(group_by_name_suffix)
+  groups.AddValues(all_values)
+  return groups.Merge()
+
+
+def SamePageValueGroups():
+  """Returns LikeValueGroups that merge like MergeLikeValuesFromSamePage."""
+  return LikeValueGroups(
+      lambda x: (x.page, x.name),
+      lambda v0, merge_group: v0.MergeLikeValuesFromSamePage(merge_group),
+      value_store.MergeStoredValuesFromSamePage)
+
+
+def DifferentPagesValueGroups(group_by_name_suffix=False):
+  """Returns LikeValueGroups that merge like
+  MergeLikeValuesFromDifferentPages."""
   if group_by_name_suffix:
     def key(value):
       return value.name_suffix
   else:
     key = lambda x: x.name
-  return _MergeLikeValuesCommon(
-      all_values,
+  return LikeValueGroups(
       key,
       lambda v0, merge_group: v0.MergeLikeValuesFromDifferentPages(
-          merge_group, group_by_name_suffix=group_by_name_suffix))
+          merge_group, group_by_name_suffix=group_by_name_suffix),
+      lambda entries: value_store.MergeStoredValuesFromDifferentPages(
+          entries, group_by_name_suffix=group_by_name_suffix))
+
 
+class LikeValueGroups(object):
+  """Groups values by key_func as they are added, then applies merge_func to
+  the groups.
 
-def _MergeLikeValuesCommon(all_values, key_func, merge_func):
-  """Groups all_values by key_func then applies merge_func to the groups.
+  Values can be added a few at a time, e.g. page run by page run, so that
+  only the merging is left to do at the end. Groups are merged in the order
+  they were found in, and the values of a group in the order they were added.
+  If merge_func produces a non-None return, it is added to the list of
+  returned values.
 
-  This takes the all_values list and groups each item in that using the key
-  provided by key_func. This produces groups of values with like keys. Thes are
-  then handed to the merge_func to produce a new key. If merge_func produces a
-  non-None return, it is added to the list of returned values.
+  Values added as a value_store.StoredValues stay in the value store. Groups
+  made only of stored values are handed to merge_stored_func as lists of
+  (series, value_index), so that they are merged without creating a Value for
+  each.
   """
-  # When merging, we want to merge values in a consistent order, e.g. so that
-  # Scalar(1), Scalar(2) predictably produces ListOfScalarValues([1,2]) rather
-  # than 2,1.
-  #
-  # To do this, the values are sorted by key up front. Then, grouping is
-  # performed using a dictionary, but as new groups are found, the order in
-  # which they were found is also noted.
-  #
-  # Merging is then performed on groups in group-creation-order. This ensures
-  # that the returned array is in a stable order, group by group.
-  #
-  # Within a group, the order is stable because of the original sort.
-  all_values = list(all_values)
-  merge_groups = GroupStably(all_values, key_func)
 
-  res = []
-  for merge_group in merge_groups:
-    v0 = merge_group[0]
-    vM = merge_func(v0, merge_group)
-    if vM:
-      res.append(vM)
-  return res
+  def __init__(self, key_func, merge_func, merge_stored_func):
+    self._key_func = key_func
+    self._merge_func = merge_func
+    self._merge_stored_func = merge_stored_func
+    self._merge_groups = {}
+    self._merge_groups_in_creation_order = []
+    # ValueSeries have the page and name of their values, so key_func works
+    # on them too. All values of a series have the same key.
+    self._keys_by_series = {}
+
+  def AddValues(self, values):
+    if isinstance(values, value_store.StoredValues):
+      entries = values.IterEntries()
+    else:
+      entries = ((value, None, None) for value in values)
+    for value, series, value_index in entries:
+      if value is None:
+        key = self._keys_by_series.get(series)
+        if key is None:
+          key = self._keys_by_series[series] = self._key_func(series)
+        entry = (series, value_index)
+      elif _ShouldSkipValue(value):
+        continue
+      else:
+        key = self._key_func(value)
+        entry = value
+      if key not in self._merge_groups:
+        self._merge_groups[key] = []
+        self._merge_groups_in_creation_order.append(self._merge_groups[key])
+      self._merge_groups[key].append(entry)
+
+  def Merge(self):
+    res = []
+    for merge_group in self._merge_groups_in_creation_order:
+      if all(type(entry) is tuple for entry in merge_group):
+        vM = self._merge_stored_func(merge_group)
+      else:
+        merge_group = [entry[0].GetValue(entry[1]) if type(entry) is tuple
+                       else entry for entry in merge_group]
+        vM = self._merge_func(merge_group[0], merge_group)
+      if vM:
+        res.append(vM)
+    return res
+
+
+def _ShouldSkipValue(value):
+  # TODO(chrishenry): This is temporary. When we figure out the
+  # right summarization strategy for page runs with failures/skips, we
+  # should use that instead.
+  return (isinstance(value, failure.FailureValue) or
+          isinstance(value, skip.SkipValue))
+
 
 def GroupStably(all_values, key_func):
   """Groups an array by key_func, with the groups returned in a stable order.
@@ -113,13 +168,7 @@ def GroupStably(all_values, key_func):
   merge_groups = {}
   merge_groups_in_creation_order = []
   for value in all_values:
-    # TODO(chrishenry): This is temporary. When we figure out the
-    # right summarization strategy for page runs with failures/skips, we
-    # should use that instead.
-    should_skip_value = (isinstance(value, failure.FailureValue) or
-                         isinstance(value, skip.SkipValue))
-
-    if should_skip_value:
+    if _ShouldSkipValue(value):
       continue
 
     key = key_func(value)
@@ -113,3 +113,17 @@ class MergeValueTest(TestBase):
     self.assertEquals((None, 'score'),
                       (merged_values[0].page, merged_values[0].name))
     self.assertEquals([1, 2], merged_values[0].values)
+
+  def testValueGroupsAddedIncrementally(self):
+    page0 = self.pages[0]
+    page1 = self.pages[1]
+
+    groups = merge_values.DifferentPagesValueGroups()
+    groups.AddValues([scalar.ScalarValue(page0, 'x', 'units', 1),
+                      scalar.ScalarValue(page0, 'y', 'units', 2)])
+    groups.AddValues([scalar.ScalarValue(page1, 'x', 'units', 3)])
+
+    merged_values = groups.Merge()
+    self.assertEquals(['x', 'y'], [v.name for v in merged_values])
+    self.assertEquals([1, 3], merged_values[0].values)
+    self.assertEquals([2], merged_values[1].values)
@@ -7,6 +7,7 @@ from collections import defaultdict
 from telemetry.value import failure
 from telemetry.value import merge_values
 from telemetry.value import skip
+from telemetry.value import value_store
 
 
 class Summary(object):
@@ -35,21 +36,63 @@ class Summary(object):
       ]
 
   """
-  def __init__(self, all_page_specific_values):
-    had_failures = any(isinstance(v, failure.FailureValue) for v in
-        all_page_specific_values)
-    self.had_failures = had_failures
+  def __init__(self, all_page_specific_values=None):
+    self.had_failures = False
+    # We will later need to determine how many values were originally created
+    # for each value name, to apply a workaround meant to clean up the printf
+    # output.
+    self._num_successful_pages_for_value_name = defaultdict(int)
+    self._same_page_value_groups = merge_values.SamePageValueGroups()
+    self._different_pages_value_groups = (
+        merge_values.DifferentPagesValueGroups())
+    self._computed = False
     self._computed_per_page_values = []
     self._computed_summary_values = []
     self._interleaved_computed_per_page_values_and_summaries = []
-    self._ComputePerPageValues(all_page_specific_values)
+    if all_page_specific_values is not None:
+      self.AddValues(all_page_specific_values)
+
+  def AddValues(self, page_specific_values):
+    """Adds page specific values, e.g. those of a page run that just finished.
+
+    The values are grouped as they are added, so that only merging the groups
+    is left to do when the computed values are asked for.
+    """
+    def IsSuccessful(v):
+      return not (isinstance(v, failure.FailureValue) or
+                  isinstance(v, skip.SkipValue))
+
+    if isinstance(page_specific_values, value_store.StoredValues):
+      # Failures and skips are never stored in a value store, and the value
+      # groups leave them out themselves, so stored values are summarized
+      # without turning them into Value objects.
+      object_values = list(page_specific_values.IterObjectValues())
+      successful_value_names = [
+          value.name if value is not None else series.name
+          for value, series, _ in page_specific_values.IterEntries()
+          if value is None or IsSuccessful(value)]
+    else:
+      page_specific_values = list(page_specific_values)
+      object_values = page_specific_values
+      successful_value_names = [
+          v.name for v in page_specific_values if IsSuccessful(v)]
+
+    if any(isinstance(v, failure.FailureValue) for v in object_values):
+      self.had_failures = True
+    for name in successful_value_names:
+      self._num_successful_pages_for_value_name[name] += 1
+    self._same_page_value_groups.AddValues(page_specific_values)
+    self._different_pages_value_groups.AddValues(page_specific_values)
+    self._computed = False
 
   @property
   def computed_per_page_values(self):
+    self._ComputePerPageValuesIfNeeded()
     return self._computed_per_page_values
 
   @property
   def computed_summary_values(self):
+    self._ComputePerPageValuesIfNeeded()
     return self._computed_summary_values
 
   @property
@@ -60,19 +103,21 @@ class Summary(object):
     values, then summary values.
 
     """
+    self._ComputePerPageValuesIfNeeded()
     return self._interleaved_computed_per_page_values_and_summaries
 
-  def _ComputePerPageValues(self, all_page_specific_values):
-    all_successful_page_values = [
-        v for v in all_page_specific_values if not (isinstance(
-            v, failure.FailureValue) or isinstance(v, skip.SkipValue))]
+  def _ComputePerPageValuesIfNeeded(self):
+    if self._computed:
+      return
+    self._computed_per_page_values = []
+    self._computed_summary_values = []
+    self._interleaved_computed_per_page_values_and_summaries = []
+    self._ComputePerPageValues()
+    self._computed = True
 
-    # We will later need to determine how many values were originally created
-    # for each value name, to apply a workaround meant to clean up the printf
-    # output.
-    num_successful_pages_for_value_name = defaultdict(int)
-    for v in all_successful_page_values:
-      num_successful_pages_for_value_name[v.name] += 1
+  def _ComputePerPageValues(self):
+    num_successful_pages_for_value_name = (
+        self._num_successful_pages_for_value_name)
 
     # By here, due to page repeat options, all_values_from_successful_pages
     # contains values of the same name not only from mulitple pages, but also
@@ -80,8 +125,7 @@ class Summary(object):
     # have run twice, producing two 'x' values.
     #
     # So, get rid of the repeated pages by merging.
-    merged_page_values = merge_values.MergeLikeValuesFromSamePage(
-        all_successful_page_values)
+    merged_page_values = self._same_page_value_groups.Merge()
 
     # Now we have a bunch of values, but there is only one value_name per page.
     # Suppose page1 and page2 ran, producing values x and y. We want to print
@@ -108,8 +152,7 @@ class Summary(object):
     # alphabetical order.
     merged_pages_value_by_value_name = {}
     if not self.had_failures:
-      for value in merge_values.MergeLikeValuesFromDifferentPages(
-          all_successful_page_values):
+      for value in self._different_pages_value_groups.Merge():
         assert value.name not in merged_pages_value_by_value_name
         merged_pages_value_by_value_name[value.name] = value
 
@@ -3,7 +3,9 @@
 # found in the LICENSE file.
 
 import datetime
+import gzip
 import logging
+import mimetypes
 import random
 import shutil
 import os
@@ -44,6 +46,13 @@ class TraceValue(value_module.Value):
     tf.close()
     return file_handle.FromTempFile(tf)
 
+  def _GetCompressedTempFilePath(self, fh):
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.gz') as tf:
+      with open(fh.GetAbsPath(), 'rb') as f:
+        with gzip.GzipFile(fileobj=tf, mode='wb') as gzip_file:
+          shutil.copyfileobj(f, gzip_file)
+    return tf.name
+
   def __repr__(self):
     if self.page:
       page_name = self.page.url
@@ -80,6 +89,14 @@ class TraceValue(value_module.Value):
                                         group_by_name_suffix=False):
     return None
 
+  @property
+  def serialized_file_handle(self):
+    return self._serialized_file_handle
+
+  @property
+  def cloud_url(self):
+    return self._cloud_url
+
   def AsDict(self):
     d = super(TraceValue, self).AsDict()
     if self._serialized_file_handle:
@@ -96,8 +113,14 @@ class TraceValue(value_module.Value):
     self._serialized_file_handle = file_handle.FromFilePath(file_path)
     return self._serialized_file_handle
 
-  def UploadToCloud(self, bucket):
+  def UploadToCloud(self, bucket, compress=False):
+    """Uploads the trace HTML to bucket and returns its URL.
+
+    If compress is true, the file is uploaded gzipped, with a gzip
+    Content-Encoding so that browsers still show it as HTML.
+    """
     temp_fh = None
+    compressed_path = None
     try:
       if self._serialized_file_handle:
         fh = self._serialized_file_handle
@@ -109,8 +132,18 @@ class TraceValue(value_module.Value):
           datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S'),
           random.randint(1, 100000),
           fh.extension))
-      self._cloud_url = cloud_storage.Insert(
-          bucket, remote_path, fh.GetAbsPath())
+      if compress:
+        compressed_path = self._GetCompressedTempFilePath(fh)
+        # The compressed file is named .gz, so gsutil would not know that it
+        # holds HTML.
+        content_type = (mimetypes.guess_type('trace' + fh.extension)[0] or
+                        'text/html')
+        self._cloud_url = cloud_storage.Insert(
+            bucket, remote_path, compressed_path, content_encoding='gzip',
+            content_type=content_type)
+      else:
+        self._cloud_url = cloud_storage.Insert(
+            bucket, remote_path, fh.GetAbsPath())
       sys.stderr.write(
           'View generated trace files online at %s for page %s\n' %
           (self._cloud_url, self.page.url if self.page else 'unknown'))
@@ -121,3 +154,5 @@ class TraceValue(value_module.Value):
     finally:
       if temp_fh:
         os.remove(temp_fh.GetAbsPath())
+      if compressed_path:
+        os.remove(compressed_path)
@@ -94,6 +94,21 @@ class ValueTest(TestBase):
         os.remove(test_temp_file.name)
 
 
+  def testUploadsCompressedTraceAsHtml(self):
+    v = trace.TraceValue(
+        None, tracing_timeline_data.TracingTimelineData({'test': 1}))
+    inserts = []
+    def Insert(bucket, remote_path, local_path, **kwargs):
+      inserts.append((bucket, remote_path, kwargs))
+      return 'url'
+    trace.cloud_storage.Insert = Insert
+    v.UploadToCloud(trace.cloud_storage.PUBLIC_BUCKET, compress=True)
+    self.assertEqual(1, len(inserts))
+    self.assertTrue(inserts[0][1].endswith('.html'))
+    self.assertEqual({'content_encoding': 'gzip', 'content_type': 'text/html'},
+                     inserts[0][2])
+
+
 def _IsEmptyDir(path):
   return os.path.exists(path) and not os.listdir(path)
 
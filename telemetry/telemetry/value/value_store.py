@@ -0,0 +1,301 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Compact storage for the numbers of ScalarValues and ListOfScalarValues.
+
+Benchmarks that repeat many pages many times produce a large number of scalar
+values, each of which is a Python object holding its name, units, page and a
+list of Python numbers. A ValueStore keeps those numbers in one typed array
+per (page, value name) instead, with the names, units and descriptions
+interned, and turns them back into Value objects only when asked to.
+
+PageTestResults created with a ValueStore hands out StoredValues instead of
+lists of values. StoredValues can be iterated like a list of values, but
+merge_values, Summary and the output formatters merge and serialize them
+straight from the arrays.
+"""
+
+import array
+import itertools
+
+from telemetry import value as value_module
+from telemetry.value import list_of_scalar_values
+from telemetry.value import scalar
+
+# Integers larger than this may not be stored exactly as doubles.
+_MAX_EXACT_INTEGER = 2 ** 53
+
+
+def _IsStorableNumber(number):
+  if type(number) is float:
+    return True
+  return type(number) is int and abs(number) <= _MAX_EXACT_INTEGER
+
+
+class ValueSeries(object):
+  """The numbers of all values of one name measured on one page.
+
+  The series also has the attributes shared by those values: page, name,
+  units, important, description, value_type and, for ListOfScalarValues,
+  same_page_merge_policy.
+  """
+
+  def __init__(self, value, intern_string):
+    self.page = value.page
+    self.name = intern_string(value.name)
+    self.units = intern_string(value.units)
+    self.important = value.important
+    self.description = intern_string(value.description)
+    self.value_type = type(value)
+    self.same_page_merge_policy = getattr(value, 'same_page_merge_policy', None)
+    self._samples = array.array('d')
+    # Whether each sample was an int rather than a float, and how many were.
+    self._sample_is_int = array.array('b')
+    self._int_count = 0
+    # The end of each value's samples in self._samples.
+    self._value_ends = array.array('l')
+
+  def __len__(self):
+    return len(self._value_ends)
+
+  @property
+  def name_suffix(self):
+    """Returns the string after a . in the name, or the full name otherwise."""
+    if '.' in self.name:
+      return self.name.split('.', 1)[1]
+    else:
+      return self.name
+
+  def IsCompatibleWith(self, value):
+    """Returns whether value, which has the page and name of this series, can
+    be stored in it."""
+    return (type(value) == self.value_type and
+            value.units == self.units and
+            value.important == self.important and
+            value.description == self.description and
+            getattr(value, 'same_page_merge_policy', None) ==
+            self.same_page_merge_policy)
+
+  def Append(self, numbers):
+    """Appends the numbers of one value and returns its index."""
+    if len(numbers) == 1:
+      is_int = type(numbers[0]) is int
+      self._samples.append(numbers[0])
+      self._sample_is_int.append(is_int)
+      self._int_count += is_int
+    else:
+      is_int = [type(n) is int for n in numbers]
+      self._samples.extend(numbers)
+      self._sample_is_int.extend(is_int)
+      self._int_count += sum(is_int)
+    self._value_ends.append(len(self._samples))
+    return len(self._value_ends) - 1
+
+  def RemoveLast(self):
+    """Removes the numbers of the last appended value."""
+    self._value_ends.pop()
+    end = self._value_ends[-1] if self._value_ends else 0
+    self._int_count -= sum(self._sample_is_int[end:])
+    del self._samples[end:]
+    del self._sample_is_int[end:]
+
+  def GetSamples(self, value_index):
+    """Returns the numbers of the value at value_index as a list."""
+    start = self._value_ends[value_index - 1] if value_index else 0
+    end = self._value_ends[value_index]
+    samples = self._samples[start:end].tolist()
+    if not self._int_count:
+      return samples
+    if self._int_count == len(self._samples):
+      return [int(sample) for sample in samples]
+    return [int(sample) if is_int else sample for sample, is_int in
+            itertools.izip(samples, self._sample_is_int[start:end])]
+
+  def GetValue(self, value_index):
+    """Returns the value at value_index as a Value object."""
+    samples = self.GetSamples(value_index)
+    if self.value_type is scalar.ScalarValue:
+      return scalar.ScalarValue(
+          self.page, self.name, self.units, samples[0],
+          important=self.important, description=self.description)
+    return list_of_scalar_values.ListOfScalarValues(
+        self.page, self.name, self.units, samples,
+        important=self.important, description=self.description,
+        same_page_merge_policy=self.same_page_merge_policy)
+
+  def AsDict(self, value_index):
+    """Returns what AsDict() returns for the value at value_index."""
+    d = {
+      'name': self.name,
+      'type': self.value_type.GetJSONTypeName(),
+      'units': self.units,
+      'important': self.important
+    }
+    if self.description:
+      d['description'] = self.description
+    if self.page:
+      d['page_id'] = self.page.id
+    samples = self.GetSamples(value_index)
+    if self.value_type is scalar.ScalarValue:
+      d['value'] = samples[0]
+    else:
+      d['values'] = samples
+    return d
+
+
+def MergeStoredValuesFromSamePage(entries):
+  """Merges stored values like Value.MergeLikeValuesFromSamePage.
+
+  Args:
+    entries: A list of (series, value_index) of values with the same page and
+        name.
+  """
+  series0, index0 = entries[0]
+  if series0.same_page_merge_policy == value_module.PICK_FIRST:
+    samples = series0.GetSamples(index0)
+  else:
+    samples = _ConcatenateSamples(entries)
+  return _CreateMergedValue(series0, series0.page, series0.name, samples)
+
+
+def MergeStoredValuesFromDifferentPages(entries, group_by_name_suffix=False):
+  """Merges stored values like Value.MergeLikeValuesFromDifferentPages.
+
+  Args:
+    entries: A list of (series, value_index) of values with the same name.
+  """
+  series0 = entries[0][0]
+  name = series0.name_suffix if group_by_name_suffix else series0.name
+  return _CreateMergedValue(series0, None, name, _ConcatenateSamples(entries))
+
+
+def _ConcatenateSamples(entries):
+  samples = []
+  for series, value_index in entries:
+    samples.extend(series.GetSamples(value_index))
+  return samples
+
+
+def _CreateMergedValue(series0, page, name, samples):
+  # Merged ScalarValues become ListOfScalarValues with the default policy.
+  return list_of_scalar_values.ListOfScalarValues(
+      page, name, series0.units, samples, important=series0.important,
+      same_page_merge_policy=(series0.same_page_merge_policy or
+                              value_module.CONCATENATE))
+
+
+class ValueStore(object):
+  def __init__(self):
+    self._strings = {}
+    self._series = []
+    self._series_index_by_key = {}
+
+  def _Intern(self, string):
+    if string is None:
+      return None
+    return self._strings.setdefault(string, string)
+
+  @staticmethod
+  def CanStore(value):
+    """Returns whether value is a ScalarValue or ListOfScalarValues whose
+    numbers can be stored exactly."""
+    value_type = type(value)
+    if value_type is scalar.ScalarValue:
+      return value.value is not None and _IsStorableNumber(value.value)
+    if value_type is list_of_scalar_values.ListOfScalarValues:
+      return (value.values is not None and
+              all(_IsStorableNumber(v) for v in value.values))
+    return False
+
+  def GetSeries(self, series_index):
+    return self._series[series_index]
+
+  def AddValue(self, value):
+    """Stores the numbers of value if possible.
+
+    Returns:
+      (series_index, value_index) to find the value again, or None if value
+      cannot be stored and has to be kept as an object.
+    """
+    if not self.CanStore(value):
+      return None
+    key = (value.page, value.name)
+    series_index = self._series_index_by_key.get(key)
+    if series_index is None:
+      series_index = len(self._series)
+      self._series.append(ValueSeries(value, self._Intern))
+      self._series_index_by_key[key] = series_index
+    series = self._series[series_index]
+    if not series.IsCompatibleWith(value):
+      return None
+    if series.value_type is scalar.ScalarValue:
+      return series_index, series.Append((value.value,))
+    return series_index, series.Append(value.values)
+
+  def RemoveLastValue(self, series_index):
+    """Removes the last value added to a series.
+
+    Values have to be removed in the reverse order in which they were added.
+    """
+    series = self._series[series_index]
+    series.RemoveLast()
+    if not len(series):
+      assert series_index == len(self._series) - 1
+      self._series.pop()
+      del self._series_index_by_key[(series.page, series.name)]
+
+
+class StoredValues(object):
+  """The values of a sequence of page runs, some of them in a ValueStore.
+
+  Iterating over StoredValues yields Value objects in the order they were
+  added, like iterating over a list of the values would.
+  """
+
+  def __init__(self, page_runs):
+    self._page_runs = page_runs
+
+  def IterEntries(self):
+    """Yields (value, None, None) for the values kept as objects and
+    (None, series, value_index) for the stored values, in order."""
+    return itertools.chain.from_iterable(
+        run.IterEntries() for run in self._page_runs)
+
+  def IterObjectValues(self):
+    """Yields the values that are kept as objects, in order."""
+    for value, _, _ in self.IterEntries():
+      if value is not None:
+        yield value
+
+  def IterDicts(self):
+    """Yields the AsDict() of each value."""
+    for value, series, value_index in self.IterEntries():
+      if value is not None:
+        yield value.AsDict()
+      else:
+        yield series.AsDict(value_index)
+
+  def __iter__(self):
+    for value, series, value_index in self.IterEntries():
+      if value is not None:
+        yield value
+      else:
+        yield series.GetValue(value_index)
+
+  def __len__(self):
+    return sum(run.num_values for run in self._page_runs)
+
+  def __getitem__(self, index):
+    """Returns the value at index, creating only that Value object."""
+    if isinstance(index, slice):
+      return list(self)[index]
+    if index < 0:
+      index += len(self)
+    if index >= 0:
+      for run in self._page_runs:
+        num_values = run.num_values
+        if index < num_values:
+          return run.GetValue(index)
+        index -= num_values
+    raise IndexError('StoredValues index out of range')
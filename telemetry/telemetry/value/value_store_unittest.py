@@ -0,0 +1,103 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+import os
+import unittest
+
+from telemetry import value as value_module
+from telemetry.page import page_set
+from telemetry.value import histogram
+from telemetry.value import list_of_scalar_values
+from telemetry.value import scalar
+from telemetry.value import value_store
+
+
+class ValueStoreTest(unittest.TestCase):
+  def setUp(self):
+    self.page_set = page_set.PageSet(file_path=os.path.dirname(__file__))
+    self.page_set.AddPageWithDefaultRunNavigate("http://www.bar.com/")
+    self.page_set.AddPageWithDefaultRunNavigate("http://www.baz.com/")
+
+  @property
+  def pages(self):
+    return self.page_set.pages
+
+  def testValuesAreRecreated(self):
+    store = value_store.ValueStore()
+    values = [
+        scalar.ScalarValue(self.pages[0], 'x', 'ms', 1,
+                           description='An int.'),
+        scalar.ScalarValue(self.pages[0], 'x', 'ms', 2,
+                           description='An int.'),
+        scalar.ScalarValue(self.pages[1], 'x', 'ms', 1.5,
+                           important=False),
+        list_of_scalar_values.ListOfScalarValues(
+            self.pages[0], 'y', 'count', [1, 2.5, -3],
+            same_page_merge_policy=value_module.PICK_FIRST)]
+    indices = [store.AddValue(v) for v in values]
+    self.assertEquals([(0, 0), (0, 1), (1, 0), (2, 0)], indices)
+    for v, (series_index, value_index) in zip(values, indices):
+      series = store.GetSeries(series_index)
+      stored_value = series.GetValue(value_index)
+      self.assertEquals(repr(v), repr(stored_value))
+      self.assertEquals(v.AsDict(), series.AsDict(value_index))
+    self.assertEquals([1, 2.5, -3], store.GetSeries(2).GetSamples(0))
+    self.assertEquals(int, type(store.GetSeries(2).GetSamples(0)[0]))
+
+  def testValuesThatAreNotStored(self):
+    store = value_store.ValueStore()
+    self.assertEquals((0, 0), store.AddValue(
+        scalar.ScalarValue(self.pages[0], 'x', 'ms', 1)))
+    # Values that differ from the first value of their page and name.
+    self.assertEquals(None, store.AddValue(
+        scalar.ScalarValue(self.pages[0], 'x', 'seconds', 1)))
+    self.assertEquals(None, store.AddValue(
+        list_of_scalar_values.ListOfScalarValues(
+            self.pages[0], 'x', 'ms', [1])))
+    # Values that are not numbers stored exactly as doubles.
+    self.assertEquals(None, store.AddValue(
+        scalar.ScalarValue(self.pages[0], 'y', 'ms', None,
+                           none_value_reason='No data.')))
+    self.assertEquals(None, store.AddValue(
+        scalar.ScalarValue(self.pages[0], 'y', 'ms', 2 ** 60)))
+    self.assertEquals(None, store.AddValue(
+        scalar.ScalarValue(self.pages[0], 'y', 'ms', True)))
+    self.assertEquals(None, store.AddValue(
+        histogram.HistogramValue(
+            self.pages[0], 'z', 'ms',
+            raw_value_json='{"buckets": [{"low": 1, "high": 2, "count": 1}]}')))
+
+  def testRemoveLastValue(self):
+    store = value_store.ValueStore()
+    store.AddValue(scalar.ScalarValue(self.pages[0], 'x', 'ms', 1))
+    store.AddValue(scalar.ScalarValue(self.pages[0], 'x', 'ms', 2))
+    store.AddValue(scalar.ScalarValue(self.pages[0], 'y', 'ms', 3))
+    store.RemoveLastValue(1)
+    store.RemoveLastValue(0)
+    self.assertEquals(1, len(store.GetSeries(0)))
+    self.assertEquals([1], store.GetSeries(0).GetSamples(0))
+    # The series of 'y' was removed, so a new 'y' starts a new series.
+    self.assertEquals((1, 0), store.AddValue(
+        list_of_scalar_values.ListOfScalarValues(
+            self.pages[0], 'y', 'ms', [4, 5])))
+
+  def testMergeStoredValues(self):
+    store = value_store.ValueStore()
+    entries = []
+    for page, v in [(self.pages[0], 1), (self.pages[1], 2.5),
+                    (self.pages[0], 3)]:
+      series_index, value_index = store.AddValue(
+          scalar.ScalarValue(page, 'a.x', 'ms', v))
+      entries.append((store.GetSeries(series_index), value_index))
+
+    merged = value_store.MergeStoredValuesFromSamePage(
+        [entries[0], entries[2]])
+    self.assertEquals(self.pages[0], merged.page)
+    self.assertEquals([1, 3], merged.values)
+
+    merged = value_store.MergeStoredValuesFromDifferentPages(
+        entries, group_by_name_suffix=True)
+    self.assertEquals(None, merged.page)
+    self.assertEquals('x', merged.name)
+    self.assertEquals([1, 2.5, 3], merged.values)
+    self.assertEquals(value_module.CONCATENATE, merged.same_page_merge_policy)
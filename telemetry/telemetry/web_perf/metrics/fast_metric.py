@@ -7,15 +7,47 @@ import logging
 from telemetry.timeline import bounds
 from telemetry.value import scalar
 from telemetry.web_perf import timeline_interaction_record as tir_module
+from telemetry.web_perf.metrics import record_sweep
+from telemetry.web_perf.metrics import thread_sweep
 from telemetry.web_perf.metrics import timeline_based_metric
 from telemetry.web_perf.metrics import v8_stats as v8_stats_module
 
 
+class _TopSliceTimes(thread_sweep.SliceAccumulator):
+  """Sums up the time that the top level slices of a thread overlap
+  interaction records."""
+
+  def __init__(self, renderer_thread, interaction_records):
+    super(_TopSliceTimes, self).__init__(renderer_thread, toplevel_only=True)
+    self.interaction_records = interaction_records
+    self.cpu_time = 0
+    self.overlapped_time = 0
+    self.no_thread_time_data = False
+    self._record_sweep = record_sweep.RecordSweep(interaction_records)
+
+  def AddSlice(self, s, _):
+    for _, r in self._record_sweep.IterOverlappingRecords(s.start, s.end):
+      self.overlapped_time += bounds.Bounds.GetOverlap(r.start, r.end,
+                                                       s.start, s.end)
+      if self.no_thread_time_data:
+        continue
+      try:
+        self.cpu_time += r.GetOverlappedThreadTimeForSlice(s)
+      except tir_module.NoThreadTimeDataException:
+        self.no_thread_time_data = True
+
+
 class FastMetric(timeline_based_metric.TimelineBasedMetric):
   def __init__(self):
     super(FastMetric, self).__init__()
 
-  def AddResults(self, model, renderer_thread, interaction_records, results):
+  def CreateAccumulators(self, _, renderer_thread, interaction_records):
+    self.VerifyNonOverlappedRecords(interaction_records)
+    return [_TopSliceTimes(renderer_thread, interaction_records),
+            v8_stats_module.V8Stats(renderer_thread, interaction_records,
+                                    sweep=False)]
+
+  def AddResultsFromAccumulators(self, accumulators, results):
     """Add 11 results: duration, cpu_time, and idle_time,
                        incremental_marking, incremental_marking_outside_idle,
                        scavenger, scavenger_outside_idle,
@@ -44,40 +76,31 @@ class FastMetric(timeline_based_metric.TimelineBasedMetric):
         garbage collection outside of idle notification.
 
     Args:
-      model: a TimelineModule instance
-      renderer_thread: a telemetry.timeline.thread.Thread() instance
-      interaction_records: an iterable of TimelineInteractionRecord instances
+      accumulators: the accumulators returned by CreateAccumulators, once
+          they were handed the slices of the renderer thread
       results: an instance of page.PageTestResults
     """
-    self.VerifyNonOverlappedRecords(interaction_records)
+    top_slice_times, v8_stats = accumulators
+    interaction_records = top_slice_times.interaction_records
 
     duration = sum(r.end - r.start for r in interaction_records)
     results.AddValue(scalar.ScalarValue(
         results.current_page, 'fast-duration', 'ms', duration))
 
-    try:
-      cpu_time = sum(
-          r.GetOverlappedThreadTimeForSlice(s)
-          for r in interaction_records
-          for s in renderer_thread.toplevel_slices)
-    except tir_module.NoThreadTimeDataException:
+    if top_slice_times.no_thread_time_data:
       logging.warning(
           'Main thread cpu_time cannot be computed for records %s since '
           'trace does not contain thread time data.',
           repr(interaction_records))
     else:
       results.AddValue(scalar.ScalarValue(
-          results.current_page, 'fast-cpu_time', 'ms', cpu_time))
+          results.current_page, 'fast-cpu_time', 'ms',
+          top_slice_times.cpu_time))
 
-    idle_time = duration - sum(
-        bounds.Bounds.GetOverlap(r.start, r.end, s.start, s.end)
-        for r in interaction_records
-        for s in renderer_thread.toplevel_slices)
+    idle_time = duration - top_slice_times.overlapped_time
     results.AddValue(scalar.ScalarValue(
         results.current_page, 'fast-idle_time', 'ms', idle_time))
 
-    v8_stats = v8_stats_module.V8Stats(renderer_thread, interaction_records)
-
     for event_stats in v8_stats.all_event_stats:
       results.AddValue(scalar.ScalarValue(
           results.current_page, 'fast-' + event_stats.result_name, 'ms',
@@ -2,6 +2,10 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 
+from telemetry.web_perf import timeline_interaction_record as tir_module
+from telemetry.web_perf.metrics import record_sweep
+from telemetry.web_perf.metrics import thread_sweep
+
 
 # A top level slice of a main thread can cause the webapp to behave
 # unresponsively if its thread duration is greater than or equals to
@@ -20,6 +24,13 @@ class _MainthreadJankStat(object):
     self.sum_big_top_slices_thread_time = 0
     self.biggest_top_slice_thread_time = 0
 
+  def AddTopSlice(self, record, top_slice):
+    jank_thread_duration = record.GetOverlappedThreadTimeForSlice(top_slice)
+    self.biggest_top_slice_thread_time = max(
+        self.biggest_top_slice_thread_time, jank_thread_duration)
+    if jank_thread_duration >= USER_PERCEIVABLE_DELAY_THRESHOLD_MS:
+      self.sum_big_top_slices_thread_time += jank_thread_duration
+
 
 def _ComputeMainthreadJankStatsForRecord(renderer_thread, record):
   """Computes the mainthread jank stat on a record range.
@@ -41,15 +52,11 @@ def _ComputeMainthreadJankStatsForRecord(renderer_thread, record):
   """
   stat = _MainthreadJankStat()
   for s in renderer_thread.toplevel_slices:
-    jank_thread_duration = record.GetOverlappedThreadTimeForSlice(s)
-    stat.biggest_top_slice_thread_time = max(
-        stat.biggest_top_slice_thread_time, jank_thread_duration)
-    if jank_thread_duration >= USER_PERCEIVABLE_DELAY_THRESHOLD_MS:
-      stat.sum_big_top_slices_thread_time += jank_thread_duration
+    stat.AddTopSlice(record, s)
   return stat
 
 
-class MainthreadJankStats(object):
+class MainthreadJankStats(thread_sweep.SliceAccumulator):
   """
     Utility class for extracting main thread jank statistics from the timeline
     (or other loggin facilities), and providing them in a common format to
@@ -63,29 +70,50 @@ class MainthreadJankStats(object):
       biggest_jank_thread_time is the biggest thread duration of all
       top slices whose thread time ranges overlapped with any of records' thread
       time ranges.
+
+    The stats are computed when they are created, which raises
+    NoThreadTimeDataException if the slices or records lack thread times. If
+    sweep is False, they are computed once thread_sweep.SweepThreads is run
+    with them instead, and error holds that exception if there was one.
   """
 
-  def __init__(self, renderer_thread, interaction_records):
-    self._renderer_thread = renderer_thread
+  def __init__(self, renderer_thread, interaction_records, sweep=True):
+    super(MainthreadJankStats, self).__init__(renderer_thread,
+                                              toplevel_only=True)
     self._interaction_records = interaction_records
-    self._total_big_jank_thread_time = 0
-    self._biggest_jank_thread_time = 0
-    self._ComputeMainthreadJankStats()
+    self._record_jank_stats = [_MainthreadJankStat()
+                               for _ in interaction_records]
+    self._record_sweep = record_sweep.RecordSweep(interaction_records)
+    self._error = None
+    if sweep:
+      thread_sweep.SweepThreads([self])
+      if self._error:
+        raise self._error
+
+  @property
+  def interaction_records(self):
+    return self._interaction_records
+
+  @property
+  def error(self):
+    return self._error
 
   @property
   def total_big_jank_thread_time(self):
-    return self._total_big_jank_thread_time
+    return sum(stat.sum_big_top_slices_thread_time
+               for stat in self._record_jank_stats)
 
   @property
   def biggest_jank_thread_time(self):
-    return self._biggest_jank_thread_time
-
-  def _ComputeMainthreadJankStats(self):
-    for record in self._interaction_records:
-      record_jank_stat = _ComputeMainthreadJankStatsForRecord(
-          self._renderer_thread, record)
-      self._total_big_jank_thread_time += (
-          record_jank_stat.sum_big_top_slices_thread_time)
-      self._biggest_jank_thread_time = (
-          max(self._biggest_jank_thread_time,
-              record_jank_stat.biggest_top_slice_thread_time))
+    return max([stat.biggest_top_slice_thread_time
+                for stat in self._record_jank_stats] + [0])
+
+  def AddSlice(self, timeline_slice, _):
+    if self._error:
+      return
+    try:
+      for i, record in self._record_sweep.IterOverlappingRecords(
+          timeline_slice.start, timeline_slice.end):
+        self._record_jank_stats[i].AddTopSlice(record, timeline_slice)
+    except tir_module.NoThreadTimeDataException as e:
+      self._error = e
@@ -0,0 +1,49 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+
+class RecordSweep(object):
+  """Finds the interaction records that slices overlap in one pass over both.
+
+  Slices are looked up in order of their start times. Records are kept sorted
+  by start time, and only those that may still overlap later slices are
+  looked at, so going through N slices and M records costs O(N + M) plus the
+  number of overlaps found, rather than O(N * M). Looking up a slice that
+  starts before the previous one is correct but starts the sweep over.
+  """
+
+  def __init__(self, interaction_records):
+    self._records = interaction_records
+    self._order = sorted(xrange(len(interaction_records)),
+                         key=lambda i: interaction_records[i].start)
+    self._Reset()
+
+  def _Reset(self):
+    self._next = 0
+    self._active = []
+    self._last_start = None
+
+  def IterOverlappingRecords(self, start, end):
+    """Yields (index, record) for the records that overlap [start, end], in
+    the order of their indices in interaction_records."""
+    if self._last_start is not None and start < self._last_start:
+      self._Reset()
+    self._last_start = start
+    records = self._records
+    order = self._order
+    while (self._next < len(order) and
+           records[order[self._next]].start <= end):
+      self._active.append(order[self._next])
+      self._next += 1
+    # Records that end before this slice starts end before all later ones.
+    self._active = [i for i in self._active if records[i].end >= start]
+    for i in sorted(self._active):
+      if records[i].start <= end:
+        yield i, records[i]
+
+  def IterContainingRecords(self, start, end):
+    """Yields (index, record) for the records that contain [start, end]."""
+    for i, record in self.IterOverlappingRecords(start, end):
+      if record.start <= start and end <= record.end:
+        yield i, record
@@ -0,0 +1,56 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import random
+import unittest
+
+from telemetry.web_perf import timeline_interaction_record as tir_module
+from telemetry.web_perf.metrics import record_sweep
+
+
+def _CreateRecord(start, end):
+  return tir_module.TimelineInteractionRecord('Record', start, end)
+
+
+class RecordSweepTest(unittest.TestCase):
+  def testOverlappingRecordsAreFoundInIndexOrder(self):
+    records = [_CreateRecord(30, 40), _CreateRecord(0, 10),
+               _CreateRecord(5, 35), _CreateRecord(50, 60)]
+    sweep = record_sweep.RecordSweep(records)
+    def Overlapping(start, end):
+      return [i for i, _ in sweep.IterOverlappingRecords(start, end)]
+    self.assertEqual([1, 2], Overlapping(1, 6))
+    self.assertEqual([0, 2], Overlapping(12, 30))
+    self.assertEqual([], Overlapping(41, 49))
+    self.assertEqual([3], Overlapping(60, 70))
+    # Going back in time starts the sweep over.
+    self.assertEqual([1], Overlapping(0, 2))
+
+  def testContainingRecords(self):
+    records = [_CreateRecord(0, 10), _CreateRecord(5, 35)]
+    sweep = record_sweep.RecordSweep(records)
+    self.assertEqual(
+        [0], [i for i, _ in sweep.IterContainingRecords(2, 6)])
+    self.assertEqual(
+        [0, 1], [i for i, _ in sweep.IterContainingRecords(6, 10)])
+    self.assertEqual(
+        [1], [i for i, _ in sweep.IterContainingRecords(8, 35)])
+
+  def testMatchesComparingAllPairs(self):
+    rng = random.Random(0)
+    records = []
+    for _ in xrange(50):
+      start = rng.uniform(0, 1000)
+      records.append(_CreateRecord(start, start + rng.uniform(0, 100)))
+    slices = []
+    for _ in xrange(500):
+      start = rng.uniform(0, 1100)
+      slices.append((start, start + rng.uniform(0, 20)))
+    slices.sort()
+    sweep = record_sweep.RecordSweep(records)
+    for start, end in slices:
+      self.assertEqual(
+          [i for i, r in enumerate(records)
+           if r.start <= end and r.end >= start],
+          [i for i, _ in sweep.IterOverlappingRecords(start, end)])
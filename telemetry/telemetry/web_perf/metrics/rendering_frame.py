@@ -56,8 +56,9 @@ class RenderingFrame(object):
     return self._begin_main_frame.start - self._send_begin_frame.start
 
 
-def GetFrameEventsInsideRange(renderer_process, timeline_range):
-  """Returns RenderingFrames for all relevant events in the timeline_range."""
+def GetFrames(renderer_process):
+  """Returns RenderingFrames for all relevant events of the renderer_process,
+  sorted by their start times."""
   # First filter all events from the renderer_process and turn them into a
   # dictonary of the form:
   #   {0: [send_begin_frame, begin_main_frame, begin_main_frame],
@@ -76,11 +77,15 @@ def GetFrameEventsInsideRange(renderer_process, timeline_range):
   frames = []
   for events in begin_frame_events_by_id.values():
     try:
-      frame = RenderingFrame(events)
-      if frame.bounds.Intersects(timeline_range):
-        frames.append(frame)
+      frames.append(RenderingFrame(events))
     except MissingData:
       continue
   frames.sort(key=lambda frame: frame.bounds.min)
 
   return frames
+
+
+def GetFrameEventsInsideRange(renderer_process, timeline_range):
+  """Returns RenderingFrames for all relevant events in the timeline_range."""
+  return [frame for frame in GetFrames(renderer_process)
+          if frame.bounds.Intersects(timeline_range)]
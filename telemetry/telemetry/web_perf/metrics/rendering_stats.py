@@ -1,7 +1,7 @@
 # Copyright 2014 The Chromium Authors. All rights reserved.
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
-from operator import attrgetter
+import bisect
 
 from telemetry.web_perf.metrics import rendering_frame
 
@@ -27,6 +27,14 @@ SCROLL_UPDATE_EVENT_NAME = 'InputLatency:ScrollUpdate'
 # Name for a gesture scroll update latency event.
 GESTURE_SCROLL_UPDATE_EVENT_NAME = 'InputLatency:GestureScrollUpdate'
 
+# Names of all the trace events that RenderingStats looks at.
+EVENT_NAMES = frozenset([
+    'InputLatency',
+    'BenchmarkInstrumentation::DisplayRenderingStats',
+    'BenchmarkInstrumentation::ImplThreadRenderingStats',
+    rendering_frame.RenderingFrame.send_begin_frame_event,
+    rendering_frame.RenderingFrame.begin_main_frame_event])
+
 
 def GetInputLatencyEvents(process, timeline_range):
   """Get input events' LatencyInfo from the process's trace buffer that are
@@ -114,6 +122,50 @@ def GetTimestampEventName(process):
       return event_name
   return 'BenchmarkInstrumentation::ImplThreadRenderingStats'
 
+class _RangeLookup(object):
+  """Finds the timeline ranges that contain or intersect an event.
+
+  The non-empty ranges are sorted by their start, so the candidates for an
+  event are the ranges starting before it ends, found by binary search. They
+  are scanned backwards until the running maximum of the range ends shows that
+  no earlier range can reach the event.
+  """
+
+  def __init__(self, timeline_ranges):
+    indices = [i for i, timeline_range in enumerate(timeline_ranges)
+               if not timeline_range.is_empty]
+    indices.sort(key=lambda i: timeline_ranges[i].min)
+    self._ranges = [timeline_ranges[i] for i in indices]
+    self._indices = indices
+    self._mins = [timeline_range.min for timeline_range in self._ranges]
+    self._running_maxs = []
+    running_max = None
+    for timeline_range in self._ranges:
+      running_max = max(running_max, timeline_range.max)
+      self._running_maxs.append(running_max)
+
+  @property
+  def is_empty(self):
+    return not self._ranges
+
+  def _IterIndicesReaching(self, last_start, end):
+    """Yields indices of the ranges with min <= last_start and max >= end, in
+    decreasing order of min."""
+    position = bisect.bisect_right(self._mins, last_start) - 1
+    while position >= 0 and self._running_maxs[position] >= end:
+      if self._ranges[position].max >= end:
+        yield self._indices[position]
+      position -= 1
+
+  def IterIndicesContaining(self, start, end):
+    """Yields the indices of the ranges that contain [start, end]."""
+    return self._IterIndicesReaching(start, end)
+
+  def IterIndicesIntersecting(self, start, end):
+    """Yields the indices of the ranges that intersect [start, end]."""
+    return self._IterIndicesReaching(end, start)
+
+
 class RenderingStats(object):
   def __init__(self, renderer_process, browser_process, timeline_ranges):
     """
@@ -125,6 +177,9 @@ class RenderingStats(object):
     timeline range.
 
     All *_time values are measured in milliseconds.
+
+    The events of each kind are visited once, in order, and added to every
+    timeline range they fall into.
     """
     assert len(timeline_ranges) > 0
     # Find the top level process with rendering stats (browser or renderer).
@@ -139,102 +194,124 @@ class RenderingStats(object):
     # in attempting to generate that list.
     self.errors = {}
 
-    self.frame_timestamps = []
-    self.frame_times = []
-    self.approximated_pixel_percentages = []
+    self.frame_timestamps = [[] for _ in timeline_ranges]
+    self.frame_times = [[] for _ in timeline_ranges]
+    self.approximated_pixel_percentages = [[] for _ in timeline_ranges]
     # End-to-end latency for input event - from when input event is
     # generated to when the its resulted page is swap buffered.
-    self.input_event_latency = []
+    self.input_event_latency = [[] for _ in timeline_ranges]
     self.frame_queueing_durations = []
     # Latency from when a scroll update is sent to the main thread until the
     # resulting frame is swapped.
-    self.scroll_update_latency = []
+    self.scroll_update_latency = [[] for _ in timeline_ranges]
     # Latency for a GestureScrollUpdate input event.
-    self.gesture_scroll_update_latency = []
+    self.gesture_scroll_update_latency = [[] for _ in timeline_ranges]
 
-    for timeline_range in timeline_ranges:
-      self.frame_timestamps.append([])
-      self.frame_times.append([])
-      self.approximated_pixel_percentages.append([])
-      self.input_event_latency.append([])
-      self.scroll_update_latency.append([])
-      self.gesture_scroll_update_latency.append([])
-
-      if timeline_range.is_empty:
-        continue
-      self._InitFrameTimestampsFromTimeline(
-          timestamp_process, timestamp_event_name, timeline_range)
-      self._InitImplThreadRenderingStatsFromTimeline(
-          renderer_process, timeline_range)
-      self._InitInputLatencyStatsFromTimeline(
-          browser_process, renderer_process, timeline_range)
-      self._InitFrameQueueingDurationsFromTimeline(
-          renderer_process, timeline_range)
+    range_lookup = _RangeLookup(timeline_ranges)
+    if range_lookup.is_empty:
+      return
+    self._InitFrameTimestampsFromTimeline(
+        timestamp_process, timestamp_event_name, range_lookup)
+    self._InitImplThreadRenderingStatsFromTimeline(
+        renderer_process, range_lookup)
+    self._InitInputLatencyStatsFromTimeline(
+        browser_process, renderer_process, timeline_ranges, range_lookup)
+    self._InitFrameQueueingDurationsFromTimeline(
+        renderer_process, timeline_ranges, range_lookup)
 
   def _InitInputLatencyStatsFromTimeline(
-      self, browser_process, renderer_process, timeline_range):
-    latency_events = GetInputLatencyEvents(browser_process, timeline_range)
+      self, browser_process, renderer_process, timeline_ranges, range_lookup):
+    latency_events = [[] for _ in timeline_ranges]
     # Plugin input event's latency slice is generated in renderer process.
-    latency_events.extend(GetInputLatencyEvents(renderer_process,
-                                                timeline_range))
-    input_event_latencies = ComputeInputEventLatencies(latency_events)
-    # Don't include scroll updates in the overall input latency measurement,
-    # because scroll updates can take much more time to process than other
-    # input events and would therefore add noise to overall latency numbers.
-    self.input_event_latency[-1] = [
-        latency for name, latency in input_event_latencies
-        if name != SCROLL_UPDATE_EVENT_NAME]
-    self.scroll_update_latency[-1] = [
-        latency for name, latency in input_event_latencies
-        if name == SCROLL_UPDATE_EVENT_NAME]
-    self.gesture_scroll_update_latency[-1] = [
-        latency for name, latency in input_event_latencies
-        if name == GESTURE_SCROLL_UPDATE_EVENT_NAME]
-
-  def _GatherEvents(self, event_name, process, timeline_range):
+    for process in (browser_process, renderer_process):
+      if not process:
+        continue
+      for event in process.IterAllAsyncSlicesOfName('InputLatency'):
+        sub_slices = None
+        for index in range_lookup.IterIndicesContaining(event.start,
+                                                        event.end):
+          if sub_slices is None:
+            sub_slices = [ss for ss in event.sub_slices if 'data' in ss.args]
+          latency_events[index].extend(sub_slices)
+
+    for index, events in enumerate(latency_events):
+      if not events:
+        continue
+      input_event_latencies = ComputeInputEventLatencies(events)
+      # Don't include scroll updates in the overall input latency measurement,
+      # because scroll updates can take much more time to process than other
+      # input events and would therefore add noise to overall latency numbers.
+      self.input_event_latency[index] = [
+          latency for name, latency in input_event_latencies
+          if name != SCROLL_UPDATE_EVENT_NAME]
+      self.scroll_update_latency[index] = [
+          latency for name, latency in input_event_latencies
+          if name == SCROLL_UPDATE_EVENT_NAME]
+      self.gesture_scroll_update_latency[index] = [
+          latency for name, latency in input_event_latencies
+          if name == GESTURE_SCROLL_UPDATE_EVENT_NAME]
+
+  def _GatherEvents(self, event_name, process, range_lookup):
+    """Returns (event, range indices) for the events of event_name that have
+    data and lie inside at least one range, sorted by start."""
     events = []
     for event in process.IterAllSlicesOfName(event_name):
-      if event.start >= timeline_range.min and event.end <= timeline_range.max:
-        if 'data' not in event.args:
-          continue
-        events.append(event)
-    events.sort(key=attrgetter('start'))
+      if 'data' not in event.args:
+        continue
+      indices = list(range_lookup.IterIndicesContaining(event.start,
+                                                        event.end))
+      if indices:
+        events.append((event, indices))
+    events.sort(key=lambda event_and_indices: event_and_indices[0].start)
     return events
 
-  def _AddFrameTimestamp(self, event):
+  def _AddFrameTimestamp(self, event, index):
     frame_count = event.args['data']['frame_count']
     if frame_count > 1:
       raise ValueError('trace contains multi-frame render stats')
     if frame_count == 1:
-      self.frame_timestamps[-1].append(
-          event.start)
-      if len(self.frame_timestamps[-1]) >= 2:
-        self.frame_times[-1].append(round(self.frame_timestamps[-1][-1] -
-                                          self.frame_timestamps[-1][-2], 2))
+      frame_timestamps = self.frame_timestamps[index]
+      frame_timestamps.append(event.start)
+      if len(frame_timestamps) >= 2:
+        self.frame_times[index].append(round(frame_timestamps[-1] -
+                                             frame_timestamps[-2], 2))
 
   def _InitFrameTimestampsFromTimeline(
-      self, process, timestamp_event_name, timeline_range):
-    for event in self._GatherEvents(
-        timestamp_event_name, process, timeline_range):
-      self._AddFrameTimestamp(event)
+      self, process, timestamp_event_name, range_lookup):
+    for event, indices in self._GatherEvents(
+        timestamp_event_name, process, range_lookup):
+      for index in indices:
+        self._AddFrameTimestamp(event, index)
 
-  def _InitImplThreadRenderingStatsFromTimeline(self, process, timeline_range):
+  def _InitImplThreadRenderingStatsFromTimeline(self, process, range_lookup):
     event_name = 'BenchmarkInstrumentation::ImplThreadRenderingStats'
-    for event in self._GatherEvents(event_name, process, timeline_range):
+    for event, indices in self._GatherEvents(event_name, process,
+                                             range_lookup):
       data = event.args['data']
       if data.get('visible_content_area', 0):
-        self.approximated_pixel_percentages[-1].append(
-            round(float(data['approximated_visible_content_area']) /
-                  float(data['visible_content_area']) * 100.0, 3))
+        percentage = round(float(data['approximated_visible_content_area']) /
+                           float(data['visible_content_area']) * 100.0, 3)
       else:
-        self.approximated_pixel_percentages[-1].append(0.0)
+        percentage = 0.0
+      for index in indices:
+        self.approximated_pixel_percentages[index].append(percentage)
 
-  def _InitFrameQueueingDurationsFromTimeline(self, process, timeline_range):
+  def _InitFrameQueueingDurationsFromTimeline(
+      self, process, timeline_ranges, range_lookup):
     try:
-      events = rendering_frame.GetFrameEventsInsideRange(process,
-                                                         timeline_range)
-      new_frame_queueing_durations = [e.queueing_duration for e in events]
-      self.frame_queueing_durations.append(new_frame_queueing_durations)
+      frames = rendering_frame.GetFrames(process)
     except rendering_frame.NoBeginFrameIdException:
       self.errors['frame_queueing_durations'] = (
           'Current chrome version does not support the queueing delay metric.')
+      return
+    frame_queueing_durations = [[] for _ in timeline_ranges]
+    for frame in frames:
+      for index in range_lookup.IterIndicesIntersecting(frame.bounds.min,
+                                                        frame.bounds.max):
+        frame_queueing_durations[index].append(frame.queueing_duration)
+    # Like the other stats, frame queueing durations are only computed for
+    # non-empty ranges, but they leave out the empty ones altogether.
+    self.frame_queueing_durations = [
+        durations for timeline_range, durations
+        in zip(timeline_ranges, frame_queueing_durations)
+        if not timeline_range.is_empty]
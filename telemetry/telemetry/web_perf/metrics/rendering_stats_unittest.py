@@ -390,6 +390,39 @@ class RenderingStatsUnitTest(unittest.TestCase):
     self.assertEquals(stats.approximated_pixel_percentages,
                       renderer_ref_stats.approximated_pixel_percentages)
 
+  def testOverlappingRanges(self):
+    timeline = model.TimelineModel()
+    renderer = timeline.GetOrCreateProcess(pid=2)
+    renderer_compositor = renderer.GetOrCreateThread(tid=22)
+
+    timer = MockTimer()
+    for i in xrange(0, 30):
+      AddImplThreadRenderingStats(timer, renderer_compositor, i == 0, None)
+    renderer.FinalizeImport()
+
+    length = timer.milliseconds
+    timeline_ranges = []
+    for begin, end in [(0.5, 0.8), (0.1, 0.7), (0.2, 0.3), (0.9, 1.1)]:
+      timeline_range = timeline_bounds.Bounds()
+      timeline_range.AddValue(length * begin)
+      timeline_range.AddValue(length * end)
+      timeline_ranges.append(timeline_range)
+    timeline_ranges.insert(2, timeline_bounds.Bounds())
+
+    # Each range gets the same stats as when it is the only range.
+    stats = RenderingStats(renderer, None, timeline_ranges)
+    for i, timeline_range in enumerate(timeline_ranges):
+      single_range_stats = RenderingStats(renderer, None, [timeline_range])
+      self.assertEquals(single_range_stats.frame_timestamps[0],
+                        stats.frame_timestamps[i])
+      self.assertEquals(single_range_stats.frame_times[0],
+                        stats.frame_times[i])
+      self.assertEquals(single_range_stats.approximated_pixel_percentages[0],
+                        stats.approximated_pixel_percentages[i])
+    self.assertTrue(stats.frame_timestamps[1])
+    self.assertTrue(stats.frame_timestamps[4])
+    self.assertEquals([], stats.frame_timestamps[2])
+
   def testInputLatencyFromTimeline(self):
     timeline = model.TimelineModel()
 
@@ -4,7 +4,6 @@
 import logging
 
 from telemetry.value import scalar
-from telemetry.web_perf import timeline_interaction_record as tir_module
 from telemetry.web_perf.metrics import mainthread_jank_stats
 from telemetry.web_perf.metrics import timeline_based_metric
 
@@ -27,19 +26,21 @@ class ResponsivenessMetric(timeline_based_metric.TimelineBasedMetric):
   def __init__(self):
     super(ResponsivenessMetric, self).__init__()
 
-  def AddResults(self, _, renderer_thread, interaction_records, results):
+  def CreateAccumulators(self, _, renderer_thread, interaction_records):
     self.VerifyNonOverlappedRecords(interaction_records)
-    try:
-      jank_stats = mainthread_jank_stats.MainthreadJankStats(
-          renderer_thread, interaction_records)
+    return [mainthread_jank_stats.MainthreadJankStats(
+        renderer_thread, interaction_records, sweep=False)]
+
+  def AddResultsFromAccumulators(self, accumulators, results):
+    jank_stats, = accumulators
     # TODO(nednguyen): maybe fall back to use wall-time for computing the
     # metrics.
-    except tir_module.NoThreadTimeDataException as e:
+    if jank_stats.error:
       #TODO(nednguyen): Report the warning with page_results system.
       logging.warning(
           'Main thread jank metrics cannot be computed for records %s since '
           'trace does not contain thread time data. %s',
-          repr(interaction_records), repr(e))
+          repr(jank_stats.interaction_records), repr(jank_stats.error))
       return
 
     results.AddValue(scalar.ScalarValue(
@@ -3,6 +3,7 @@
 # found in the LICENSE file.
 
 from telemetry.perf_tests_helper import FlattenList
+from telemetry.timeline import import_filter
 from telemetry.util import statistics
 from telemetry.value import list_of_scalar_values
 from telemetry.value import scalar
@@ -53,6 +54,11 @@ class SmoothnessMetric(timeline_based_metric.TimelineBasedMetric):
       [r.GetBounds() for r in interaction_records])
     self._PopulateResultsFromStats(results, stats)
 
+  def GetImportFilter(self):
+    return import_filter.ImportFilter(
+        names=rendering_stats.EVENT_NAMES,
+        name_prefixes=['Interaction.'])
+
   def _PopulateResultsFromStats(self, results, stats):
     page = results.current_page
     values = [
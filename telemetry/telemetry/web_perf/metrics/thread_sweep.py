@@ -0,0 +1,103 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Walks the slices of threads once for all the metrics that look at them.
+
+Metrics that compute their results from the slices of a thread describe what
+they need with SliceAccumulators. SweepThreads then walks every thread once and
+hands each slice to all the accumulators that asked for it, so the cost of
+walking a thread does not grow with the number of metrics computed from it.
+"""
+
+from collections import defaultdict
+
+from telemetry.timeline import bounds as bounds_module
+
+
+class SliceAccumulator(object):
+  """Collects statistics from the slices of one thread.
+
+  thread: the thread whose slices are collected.
+  event_names: the names of the slices to collect, or None for all of them.
+  toplevel_only: whether to only collect the top level slices of the thread.
+  time_range: a Bounds that collected slices overlap, or None for all slices.
+  """
+
+  def __init__(self, thread, event_names=None, toplevel_only=False,
+               time_range=None):
+    self.thread = thread
+    self.event_names = (frozenset(event_names) if event_names is not None
+                        else None)
+    self.toplevel_only = toplevel_only
+    self.time_range = time_range
+
+  def AddSlice(self, timeline_slice, ancestor_names):
+    """Adds a slice that this accumulator asked for.
+
+    Args:
+      timeline_slice: a telemetry.timeline.slice.Slice.
+      ancestor_names: the names of the slices that timeline_slice is nested
+          in, outermost first. The list is only valid during the call.
+    """
+    raise NotImplementedError()
+
+
+def _Overlaps(time_range, timeline_slice):
+  return (time_range is None or
+          (not time_range.is_empty and
+           timeline_slice.start <= time_range.max and
+           timeline_slice.end >= time_range.min))
+
+
+def _SweepThread(thread, accumulators):
+  toplevel_accumulators = []
+  accumulators_by_name = defaultdict(list)
+  accumulators_of_all_names = []
+  for accumulator in accumulators:
+    if accumulator.toplevel_only:
+      toplevel_accumulators.append(accumulator)
+    elif accumulator.event_names is None:
+      accumulators_of_all_names.append(accumulator)
+    else:
+      for name in accumulator.event_names:
+        accumulators_by_name[name].append(accumulator)
+  descend = bool(accumulators_by_name or accumulators_of_all_names)
+
+  # Slices are nested in their parents, so top level slices that are outside
+  # the time ranges of all the accumulators are skipped with their children.
+  time_range = None
+  if all(a.time_range is not None for a in accumulators):
+    time_range = bounds_module.Bounds()
+    for accumulator in accumulators:
+      time_range.AddBounds(accumulator.time_range)
+
+  ancestor_names = []
+  def Visit(timeline_slice, interested_accumulators):
+    for accumulator in interested_accumulators:
+      if _Overlaps(accumulator.time_range, timeline_slice):
+        accumulator.AddSlice(timeline_slice, ancestor_names)
+    for accumulator in accumulators_by_name.get(timeline_slice.name, ()):
+      if _Overlaps(accumulator.time_range, timeline_slice):
+        accumulator.AddSlice(timeline_slice, ancestor_names)
+    if not descend:
+      return
+    ancestor_names.append(timeline_slice.name)
+    for sub_slice in timeline_slice.sub_slices:
+      Visit(sub_slice, accumulators_of_all_names)
+    ancestor_names.pop()
+
+  toplevel_interested = toplevel_accumulators + accumulators_of_all_names
+  for timeline_slice in thread.toplevel_slices:
+    if _Overlaps(time_range, timeline_slice):
+      Visit(timeline_slice, toplevel_interested)
+
+
+def SweepThreads(accumulators):
+  """Hands the slices of their threads to accumulators, walking each thread
+  once."""
+  accumulators_by_thread = defaultdict(list)
+  for accumulator in accumulators:
+    accumulators_by_thread[accumulator.thread].append(accumulator)
+  for thread, thread_accumulators in accumulators_by_thread.iteritems():
+    _SweepThread(thread, thread_accumulators)
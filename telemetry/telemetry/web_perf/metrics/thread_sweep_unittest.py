@@ -0,0 +1,61 @@
+# Copyright 2014 The Chromium Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import unittest
+
+from telemetry.timeline import bounds
+from telemetry.timeline import model as model_module
+from telemetry.web_perf.metrics import thread_sweep
+
+
+class _RecordingAccumulator(thread_sweep.SliceAccumulator):
+  def __init__(self, thread, **kwargs):
+    super(_RecordingAccumulator, self).__init__(thread, **kwargs)
+    self.added = []
+
+  def AddSlice(self, timeline_slice, ancestor_names):
+    self.added.append((timeline_slice.name, list(ancestor_names)))
+
+
+class ThreadSweepTest(unittest.TestCase):
+  def setUp(self):
+    # [    a    ]      [    d    ]
+    #   [ b ]            [ b ]
+    #   [c]
+    # 0         10     20        30
+    model = model_module.TimelineModel()
+    self._thread = model.GetOrCreateProcess(1).GetOrCreateThread(2)
+    self._other_thread = model.GetOrCreateProcess(1).GetOrCreateThread(3)
+    for name, start, end in [('a', 0, 10), ('b', 2, 6), ('c', 2, 3),
+                             ('d', 20, 30), ('b', 22, 26)]:
+      self._thread.PushCompleteSlice('cat', name, start, end - start, None,
+                                     None)
+    self._other_thread.PushCompleteSlice('cat', 'b', 0, 5, None, None)
+    model.FinalizeImport(shift_world_to_zero=False)
+
+  def testSlicesAreDispatchedToInterestedAccumulators(self):
+    all_slices = _RecordingAccumulator(self._thread)
+    toplevel = _RecordingAccumulator(self._thread, toplevel_only=True)
+    named = _RecordingAccumulator(self._thread, event_names=['b'])
+    other_thread = _RecordingAccumulator(self._other_thread)
+    thread_sweep.SweepThreads([all_slices, toplevel, named, other_thread])
+
+    self.assertEqual([('a', []), ('b', ['a']), ('c', ['a', 'b']),
+                      ('d', []), ('b', ['d'])], all_slices.added)
+    self.assertEqual([('a', []), ('d', [])], toplevel.added)
+    self.assertEqual([('b', ['a']), ('b', ['d'])], named.added)
+    self.assertEqual([('b', [])], other_thread.added)
+
+  def testSlicesOutsideTimeRangeAreSkipped(self):
+    time_range = bounds.Bounds()
+    time_range.AddValue(21)
+    time_range.AddValue(23)
+    named = _RecordingAccumulator(self._thread, event_names=['b'],
+                                  time_range=time_range)
+    toplevel = _RecordingAccumulator(self._thread, toplevel_only=True,
+                                     time_range=bounds.Bounds())
+    thread_sweep.SweepThreads([named, toplevel])
+
+    self.assertEqual([('b', ['d'])], named.added)
+    self.assertEqual([], toplevel.added)
@@ -2,6 +2,8 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 
+from telemetry.web_perf.metrics import thread_sweep
+
 
 class TimelineBasedMetricException(Exception):
   """Exception that can be thrown from metrics that implements
@@ -38,7 +40,10 @@ class TimelineBasedMetric(object):
     """Computes and adds metrics for the interaction_records' time ranges.
 
     The override of this method should compute results on the data **only**
-    within the interaction_records' start and end time ranges.
+    within the interaction_records' start and end time ranges. Metrics that
+    compute their results from slices of threads should instead override
+    CreateAccumulators and AddResultsFromAccumulators, which this method
+    calls.
 
     Args:
       model: An instance of telemetry.timeline.model.TimelineModel.
@@ -48,8 +53,36 @@ class TimelineBasedMetric(object):
       results: An instance of page.PageTestResults.
 
     """
+    accumulators = self.CreateAccumulators(model, renderer_thread,
+                                           interaction_records)
+    if accumulators is None:
+      raise NotImplementedError()
+    thread_sweep.SweepThreads(accumulators)
+    self.AddResultsFromAccumulators(accumulators, results)
+
+  def CreateAccumulators(self, model, renderer_thread, interaction_records):
+    """Returns the thread_sweep.SliceAccumulators that collect the slices this
+    metric computes its results from, or None if AddResults is overridden.
+
+    TimelineBasedMeasurement walks each thread once for the accumulators of
+    all the metrics that run, then passes them to AddResultsFromAccumulators.
+    """
+    return None
+
+  def AddResultsFromAccumulators(self, accumulators, results):
+    """Adds the results computed by the accumulators of CreateAccumulators,
+    once they were handed all their slices."""
     raise NotImplementedError()
 
+  def GetImportFilter(self):
+    """Returns the telemetry.timeline.import_filter.ImportFilter that selects
+    every trace event that AddResults looks at, or None if it needs them all.
+
+    The model passed to AddResults may then hold only the events selected by
+    the filters of all the metrics that run on it.
+    """
+    return None
+
   def VerifyNonOverlappedRecords(self, interaction_records):
     """This raises exceptions if interaction_records contain overlapped ranges.
     """
@@ -2,6 +2,11 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 
+from telemetry.timeline import bounds
+from telemetry.web_perf.metrics import record_sweep
+from telemetry.web_perf.metrics import thread_sweep
+
+
 class EventStats(object):
   def __init__(self, src_event_name, result_name, result_description):
     self.src_event_name = src_event_name
@@ -15,23 +20,18 @@ class EventStats(object):
     return self.thread_duration - self.thread_duration_inside_idle
 
 
-def _FindEventStats(event_stats_list, event_name):
-  for event_stats in event_stats_list:
-    if event_stats.src_event_name == event_name:
-      return event_stats
-  return None
+_IDLE_NOTIFICATION_EVENT_NAME = 'V8.GCIdleNotification'
+
 
+class V8Stats(thread_sweep.SliceAccumulator):
+  """Sums up the thread durations of the garbage collection events of a
+  thread that lie within interaction records.
 
-def _IsDescendentOfIdleNotification(event):
-  parent = event.parent_slice
-  while parent:
-    if parent.name == 'V8.GCIdleNotification':
-      return True
-    parent = parent.parent_slice
-  return False
+  The stats are computed when they are created, or, if sweep is False, once
+  thread_sweep.SweepThreads is run with them.
+  """
 
-class V8Stats(object):
-  def __init__(self, renderer_thread, interaction_records):
+  def __init__(self, renderer_thread, interaction_records, sweep=True):
     self.all_event_stats = [
         EventStats('V8.GCIncrementalMarking',
                    'incremental_marking',
@@ -42,18 +42,30 @@ class V8Stats(object):
         EventStats('V8.GCCompactor',
                    'mark_compactor',
                    'total thread duration spent in mark-sweep-compactor')]
+    self._event_stats_by_name = dict(
+        (event_stats.src_event_name, event_stats)
+        for event_stats in self.all_event_stats)
+    self._record_sweep = record_sweep.RecordSweep(interaction_records)
+    time_range = bounds.Bounds()
+    for r in interaction_records:
+      time_range.AddValue(r.start)
+      time_range.AddValue(r.end)
+    super(V8Stats, self).__init__(
+        renderer_thread, event_names=self._event_stats_by_name.keys(),
+        time_range=time_range)
+    if sweep:
+      thread_sweep.SweepThreads([self])
 
-    # Find all GC events contained in an interaction record
-    for event in renderer_thread.IterAllSlices():
-      event_stats = _FindEventStats(self.all_event_stats, event.name)
-      if not event_stats:
-        continue
-      for r in interaction_records:
-        if not r.GetBounds().ContainsInterval(event.start, event.end):
-          continue
-        event_stats.thread_duration += event.thread_duration
-        if _IsDescendentOfIdleNotification(event):
-          event_stats.thread_duration_inside_idle += event.thread_duration
+  def AddSlice(self, timeline_slice, ancestor_names):
+    # Count the GC events contained in each interaction record.
+    event_stats = self._event_stats_by_name[timeline_slice.name]
+    inside_idle = _IDLE_NOTIFICATION_EVENT_NAME in ancestor_names
+    for _ in self._record_sweep.IterContainingRecords(timeline_slice.start,
+                                                      timeline_slice.end):
+      event_stats.thread_duration += timeline_slice.thread_duration
+      if inside_idle:
+        event_stats.thread_duration_inside_idle += (
+            timeline_slice.thread_duration)
 
   @property
   def total_gc_thread_duration(self):
@@ -7,12 +7,14 @@ from collections import defaultdict
 from telemetry.core.platform import tracing_category_filter
 from telemetry.core.platform import tracing_options
 from telemetry.page import page_test
+from telemetry.timeline import import_filter
 from telemetry.timeline import model as model_module
 from telemetry.value import trace
 from telemetry.web_perf import timeline_interaction_record as tir_module
 from telemetry.web_perf.metrics import fast_metric
 from telemetry.web_perf.metrics import responsiveness_metric
 from telemetry.web_perf.metrics import smoothness
+from telemetry.web_perf.metrics import thread_sweep
 
 # TimelineBasedMeasurement considers all instrumentation as producing a single
 # timeline. But, depending on the amount of instrumentation that is enabled,
@@ -45,6 +47,34 @@ def _GetMetricFromMetricType(metric_type):
   raise Exception('Unrecognized metric type: %s' % metric_type)
 
 
+def _GetImportFilter(trace_result, get_metric_from_metric_type_callback):
+  """Returns an ImportFilter for the events that the metrics asked for by the
+  interaction records of trace_result need, or None to import all events.
+
+  Only traces that are already held in memory are scanned for interaction
+  records; the others are imported whole.
+  """
+  event_data = trace_result.EventData()
+  if isinstance(event_data, dict):
+    event_data = event_data.get('traceEvents', [])
+  if not isinstance(event_data, list):
+    return None
+  metric_types = set()
+  for event in event_data:
+    name = event.get('name', '')
+    if event.get('ph') != 'S' or not tir_module.IsTimelineInteractionRecord(
+        name):
+      continue
+    marker = tir_module.ParseJavaScriptMarker(name)
+    if marker:
+      metric_types.update(f for f in marker[1] if f in tir_module.METRICS)
+  if not metric_types:
+    return None
+  return import_filter.ImportFilter.Union(
+      get_metric_from_metric_type_callback(metric_type).GetImportFilter()
+      for metric_type in metric_types)
+
+
 # TODO(nednguyen): Get rid of this results wrapper hack after we add interaction
 # record to telemetry value system.
 class _ResultsWrapper(object):
@@ -87,15 +117,32 @@ class _TimelineBasedMetrics(object):
     for i in all_interactions:
       interactions_by_label[i.label].append(i)
 
+    metric_runs = []
     for label, interactions in interactions_by_label.iteritems():
       are_repeatable = [i.repeatable for i in interactions]
       if not all(are_repeatable) and len(interactions) > 1:
         raise InvalidInteractions('Duplicate unrepeatable interaction records '
                                   'on the page')
       wrapped_results = _ResultsWrapper(results, label)
-      self.UpdateResultsByMetric(interactions, wrapped_results)
-
-  def UpdateResultsByMetric(self, interactions, wrapped_results):
+      metric_runs.extend(self.CreateMetricRuns(interactions, wrapped_results))
+
+    # Walk each thread once for all the metrics that compute their results
+    # from slices.
+    thread_sweep.SweepThreads(
+        accumulator
+        for _, _, _, accumulators in metric_runs if accumulators is not None
+        for accumulator in accumulators)
+    for metric, interactions, wrapped_results, accumulators in metric_runs:
+      if accumulators is None:
+        metric.AddResults(self._model, self._renderer_thread,
+                          interactions, wrapped_results)
+      else:
+        metric.AddResultsFromAccumulators(accumulators, wrapped_results)
+
+  def CreateMetricRuns(self, interactions, wrapped_results):
+    """Returns (metric, interactions, wrapped_results, accumulators) tuples
+    for the metrics that the flags of interactions ask for."""
+    metric_runs = []
     for metric_type in tir_module.METRICS:
       # For each metric type, either all or none of the interactions should
       # have that metric.
@@ -107,8 +154,10 @@ class _TimelineBasedMetrics(object):
         raise InvalidInteractions('Interaction records with the same logical '
                                   'name must have the same flags.')
       metric = self._get_metric_from_metric_type_callback(metric_type)
-      metric.AddResults(self._model, self._renderer_thread,
-                        interactions, wrapped_results)
+      accumulators = metric.CreateAccumulators(
+          self._model, self._renderer_thread, interactions)
+      metric_runs.append((metric, interactions, wrapped_results, accumulators))
+    return metric_runs
 
 
 class TimelineBasedMeasurement(page_test.PageTest):
@@ -166,7 +215,9 @@ class TimelineBasedMeasurement(page_test.PageTest):
     """ Collect all possible metrics and added them to results. """
     trace_result = tab.browser.platform.tracing_controller.Stop()
     results.AddValue(trace.TraceValue(results.current_page, trace_result))
-    model = model_module.TimelineModel(trace_result)
+    model = model_module.TimelineModel(
+        trace_result,
+        import_filter=_GetImportFilter(trace_result, _GetMetricFromMetricType))
     renderer_thread = model.GetRendererThreadFromTabId(tab.id)
     meta_metrics = _TimelineBasedMetrics(
         model, renderer_thread, _GetMetricFromMetricType)
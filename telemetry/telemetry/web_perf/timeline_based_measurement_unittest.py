@@ -13,6 +13,7 @@ from telemetry.page import page_set
 from telemetry.results import page_test_results
 from telemetry.timeline import model as model_module
 from telemetry.timeline import async_slice
+from telemetry.timeline import tracing_timeline_data
 from telemetry.unittest_util import browser_test_case
 from telemetry.unittest_util import options_for_unittests
 from telemetry.unittest_util import page_test_test_case
@@ -176,6 +177,24 @@ class TimelineBasedMetricsTests(unittest.TestCase):
     d.FinalizeImport()
     self.assertRaises(tbm_module.InvalidInteractions, d.AddResults)
 
+  def testImportFilterIsDerivedFromInteractionRecords(self):
+    def GetImportFilter(markers):
+      events = [{'name': marker, 'cat': 'blink.console', 'ph': 'S', 'id': i,
+                 'pid': 1, 'tid': 2, 'ts': 0, 'args': {}}
+                for i, marker in enumerate(markers)]
+      return tbm_module._GetImportFilter(  # pylint: disable=W0212
+          tracing_timeline_data.TracingTimelineData({'traceEvents': events}),
+          tbm_module._GetMetricFromMetricType)  # pylint: disable=W0212
+
+    smooth_filter = GetImportFilter(['Interaction.Scroll/is_smooth'])
+    self.assertTrue(smooth_filter.IsNameImported('InputLatency'))
+    self.assertTrue(smooth_filter.IsNameImported('Interaction.Other'))
+    self.assertFalse(smooth_filter.IsNameImported('V8.Execute'))
+    # The other metrics need all events.
+    self.assertIsNone(GetImportFilter(['Interaction.Scroll/is_smooth',
+                                       'Interaction.Tap/is_fast']))
+    self.assertIsNone(GetImportFilter([]))
+
 
 class TestTimelinebasedMeasurementPage(page_module.Page):
 
@@ -63,6 +63,21 @@ def GetJavaScriptMarker(label, flags):
   _AssertFlagsAreValid(flags)
   return 'Interaction.%s/%s' % (label, ','.join(flags))
 
+def ParseJavaScriptMarker(marker):
+  """Splits the marker string of an interaction record into its parts.
+
+  This is the inverse of GetJavaScriptMarker.
+
+  Returns:
+    A (label, flags) tuple, or None if marker is not the marker string of an
+    interaction record.
+  """
+  m = re.match(r'Interaction\.(?P<label>.+?)(/(?P<flags>[^/]+))?$', marker)
+  if not m:
+    return None
+  flags = m.group('flags').split(',') if m.group('flags') is not None else []
+  return m.group('label'), flags
+
 class TimelineInteractionRecord(object):
   """Represents an interaction that took place during a timeline recording.
 
@@ -156,11 +171,9 @@ class TimelineInteractionRecord(object):
     assert async_event.start_thread == async_event.end_thread, (
         'Start thread of this record\'s async event is not the same as its '
         'end thread')
-    m = re.match(r'Interaction\.(?P<label>.+?)(/(?P<flags>[^/]+))?$',
-                 async_event.name)
-    assert m, "Async event is not an interaction record."
-    label = m.group('label')
-    flags = m.group('flags').split(',') if m.group('flags') is not None else []
+    marker = ParseJavaScriptMarker(async_event.name)
+    assert marker, "Async event is not an interaction record."
+    label, flags = marker
     return cls(label, async_event.start, async_event.end, async_event, flags)
 
   @decorators.Cache